@@ -3,20 +3,77 @@ import gzip
 import pandas as pd
 from tqdm import tqdm
 
-maf_dir = "maf_files"
-all_maf = []
+from memo_cache import MemoCache
+from instrumentation import StepProfiler
+from config import configure
+from patient_table import aliquot_burden, summarize_burden
 
-maf_files = [f for f in os.listdir(maf_dir) if f.endswith(".maf.gz")]
+MAF_DIR = "maf_files"
+MERGED_MAF_PATH = "merged_LIHC_MAF.csv"
+# Hasta başına ham mutasyon yükü (toplam / nonsynonymous sayım) aynı okuma geçişinde dosya başına
+# çıkarılır. TMB ve hypermutator bayrağı config'e bağlı olduğundan burada yazılmaz; okuyan adımlar
+# (patients, step1) güncel [patients] exome_size_mb / hypermutator_tmb ile hesaplar.
+BURDEN_PATH = os.path.join("outputs", "patient_burden.csv")
+MEMO_DIR = os.path.join("outputs", ".memo_cache")   # None -> memo cache kapalı
+RUN_LOG_DIR = os.path.join("outputs", "run_logs")
+configure(globals(), "merge_maf")
 
-for maf in tqdm(maf_files):
-    with gzip.open(os.path.join(maf_dir, maf), 'rt') as f:
-        df = pd.read_csv(f, sep='\t', comment='#', low_memory=False)
-        all_maf.append(df)
 
-merged_maf = pd.concat(all_maf, ignore_index=True)
+def read_maf_files(maf_dir: str = MAF_DIR) -> pd.DataFrame:
+    """
+    maf_dir altındaki tüm .maf.gz dosyalarını tek bir tabloda birleştir.
+    Aliquot başına yük (dosya okunurken) df.attrs["aliquot_burden"]'e konur.
+    """
+    all_maf = []
+    burdens = []
 
-# analiz için dışa aktar
-merged_maf.to_csv("merged_LIHC_MAF.csv", index=False)
+    maf_files = [f for f in os.listdir(maf_dir) if f.endswith(".maf.gz")]
 
-print("MAF birleştirildi ve kaydedildi:")
-print(merged_maf.shape)
+    for maf in tqdm(maf_files):
+        with gzip.open(os.path.join(maf_dir, maf), 'rt') as f:
+            df = pd.read_csv(f, sep='\t', comment='#', low_memory=False)
+            all_maf.append(df)
+            burdens.append(aliquot_burden(df))
+
+    merged = pd.concat(all_maf, ignore_index=True)
+    merged.attrs["aliquot_burden"] = pd.concat(burdens, ignore_index=True) if burdens else aliquot_burden(merged)
+    return merged
+
+
+def write_burden(maf: pd.DataFrame, path: str = BURDEN_PATH) -> pd.DataFrame:
+    """read_maf_files'ın aliquot yüklerinden hasta başına ham yük sayımları (ekstra MAF taraması yok)."""
+    ab = maf.attrs.get("aliquot_burden")
+    burden = summarize_burden(ab if ab is not None else aliquot_burden(maf))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    burden.to_csv(path, index=False)
+    return burden
+
+
+def main():
+    read = read_maf_files
+    caches = []
+    if MEMO_DIR is not None:
+        # maf_files içeriği değişmediyse gz dosyaları yeniden parse edilmez
+        memo = MemoCache(MEMO_DIR)
+        read = memo.memoize("merge_maf.read_maf_files", files=("maf_dir",))(read_maf_files)
+        caches.append(memo)
+    prof = StepProfiler("merge_maf", log_dir=RUN_LOG_DIR, caches=caches)
+
+    with prof.phase("read MAF files") as ph:
+        merged_maf = read(MAF_DIR)
+        ph["rows_out"] = len(merged_maf)
+
+    # analiz için dışa aktar
+    with prof.phase("write merged CSV", rows_in=len(merged_maf)):
+        merged_maf.to_csv(MERGED_MAF_PATH, index=False)
+        burden = write_burden(merged_maf, BURDEN_PATH)
+    prof.finish()
+
+    print("MAF birleştirildi ve kaydedildi:")
+    print(merged_maf.shape)
+    print(f"Mutasyon yükü: {BURDEN_PATH} ({len(burden)} hasta, "
+          f"medyan nonsynonymous {burden['n_nonsynonymous'].median():.0f})")
+
+
+if __name__ == "__main__":
+    main()
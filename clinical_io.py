@@ -0,0 +1,305 @@
+import os
+import json
+import pickle
+import hashlib
+import argparse
+import pandas as pd
+
+from memo_cache import ENV_DISABLE, file_digest, _source_hash
+
+# ============================================================
+# Clinical loader (clinical.tsv / follow_up.tsv / pathology_detail.tsv)
+# - GDC TSV'leri vaka başına çok satırdır (diagnosis × treatment kombinasyonu),
+#   yüzlerce kolon içerir ve boş hücreler '-- ile doldurulur
+# - Şema bir kez çözülür: her tablo için mantıksal alan -> aday kolon isimleri
+#   (header'a karşı, büyük/küçük harf duyarsız; "~anahtar" = isminde anahtar geçen ilk kolon)
+# - Sadece gereken kolonlar okunur (usecols); '-- NA olur, sayısal alanlar float,
+#   kategorik alanlar category, bayraklar boolean
+# - Vaka başına tek satır: groupby(patient_id).agg(first / min / max), vektörel
+# - Tipli binary snapshot: <cache_dir>/<tablo>.pkl; kaynak dosya (boyut + mtime, gerekirse
+#   sha1) ve şema / loader kodu değişmedikçe TSV tekrar parse edilmez
+#
+#   from clinical_io import load_clinical, load_follow_up, load_pathology, load_cases
+#   clin = load_clinical(CLIN_PATH)      # patient_id, vital_status, days_to_death, age_at_index ...
+#   cov  = load_cases(BASE_DIR)          # üç tablo vaka başına birleşik (kovaryatlar için)
+#
+#   python clinical_io.py info  --base-dir D:\ALSU\GDC_TCGA_LIHC
+#   python clinical_io.py show clinical --base-dir ...
+#   python clinical_io.py clear --base-dir ...
+#
+# LIHC_MEMO=0 snapshot'ı da kapatır (her seferinde TSV okunur).
+# ============================================================
+
+NA_VALUES = ["'--", "--"]
+SNAPSHOT_VERSION = 1
+CACHE_SUBDIR = os.path.join("outputs", ".clinical_cache")
+
+ID_CANDIDATES = ["cases.submitter_id", "submitter_id", "case_submitter_id",
+                 "cases.case_id", "case_id", "patient_id"]
+
+# alan: (aday kolonlar, tip, vaka başına birleştirme)
+#   tip         : "id" | "num" | "cat" | "bool"
+#   birleştirme : "first" (ilk NA olmayan) | "min" | "max"
+CLINICAL_SCHEMA = {
+    "patient_id":             (["cases.submitter_id", "demographic.submitter_id"] + ID_CANDIDATES[1:], "id", None),
+    "is_primary":             (["diagnoses.diagnosis_is_primary_disease"], "bool", "max"),
+    "vital_status":           (["demographic.vital_status", "vital_status"], "cat", "first"),
+    "days_to_death":          (["demographic.days_to_death", "days_to_death"], "num", "first"),
+    "days_to_last_follow_up": (["diagnoses.days_to_last_follow_up", "days_to_last_follow_up"], "num", "max"),
+    "age_at_index":           (["demographic.age_at_index", "age_at_index"], "num", "first"),
+    "gender":                 (["demographic.gender", "gender"], "cat", "first"),
+    "race":                   (["demographic.race", "race"], "cat", "first"),
+    "ethnicity":              (["demographic.ethnicity", "ethnicity"], "cat", "first"),
+    "ajcc_pathologic_stage":  (["diagnoses.ajcc_pathologic_stage", "ajcc_pathologic_stage"], "cat", "first"),
+    "ajcc_pathologic_t":      (["diagnoses.ajcc_pathologic_t", "ajcc_pathologic_t"], "cat", "first"),
+    "tumor_grade":            (["diagnoses.tumor_grade", "tumor_grade"], "cat", "first"),
+    "child_pugh":             (["diagnoses.child_pugh_classification"], "cat", "first"),
+    "ishak_fibrosis_score":   (["diagnoses.ishak_fibrosis_score"], "cat", "first"),
+    "residual_disease":       (["diagnoses.residual_disease"], "cat", "first"),
+    "prior_treatment":        (["diagnoses.prior_treatment"], "cat", "first"),
+}
+
+FOLLOW_UP_SCHEMA = {
+    "patient_id":          (ID_CANDIDATES, "id", None),
+    "days_to_follow_up":   (["follow_ups.days_to_follow_up", "days_to_follow_up",
+                             "follow_up.days_to_follow_up"], "num", "max"),
+    "days_to_recurrence":  (["~days_to_recurrence"], "num", "min"),
+    "days_to_progression": (["~days_to_progression"], "num", "min"),
+}
+
+PATHOLOGY_SCHEMA = {
+    "patient_id":                (ID_CANDIDATES, "id", None),
+    "vascular_invasion_present": (["pathology_details.vascular_invasion_present"], "cat", "first"),
+    "vascular_invasion_type":    (["pathology_details.vascular_invasion_type"], "cat", "first"),
+    "tumor_largest_dimension":   (["pathology_details.tumor_largest_dimension_diameter",
+                                   "pathology_details.greatest_tumor_dimension"], "num", "max"),
+    "additional_findings":       (["pathology_details.additional_pathology_findings"], "cat", "first"),
+}
+
+# tablo: dosya, şema, zorunlu alanlar, öncelikli satır bayrağı ("first" için önce bu satırlar)
+TABLES = {
+    "clinical":  {"file": "clinical.tsv", "schema": CLINICAL_SCHEMA,
+                  "required": ["patient_id", "vital_status"], "prefer": "is_primary"},
+    "follow_up": {"file": "follow_up.tsv", "schema": FOLLOW_UP_SCHEMA,
+                  "required": ["patient_id", "days_to_follow_up"], "prefer": None},
+    "pathology": {"file": "pathology_detail.tsv", "schema": PATHOLOGY_SCHEMA,
+                  "required": ["patient_id"], "prefer": None},
+}
+
+
+# ------------------------------------------------------------
+# Şema çözümü + projeksiyonlu okuma
+# ------------------------------------------------------------
+def read_header(path):
+    return list(pd.read_csv(path, sep="\t", nrows=0).columns)
+
+
+def resolve_schema(columns, schema, required=(), label=""):
+    """{alan: kaynak kolon | None}; zorunlu alan bulunamazsa ValueError."""
+    lower_map = {}
+    for c in columns:
+        lower_map.setdefault(c.lower(), c)
+    out = {}
+    for field, (candidates, _, _) in schema.items():
+        col = None
+        for cand in candidates:
+            if cand.startswith("~"):
+                key = cand[1:].lower()
+                col = next((c for c in columns if key in c.lower()), None)
+            else:
+                col = lower_map.get(cand.lower())
+            if col is not None:
+                break
+        if col is None and field in required:
+            raise ValueError(f"{label}: '{field}' kolonu bulunamadı (adaylar: {', '.join(candidates)})")
+        out[field] = col
+    return out
+
+
+def read_projected(path, colmap, schema):
+    """Sadece eşlenen kolonları oku, alan adlarına çevir, tiplendir."""
+    used = [col for col in colmap.values() if col is not None]
+    # sayısal / bayrak kolonlarını C parser tiplendirir; metinler string olarak okunur
+    dtype = {colmap[f]: "string" for f, (_, kind, _) in schema.items() if kind in ("id", "cat") and colmap[f]}
+    raw = pd.read_csv(path, sep="\t", usecols=used, dtype=dtype, na_values=NA_VALUES, keep_default_na=True)
+    df = pd.DataFrame(index=raw.index)
+    for field, (_, kind, _) in schema.items():
+        col = colmap[field]
+        s = raw[col] if col is not None else pd.Series(pd.NA, index=raw.index, dtype="string")
+        if kind == "id":
+            s = s.str.strip().str.upper()
+        elif kind == "num":
+            s = s if s.dtype == float else pd.to_numeric(s, errors="coerce").astype(float)
+        elif kind == "bool":
+            if s.dtype != bool:
+                s = s.astype("string").str.lower().map({"true": True, "false": False})
+            s = s.astype("boolean")
+        df[field] = s
+    return df
+
+
+def collapse(df, schema, prefer=None):
+    """Vaka başına tek satır (ilk görünme sırası korunur); 'first' için prefer=True satırlar önce."""
+    df = df[df["patient_id"].notna()]
+    order = df["patient_id"].drop_duplicates()
+    if prefer:
+        df = df.sort_values(prefer, ascending=False, kind="mergesort", na_position="last")
+    agg = {field: how for field, (_, _, how) in schema.items() if how}
+    out = df.groupby("patient_id", sort=False).agg(agg).reindex(order.to_numpy())
+    for field, (_, kind, _) in schema.items():
+        if kind == "cat":
+            out[field] = out[field].astype("category")
+    out.index.name = "patient_id"
+    out = out.reset_index()
+    out["patient_id"] = out["patient_id"].astype("string")
+    return out
+
+
+# ------------------------------------------------------------
+# Snapshot
+# ------------------------------------------------------------
+def schema_hash(name):
+    spec = TABLES[name]
+    h = hashlib.sha1(json.dumps([SNAPSHOT_VERSION, spec["schema"], spec["required"], spec["prefer"], NA_VALUES],
+                                sort_keys=True).encode())
+    for fn in (resolve_schema, read_projected, collapse):
+        h.update(_source_hash(fn).encode())
+    return h.hexdigest()
+
+
+def default_cache_dir(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_SUBDIR)
+
+
+def _snapshot_path(cache_dir, name):
+    return os.path.join(cache_dir, f"{name}.pkl")
+
+
+def _read_snapshot(snap_path, path, key):
+    """Geçerli snapshot varsa (frame, source) döndür; yoksa None."""
+    try:
+        with open(snap_path, "rb") as f:
+            snap = pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if snap.get("key") != key:
+        return None
+    st = os.stat(path)
+    src = snap["source"]
+    if (src["size"], src["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+        return snap
+    # dosyaya dokunulmuş ama içerik aynı olabilir (kopya / touch) -> sha1 ile doğrula
+    if src["size"] == st.st_size and src["sha1"] == file_digest(path):
+        snap["source"].update(mtime_ns=st.st_mtime_ns)
+        return snap
+    return None
+
+
+def _write_snapshot(snap_path, snap):
+    os.makedirs(os.path.dirname(snap_path), exist_ok=True)
+    tmp = f"{snap_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(snap, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, snap_path)
+
+
+def load_table(name, path, cache_dir=None, use_cache=None, verbose=True):
+    """
+    Vaka başına tipli tablo (patient_id + şema alanları).
+    frame.attrs["source_columns"] = {alan: kaynak kolon | None} (hangi kolonun seçildiği).
+    """
+    spec = TABLES[name]
+    if use_cache is None:
+        use_cache = os.environ.get(ENV_DISABLE, "1") not in ("0", "false", "off")
+    cache_dir = cache_dir or default_cache_dir(path)
+    snap_path = _snapshot_path(cache_dir, name)
+    key = schema_hash(name)
+
+    snap = _read_snapshot(snap_path, path, key) if use_cache else None
+    if snap is not None:
+        if verbose:
+            print(f"♻ clinical snapshot: {name} ({len(snap['frame'])} vaka)")
+        frame = snap["frame"]
+        frame.attrs["source_columns"] = dict(snap["columns"])
+        return frame
+
+    label = os.path.basename(path)
+    colmap = resolve_schema(read_header(path), spec["schema"], spec["required"], label=label)
+    raw = read_projected(path, colmap, spec["schema"])
+    frame = collapse(raw, spec["schema"], prefer=spec["prefer"])
+    if verbose:
+        print(f"📄 {label}: {len(raw)} satır -> {len(frame)} vaka, "
+              f"{sum(c is not None for c in colmap.values())} kolon okundu")
+
+    if use_cache:
+        st = os.stat(path)
+        _write_snapshot(snap_path, {
+            "key": key, "table": name, "columns": colmap, "frame": frame,
+            "source": {"path": os.path.abspath(path), "size": st.st_size,
+                       "mtime_ns": st.st_mtime_ns, "sha1": file_digest(path)},
+        })
+    frame.attrs["source_columns"] = dict(colmap)
+    return frame
+
+
+def load_clinical(path, cache_dir=None, **kw):
+    return load_table("clinical", path, cache_dir, **kw)
+
+
+def load_follow_up(path, cache_dir=None, **kw):
+    return load_table("follow_up", path, cache_dir, **kw)
+
+
+def load_pathology(path, cache_dir=None, **kw):
+    return load_table("pathology", path, cache_dir, **kw)
+
+
+def load_cases(base_dir, cache_dir=None, **kw):
+    """clinical + follow_up + pathology, vaka başına tek satır (olmayan tablolar atlanır)."""
+    cases = None
+    for name, spec in TABLES.items():
+        path = os.path.join(base_dir, spec["file"])
+        if not os.path.exists(path):
+            continue
+        part = load_table(name, path, cache_dir or os.path.join(base_dir, CACHE_SUBDIR), **kw)
+        cases = part if cases is None else cases.merge(part, on="patient_id", how="outer", sort=False)
+    if cases is None:
+        raise FileNotFoundError(f"{base_dir}: clinical TSV dosyası bulunamadı")
+    return cases
+
+
+def main(argv=None):
+    from config import base_dir as config_base_dir
+
+    ap = argparse.ArgumentParser(description="Clinical TSV snapshot'ları (clinical_io.py)")
+    ap.add_argument("cmd", choices=["info", "show", "clear"])
+    ap.add_argument("tables", nargs="*", default=list(TABLES))
+    ap.add_argument("--base-dir", default=None, help="Veri klasörü (varsayılan: config [paths] base_dir)")
+    args = ap.parse_args(argv)
+
+    base = args.base_dir or config_base_dir()
+    cache_dir = os.path.join(base, CACHE_SUBDIR)
+    for name in args.tables:
+        path = os.path.join(base, TABLES[name]["file"])
+        snap_path = _snapshot_path(cache_dir, name)
+        if args.cmd == "clear":
+            if os.path.exists(snap_path):
+                os.remove(snap_path)
+                print(f"🗑 silindi: {snap_path}")
+            continue
+        if not os.path.exists(path):
+            print(f"{name:10s} dosya yok: {path}")
+            continue
+        if args.cmd == "info":
+            snap = _read_snapshot(snap_path, path, schema_hash(name))
+            state = f"güncel ({os.path.getsize(snap_path) / 1024:.0f} KB)" if snap else "yok / eski"
+            print(f"{name:10s} {os.path.basename(path):22s} snapshot: {state}")
+            continue
+        frame = load_table(name, path, cache_dir)
+        print(f"\n[{name}] {frame.shape}")
+        for field, col in frame.attrs["source_columns"].items():
+            print(f"  {field:26s} {str(frame[field].dtype):10s} {int(frame[field].notna().sum()):5d}  <- {col}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+from memo_cache import MemoCache, file_digest
+from config import base_dir
+
+# ============================================================
+# Ko-mutasyon komşu indeksi (MinHash + LSH)
+# - "X ile en çok birlikte mutasyonlu genler": step4B'nin gene_to_patients hasta
+#   kümeleri üzerinde Jaccard benzerliği. 14.6k gen için tüm çiftler ~100M küme kesişimi;
+#   bunun yerine tek vektörel geçişte MinHash imzaları + LSH bantları kurulur.
+# - MinHash: N_PERM evrensel hash (a*x + b) mod P, x = patient_idx; gen başına minimum
+#   (CSR segmentlerinde np.minimum.reduceat). İki genin imzalarının eşit pozisyon oranı ~ Jaccard.
+# - LSH: imza BANDS banda bölünür (bant başına N_PERM / BANDS satır); aynı bantta aynı kovaya
+#   düşen genler aday olur. Yaklaşık eşik ~ (1 / BANDS) ** (BANDS / N_PERM).
+# - top-k sorgusu: LSH adayları + MinHash tahminine göre en iyi k * CANDIDATE_FACTOR gen
+#   (gerçek ko-mutasyon Jaccard'ları çoğunlukla 0.1-0.2: LSH eşiğinin altında kalabilir);
+#   kesin skorlamadan sonra tahmini k. kesin Jaccard'ın EST_MARGIN_SD standart hata yakınında
+#   olan genler de eklenir (MinHash tahmin hatası ~ sqrt(J(1-J) / N_PERM)).
+# - Adaylar her zaman kesin Jaccard ile yeniden skorlanır (seyrek gen x hasta matrisi).
+# - Kaynak (MAF / patient_aliquots.csv) değişince indeks otomatik yeniden kurulur.
+#
+#   python comutation_index.py build
+#   python comutation_index.py query CTNNB1 AXIN1 TP53 -k 20
+#   python comutation_index.py query CTNNB1 --exact            # tam tarama (doğrulama)
+#   python comutation_index.py pairs --threshold 0.3 --out outputs/comut_pairs.csv
+#
+# Kullanım (script içinde):
+#   idx = open_comut_index()
+#   nb = idx.neighbors("CTNNB1", k=20)     # neighbor, jaccard, n_shared, ...
+#   pairs = idx.pairs(threshold=0.3)
+# ============================================================
+
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
+MAF_PATH = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
+ALIQUOT_PATH = os.path.join(BASE_DIR, "outputs", "patient_aliquots.csv")
+INDEX_DIR = os.path.join(BASE_DIR, "outputs", "comut_index")
+MEMO_DIR = os.path.join(BASE_DIR, "outputs", ".memo_cache")   # step4B ile aynı gene_to_patients cache'i
+
+INDEX_VERSION = 1
+N_PERM = 128
+BANDS = 64                   # bant başına N_PERM / BANDS = 2 satır -> eşik ~0.13
+MIN_PATIENTS = 3             # daha az hastada mutasyonlu genler indekslenmez (tekil eşleşmeler J=1 olur)
+MAX_BUCKET = 1000            # çift üretiminde bundan büyük kovalar atlanır (dejenere imzalar)
+PAIR_CHUNK = 200_000
+HASH_CHUNK = 1 << 20         # MinHash'te bir seferde işlenen (gen, hasta) girdisi
+SEED = 1
+TOP_K = 20
+CANDIDATE_FACTOR = 5         # top-k için MinHash tahmininden alınan ek aday sayısı (k x ...)
+EST_MARGIN_SD = 3.0          # top-k: k. kesin Jaccard'a bu kadar standart hata yakın tahminler de skorlanır
+
+_PRIME = np.uint64((1 << 31) - 1)   # Mersenne asal; patient_idx < 2^31
+
+
+# ------------------------------------------------------------
+# Kurulum
+# ------------------------------------------------------------
+def _source_stamp(paths, with_digest=True):
+    stamp = {}
+    for p in paths:
+        st = os.stat(p)
+        stamp[os.path.abspath(p)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if with_digest:
+            stamp[os.path.abspath(p)]["sha1"] = file_digest(p)
+    return stamp
+
+
+def gene_patient_sets(maf_path=MAF_PATH, aliquot_path=ALIQUOT_PATH, memo_dir=MEMO_DIR):
+    """step4B'nin {gen: sıralı patient_idx dizisi} yapısı (aynı memo girdisi paylaşılır)."""
+    from step4B_survival_by_gene import load_maf_patients, build_gene_to_patients
+
+    load, build = load_maf_patients, build_gene_to_patients
+    if memo_dir is not None:
+        memo = MemoCache(memo_dir)
+        load = memo.memoize("step4b.load_maf_patients", files=("maf_path", "aliquot_path"))(load_maf_patients)
+        build = memo.memoize("step4b.build_gene_to_patients")(build_gene_to_patients)
+    return build(load(maf_path, aliquot_path))
+
+
+def minhash_signatures(indptr, indices, n_perm=N_PERM, seed=SEED, chunk=HASH_CHUNK):
+    """CSR (gen -> patient_idx) için gen x n_perm MinHash imzaları (uint32); boş gen yok varsayılır."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size=n_perm, dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), size=n_perm, dtype=np.uint64)
+    n_genes = len(indptr) - 1
+    sig = np.empty((n_genes, n_perm), dtype=np.uint32)
+    x = indices.astype(np.uint64)
+    # gen blokları halinde: her blokta (n_perm x nnz_blok) hash matrisi
+    g0 = 0
+    while g0 < n_genes:
+        g1 = int(np.searchsorted(indptr, indptr[g0] + chunk, side="right")) - 1
+        g1 = min(max(g1, g0 + 1), n_genes)
+        lo, hi = indptr[g0], indptr[g1]
+        h = (a[:, None] * x[None, lo:hi] + b[:, None]) % _PRIME
+        sig[g0:g1] = np.minimum.reduceat(h, indptr[g0:g1] - lo, axis=1).T
+        g0 = g1
+    return sig
+
+
+def band_keys(sig, bands=BANDS):
+    """bands x gen kova anahtarları (bant satırlarının uint64 karışımı)."""
+    rows = sig.shape[1] // bands
+    keys = np.zeros((bands, sig.shape[0]), dtype=np.uint64)
+    for j in range(rows):
+        keys = keys * np.uint64(0x9E3779B97F4A7C15) + sig[:, j::rows][:, :bands].T.astype(np.uint64)
+    return keys
+
+
+def build_index(maf_path=MAF_PATH, aliquot_path=ALIQUOT_PATH, index_dir=INDEX_DIR, n_perm=N_PERM,
+                bands=BANDS, min_patients=MIN_PATIENTS, seed=SEED, memo_dir=MEMO_DIR, verbose=True):
+    """gene_to_patients -> CSR + MinHash imzaları + LSH bantları; index_dir'e yaz."""
+    if n_perm % bands:
+        raise ValueError(f"N_PERM ({n_perm}) BANDS'e ({bands}) tam bölünmeli")
+    t0 = time.time()
+    gene_to_patients = gene_patient_sets(maf_path, aliquot_path, memo_dir)
+    genes = np.array(sorted(g for g, p in gene_to_patients.items() if len(p) >= min_patients))
+    sizes = np.array([len(gene_to_patients[g]) for g in genes], dtype=np.int64)
+    indptr = np.r_[0, np.cumsum(sizes)].astype(np.int64)
+    indices = (np.concatenate([gene_to_patients[g] for g in genes]) if len(genes)
+               else np.array([], dtype=np.int64)).astype(np.int64)
+    n_patients = int(indices.max(initial=-1)) + 1
+
+    sig = minhash_signatures(indptr, indices, n_perm, seed)
+    keys = band_keys(sig, bands)
+    order = np.argsort(keys, axis=1, kind="stable").astype(np.int64)
+
+    meta_path = os.path.join(index_dir, "meta.json")
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir)
+    os.makedirs(index_dir)
+    np.savez(os.path.join(index_dir, "index.npz"), indptr=indptr, indices=indices, sig=sig,
+             band_order=order, band_sorted=np.take_along_axis(keys, order, axis=1), band_keys=keys)
+    with open(os.path.join(index_dir, "genes.json"), "w", encoding="utf-8") as f:
+        json.dump(genes.tolist(), f)
+    meta = {"version": INDEX_VERSION, "n_genes": int(len(genes)), "n_patients": n_patients,
+            "nnz": int(len(indices)), "n_perm": n_perm, "bands": bands, "min_patients": min_patients,
+            "seed": seed, "source": _source_stamp([maf_path, aliquot_path]),
+            "built": time.strftime("%Y-%m-%d %H:%M:%S"), "seconds": round(time.time() - t0, 2)}
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(meta_path + ".tmp", meta_path)
+    if verbose:
+        print(f"📇 Ko-mutasyon indeksi kuruldu: {index_dir} ({len(genes)} gen >= {min_patients} hasta, "
+              f"{len(indices)} gen-hasta, {n_perm} perm / {bands} bant, {meta['seconds']} sn)")
+    return CoMutIndex(index_dir)
+
+
+def is_stale(index_dir, maf_path, aliquot_path):
+    """İndeks yok / eski sürüm / parametre değişmiş / kaynak dosyalar değişmiş mi?"""
+    try:
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return True
+    if meta.get("version") != INDEX_VERSION or (meta["n_perm"], meta["bands"], meta["min_patients"],
+                                                meta["seed"]) != (N_PERM, BANDS, MIN_PATIENTS, SEED):
+        return True
+    now = _source_stamp([maf_path, aliquot_path], with_digest=False)
+    if set(now) != set(meta["source"]):
+        return True
+    for p, st in now.items():
+        src = meta["source"][p]
+        if (src["size"], src["mtime_ns"]) != (st["size"], st["mtime_ns"]):
+            if src["size"] != st["size"] or src["sha1"] != file_digest(p):
+                return True
+    return False
+
+
+def open_comut_index(maf_path=MAF_PATH, aliquot_path=ALIQUOT_PATH, index_dir=INDEX_DIR, verbose=True):
+    """Güncel indeksi aç; yoksa / kaynak değişmişse önce kur."""
+    if is_stale(index_dir, maf_path, aliquot_path):
+        return build_index(maf_path, aliquot_path, index_dir, verbose=verbose)
+    return CoMutIndex(index_dir)
+
+
+# ------------------------------------------------------------
+# Sorgu
+# ------------------------------------------------------------
+class CoMutIndex:
+    def __init__(self, index_dir=INDEX_DIR):
+        from scipy import sparse
+
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, "genes.json"), encoding="utf-8") as f:
+            self.genes = np.array(json.load(f), dtype=object)
+        ix = np.load(os.path.join(index_dir, "index.npz"))
+        self._ix = {k: ix[k] for k in ix.files}
+        self.sig = self._ix["sig"]
+        indptr, indices = self._ix["indptr"], self._ix["indices"]
+        self.sizes = np.diff(indptr)
+        # gen x hasta ikili matris: kesin Jaccard için (seyrek)
+        self.X = sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                                   shape=(len(self.genes), max(self.meta["n_patients"], 1)))
+        self._gene_pos = {g: i for i, g in enumerate(self.genes)}
+
+    def gene_pos(self, gene):
+        if gene not in self._gene_pos:
+            raise KeyError(f"'{gene}' indekste yok (< {self.meta['min_patients']} hastada mutasyonlu ya da MAF'ta yok)")
+        return self._gene_pos[gene]
+
+    def candidates(self, g):
+        """g ile en az bir bantta aynı kovaya düşen genler (g hariç)."""
+        keys, srt, order = self._ix["band_keys"], self._ix["band_sorted"], self._ix["band_order"]
+        found = []
+        for b in range(keys.shape[0]):
+            lo = np.searchsorted(srt[b], keys[b, g], side="left")
+            hi = np.searchsorted(srt[b], keys[b, g], side="right")
+            found.append(order[b, lo:hi])
+        cand = np.unique(np.concatenate(found))
+        return cand[cand != g]
+
+    def jaccard(self, g, others):
+        """Kesin Jaccard: (jaccard, n_shared) dizileri."""
+        shared = np.asarray(self.X[others] @ self.X[g].T.toarray()).ravel().astype(np.int64)
+        union = self.sizes[others] + self.sizes[g] - shared
+        return shared / np.maximum(union, 1), shared
+
+    def estimate(self, g):
+        """Tüm genler için MinHash Jaccard tahmini (eşit imza pozisyonu oranı)."""
+        return (self.sig == self.sig[g]).mean(axis=1)
+
+    def neighbors(self, gene, k=TOP_K, exact=False, factor=CANDIDATE_FACTOR):
+        """
+        gene için Jaccard'a göre en yakın k gen. Adaylar: LSH kovaları + MinHash tahmininde
+        en iyi k * factor gen; hepsi kesin skorlanır (exact -> tüm genler).
+        """
+        g = self.gene_pos(gene)
+        est_all = self.estimate(g)
+        est_all[g] = -1.0
+        if exact:
+            cand = np.delete(np.arange(len(self.genes)), g)
+        else:
+            m = min(k * factor, len(self.genes) - 1)
+            top = np.argpartition(-est_all, m - 1)[:m] if m > 0 else np.array([], dtype=np.int64)
+            cand = np.union1d(self.candidates(g), top[est_all[top] > 0])
+            jac, _ = self.jaccard(g, cand)
+            if len(cand) >= k:
+                # k. kesin skora tahmin hatası mesafesindeki genler de aday (tahmin gürültüsüne karşı)
+                jk = np.partition(jac, len(jac) - k)[len(jac) - k]
+                margin = EST_MARGIN_SD * np.sqrt(max(jk * (1 - jk), 1e-3) / self.sig.shape[1])
+                cand = np.union1d(cand, np.flatnonzero(est_all >= jk - margin))
+        jac, shared = self.jaccard(g, cand)
+        est = est_all[cand]
+        out = pd.DataFrame({"gene": gene, "neighbor": self.genes[cand], "jaccard": jac, "n_shared": shared,
+                            "n_gene": int(self.sizes[g]), "n_neighbor": self.sizes[cand], "minhash_est": est})
+        out = out[out["n_shared"] > 0]
+        return out.sort_values(["jaccard", "n_shared", "neighbor"], ascending=[False, False, True],
+                               kind="mergesort").head(k).reset_index(drop=True)
+
+    def candidate_pairs(self, max_bucket=MAX_BUCKET):
+        """Tüm bantlarda aynı kovayı paylaşan tekil gen çiftleri (i < j)."""
+        srt, order = self._ix["band_sorted"], self._ix["band_order"]
+        n = np.uint64(len(self.genes))
+        codes = []
+        for b in range(srt.shape[0]):
+            s = srt[b]
+            starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]])
+            lens = np.diff(np.r_[starts, len(s)])
+            # aynı boyuttaki kovalar tek seferde: triu indeksleriyle kova içi çiftler
+            for size in np.unique(lens[(lens >= 2) & (lens <= max_bucket)]):
+                st = starts[lens == size]
+                ti, tj = np.triu_indices(int(size), 1)
+                gi = order[b][st[:, None] + ti[None, :]].ravel().astype(np.uint64)
+                gj = order[b][st[:, None] + tj[None, :]].ravel().astype(np.uint64)
+                codes.append(np.minimum(gi, gj) * n + np.maximum(gi, gj))
+        if not codes:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        codes = np.unique(np.concatenate(codes))
+        return (codes // n).astype(np.int64), (codes % n).astype(np.int64)
+
+    def pairs(self, threshold=0.3, min_shared=1, max_bucket=MAX_BUCKET, chunk=PAIR_CHUNK):
+        """Kesin Jaccard >= threshold olan gen çiftleri (LSH adayları üzerinden)."""
+        gi, gj = self.candidate_pairs(max_bucket)
+        keep_i, keep_j, jac_all, shared_all = [], [], [], []
+        for s in range(0, len(gi), chunk):
+            a, b = gi[s:s + chunk], gj[s:s + chunk]
+            shared = np.asarray(self.X[a].multiply(self.X[b]).sum(axis=1)).ravel().astype(np.int64)
+            jac = shared / np.maximum(self.sizes[a] + self.sizes[b] - shared, 1)
+            m = (jac >= threshold) & (shared >= min_shared)
+            keep_i.append(a[m]), keep_j.append(b[m]), jac_all.append(jac[m]), shared_all.append(shared[m])
+        if not keep_i:
+            return pd.DataFrame(columns=["gene_a", "gene_b", "jaccard", "n_shared", "n_a", "n_b"])
+        a, b = np.concatenate(keep_i), np.concatenate(keep_j)
+        out = pd.DataFrame({"gene_a": self.genes[a], "gene_b": self.genes[b], "jaccard": np.concatenate(jac_all),
+                            "n_shared": np.concatenate(shared_all), "n_a": self.sizes[a], "n_b": self.sizes[b]})
+        return out.sort_values(["jaccard", "n_shared", "gene_a", "gene_b"], ascending=[False, False, True, True],
+                               kind="mergesort").reset_index(drop=True)
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Ko-mutasyon komşuları (MinHash + LSH, kesin Jaccard)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ["build", "info", "query", "pairs"]:
+        sp = sub.add_parser(name)
+        sp.add_argument("--base-dir", default=None, help="Veri klasörü (varsayılan: config [paths] base_dir)")
+        sp.add_argument("--index-dir", default=None, help="İndeks klasörü (varsayılan: <base-dir>/outputs/comut_index)")
+        if name == "query":
+            sp.add_argument("genes", nargs="+", help="Hugo_Symbol(lar)")
+            sp.add_argument("-k", type=int, default=TOP_K, help="Gen başına komşu sayısı")
+            sp.add_argument("--exact", action="store_true", help="LSH yerine tüm genleri kesin skorla")
+        if name == "pairs":
+            sp.add_argument("--threshold", type=float, default=0.3, help="Kesin Jaccard eşiği")
+            sp.add_argument("--min-shared", type=int, default=2, help="En az ortak hasta")
+            sp.add_argument("--limit", type=int, default=30, help="Ekrana basılacak çift sayısı")
+        if name in ("query", "pairs"):
+            sp.add_argument("--out", default=None, help="Sonucu CSV'ye yaz")
+    args = ap.parse_args(argv)
+
+    base = args.base_dir or BASE_DIR
+    maf_path = os.path.join(base, "merged_LIHC_MAF.csv")
+    aliquot_path = os.path.join(base, "outputs", "patient_aliquots.csv")
+    index_dir = args.index_dir or os.path.join(base, "outputs", "comut_index")
+    memo_dir = os.path.join(base, "outputs", ".memo_cache")
+
+    if args.cmd == "build":
+        build_index(maf_path, aliquot_path, index_dir, memo_dir=memo_dir)
+        return
+    if args.cmd == "info":
+        if not os.path.exists(os.path.join(index_dir, "meta.json")):
+            print(f"İndeks yok: {index_dir}  (python comutation_index.py build)")
+            return
+        stale = is_stale(index_dir, maf_path, aliquot_path)
+        m = CoMutIndex(index_dir).meta
+        print(f"İndeks : {index_dir} ({'ESKİ, sorguda yeniden kurulur' if stale else 'güncel'})  kuruldu {m['built']}")
+        print(f"Gen    : {m['n_genes']} (>= {m['min_patients']} hasta)   hasta: {m['n_patients']}   gen-hasta: {m['nnz']}")
+        rows = m["n_perm"] // m["bands"]
+        print(f"MinHash: {m['n_perm']} perm, {m['bands']} bant x {rows} satır "
+              f"(LSH eşiği ~{(1 / m['bands']) ** (1 / rows):.2f})")
+        return
+
+    if is_stale(index_dir, maf_path, aliquot_path):
+        idx = build_index(maf_path, aliquot_path, index_dir, memo_dir=memo_dir)
+    else:
+        idx = CoMutIndex(index_dir)
+    t0 = time.perf_counter()
+    if args.cmd == "query":
+        parts = []
+        for gene in args.genes:
+            try:
+                parts.append(idx.neighbors(gene, args.k, exact=args.exact))
+            except KeyError as e:
+                print(f"❌ {e}")
+        out = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"🔎 {len(parts)} gen, {len(out)} komşu ({'tam tarama' if args.exact else 'LSH'}, {ms:.1f} ms)")
+        for gene, grp in (out.groupby("gene", sort=False) if len(out) else []):
+            print(f"\n{gene} (n={int(grp['n_gene'].iloc[0])}):")
+            print(grp.drop(columns=["gene", "n_gene"]).to_string(index=False))
+    else:
+        out = idx.pairs(args.threshold, args.min_shared)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"🔎 Jaccard >= {args.threshold}: {len(out)} çift ({ms:.1f} ms)")
+        if len(out):
+            print(out.head(args.limit).to_string(index=False))
+    if args.out:
+        out.to_csv(args.out, index=False)
+        print("✅ yazıldı:", args.out)
+
+
+if __name__ == "__main__":
+    main()
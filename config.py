@@ -0,0 +1,276 @@
+import os
+import ast
+import json
+import difflib
+import hashlib
+import argparse
+import tomllib
+
+# ============================================================
+# Typed config (lihc.toml) + CLI override'ları
+# - Her adımın ayar sabitleri (TOP_N_GENES, MIN_MUT_PATIENTS, K_MIN/K_MAX, W_PATIENT,
+#   RF_N_ESTIMATORS ...) script'te varsayılan olarak kalır; config dosyasındaki
+#   [adım] bölümü bunları import sırasında ezer:
+#
+#     [paths]
+#     base_dir = 'D:\ALSU\GDC_TCGA_LIHC'
+#
+#     [step4b]
+#     min_mut_patients = 5        # -> MIN_MUT_PATIENTS
+#
+# - Tip kontrolü: değer, script'teki varsayılanın tipinde olmalı (int yerine float
+#   verilirse / bilinmeyen anahtar yazılırsa ConfigError; yakın isim önerilir)
+# - Öncelik: script varsayılanı < config dosyası < --set bölüm.anahtar=değer
+# - Config dosyası: LIHC_CONFIG ortam değişkeni, yoksa repo'daki lihc.toml
+#   --set override'ları LIHC_SET (JSON) ile alt process'lere taşınır
+#
+# Kullanım (adım script'inde, ayar sabitlerinden sonra):
+#   from config import base_dir, configure
+#   BASE_DIR = base_dir()
+#   ...
+#   configure(globals(), "step4b")
+#
+#   python config.py show [--set step4b.min_mut_patients=5]   # etkin config
+#   python config.py check                                   # tüm bölümleri script'lere karşı doğrula
+# ============================================================
+
+ENV_CONFIG = "LIHC_CONFIG"
+ENV_SET = "LIHC_SET"
+ENV_BASE_DIR = "LIHC_BASE_DIR"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(SCRIPT_DIR, "lihc.toml")
+DEFAULT_BASE_DIR = r"D:\ALSU\GDC_TCGA_LIHC"
+PATHS_SECTION = "paths"
+PATHS_KEYS = ["base_dir", "memo_dir"]      # memo_dir: MEMO_DIR'i olan tüm adımlar için ortak cache
+
+# config ile değiştirilebilen sabit tipleri (None varsayılanı: her tip kabul)
+CONFIGURABLE_TYPES = (bool, int, float, str, list, tuple, type(None))
+
+
+class ConfigError(ValueError):
+    pass
+
+
+# ------------------------------------------------------------
+# Okuma
+# ------------------------------------------------------------
+def parse_value(text):
+    """CLI değeri -> TOML değeri ('5' -> 5, '0.3' -> 0.3, 'true' -> True, '[2, 8]' -> [2, 8]); olmazsa string."""
+    try:
+        return tomllib.loads(f"v = {text}")["v"]
+    except tomllib.TOMLDecodeError:
+        return text
+
+
+def parse_assignment(text):
+    """'step4b.min_mut_patients=5' -> ('step4b.min_mut_patients', 5)."""
+    key, sep, value = text.partition("=")
+    key = key.strip()
+    if not sep or "." not in key:
+        raise ConfigError(f"Override 'bölüm.anahtar=değer' biçiminde olmalı: {text!r}")
+    return key, parse_value(value.strip())
+
+
+def parse_overrides(items):
+    return dict(parse_assignment(s) for s in items or [])
+
+
+def overrides_env(overrides):
+    """--set override'larını alt process'lere taşımak için LIHC_SET değeri."""
+    return json.dumps(overrides, sort_keys=True)
+
+
+def config_path(environ=None):
+    environ = os.environ if environ is None else environ
+    path = environ.get(ENV_CONFIG)
+    if path:
+        if not os.path.exists(path):
+            raise ConfigError(f"Config dosyası bulunamadı ({ENV_CONFIG}): {path}")
+        return path
+    return DEFAULT_CONFIG if os.path.exists(DEFAULT_CONFIG) else None
+
+
+def load_config(path=None, overrides=None, environ=None):
+    """
+    Etkin config: {bölüm: {anahtar: değer}}.
+    path / overrides verilmezse LIHC_CONFIG / LIHC_SET ortam değişkenlerinden okunur.
+    """
+    environ = os.environ if environ is None else environ
+    path = path or config_path(environ)
+    cfg = {}
+    if path:
+        with open(path, "rb") as f:
+            try:
+                cfg = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ConfigError(f"{path}: {e}") from None
+    for sec, vals in cfg.items():
+        if not isinstance(vals, dict):
+            raise ConfigError(f"{path}: '{sec}' bir bölüm olmalı ([{sec}]), üst seviye anahtar desteklenmez")
+    if overrides is None:
+        overrides = json.loads(environ.get(ENV_SET) or "{}")
+    for key, value in overrides.items():
+        sec, _, name = key.partition(".")
+        cfg.setdefault(sec, {})[name] = value
+    return cfg
+
+
+def base_dir(environ=None):
+    """Veri klasörü: LIHC_BASE_DIR > config [paths] base_dir > DEFAULT_BASE_DIR."""
+    environ = os.environ if environ is None else environ
+    if environ.get(ENV_BASE_DIR):
+        return environ[ENV_BASE_DIR]
+    return load_config(environ=environ).get(PATHS_SECTION, {}).get("base_dir", DEFAULT_BASE_DIR)
+
+
+def section_hash(name, cfg):
+    """Adım bölümünün hash'i (pipeline güncellik kontrolü için); bölüm boşsa None."""
+    sec = cfg.get(name) or {}
+    if not sec:
+        return None
+    return hashlib.sha1(json.dumps(sec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ------------------------------------------------------------
+# Tip kontrolü + uygulama
+# ------------------------------------------------------------
+def coerce(key, value, default):
+    """Değeri varsayılanın tipine göre doğrula / dönüştür."""
+    if default is None:
+        return value
+    if isinstance(default, bool):
+        ok = isinstance(value, bool)
+    elif isinstance(default, int):
+        ok = isinstance(value, int) and not isinstance(value, bool)
+    elif isinstance(default, float):
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+        value = float(value) if ok else value
+    elif isinstance(default, str):
+        ok = isinstance(value, str)
+    elif isinstance(default, (list, tuple)):
+        ok = isinstance(value, list)
+        value = type(default)(value) if ok else value
+    else:
+        raise ConfigError(f"{key}: {type(default).__name__} tipindeki sabit config ile değiştirilemez")
+    if not ok:
+        raise ConfigError(f"{key}: {type(default).__name__} bekleniyordu, {value!r} ({type(value).__name__}) verildi")
+    return value
+
+
+def configurable(namespace):
+    """Config ile değiştirilebilen sabitler: BÜYÜK_HARF isimli, basit tipte modül değişkenleri."""
+    return {k: v for k, v in namespace.items()
+            if k.isupper() and not k.startswith("_") and isinstance(v, CONFIGURABLE_TYPES)}
+
+
+def _unknown(name, key, known):
+    near = difflib.get_close_matches(key, [k.lower() for k in known], n=3)
+    hint = f" (bunu mu demek istedin: {', '.join(near)}?)" if near else ""
+    return ConfigError(f"[{name}] bilinmeyen anahtar: {key}{hint}")
+
+
+def check_section(name, values, defaults):
+    """values'ı defaults'a (SABİT -> varsayılan) karşı doğrula; {SABİT: değer} döndür."""
+    out = {}
+    for key, value in values.items():
+        const = key.upper()
+        if const not in defaults:
+            raise _unknown(name, key, defaults)
+        out[const] = coerce(f"{name}.{key}", value, defaults[const])
+    return out
+
+
+def configure(namespace, name, cfg=None, verbose=True):
+    """
+    Modül sabitlerini config'teki [name] bölümüyle ez (namespace = globals()).
+    [paths] memo_dir verilmişse modülün MEMO_DIR'i de ona yönlendirilir.
+    """
+    cfg = load_config() if cfg is None else cfg
+    applied = check_section(name, cfg.get(name) or {}, configurable(namespace))
+    memo_dir = (cfg.get(PATHS_SECTION) or {}).get("memo_dir")
+    if memo_dir and "MEMO_DIR" in namespace:
+        applied["MEMO_DIR"] = memo_dir
+    namespace.update(applied)
+    if verbose and applied:
+        print(f"⚙️  config [{name}]: " + ", ".join(f"{k}={v!r}" for k, v in applied.items()))
+    return applied
+
+
+# ------------------------------------------------------------
+# Script'i çalıştırmadan doğrulama (AST ile varsayılanlar)
+# ------------------------------------------------------------
+def script_defaults(path):
+    """Script'in üst seviye BÜYÜK_HARF atamaları; literal olmayanlar (os.path.join ...) None (her tip)."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    out = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            names = [target] if isinstance(target, ast.Name) else \
+                list(target.elts) if isinstance(target, ast.Tuple) else []
+            values = [node.value] if isinstance(target, ast.Name) else \
+                list(node.value.elts) if isinstance(node.value, ast.Tuple) else [None] * len(names)
+            for t, v in zip(names, values):
+                if not isinstance(t, ast.Name) or not t.id.isupper():
+                    continue
+                try:
+                    val = ast.literal_eval(v) if v is not None else None
+                except ValueError:
+                    val = None
+                if isinstance(val, CONFIGURABLE_TYPES):
+                    out[t.id] = val
+    return out
+
+
+def validate(cfg, scripts):
+    """cfg'yi {bölüm: script yolu} eşlemesine karşı doğrula; hata mesajları listesi döndür."""
+    errors = []
+    for sec, values in cfg.items():
+        if sec == PATHS_SECTION:
+            errors += [f"[{sec}] bilinmeyen anahtar: {k}" for k in values if k not in PATHS_KEYS]
+            continue
+        if sec not in scripts:
+            near = difflib.get_close_matches(sec, list(scripts), n=3)
+            errors.append(f"bilinmeyen bölüm: [{sec}]" + (f" (bunu mu demek istedin: {', '.join(near)}?)" if near else ""))
+            continue
+        try:
+            check_section(sec, values, script_defaults(scripts[sec]))
+        except ConfigError as e:
+            errors.append(str(e))
+    return errors
+
+
+def step_scripts():
+    from pipeline import STEPS
+    return {st["name"]: os.path.join(SCRIPT_DIR, st["script"]) for st in STEPS}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Config (lihc.toml) göster / doğrula")
+    ap.add_argument("cmd", choices=["show", "check"])
+    ap.add_argument("--config", default=None, help=f"Config dosyası (varsayılan: {ENV_CONFIG} veya lihc.toml)")
+    ap.add_argument("--set", action="append", default=[], metavar="BÖLÜM.ANAHTAR=DEĞER")
+    args = ap.parse_args(argv)
+
+    overrides = {**json.loads(os.environ.get(ENV_SET) or "{}"), **parse_overrides(args.set)}
+    cfg = load_config(args.config, overrides)
+    print(f"Config dosyası: {args.config or config_path() or '(yok, script varsayılanları)'}")
+    if args.cmd == "show":
+        print("base_dir:", os.environ.get(ENV_BASE_DIR) or (cfg.get(PATHS_SECTION) or {}).get("base_dir", DEFAULT_BASE_DIR))
+        for sec, values in cfg.items():
+            print(f"[{sec}]")
+            for k, v in values.items():
+                print(f"  {k} = {v!r}")
+        return
+    errors = validate(cfg, step_scripts())
+    for e in errors:
+        print("❌", e)
+    if errors:
+        raise SystemExit(1)
+    print("✅ Config geçerli.")
+
+
+if __name__ == "__main__":
+    main()
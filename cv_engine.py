@@ -0,0 +1,221 @@
+import os
+import time
+import pickle
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import RepeatedStratifiedKFold
+from sklearn.metrics import roc_auc_score, average_precision_score
+
+# ============================================================
+# Repeated stratified CV engine (STEP 3D model seçimi için)
+# - Fold indeksleri bir kez önceden hesaplanır
+# - model x fold x repeat işleri process pool üzerinde koşar (joblib/loky;
+#   Windows'ta script'in yeniden çalıştırılması sorunu yok)
+# - Her fit'in test olasılıkları diskte cache'lenir (model nesnesi saklanmaz):
+#     <cache_dir>/<veri parmak izi>/<iş anahtarı>.pkl
+#   Başka veri parmak izine ait klasörler her koşuda silinir (cache sınırsız büyümez)
+# - Çıktı: fold ve repeat bazında AUC/AP dağılımı + out-of-fold olasılıklar
+# ============================================================
+
+
+def make_folds(y, n_splits=5, n_repeats=50, seed=42):
+    """[(repeat, fold, train_idx, test_idx), ...] listesini önceden üret."""
+    y = np.asarray(y)
+    n_pos = int(y.sum())
+    if n_pos < n_splits:
+        raise ValueError(f"Pozitif sayısı ({n_pos}) n_splits ({n_splits}) değerinden küçük.")
+    rskf = RepeatedStratifiedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=seed)
+    folds = []
+    for i, (tr, te) in enumerate(rskf.split(np.zeros(len(y)), y)):
+        folds.append((i // n_splits, i % n_splits, tr.astype(np.int64), te.astype(np.int64)))
+    return folds
+
+
+def _predict_score(model, X):
+    if hasattr(model, "predict_proba"):
+        return model.predict_proba(X)[:, 1]
+    s = model.decision_function(X)
+    return (s - s.min()) / (s.max() - s.min() + 1e-9)
+
+
+def _safe_metrics(y_true, prob):
+    if len(np.unique(y_true)) < 2:
+        return np.nan, np.nan
+    return roc_auc_score(y_true, prob), average_precision_score(y_true, prob)
+
+
+def _job_key(name, model, data_key, train_idx):
+    h = hashlib.sha1()
+    h.update(name.encode())
+    h.update(type(model).__name__.encode())
+    h.update(repr(sorted(model.get_params(deep=True).items(), key=lambda kv: kv[0])).encode())
+    h.update(data_key.encode())
+    h.update(train_idx.tobytes())
+    return h.hexdigest()
+
+
+def _fit_fold(name, model, X, y, repeat, fold, train_idx, test_idx, cache_path):
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        return name, repeat, fold, cached["prob"], True
+
+    m = clone(model)
+    m.fit(X[train_idx], y[train_idx])
+    prob = _predict_score(m, X[test_idx])
+
+    if cache_path is not None:
+        tmp = cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"prob": prob, "test_idx": test_idx}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    return name, repeat, fold, prob, False
+
+
+def data_fingerprint(X, y):
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(X, dtype=float).tobytes())
+    h.update(np.ascontiguousarray(y).tobytes())
+    return h.hexdigest()
+
+
+def prune_cache(cache_dir, data_key):
+    """cache_dir altında data_key dışındaki (eski veriye ait) girdileri sil; silinen girdi sayısı."""
+    removed = 0
+    if not os.path.isdir(cache_dir):
+        return removed
+    for entry in os.listdir(cache_dir):
+        if entry == data_key:
+            continue
+        path = os.path.join(cache_dir, entry)
+        if os.path.isdir(path):
+            removed += sum(len(files) for _, _, files in os.walk(path))
+            shutil.rmtree(path, ignore_errors=True)
+        elif entry.endswith((".pkl", ".tmp")):
+            # eski düz düzen (model nesneli girdiler)
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def run_repeated_cv(models, X, y, folds, n_jobs=-1, cache_dir=None, verbose=0):
+    """
+    models : {isim: sklearn estimator}
+    folds  : make_folds() çıktısı
+    Dönen dict:
+      "fold_metrics"   : model, repeat, fold, auc, ap
+      "repeat_metrics" : model, repeat, auc, ap (repeat içindeki OOF tahminlerle)
+      "summary"        : model başına AUC/AP ortalama, std, %2.5-%97.5
+      "oof"            : {model: (n,) repeat'ler üzerinden ortalama OOF olasılık}
+      "cache_hits"     : cache'ten gelen iş sayısı
+      "cache_pruned"   : silinen eski (başka veriye ait) cache girdisi sayısı
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y).astype(int)
+    n = len(y)
+    n_repeats = max(r for r, _, _, _ in folds) + 1
+
+    data_key = data_fingerprint(X, y)
+    cache_pruned = 0
+    if cache_dir is not None:
+        cache_pruned = prune_cache(cache_dir, data_key)
+        cache_dir = os.path.join(cache_dir, data_key)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    jobs = []
+    for name, model in models.items():
+        for repeat, fold, tr, te in folds:
+            cache_path = None
+            if cache_dir is not None:
+                cache_path = os.path.join(cache_dir, _job_key(name, model, data_key, tr) + ".pkl")
+            jobs.append(delayed(_fit_fold)(name, model, X, y, repeat, fold, tr, te, cache_path))
+
+    out = Parallel(n_jobs=n_jobs, backend="loky", verbose=verbose)(jobs)
+
+    # repeat x gen OOF matrisi (her repeat'te her gen tam bir kez test edilir)
+    oof_mats = {name: np.full((n_repeats, n), np.nan) for name in models}
+    test_of = {(r, f): te for r, f, _, te in folds}
+    fold_rows = []
+    cache_hits = 0
+    for name, repeat, fold, prob, hit in out:
+        te = test_of[(repeat, fold)]
+        oof_mats[name][repeat, te] = prob
+        auc, ap = _safe_metrics(y[te], prob)
+        fold_rows.append({"model": name, "repeat": repeat, "fold": fold, "auc": auc, "ap": ap})
+        cache_hits += int(hit)
+
+    repeat_rows = []
+    for name, mat in oof_mats.items():
+        for r in range(n_repeats):
+            auc, ap = _safe_metrics(y, mat[r])
+            repeat_rows.append({"model": name, "repeat": r, "auc": auc, "ap": ap})
+
+    fold_metrics = pd.DataFrame(fold_rows).sort_values(["model", "repeat", "fold"]).reset_index(drop=True)
+    repeat_metrics = pd.DataFrame(repeat_rows)
+
+    summary = (
+        repeat_metrics.groupby("model")[["auc", "ap"]]
+        .agg(["mean", "std", lambda s: s.quantile(0.025), lambda s: s.quantile(0.975)])
+    )
+    summary.columns = [f"{m}_{s}" for m, s in zip(
+        summary.columns.get_level_values(0),
+        ["mean", "std", "q025", "q975"] * 2
+    )]
+    summary = summary.reset_index()
+    summary["n_repeats"] = n_repeats
+    summary["n_folds"] = len(folds) // n_repeats
+
+    oof = {name: np.nanmean(mat, axis=0) for name, mat in oof_mats.items()}
+
+    return {
+        "fold_metrics": fold_metrics,
+        "repeat_metrics": repeat_metrics,
+        "summary": summary,
+        "oof": oof,
+        "cache_hits": cache_hits,
+        "cache_pruned": cache_pruned,
+    }
+
+
+def pick_best_model(summary, metric="auc_mean"):
+    """Ortalama CV metriğine göre en iyi model adı (NaN en sona)."""
+    s = summary.sort_values(metric, ascending=False, na_position="last")
+    return str(s.iloc[0]["model"])
+
+
+def benchmark_models(models, X, y, n_repeats=3, predict_rows=None):
+    """
+    Her model için tüm veri üzerinde fit ve predict süresi (saniye, n_repeats ortalaması/minimumu).
+    predict_rows: tahmin için satır sayısı (None -> X'in tamamı)
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y).astype(int)
+    Xp = X if predict_rows is None else X[np.arange(predict_rows) % len(X)]
+    rows = []
+    for name, model in models.items():
+        fit_t, pred_t = [], []
+        for _ in range(n_repeats):
+            m = clone(model)
+            t0 = time.perf_counter()
+            m.fit(X, y)
+            fit_t.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            _predict_score(m, Xp)
+            pred_t.append(time.perf_counter() - t0)
+        rows.append({
+            "model": name,
+            "n_train": len(y),
+            "n_predict": len(Xp),
+            "fit_sec_mean": float(np.mean(fit_t)),
+            "fit_sec_min": float(np.min(fit_t)),
+            "predict_sec_mean": float(np.mean(pred_t)),
+            "predict_sec_min": float(np.min(pred_t)),
+            # early stopping olan modellerde kullanılan iterasyon sayısı
+            "n_iter": int(getattr(m, "n_iter_", 0)) or np.nan,
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from memo_cache import content_hash, _source_hash
+
+# ============================================================
+# Headless figure subsystem (tüm adımlar için ortak)
+# - Adımlar grafiği çizmez, "spec" toplar: çıktı yolu + modül seviyesindeki bir
+#   render fonksiyonu + veri argümanları. Spec'ler arka planda bir process
+#   pool'unda (non-interactive Agg backend, plt.show() yok) PNG'ye yazılır;
+#   analiz çizimi beklemeden devam eder, close() sonunda beklenir.
+# - Spec anahtarı = render fonksiyonunun kaynak kodu + veri içeriği + dpi hash'i.
+#   Dosya yerindeyse ve anahtar değişmediyse tekrar çizilmez (manifest:
+#   <manifest_dir>/<batch>.json; her adımın kendi manifest'i -> paralel adımlar çakışmaz).
+# - LIHC_PLOTS=0 -> grafik modu kapalı (add() hiçbir şey yapmaz, matplotlib yüklenmez)
+# - LIHC_FIG_JOBS -> worker sayısı (0: pool yok, sırayla bu process'te çiz)
+#
+# Kullanım (step içinde):
+#   figures = FigureBatch("step3b", OUTPUT_DIR)
+#   figures.add(os.path.join(OUTPUT_DIR, "elbow.png"), render_elbow, k_values, inertias, dpi=200)
+#   ...                                   # analiz devam eder, çizim arka planda
+#   figures.close()                       # bekle + manifest yaz
+#
+# Render fonksiyonu: pyplot ile YENİ bir figure çizer (savefig / show / close yapmaz),
+# pickle'lanabilmesi için modül seviyesinde tanımlı olmalı.
+# ============================================================
+
+ENV_PLOTS = "LIHC_PLOTS"
+ENV_FIG_JOBS = "LIHC_FIG_JOBS"
+MANIFEST_DIR_NAME = ".figure_cache"
+MAX_FIG_JOBS = 4          # her worker matplotlib'i ayrı yükler (~60 MB)
+
+
+def plots_enabled():
+    return os.environ.get(ENV_PLOTS, "1").lower() not in ("0", "", "false", "off")
+
+
+def _default_jobs():
+    n = os.environ.get(ENV_FIG_JOBS)
+    if n is not None:
+        return int(n)
+    return min(os.cpu_count() or 1, MAX_FIG_JOBS)
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+def _render_spec(out_path, render, args, kwargs, dpi):
+    """Tek spec'i çiz ve kaydet (worker'da ya da sırayla bu process'te)."""
+    _use_agg()
+    import matplotlib.pyplot as plt
+
+    t0 = time.perf_counter()
+    try:
+        render(*args, **kwargs)
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        # yarım yazılmış PNG kalmasın: önce geçici dosya, sonra rename
+        root, ext = os.path.splitext(out_path)
+        tmp = f"{root}.tmp{os.getpid()}{ext}"
+        plt.savefig(tmp, dpi=dpi)
+        os.replace(tmp, out_path)
+    finally:
+        plt.close("all")
+    return time.perf_counter() - t0
+
+
+class FigureBatch:
+    def __init__(self, name, output_dir, manifest_dir=None, n_jobs=None, enabled=None):
+        """
+        name         : manifest adı (genelde adım adı)
+        output_dir   : manifest_dir verilmezse <output_dir>/.figure_cache
+        n_jobs       : worker sayısı (None -> LIHC_FIG_JOBS ya da min(cpu, 4); 0 -> sırayla)
+        enabled      : False -> grafik yok (None -> LIHC_PLOTS ortam değişkeni)
+        """
+        self.name = name
+        self.output_dir = output_dir
+        self.manifest_dir = manifest_dir or os.path.join(output_dir, MANIFEST_DIR_NAME)
+        self.manifest_path = os.path.join(self.manifest_dir, f"{name}.json")
+        self.n_jobs = _default_jobs() if n_jobs is None else n_jobs
+        self.enabled = plots_enabled() if enabled is None else enabled
+        self.rendered = 0
+        self.skipped = 0
+        self.failed = []
+        self._manifest = self._read_manifest() if self.enabled else {}
+        self._done = {}          # path -> anahtar (bu batch'te çizilen / atlanan)
+        self._pending = {}       # future -> (path, anahtar)
+        self._serial = []        # n_jobs=0 için
+        self._pool = None
+
+    def _read_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _rel(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.output_dir)).replace(os.sep, "/")
+
+    # --------------------------------------------------------
+    # Spec ekleme
+    # --------------------------------------------------------
+    def add(self, out_path, render, *args, dpi=200, **kwargs):
+        """Grafik spec'i ekle; güncelse atla, değilse arka planda çizime gönder."""
+        if not self.enabled:
+            return False
+        key = content_hash(render.__module__, render.__qualname__, _source_hash(render), dpi, args, kwargs)
+        rel = self._rel(out_path)
+        if os.path.exists(out_path) and self._manifest.get(rel) == key:
+            self.skipped += 1
+            self._done[rel] = key
+            return False
+
+        if self.n_jobs == 0:
+            self._serial.append((out_path, rel, key, render, args, kwargs, dpi))
+            return True
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=max(self.n_jobs, 1), initializer=_use_agg)
+        fut = self._pool.submit(_render_spec, out_path, render, args, kwargs, dpi)
+        self._pending[fut] = (out_path, rel, key)
+        return True
+
+    # --------------------------------------------------------
+    # Bitir
+    # --------------------------------------------------------
+    def _record(self, out_path, rel, key, run):
+        try:
+            run()
+        except Exception as e:           # bir grafik hatası diğerlerini durdurmasın; sonda raporlanır
+            self.failed.append((out_path, f"{type(e).__name__}: {e}"))
+            return
+        self.rendered += 1
+        self._done[rel] = key
+
+    def close(self, verbose=True):
+        """Bekleyen çizimleri bitir, manifest'i yaz; {rendered, skipped, failed} döndür."""
+        for out_path, rel, key, render, args, kwargs, dpi in self._serial:
+            self._record(out_path, rel, key, lambda: _render_spec(out_path, render, args, kwargs, dpi))
+        self._serial = []
+        for fut, (out_path, rel, key) in list(self._pending.items()):
+            self._record(out_path, rel, key, fut.result)
+        self._pending = {}
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+        if self.enabled and self._done:
+            self._manifest.update(self._done)
+            os.makedirs(self.manifest_dir, exist_ok=True)
+            tmp = self.manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.manifest_path)
+
+        if verbose and self.enabled:
+            print(f"\n🖼 Grafikler ({self.name}): {self.rendered} çizildi, {self.skipped} güncel (atlandı)"
+                  + (f", {len(self.failed)} HATA" if self.failed else ""))
+        elif verbose:
+            print(f"\n🖼 Grafikler ({self.name}): kapalı ({ENV_PLOTS}=0)")
+        if self.failed:
+            msg = "\n".join(f"  {p}: {err}" for p, err in self.failed)
+            raise RuntimeError(f"{len(self.failed)} grafik çizilemedi:\n{msg}")
+        return {"rendered": self.rendered, "skipped": self.skipped, "failed": len(self.failed)}
+
+
+@contextmanager
+def figure_batch(figures, name, output_dir):
+    """Verilen batch'i kullan; yoksa yeni bir batch aç ve blok sonunda kapat (tek başına çağrılar için)."""
+    if figures is not None:
+        yield figures
+        return
+    own = FigureBatch(name, output_dir)
+    try:
+        yield own
+    finally:
+        own.close()      # blok hata verse de worker pool kapanır
@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import cProfile
+from contextlib import contextmanager
+
+# pandas sadece log yazılırken / okunurken import edilir (pipeline.py ve lihc.py hızlı açılsın)
+
+try:
+    import resource            # Linux / macOS
+except ImportError:
+    resource = None
+try:
+    import psutil              # opsiyonel (Windows'ta peak RSS için)
+except ImportError:
+    psutil = None
+
+# ============================================================
+# Adım / faz bazlı ölçüm (run log)
+# - Her faz için: wall süre, CPU süresi, peak RSS, girdi/çıktı satır sayısı,
+#   memo cache hit/miss (+ istenirse ek sayaçlar)
+# - Run log:
+#     outputs/run_logs/runs.csv                 (tüm koşular, faz başına bir satır)
+#     outputs/run_logs/<run_id>/<step>.json     (tek adımın detayı)
+#     outputs/run_logs/<run_id>/<step>.prof     (LIHC_PROFILE=1 ise cProfile dump)
+# - Aynı pipeline koşusundaki adımlar LIHC_RUN_ID ortam değişkeniyle aynı run_id'yi paylaşır
+#
+# Kullanım (script içinde):
+#   prof = StepProfiler("step4b", caches=[memo])
+#   with prof.phase("OS scan", rows_in=len(os_df)) as ph:
+#       ...
+#       ph["rows_out"] = len(os_res)
+#   prof.finish()
+#
+# Rapor:
+#   python instrumentation.py                 # son koşu + önceki koşuya göre değişim
+#   python instrumentation.py --run <run_id>
+#   python -m pstats outputs/run_logs/<run_id>/step4b.prof
+#
+# Not: CPU süresi bu process'e aittir; joblib/loky worker'larının CPU'su dahil değildir.
+#      peak RSS process ömrü boyunca en yüksek değerdir; rss_growth_mb fazın bu
+#      tepe değeri ne kadar yükselttiğini gösterir.
+# ============================================================
+
+DEFAULT_LOG_DIR = os.path.join("outputs", "run_logs")
+RUNS_CSV = "runs.csv"
+ENV_RUN_ID = "LIHC_RUN_ID"
+ENV_PROFILE = "LIHC_PROFILE"
+
+RUN_COLUMNS = ["run_id", "step", "phase", "started", "wall_s", "cpu_s", "peak_rss_mb", "rss_growth_mb",
+               "rows_in", "rows_out", "cache_hits", "cache_misses", "extra"]
+
+
+def peak_rss_mb():
+    """Process'in şimdiye kadarki en yüksek RSS'i (MB); ölçülemezse NaN."""
+    if resource is not None:
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r / 1024 ** 2 if sys.platform == "darwin" else r / 1024
+    if psutil is not None:
+        mi = psutil.Process().memory_info()
+        return getattr(mi, "peak_wset", mi.rss) / 1024 ** 2
+    return float("nan")
+
+
+def new_run_id():
+    return datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+
+
+def _env_flag(name):
+    return os.environ.get(name, "0").lower() not in ("0", "", "false", "off")
+
+
+class StepProfiler:
+    def __init__(self, step, log_dir=DEFAULT_LOG_DIR, caches=(), run_id=None, profile=None):
+        """
+        step    : adım adı (pipeline.py'deki isimle aynı olması önerilir)
+        caches  : hits / misses sayaçları olan nesneler (MemoCache)
+        profile : True -> cProfile dump (None -> LIHC_PROFILE ortam değişkeni)
+        """
+        self.step = step
+        self.log_dir = log_dir
+        self.caches = list(caches)
+        self.run_id = run_id or os.environ.get(ENV_RUN_ID) or new_run_id()
+        self.records = []
+        self._open = None
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self._rss0 = peak_rss_mb()
+        self._started = datetime.datetime.now().isoformat(timespec="seconds")
+        self._profiler = None
+        if profile if profile is not None else _env_flag(ENV_PROFILE):
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    # --------------------------------------------------------
+    # Fazlar
+    # --------------------------------------------------------
+    def _cache_counts(self):
+        return (sum(getattr(c, "hits", 0) for c in self.caches),
+                sum(getattr(c, "misses", 0) for c in self.caches))
+
+    def begin(self, name, rows_in=None):
+        """Yeni faz başlat (açık faz varsa önce kapatılır); faz kaydını (dict) döndür."""
+        if self._open is not None:
+            self.end()
+        hits, misses = self._cache_counts()
+        self._open = {
+            "phase": name,
+            "started": datetime.datetime.now().isoformat(timespec="seconds"),
+            "rows_in": rows_in,
+            "rows_out": None,
+            "extra": {},
+            "_t": time.perf_counter(),
+            "_c": time.process_time(),
+            "_rss": peak_rss_mb(),
+            "_hits": hits,
+            "_misses": misses,
+        }
+        return self._open
+
+    def end(self, rows_out=None):
+        ph = self._open
+        if ph is None:
+            return None
+        self._open = None
+        if rows_out is not None:
+            ph["rows_out"] = rows_out
+        hits, misses = self._cache_counts()
+        rss = peak_rss_mb()
+        rec = {
+            "run_id": self.run_id,
+            "step": self.step,
+            "phase": ph["phase"],
+            "started": ph["started"],
+            "wall_s": round(time.perf_counter() - ph["_t"], 4),
+            "cpu_s": round(time.process_time() - ph["_c"], 4),
+            "peak_rss_mb": round(rss, 1),
+            "rss_growth_mb": round(rss - ph["_rss"], 1),
+            "rows_in": ph["rows_in"],
+            "rows_out": ph["rows_out"],
+            "cache_hits": hits - ph["_hits"] + ph["extra"].pop("cache_hits", 0),
+            "cache_misses": misses - ph["_misses"] + ph["extra"].pop("cache_misses", 0),
+            "extra": ph["extra"],
+        }
+        self.records.append(rec)
+        return rec
+
+    @contextmanager
+    def phase(self, name, rows_in=None):
+        ph = self.begin(name, rows_in=rows_in)
+        try:
+            yield ph
+        finally:
+            if self._open is ph:
+                self.end()
+
+    def add(self, key, value):
+        """Açık faza sayaç ekle (örn. add("cache_hits", cv["cache_hits"]))."""
+        if self._open is not None:
+            self._open["extra"][key] = self._open["extra"].get(key, 0) + value
+
+    # --------------------------------------------------------
+    # Kayıt
+    # --------------------------------------------------------
+    def finish(self, verbose=True):
+        """Açık fazı kapat, run log'a yaz; adım toplam kaydını döndür."""
+        self.end()
+        rss = peak_rss_mb()
+        total = {
+            "run_id": self.run_id,
+            "step": self.step,
+            "phase": "__total__",
+            "started": self._started,
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "cpu_s": round(time.process_time() - self._c0, 4),
+            "peak_rss_mb": round(rss, 1),
+            "rss_growth_mb": round(rss - self._rss0, 1),
+            "rows_in": self.records[0]["rows_in"] if self.records else None,
+            "rows_out": self.records[-1]["rows_out"] if self.records else None,
+            "cache_hits": sum(r["cache_hits"] for r in self.records),
+            "cache_misses": sum(r["cache_misses"] for r in self.records),
+            "extra": {},
+        }
+        rows = self.records + [total]
+
+        run_dir = os.path.join(self.log_dir, self.run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        with open(os.path.join(run_dir, f"{self.step}.json"), "w", encoding="utf-8") as f:
+            json.dump({"run_id": self.run_id, "step": self.step, "phases": rows}, f, indent=1, default=str)
+
+        import pandas as pd
+
+        csv_path = os.path.join(self.log_dir, RUNS_CSV)
+        tab = pd.DataFrame(rows, columns=RUN_COLUMNS)
+        tab["extra"] = tab["extra"].map(lambda d: json.dumps(d) if d else "")
+        # tek write çağrısı (paralel adımlar aynı dosyaya ekliyor)
+        text = tab.to_csv(index=False, header=not os.path.exists(csv_path))
+        with open(csv_path, "a", encoding="utf-8", newline="") as f:
+            f.write(text)
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(os.path.join(run_dir, f"{self.step}.prof"))
+            self._profiler = None
+
+        if verbose:
+            cols = ["phase", "wall_s", "cpu_s", "peak_rss_mb", "rows_in", "rows_out", "cache_hits"]
+            print(f"\n⏱ {self.step} ölçümleri (run {self.run_id}):")
+            print(tab[cols].to_string(index=False))
+        return total
+
+
+# ------------------------------------------------------------
+# Run log okuma / karşılaştırma
+# ------------------------------------------------------------
+def load_runs(log_dir=DEFAULT_LOG_DIR):
+    import pandas as pd
+
+    path = os.path.join(log_dir, RUNS_CSV)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=RUN_COLUMNS)
+    return pd.read_csv(path)
+
+
+def summarize(log_dir=DEFAULT_LOG_DIR, run_id=None):
+    """
+    Seçilen koşunun (varsayılan: en son) faz tablosu + aynı adım/fazın bir önceki
+    ölçümüne göre wall süre değişimi (regresyon takibi).
+    """
+    runs = load_runs(log_dir)
+    if runs.empty:
+        return runs
+    # runs.csv kronolojik olarak eklenir: satır sırası = zaman sırası
+    if run_id is None:
+        run_id = runs["run_id"].iloc[-1]
+    is_cur = (runs["run_id"] == run_id).to_numpy()
+    if not is_cur.any():
+        raise ValueError(f"run_id bulunamadı: {run_id}")
+    cur = runs[is_cur].copy()
+    prev = runs.iloc[:int(is_cur.argmax())]
+    prev = prev.drop_duplicates(subset=["step", "phase"], keep="last")[["step", "phase", "wall_s"]]
+    cur = cur.merge(prev.rename(columns={"wall_s": "wall_s_prev"}), on=["step", "phase"], how="left")
+    cur["wall_change_pct"] = (cur["wall_s"] / cur["wall_s_prev"] - 1) * 100
+    for c in ["rows_in", "rows_out", "cache_hits", "cache_misses"]:
+        cur[c] = cur[c].astype("Int64")
+    return cur
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run log raporu (adım/faz süreleri, bellek, cache)")
+    ap.add_argument("--log-dir", default=DEFAULT_LOG_DIR)
+    ap.add_argument("--run", default=None, help="run_id (varsayılan: son koşu)")
+    ap.add_argument("--out", default=None, help="Özet tabloyu CSV olarak kaydet")
+    args = ap.parse_args(argv)
+
+    tab = summarize(args.log_dir, args.run)
+    if tab.empty:
+        print("Run log boş:", args.log_dir)
+        return
+    print(f"Run: {tab['run_id'].iloc[0]}")
+    cols = ["step", "phase", "wall_s", "wall_s_prev", "wall_change_pct", "cpu_s", "peak_rss_mb",
+            "rows_in", "rows_out", "cache_hits", "cache_misses"]
+    print(tab[cols].to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    if args.out:
+        tab.to_csv(args.out, index=False)
+        print("✅ Kaydedildi:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# Vektörize Kaplan–Meier / RMST motoru (STEP 4B gen taraması için)
+# - Tüm hastalar süreye göre BİR kez sıralanır; olay zamanları (tekil süreler) ortaktır
+# - G grup (örn. her genin mutant ve WT grubu) tek (G x n) maske matrisiyle verilir;
+#   risk altındaki / olay sayıları, S(t), medyan, sabit ufuklarda S(t) ve RMST
+#   hepsi dizi işlemleriyle hesaplanır (gen başına lifelines fit'i yok)
+# - Medyan lifelines ile aynı tanım: S(t) <= 0.5 olan ilk süre; hiç düşmezse inf
+# - RMST(tau) = 0..tau arası S(t) alanı; varyans Greenwood tipi (Klein & Moeschberger):
+#   Var = sum_{t_j <= tau} A_j^2 d_j / (R_j (R_j - d_j)),  A_j = t_j..tau arası alan
+# ============================================================
+
+DAYS_PER_YEAR = 365.25
+
+
+def km_curves(time, event, groups):
+    """
+    time, event: (n,) hasta dizileri; groups: (G, n) bool maske (grup başına üyeler).
+    {"times": (k,) tekil süreler, "surv": (G, k) S(t), "at_risk", "events": (G, k),
+     "last_time": (G,) grubun son gözlem süresi} döndürür.
+    """
+    time = np.asarray(time, dtype=float)
+    event = np.asarray(event, dtype=float)
+    groups = np.atleast_2d(np.asarray(groups, dtype=bool))
+
+    order = np.argsort(time, kind="mergesort")
+    t_sorted = time[order]
+    times, starts = np.unique(t_sorted, return_index=True)
+    m = groups[:, order].astype(np.float64)
+
+    counts = np.add.reduceat(m, starts, axis=1) if len(times) else m[:, :0]
+    events = np.add.reduceat(m * event[order], starts, axis=1) if len(times) else m[:, :0]
+    at_risk = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hazard = np.where(at_risk > 0, events / at_risk, 0.0)
+    surv = np.cumprod(1.0 - hazard, axis=1)
+
+    seen = counts > 0
+    last = np.where(seen.any(axis=1), len(times) - 1 - np.argmax(seen[:, ::-1], axis=1), -1)
+    last_time = np.where(last >= 0, times[np.maximum(last, 0)], np.nan)
+    return {"times": times, "surv": surv, "at_risk": at_risk, "events": events, "last_time": last_time}
+
+
+def median_survival(km, q=0.5):
+    """Grup başına S(t) <= q olan ilk süre (lifelines median_survival_time_ ile aynı); düşmezse inf."""
+    below = km["surv"] <= q
+    hit = below.any(axis=1)
+    idx = np.argmax(below, axis=1)
+    return np.where(hit, km["times"][idx] if len(km["times"]) else np.inf, np.inf)
+
+
+def survival_at(km, horizons):
+    """
+    (G, H) S(h). h grubun son gözleminden sonraysa ve S henüz 0 değilse NaN
+    (takip yetmiyor; KM eğrisi orada tanımsız).
+    """
+    horizons = np.asarray(horizons, dtype=float)
+    surv_full = np.hstack([np.ones((km["surv"].shape[0], 1)), km["surv"]])
+    idx = np.searchsorted(km["times"], horizons, side="right")       # 0 -> ilk süreden önce (S=1)
+    out = surv_full[:, idx]
+    s_last = surv_full[np.arange(len(surv_full)), np.searchsorted(km["times"], km["last_time"], side="right")]
+    beyond = (horizons[None, :] > km["last_time"][:, None]) & (s_last[:, None] > 0)
+    return np.where(beyond | np.isnan(km["last_time"])[:, None], np.nan, out)
+
+
+def rmst(km, tau):
+    """
+    Grup başına RMST(tau) ve Greenwood tipi varyans. tau: skaler veya (G,) dizi.
+    (rmst, var) döndürür; (G,) diziler.
+    """
+    times, surv = km["times"], km["surv"]
+    g = surv.shape[0]
+    tau = np.broadcast_to(np.asarray(tau, dtype=float), (g,))[:, None]
+
+    # S(t) basamak fonksiyonu: [0, t_1) -> 1, [t_j, t_{j+1}) -> S_j, son basamak tau'ya kadar
+    bounds = np.concatenate([[0.0], times, [np.inf]])
+    clipped = np.minimum(bounds[None, :], tau)
+    widths = np.diff(clipped, axis=1)
+    surv_full = np.hstack([np.ones((g, 1)), surv])
+    area = np.cumsum(surv_full * widths, axis=1)                      # area[:, j] = 0..min(b_{j+1}, tau)
+    total = area[:, -1]
+
+    # A_j = t_j..tau alanı (t_j = times[j]); t_j > tau olan terimler sayılmaz
+    tail = total[:, None] - area[:, :-1]
+    d, r = km["events"], km["at_risk"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        term = np.where((r - d > 0) & (times[None, :] <= tau), tail ** 2 * d / (r * (r - d)), 0.0)
+    return total, term.sum(axis=1)
+
+
+def km_compare(time, event, mut_masks, horizons_days=(), tau_days=5 * DAYS_PER_YEAR):
+    """
+    Gen başına mutant vs WT KM özeti; mut_masks: (G, n) bool.
+    Tek km_curves çağrısı (2G grup). RMST tau'su gen başına min(tau_days, iki grubun son
+    gözlemi) ile kısılır ki fark iki eğrinin de tanımlı olduğu aralıkta alınsın.
+    dict döndürür: median_mut / median_wt (G,), surv_mut / surv_wt (G, H),
+    rmst_mut / rmst_wt / rmst_diff / rmst_diff_se / rmst_p / tau (G,)
+    """
+    from scipy.special import ndtr
+
+    mut_masks = np.atleast_2d(np.asarray(mut_masks, dtype=bool))
+    g = mut_masks.shape[0]
+    km = km_curves(time, event, np.vstack([mut_masks, ~mut_masks]))
+    med = median_survival(km)
+    surv_h = survival_at(km, horizons_days)
+    tau = np.fmin(np.fmin(km["last_time"][:g], km["last_time"][g:]), tau_days)
+    r, var = rmst(km, np.concatenate([tau, tau]))
+
+    diff = r[:g] - r[g:]
+    se = np.sqrt(var[:g] + var[g:])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(se > 0, diff / se, np.nan)
+    return {
+        "median_mut": med[:g], "median_wt": med[g:],
+        "surv_mut": surv_h[:g], "surv_wt": surv_h[g:],
+        "rmst_mut": r[:g], "rmst_wt": r[g:],
+        "rmst_diff": diff, "rmst_diff_se": se, "rmst_p": 2.0 * ndtr(-np.abs(z)), "tau": tau,
+    }
+
+
+def horizon_labels(horizons_years):
+    """[1, 3, 5] -> ["1y", "3y", "5y"] (kolon sonekleri)."""
+    return [f"{y:g}y" for y in horizons_years]
+
+
+def km_group_table(time, event, labels):
+    """Etiket başına n / olay / KM medyanı (alt tip tabloları için), etiket sıralı."""
+    labels = pd.Series(np.asarray(labels))
+    levels = np.sort(labels.unique())
+    masks = labels.to_numpy()[None, :] == levels[:, None]
+    km = km_curves(time, event, masks)
+    return pd.DataFrame({"label": levels, "n": masks.sum(axis=1),
+                         "n_events": (masks * np.asarray(event, dtype=float)).sum(axis=1).astype(int),
+                         "median_days": median_survival(km)})
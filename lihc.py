@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import runpy
+import argparse
+import importlib
+import subprocess
+
+from pipeline import STEPS, SCRIPT_DIR, ENV_BASE_DIR, ENV_PLOTS
+from config import parse_overrides, overrides_env, load_config, ENV_CONFIG, ENV_SET
+
+# ============================================================
+# Tek giriş noktası (CLI)
+# - Her pipeline adımı ve yardımcı araç bir alt komut:
+#     python lihc.py step3d
+#     python lihc.py step4b --base-dir D:\ALSU\GDC_TCGA_LIHC
+#     python lihc.py step4b --set step4b.min_mut_patients=5     # config override (config.py)
+#     python lihc.py sweep --grid step4b.min_mut_patients=5,10,20 -j 3
+#     python lihc.py pipeline --dry-run        # alt komuttan sonraki argümanlar aracın kendisine gider
+#     python lihc.py runs --run <run_id>
+#     python lihc.py --list
+# - Bu dosya sadece stdlib + pipeline.py (stdlib) import eder; matplotlib / sklearn /
+#   lifelines / scipy ancak seçilen alt komutun kod yolu onlara ihtiyaç duyunca yüklenir
+#   (adım modülleri bunları fonksiyon içinde import eder).
+#
+# Import süresi bütçesi:
+#   python lihc.py check-imports               # her modül ayrı (soğuk) process'te ölçülür
+#   python lihc.py check-imports --detail step3d_ml_driver_like_score   # -X importtime top 15
+#   Bütçe aşılırsa ya da import sırasında ağır bir paket yüklenirse çıkış kodu 1 (CI'da kullanılabilir).
+# ============================================================
+
+# Yardımcı araçlar: alt komut -> (modül, açıklama); hepsi main(argv) sunar
+TOOLS = {
+    "pipeline": ("pipeline", "Hash tabanlı pipeline runner (pipeline.py)"),
+    "runs":     ("instrumentation", "Run log raporu: adım/faz süreleri, bellek, cache"),
+    "memo":     ("memo_cache", "Memo cache durumu / temizleme"),
+    "registry": ("model_registry", "Model registry: listele / batch skorla"),
+    "rank-eval": ("ranking_eval", "Referans listelerle sıralama değerlendirmesi"),
+    "synth":    ("synthetic_cohort", "Sentetik kohort üret"),
+    "bench":    ("scaling_benchmark", "Sentetik kohortlarla ölçekleme benchmark'ı"),
+    "config":   ("config", "Config (lihc.toml) göster / doğrula"),
+    "sweep":    ("sweep", "Parametre grid'i için paralel pipeline koşuları"),
+    "queue":    ("work_queue", "Dosya tabanlı iş kuyruğu: worker başlat / durum"),
+    "clinical": ("clinical_io", "Clinical TSV snapshot'ları: durum / göster / temizle"),
+    "maf":      ("maf_index", "MAF gen / hasta / bölge sorguları (kalıcı indeks)"),
+    "comut":    ("comutation_index", "Ko-mutasyon komşuları: MinHash + LSH indeksi, kesin Jaccard"),
+}
+
+# Import'u yan etkisiz olan modüller (script gövdesi main() içinde); check-imports bunları ölçer.
+# step4A / target_gene import edilince çalışan script'lerdir, ölçülmez.
+IMPORT_SAFE = [
+    "lihc", "pipeline", "config", "sweep", "work_queue", "clinical_io", "maf_index", "comutation_index", "instrumentation", "memo_cache", "figures", "ranking_eval",
+    "model_registry",
+    "analysis", "step1_gene_feature_table", "step2_gene_priority_score",
+    "step3A_validate_and_report", "step3B_clustering", "step3c_cluster_interpretation",
+    "step3d_ml_driver_like_score", "patient_table", "mutational_signatures", "patient_subtypes", "km_engine", "step4B_survival_by_gene", "subgroup_analysis", "penalized_cox", "step4c_big_picture_plots",
+]
+IMPORT_BUDGET_S = 1.0          # modül başına soğuk import süresi üst sınırı (pandas ~0.4 sn dahil)
+HEAVY_MODULES = ["matplotlib", "sklearn", "lifelines", "scipy"]
+
+_PROBE = """
+import sys, time, json, importlib
+t0 = time.perf_counter()
+importlib.import_module({mod!r})
+dt = time.perf_counter() - t0
+print(json.dumps({{"seconds": dt, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _step_commands():
+    return {st["name"]: st["script"] for st in STEPS}
+
+
+def run_step(name, argv, base_dir=None, plots=True, config=None, overrides=None):
+    """Adım script'ini bu process'te __main__ olarak çalıştır (python <script> ile aynı)."""
+    script = os.path.join(SCRIPT_DIR, _step_commands()[name])
+    if not plots:
+        os.environ[ENV_PLOTS] = "0"
+    # config, adım modülü import edilirken ortam değişkenlerinden okunur
+    if config:
+        os.environ[ENV_CONFIG] = os.path.abspath(config)
+    if overrides:
+        os.environ[ENV_SET] = overrides_env(overrides)
+    load_config()
+    if base_dir:
+        # pipeline.run_script ile aynı: göreli yol kullanan script'ler için cwd = base_dir,
+        # BASE_DIR kullananlar modül import edilirken ortam değişkenini okur
+        os.environ[ENV_BASE_DIR] = os.path.abspath(base_dir)
+        os.chdir(base_dir)
+    sys.argv = [script] + list(argv)
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    runpy.run_path(script, run_name="__main__")
+
+
+def run_tool(name, argv):
+    module = importlib.import_module(TOOLS[name][0])
+    return module.main(list(argv))
+
+
+# ------------------------------------------------------------
+# Import süresi kontrolü
+# ------------------------------------------------------------
+def probe_import(module, python=sys.executable):
+    """Modülü temiz bir process'te import et; süre + yüklenen ağır paketler."""
+    code = _PROBE.format(mod=module, heavy=HEAVY_MODULES)
+    proc = subprocess.run([python, "-c", code], cwd=SCRIPT_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        err = proc.stderr.strip().splitlines()
+        return {"module": module, "seconds": None, "heavy": [], "error": err[-1] if err else "import hatası"}
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {"module": module, "seconds": out["seconds"], "heavy": out["heavy"], "error": None}
+
+
+def import_time_detail(module, top=15, python=sys.executable):
+    """python -X importtime çıktısından kümülatif süreye göre en pahalı import'lar."""
+    proc = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"], cwd=SCRIPT_DIR,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cum_us), int(self_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def check_imports(modules=IMPORT_SAFE, budget=IMPORT_BUDGET_S, detail=None):
+    """Bütçe / ağır paket ihlali varsa False döndürür."""
+    ok = True
+    print(f"⏱ Import süresi kontrolü (bütçe {budget:.2f} sn, yasak: {', '.join(HEAVY_MODULES)})")
+    for mod in modules:
+        r = probe_import(mod)
+        if r["error"]:
+            print(f"   ❌ {mod:32s} import edilemedi: {r['error']}")
+            ok = False
+            continue
+        problems = []
+        if r["seconds"] > budget:
+            problems.append("bütçe aşıldı")
+        if r["heavy"]:
+            problems.append("ağır import: " + ", ".join(r["heavy"]))
+        ok = ok and not problems
+        print(f"   {'❌' if problems else '✅'} {mod:32s} {r['seconds']:.3f} sn" +
+              (f"  ({'; '.join(problems)})" if problems else ""))
+
+    if detail:
+        print(f"\n🔍 {detail}: kümülatif süreye göre en pahalı import'lar (ms)")
+        for cum, self_, name in import_time_detail(detail):
+            print(f"   {cum / 1000:8.1f}  {self_ / 1000:7.1f}  {name}")
+    return ok
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+def print_commands():
+    print("Pipeline adımları:")
+    for name, script in _step_commands().items():
+        print(f"  {name:14s} {script}")
+    print("\nAraçlar:")
+    for name, (module, desc) in TOOLS.items():
+        print(f"  {name:14s} {desc}")
+    print(f"  {'check-imports':14s} Import süresi bütçesi / ağır import kontrolü")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    steps = _step_commands()
+
+    ap = argparse.ArgumentParser(prog="lihc", description="LIHC analiz pipeline'ı: tek giriş noktası",
+                                 usage="python lihc.py [--list] <komut> [argümanlar...]")
+    ap.add_argument("command", nargs="?", help="Adım (step3d, step4b, ...) veya araç (pipeline, runs, ...)")
+    ap.add_argument("--list", action="store_true", help="Komutları listele")
+    # komuttan sonraki her şey komuta aittir (örn. "pipeline --dry-run")
+    cmd_at = next((i for i, a in enumerate(argv) if not a.startswith("-")), len(argv))
+    args = ap.parse_args(argv[:cmd_at + 1])
+    rest = argv[cmd_at + 1:]
+
+    if args.list or args.command is None:
+        print_commands()
+        return
+
+    if args.command in steps:
+        sp = argparse.ArgumentParser(prog=f"lihc {args.command}")
+        sp.add_argument("--base-dir", default=None, help=f"Veri klasörü ({ENV_BASE_DIR} ortam değişkenini ayarlar)")
+        sp.add_argument("--no-plots", action="store_true", help=f"Grafik üretme ({ENV_PLOTS}=0)")
+        sp.add_argument("--config", default=None, help=f"Config dosyası ({ENV_CONFIG}; varsayılan: lihc.toml)")
+        sp.add_argument("--set", action="append", default=[], metavar="BÖLÜM.ANAHTAR=DEĞER",
+                        help="Config override (tekrarlanabilir)")
+        sargs, passthrough = sp.parse_known_args(rest)
+        run_step(args.command, passthrough, base_dir=sargs.base_dir, plots=not sargs.no_plots,
+                 config=sargs.config, overrides=parse_overrides(sargs.set))
+    elif args.command in TOOLS:
+        run_tool(args.command, rest)
+    elif args.command == "check-imports":
+        sp = argparse.ArgumentParser(prog="lihc check-imports")
+        sp.add_argument("modules", nargs="*", default=IMPORT_SAFE)
+        sp.add_argument("--budget", type=float, default=IMPORT_BUDGET_S, help="Modül başına sn")
+        sp.add_argument("--detail", default=None, metavar="MODULE", help="-X importtime ile en pahalı import'lar")
+        sargs = sp.parse_args(rest)
+        if not check_imports(sargs.modules, sargs.budget, sargs.detail):
+            sys.exit(1)
+    else:
+        print(f"❌ Bilinmeyen komut: {args.command}\n")
+        print_commands()
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
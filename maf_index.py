@@ -0,0 +1,426 @@
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+from memo_cache import file_digest
+from config import base_dir
+
+# ============================================================
+# MAF sorgu indeksi (gen / hasta / bölge)
+# - merged MAF bir kez okunur, seçili kolonlar gen sırasına dizilip kolon başına .npy
+#   olarak yazılır (metin kolonları: tamsayı kod + kategori listesi); sorgular dosyaları
+#   mmap ile açar, sadece eşleşen satırları çözer -> CSV tekrar taranmaz
+# - gen      -> satır aralığı (tablo Hugo_Symbol'e göre sıralı: her gen tek blok)
+# - hasta    -> satır listesi (CSR: patient_offsets + patient_rows; patient_id = barkodun ilk 12 karakteri)
+# - bölge    -> kromozom başına Start_Position'a göre sıralı aralık indeksi; [a, b] sorgusu
+#               searchsorted(start, a - en_uzun_varyant) .. searchsorted(start, b) + End >= a
+# - Kaynak MAF değişince (boyut / mtime, gerekirse sha1) indeks otomatik yeniden kurulur
+#
+#   python maf_index.py build
+#   python maf_index.py query --gene CTNNB1 --exon 3                # CTNNB1 ekzon 3 varyantları
+#   python maf_index.py query --gene CTNNB1 --exon 3 --counts patient
+#   python maf_index.py query --region chr5:1.29M-1.30M             # TERT bölgesi
+#   python maf_index.py query --patient TCGA-DD-AAVP --counts gene
+#   python maf_index.py query --gene TP53 --class Missense_Mutation --out tp53_missense.csv
+#
+# Kullanım (script içinde):
+#   idx = open_index(MAF_PATH, INDEX_DIR)
+#   rows = idx.gene_rows(["TP53", "CTNNB1"])
+#   df = idx.frame(rows)                   # filtrelenmiş MAF satırları (orijinal sırada)
+#   counts = idx.gene_counts(rows)         # n_mutations, n_patients
+# ============================================================
+
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
+MAF_PATH = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
+INDEX_DIR = os.path.join(BASE_DIR, "outputs", "maf_index")
+
+INDEX_VERSION = 1
+# indekse alınan kolonlar (MAF'ta olmayanlar atlanır; --all-columns ile hepsi)
+INDEX_COLUMNS = [
+    "Hugo_Symbol", "Chromosome", "Start_Position", "End_Position", "Strand",
+    "Variant_Classification", "Variant_Type", "Reference_Allele", "Tumor_Seq_Allele2",
+    "Tumor_Sample_Barcode", "HGVSc", "HGVSp_Short", "Exon_Number", "Consequence",
+    "IMPACT", "hotspot", "t_depth", "t_alt_count",
+]
+REQUIRED_COLUMNS = ["Hugo_Symbol", "Chromosome", "Start_Position", "End_Position", "Tumor_Sample_Barcode"]
+DEFAULT_SHOW_COLUMNS = ["Hugo_Symbol", "Chromosome", "Start_Position", "End_Position",
+                        "Variant_Classification", "HGVSp_Short", "Exon_Number", "patient_id"]
+PRINT_LIMIT = 50
+
+_EMPTY = np.array([], dtype=np.int64)
+
+
+# ------------------------------------------------------------
+# Kurulum
+# ------------------------------------------------------------
+def _source_stamp(path, with_digest=True):
+    st = os.stat(path)
+    stamp = {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_digest:
+        stamp["sha1"] = file_digest(path)
+    return stamp
+
+
+def _offsets(sorted_codes, n):
+    """Sıralı kod dizisinde kod k'nın bloğu: offsets[k]:offsets[k+1]."""
+    return np.searchsorted(sorted_codes, np.arange(n + 1)).astype(np.int64)
+
+
+def build_index(maf_path=MAF_PATH, index_dir=INDEX_DIR, columns=INDEX_COLUMNS, verbose=True):
+    """MAF'ı oku, kolon dizilerini + gen / hasta / bölge indekslerini index_dir'e yaz."""
+    from patient_table import normalize_patient_id
+
+    t0 = time.time()
+    header = list(pd.read_csv(maf_path, nrows=0).columns)
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"MAF dosyasında eksik kolonlar: {missing}")
+    cols = [c for c in columns if c in header] if columns else header
+    maf = pd.read_csv(maf_path, usecols=cols, low_memory=False)[cols]
+    maf.insert(0, "maf_row", np.arange(len(maf), dtype=np.int64))
+    maf["Hugo_Symbol"] = maf["Hugo_Symbol"].fillna("").astype(str)
+    maf["patient_id"] = normalize_patient_id(maf["Tumor_Sample_Barcode"]).fillna("").to_numpy()
+    # tablo sırası = gen sırası (her gen tek blok), gen içinde orijinal sıra
+    maf = maf.sort_values("Hugo_Symbol", kind="mergesort").reset_index(drop=True)
+
+    # meta.json en son yazılır: yarım kalmış kurulum geçerli indeks sayılmaz
+    meta_path = os.path.join(index_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    shutil.rmtree(os.path.join(index_dir, "cols"), ignore_errors=True)
+    col_dir = os.path.join(index_dir, "cols")
+    os.makedirs(col_dir, exist_ok=True)
+
+    kinds = {}
+    codes = {}
+    for c in maf.columns:
+        s = maf[c]
+        if pd.api.types.is_bool_dtype(s) or (pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_object_dtype(s)):
+            np.save(os.path.join(col_dir, f"{c}.npy"), s.to_numpy())
+            kinds[c] = "num"
+            continue
+        k, cats = pd.factorize(s.astype("string"), sort=True)
+        np.save(os.path.join(col_dir, f"{c}.npy"), k.astype(np.int32))
+        with open(os.path.join(col_dir, f"{c}.cats.json"), "w", encoding="utf-8") as f:
+            json.dump([str(x) for x in cats], f, ensure_ascii=False)
+        kinds[c] = "cat"
+        codes[c] = (k, list(cats))
+
+    gene_codes, genes = codes["Hugo_Symbol"]
+    pat_codes, patients = codes["patient_id"]
+    chrom_codes, chroms = codes["Chromosome"]
+    start = maf["Start_Position"].to_numpy(dtype=np.int64)
+    end = maf["End_Position"].to_numpy(dtype=np.int64)
+
+    patient_rows = np.argsort(pat_codes, kind="stable").astype(np.int64)
+    pos_rows = np.lexsort((start, chrom_codes)).astype(np.int64)
+    chrom_offsets = _offsets(chrom_codes[pos_rows], len(chroms))
+    span = end - start
+    chrom_max_span = np.array([span[pos_rows[a:b]].max() if b > a else 0
+                               for a, b in zip(chrom_offsets[:-1], chrom_offsets[1:])], dtype=np.int64)
+    np.savez(os.path.join(index_dir, "index.npz"),
+             gene_offsets=_offsets(gene_codes, len(genes)),
+             patient_offsets=_offsets(pat_codes[patient_rows], len(patients)),
+             patient_rows=patient_rows,
+             pos_rows=pos_rows,
+             pos_start=start[pos_rows],
+             chrom_offsets=chrom_offsets,
+             chrom_max_span=chrom_max_span)
+
+    meta = {"version": INDEX_VERSION, "n_rows": int(len(maf)), "columns": kinds,
+            "source": _source_stamp(maf_path), "built": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds": round(time.time() - t0, 2)}
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(meta_path + ".tmp", meta_path)
+    if verbose:
+        print(f"📇 MAF indeksi kuruldu: {index_dir} ({len(maf)} satır, {len(genes)} gen, "
+              f"{len(patients)} hasta, {len(chroms)} kromozom, {meta['seconds']} sn)")
+    return MafIndex(index_dir)
+
+
+def is_stale(index_dir, maf_path):
+    """İndeks yok / eski sürüm / kaynak MAF değişmiş mi?"""
+    try:
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return True
+    if meta.get("version") != INDEX_VERSION:
+        return True
+    src = meta["source"]
+    now = _source_stamp(maf_path, with_digest=False)
+    if (src["size"], src["mtime_ns"]) == (now["size"], now["mtime_ns"]):
+        return False
+    return src["size"] != now["size"] or src["sha1"] != file_digest(maf_path)
+
+
+def open_index(maf_path=MAF_PATH, index_dir=INDEX_DIR, verbose=True):
+    """Güncel indeksi aç; yoksa / kaynak değişmişse önce kur."""
+    if is_stale(index_dir, maf_path):
+        return build_index(maf_path, index_dir, verbose=verbose)
+    return MafIndex(index_dir)
+
+
+# ------------------------------------------------------------
+# Sorgu
+# ------------------------------------------------------------
+class MafIndex:
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.n_rows = self.meta["n_rows"]
+        self.columns = self.meta["columns"]
+        ix = np.load(os.path.join(index_dir, "index.npz"))
+        self._ix = {k: ix[k] for k in ix.files}
+        self._cols = {}
+        self._cats = {}
+        self.genes = self.categories("Hugo_Symbol")
+        self.patients = self.categories("patient_id")
+        self.chroms = self.categories("Chromosome")
+        self._gene_pos = {g: i for i, g in enumerate(self.genes)}
+        self._patient_pos = {p: i for i, p in enumerate(self.patients)}
+        self._chrom_pos = {c: i for i, c in enumerate(self.chroms)}
+
+    # ---- ham kolonlar
+    def codes(self, col):
+        """Kolon dizisi (mmap); metin kolonlarında kategori kodu (-1 = NA)."""
+        if col not in self._cols:
+            if col not in self.columns:
+                raise KeyError(f"'{col}' indekste yok. Mevcut: {', '.join(self.columns)}")
+            self._cols[col] = np.load(os.path.join(self.index_dir, "cols", f"{col}.npy"), mmap_mode="r")
+        return self._cols[col]
+
+    def categories(self, col):
+        if col not in self._cats:
+            with open(os.path.join(self.index_dir, "cols", f"{col}.cats.json"), encoding="utf-8") as f:
+                self._cats[col] = json.load(f)
+        return self._cats[col]
+
+    def column(self, col, rows):
+        values = np.asarray(self.codes(col)[rows])
+        if self.columns[col] == "num":
+            return pd.Series(values, name=col)
+        return pd.Series(pd.Categorical.from_codes(values, categories=self.categories(col)), name=col)
+
+    # ---- satır bulucular (hepsi tablo satır numarası döndürür, sıralı)
+    def gene_rows(self, genes):
+        off = self._ix["gene_offsets"]
+        parts = []
+        for g in genes:
+            k = self._gene_pos.get(g, self._gene_pos.get(str(g).upper()))
+            if k is not None:
+                parts.append(np.arange(off[k], off[k + 1], dtype=np.int64))
+        return np.concatenate(parts) if parts else _EMPTY
+
+    def patient_rows(self, patients):
+        from patient_table import normalize_patient_id
+
+        off, rows = self._ix["patient_offsets"], self._ix["patient_rows"]
+        parts = []
+        for p in normalize_patient_id(list(patients)):
+            k = self._patient_pos.get(p)
+            if k is not None:
+                parts.append(rows[off[k]:off[k + 1]])
+        return np.sort(np.concatenate(parts)) if parts else _EMPTY
+
+    def _chrom_code(self, chrom):
+        chrom = str(chrom)
+        for cand in (chrom, "chr" + chrom, chrom[3:] if chrom.lower().startswith("chr") else None):
+            if cand is not None and cand in self._chrom_pos:
+                return self._chrom_pos[cand]
+        return None
+
+    def region_rows(self, chrom, start, end=None):
+        """[start, end] ile örtüşen varyantlar (Start <= end ve End >= start)."""
+        end = start if end is None else end
+        k = self._chrom_code(chrom)
+        if k is None:
+            return _EMPTY
+        a, b = self._ix["chrom_offsets"][k], self._ix["chrom_offsets"][k + 1]
+        pos = self._ix["pos_start"][a:b]
+        lo = a + np.searchsorted(pos, start - self._ix["chrom_max_span"][k], side="left")
+        hi = a + np.searchsorted(pos, end, side="right")
+        cand = self._ix["pos_rows"][lo:hi]
+        return np.sort(cand[np.asarray(self.codes("End_Position")[cand]) >= start])
+
+    def where(self, rows, col, values):
+        """rows içinden col değeri values'tan biri olanlar."""
+        if self.columns[col] == "num":
+            keep = np.isin(np.asarray(self.codes(col)[rows]), np.asarray(values, dtype=float))
+        else:
+            cats = self.categories(col)
+            wanted = [i for i, c in enumerate(cats) if c in set(map(str, values))]
+            keep = np.isin(np.asarray(self.codes(col)[rows]), wanted)
+        return rows[keep]
+
+    def exon_rows(self, rows, exons):
+        """Exon_Number '3/15' biçiminde; sadece ekzon numarasına göre süz."""
+        cats = self.categories("Exon_Number") if self.columns.get("Exon_Number") == "cat" else None
+        wanted = {str(e) for e in exons}
+        if cats is None:
+            return self.where(rows, "Exon_Number", [float(e) for e in exons])
+        ok = [i for i, c in enumerate(cats) if c.split("/")[0].split(".")[0] in wanted]
+        return rows[np.isin(np.asarray(self.codes("Exon_Number")[rows]), ok)]
+
+    # ---- çıktılar
+    def frame(self, rows, columns=None):
+        """Satırları DataFrame olarak çöz (orijinal MAF sırasıyla)."""
+        columns = [c for c in (columns or self.columns) if c != "maf_row"]
+        order = np.argsort(np.asarray(self.codes("maf_row")[rows]), kind="stable")
+        rows = rows[order]
+        out = pd.DataFrame({c: self.column(c, rows).to_numpy() for c in ["maf_row"] + columns})
+        return out
+
+    def gene_counts(self, rows):
+        """Gen başına n_mutations, n_patients (n_mutations'a göre azalan)."""
+        g = np.asarray(self.codes("Hugo_Symbol")[rows])
+        p = np.asarray(self.codes("patient_id")[rows])
+        pairs = np.unique(np.stack([g, p]), axis=1) if len(rows) else np.empty((2, 0), dtype=np.int64)
+        n_mut = np.bincount(g, minlength=len(self.genes))
+        n_pat = np.bincount(pairs[0], minlength=len(self.genes))
+        hit = np.flatnonzero(n_mut)
+        out = pd.DataFrame({"Hugo_Symbol": np.asarray(self.genes, dtype=object)[hit],
+                            "n_mutations": n_mut[hit], "n_patients": n_pat[hit]})
+        return out.sort_values("n_mutations", ascending=False, kind="mergesort").reset_index(drop=True)
+
+    def patient_counts(self, rows):
+        """Hasta başına n_mutations, n_genes."""
+        g = np.asarray(self.codes("Hugo_Symbol")[rows])
+        p = np.asarray(self.codes("patient_id")[rows])
+        pairs = np.unique(np.stack([p, g]), axis=1) if len(rows) else np.empty((2, 0), dtype=np.int64)
+        n_mut = np.bincount(p, minlength=len(self.patients))
+        n_gene = np.bincount(pairs[0], minlength=len(self.patients))
+        hit = np.flatnonzero(n_mut)
+        out = pd.DataFrame({"patient_id": np.asarray(self.patients, dtype=object)[hit],
+                            "n_mutations": n_mut[hit], "n_genes": n_gene[hit]})
+        return out.sort_values("n_mutations", ascending=False, kind="mergesort").reset_index(drop=True)
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+_SUFFIX = {"": 1, "k": 1_000, "m": 1_000_000}
+
+
+def _parse_pos(text):
+    m = re.fullmatch(r"([0-9.]+)([kKmM]?)", text.replace(",", "").replace("_", ""))
+    if not m:
+        raise ValueError(f"Pozisyon anlaşılamadı: {text!r}")
+    return int(round(float(m.group(1)) * _SUFFIX[m.group(2).lower()]))
+
+
+def parse_region(text):
+    """'chr5:1.29M-1.30M' / '5:1,295,000-1,296,000' / 'chr5:1295228' -> (chrom, start, end)."""
+    chrom, sep, span = text.partition(":")
+    if not sep:
+        raise ValueError(f"Bölge 'kromozom:başlangıç-bitiş' biçiminde olmalı: {text!r}")
+    a, _, b = span.partition("-")
+    start = _parse_pos(a)
+    return chrom, start, _parse_pos(b) if b else start
+
+
+def run_query(idx, args):
+    """CLI filtrelerini uygula (kesişim); satır numaraları döndür."""
+    rows = None
+
+    def narrow(found):
+        return found if rows is None else np.intersect1d(rows, found, assume_unique=True)
+
+    if args.gene:
+        rows = narrow(idx.gene_rows(args.gene))
+    if args.patient:
+        rows = narrow(idx.patient_rows(args.patient))
+    for region in args.region or []:
+        rows = narrow(idx.region_rows(*parse_region(region)))
+    if rows is None:
+        rows = np.arange(idx.n_rows, dtype=np.int64)
+    if args.variant_class:
+        rows = idx.where(rows, "Variant_Classification", args.variant_class)
+    if args.exon:
+        rows = idx.exon_rows(rows, args.exon)
+    for cond in args.where or []:
+        col, sep, vals = cond.partition("=")
+        if not sep:
+            raise ValueError(f"--where 'KOLON=değer1,değer2' biçiminde olmalı: {cond!r}")
+        rows = idx.where(rows, col, vals.split(","))
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="MAF gen / hasta / bölge sorguları (kalıcı indeks)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ["build", "info", "query"]:
+        sp = sub.add_parser(name)
+        sp.add_argument("--base-dir", default=None, help="Veri klasörü (varsayılan: config [paths] base_dir)")
+        sp.add_argument("--maf", default=None, help="merged MAF (varsayılan: <base-dir>/merged_LIHC_MAF.csv)")
+        sp.add_argument("--index-dir", default=None, help="İndeks klasörü (varsayılan: <base-dir>/outputs/maf_index)")
+        if name == "build":
+            sp.add_argument("--all-columns", action="store_true", help="MAF'ın tüm kolonlarını indekse al")
+        if name == "query":
+            sp.add_argument("--gene", nargs="+", help="Hugo_Symbol(lar)")
+            sp.add_argument("--patient", nargs="+", help="patient_id / barkod(lar)")
+            sp.add_argument("--region", action="append", help="kromozom:başlangıç-bitiş (örn. chr5:1.29M-1.30M)")
+            sp.add_argument("--class", dest="variant_class", nargs="+", help="Variant_Classification değer(ler)i")
+            sp.add_argument("--exon", nargs="+", help="Ekzon numarası (Exon_Number '3/15' -> 3)")
+            sp.add_argument("--where", action="append", metavar="KOLON=D1,D2", help="Ek kolon filtresi")
+            sp.add_argument("--counts", choices=["gene", "patient"], help="Satırlar yerine gen / hasta sayımları")
+            sp.add_argument("--cols", nargs="+", default=None, help="Gösterilecek kolonlar")
+            sp.add_argument("--out", default=None, help="Sonucu CSV'ye yaz")
+            sp.add_argument("--limit", type=int, default=PRINT_LIMIT, help="Ekrana basılacak satır sayısı")
+    args = ap.parse_args(argv)
+
+    base = args.base_dir or BASE_DIR
+    maf_path = args.maf or os.path.join(base, "merged_LIHC_MAF.csv")
+    index_dir = args.index_dir or os.path.join(base, "outputs", "maf_index")
+
+    if args.cmd == "build":
+        build_index(maf_path, index_dir, columns=None if args.all_columns else INDEX_COLUMNS)
+        return
+    if args.cmd == "info":
+        stale = is_stale(index_dir, maf_path)
+        if not os.path.exists(os.path.join(index_dir, "meta.json")):
+            print(f"İndeks yok: {index_dir}  (python maf_index.py build)")
+            return
+        idx = MafIndex(index_dir)
+        print(f"İndeks : {index_dir} ({'ESKİ, sorguda yeniden kurulur' if stale else 'güncel'})")
+        print(f"Kaynak : {idx.meta['source']['path']}  (kuruldu {idx.meta['built']})")
+        print(f"Satır  : {idx.n_rows}   gen: {len(idx.genes)}   hasta: {len(idx.patients)}   kromozom: {len(idx.chroms)}")
+        print(f"Kolonlar: {', '.join(idx.columns)}")
+        return
+
+    idx = open_index(maf_path, index_dir)
+    t0 = time.perf_counter()
+    try:
+        rows = run_query(idx, args)
+    except (ValueError, KeyError) as e:
+        print(f"❌ {e}")
+        raise SystemExit(2)
+    if args.counts == "gene":
+        out = idx.gene_counts(rows)
+    elif args.counts == "patient":
+        out = idx.patient_counts(rows)
+    else:
+        out = idx.frame(rows, args.cols or [c for c in DEFAULT_SHOW_COLUMNS if c in idx.columns])
+    ms = (time.perf_counter() - t0) * 1000
+
+    n_pat = len(np.unique(np.asarray(idx.codes("patient_id")[rows])))
+    print(f"🔎 {len(rows)} varyant, {n_pat} hasta ({ms:.1f} ms)")
+    if args.out:
+        out.to_csv(args.out, index=False)
+        print("✅ yazıldı:", args.out)
+    elif len(out):
+        with pd.option_context("display.width", 200, "display.max_columns", 20):
+            print(out.head(args.limit).to_string(index=False))
+        if len(out) > args.limit:
+            print(f"... (+{len(out) - args.limit} satır; hepsi için --out)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import os
+import time
+import pickle
+import hashlib
+import inspect
+import argparse
+import functools
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# Content-addressed memo cache (pahalı ara sonuçlar için)
+# - Anahtar = fonksiyon adı + version + fonksiyon kaynak kodu hash'i
+#             + argümanların İÇERİK hash'i (DataFrame / ndarray / dosya / klasör)
+# - Değerler pickle (binary, HIGHEST_PROTOCOL) ile saklanır:
+#     <cache_dir>/<isim>/<anahtar>.pkl
+# - Boyut sınırı: toplam boyut max_bytes'ı aşınca en uzun süredir
+#   kullanılmayan girdiler silinir (LRU; erişim zamanı = dosya mtime)
+# - Açık invalidation: invalidate("step4b.survival_scan") / clear()
+# - Her adım kendi fonksiyonlarını seçerek dahil eder (opt-in):
+#
+#     memo = MemoCache(os.path.join(OUT_DIR, ".memo_cache"))
+#     load = memo.memoize("step4b.load_maf", files=("maf_path",))(load_maf)
+#
+# - Fonksiyonun çağırdığı başka modüllerin kodu da sonucu belirliyorsa sources=(modül, ...)
+#   ile anahtara eklenir (ör. step4b taraması km_engine'e bağlı).
+#
+# Kullanım (script olarak):
+#   python memo_cache.py info  --dir outputs/.memo_cache
+#   python memo_cache.py clear --dir outputs/.memo_cache [isim ...]
+#
+# LIHC_MEMO=0 ortam değişkeni cache'i tamamen kapatır.
+# ============================================================
+
+DEFAULT_CACHE_DIR = os.path.join("outputs", ".memo_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3      # 2 GB
+ENV_DISABLE = "LIHC_MEMO"
+
+# (path, size, mtime_ns) -> sha1 (aynı process içinde aynı dosyayı tekrar okumamak için)
+_FILE_DIGESTS = {}
+
+
+def file_digest(path, bufsize=1 << 20):
+    """Dosya içeriğinin sha1'i; klasörse dosya adları + içerik hash'leri."""
+    if os.path.isdir(path):
+        h = hashlib.sha1()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for fn in sorted(files):
+                fp = os.path.join(root, fn)
+                h.update(os.path.relpath(fp, path).replace(os.sep, "/").encode())
+                h.update(file_digest(fp).encode())
+        return h.hexdigest()
+
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key in _FILE_DIGESTS:
+        return _FILE_DIGESTS[key]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(bufsize)
+            if not b:
+                break
+            h.update(b)
+    _FILE_DIGESTS[key] = h.hexdigest()
+    return _FILE_DIGESTS[key]
+
+
+def _update_hash(h, v):
+    """Değeri içeriğine göre hash'e ekle (tip etiketiyle)."""
+    if v is None or isinstance(v, (bool, int, float, str, np.number, np.bool_)):
+        h.update(f"{type(v).__name__}:{v!r}".encode())
+    elif isinstance(v, bytes):
+        h.update(b"bytes:" + v)
+    elif isinstance(v, pd.DataFrame):
+        h.update(b"df:" + repr((list(map(str, v.columns)), list(map(str, v.dtypes)), v.shape)).encode())
+        try:
+            h.update(pd.util.hash_pandas_object(v, index=True).to_numpy().tobytes())
+        except TypeError:
+            # hash'lenemeyen hücreler (set, list ...) -> pickle
+            h.update(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL))
+    elif isinstance(v, pd.Series):
+        h.update(b"series:" + repr((str(v.name), str(v.dtype), len(v))).encode())
+        try:
+            h.update(pd.util.hash_pandas_object(v, index=True).to_numpy().tobytes())
+        except TypeError:
+            h.update(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL))
+    elif isinstance(v, np.ndarray):
+        h.update(b"nd:" + repr((str(v.dtype), v.shape)).encode())
+        if v.dtype == object:
+            h.update(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL))
+        else:
+            h.update(np.ascontiguousarray(v).tobytes())
+    elif isinstance(v, dict):
+        h.update(f"dict:{len(v)}".encode())
+        for k in sorted(v, key=repr):
+            _update_hash(h, k)
+            _update_hash(h, v[k])
+    elif isinstance(v, (set, frozenset)):
+        h.update(f"set:{len(v)}".encode())
+        for x in sorted(v, key=repr):
+            _update_hash(h, x)
+    elif isinstance(v, (list, tuple)):
+        h.update(f"{type(v).__name__}:{len(v)}".encode())
+        for x in v:
+            _update_hash(h, x)
+    elif hasattr(v, "get_params"):
+        # sklearn estimator: tip + parametreler
+        h.update(f"est:{type(v).__name__}".encode())
+        _update_hash(h, {k: repr(p) for k, p in v.get_params(deep=True).items()})
+    else:
+        h.update(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def content_hash(*values):
+    h = hashlib.sha1()
+    for v in values:
+        _update_hash(h, v)
+    return h.hexdigest()
+
+
+def _source_hash(fn):
+    try:
+        src = inspect.getsource(fn)
+    except (OSError, TypeError):
+        src = getattr(fn, "__qualname__", repr(fn))
+    return hashlib.sha1(src.encode()).hexdigest()
+
+
+class MemoCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if enabled is None:
+            enabled = os.environ.get(ENV_DISABLE, "1") not in ("0", "false", "off")
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------------
+    # Düşük seviye: get / put
+    # --------------------------------------------------------
+    def _path(self, name, key):
+        return os.path.join(self.cache_dir, name, key + ".pkl")
+
+    def get(self, name, key):
+        """(bulundu_mu, değer)"""
+        path = self._path(name, key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # bozuk / eski formatlı girdi -> yok say ve sil
+            self._remove(path)
+            return False, None
+        try:
+            os.utime(path)          # LRU: son erişim zamanı
+        except OSError:
+            pass
+        return True, value
+
+    def put(self, name, key, value):
+        path = self._path(name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    # --------------------------------------------------------
+    # Decorator
+    # --------------------------------------------------------
+    def memoize(self, name=None, version=1, files=(), ignore=(), sources=()):
+        """
+        name    : cache alt klasörü / invalidation adı (varsayılan: modül.fonksiyon)
+        version : elle artırılırsa eski girdiler geçersiz olur
+        files   : değeri dosya/klasör yolu olan parametreler (string değil içerik hash'lenir)
+        ignore  : anahtara girmeyen parametreler (verbose, n_jobs ...)
+        sources : kaynak kodu anahtara giren ek modüller / fonksiyonlar (değişince girdiler geçersiz)
+        """
+        def deco(fn):
+            entry = name or f"{fn.__module__}.{fn.__qualname__}"
+            sig = inspect.signature(fn)
+            src = _source_hash(fn)
+            if sources:
+                src = content_hash(src, [_source_hash(s) for s in sources])
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                bound = sig.bind(*args, **kwargs)
+                bound.apply_defaults()
+                parts = [entry, version, src]
+                for pname, val in bound.arguments.items():
+                    if pname in ignore:
+                        continue
+                    if pname in files and val is not None:
+                        val = ("file", file_digest(val))
+                    parts.append((pname, val))
+                key = content_hash(*parts)
+
+                hit, value = self.get(entry, key)
+                if hit:
+                    self.hits += 1
+                    print(f"♻ memo hit: {entry} ({key[:10]})")
+                    return value
+                self.misses += 1
+                t0 = time.time()
+                value = fn(*args, **kwargs)
+                self.put(entry, key, value)
+                print(f"💾 memo kaydedildi: {entry} ({key[:10]}, {time.time() - t0:.1f} sn)")
+                return value
+
+            wrapper.memo_name = entry
+            wrapper.uncached = fn
+            return wrapper
+        return deco
+
+    # --------------------------------------------------------
+    # Bakım: liste, LRU eviction, invalidation
+    # --------------------------------------------------------
+    def entries(self):
+        """Cache içeriği: name, key, bytes, last_access (en eski önce)."""
+        rows = []
+        if not os.path.isdir(self.cache_dir):
+            return pd.DataFrame(columns=["name", "key", "bytes", "last_access", "path"])
+        for name in sorted(os.listdir(self.cache_dir)):
+            d = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(d):
+                continue
+            for fn in os.listdir(d):
+                if not fn.endswith(".pkl"):
+                    continue
+                p = os.path.join(d, fn)
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                rows.append({"name": name, "key": fn[:-4], "bytes": st.st_size,
+                             "last_access": st.st_mtime, "path": p})
+        df = pd.DataFrame(rows, columns=["name", "key", "bytes", "last_access", "path"])
+        return df.sort_values("last_access").reset_index(drop=True)
+
+    def evict(self, max_bytes=None):
+        """Toplam boyut sınırın altına inene kadar en eski erişilenleri sil; silinen sayısı."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        if limit is None:
+            return 0
+        ent = self.entries()
+        total = int(ent["bytes"].sum())
+        removed = 0
+        for _, row in ent.iterrows():
+            if total <= limit:
+                break
+            if self._remove(row["path"]):
+                total -= int(row["bytes"])
+                removed += 1
+        return removed
+
+    def invalidate(self, name=None, key=None):
+        """name verilirse o fonksiyonun (key verilirse tek girdinin) cache'i, yoksa hepsi silinir."""
+        ent = self.entries()
+        if name is not None:
+            ent = ent[ent["name"] == name]
+        if key is not None:
+            ent = ent[ent["key"] == key]
+        return sum(self._remove(p) for p in ent["path"])
+
+    def clear(self):
+        return self.invalidate()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Memo cache bakım komutları")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_info = sub.add_parser("info", help="Cache içeriğini özetle")
+    p_info.add_argument("--dir", default=DEFAULT_CACHE_DIR)
+    p_clear = sub.add_parser("clear", help="Cache'i (veya verilen fonksiyon adlarını) sil")
+    p_clear.add_argument("names", nargs="*")
+    p_clear.add_argument("--dir", default=DEFAULT_CACHE_DIR)
+    p_evict = sub.add_parser("evict", help="Boyut sınırına kadar LRU eviction")
+    p_evict.add_argument("--dir", default=DEFAULT_CACHE_DIR)
+    p_evict.add_argument("--max-mb", type=float, required=True)
+    args = ap.parse_args(argv)
+
+    cache = MemoCache(args.dir)
+    if args.cmd == "info":
+        ent = cache.entries()
+        if ent.empty:
+            print("Cache boş:", args.dir)
+            return
+        tab = ent.groupby("name").agg(n=("key", "size"), mb=("bytes", lambda b: b.sum() / 1e6),
+                                      last_access=("last_access", "max"))
+        tab["last_access"] = pd.to_datetime(tab["last_access"], unit="s").dt.strftime("%Y-%m-%d %H:%M")
+        print(tab.to_string(float_format=lambda v: f"{v:.1f}"))
+        print(f"\nToplam: {len(ent)} girdi, {ent['bytes'].sum() / 1e6:.1f} MB")
+    elif args.cmd == "clear":
+        n = sum(cache.invalidate(name=n) for n in args.names) if args.names else cache.clear()
+        print(f"✅ {n} girdi silindi.")
+    elif args.cmd == "evict":
+        n = cache.evict(max_bytes=int(args.max_mb * 1e6))
+        print(f"✅ {n} girdi silindi.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import os
+import json
+import pickle
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+
+# sklearn (ve sklearn'ü yükleyen cv_engine) fonksiyon içinde import edilir: "score" / "list"
+# komutları ve step3d modülünün import'u sklearn yükleme maliyetini ödemez.
+
+# ============================================================
+# Model registry + batch scoring (STEP 3D)
+# - Fit edilmiş pipeline (scaler + model), feature listesi, eğitim verisi
+#   hash'i ve metrikler versiyonlu olarak diske yazılır:
+#     models/<isim>/v0001/model.pkl
+#     models/<isim>/v0001/meta.json
+#     models/<isim>/registry.json   (versiyon listesi + latest)
+# - Eğitim verisi hash'i + feature listesi + model parametreleri en son versiyonla
+#   aynıysa yeni versiyon açılmaz (tekrar koşular registry'yi büyütmez)
+# - score_table(): model bir kez yüklenir, büyük gen tabloları chunk chunk
+#   skorlanır (yeniden eğitim yok)
+#
+# Kullanım:
+#   python model_registry.py list --registry models
+#   python model_registry.py score other_cohort_genes.csv out_scores.csv \
+#       --registry models --name step3d --version latest
+# ============================================================
+
+DEFAULT_NAME = "step3d"
+SCORE_COL = "ml_driver_probability"
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def prepare_feature_matrix(df, features):
+    """
+    STEP 3D ile aynı feature hazırlığı: türetilmiş kolonlar + numeric + NaN -> 0.
+    step1 tablosu (gene_feature_table.csv) da skorlanabilir: hotspot_ratio yoksa step2'deki gibi
+    hotspot_count / n_mutations (n_mutations 0 -> 0) olarak türetilir.
+    """
+    df = df.copy()
+    if "log_n_mutations" in features and "log_n_mutations" not in df.columns:
+        df["log_n_mutations"] = np.log1p(pd.to_numeric(df["n_mutations"], errors="coerce").fillna(0))
+    if "hotspot_ratio" in features and "hotspot_ratio" not in df.columns and "hotspot_count" in df.columns:
+        n_mut = pd.to_numeric(df["n_mutations"], errors="coerce").fillna(0)
+        hot = pd.to_numeric(df["hotspot_count"], errors="coerce").fillna(0)
+        df["hotspot_ratio"] = np.where(n_mut > 0, hot / n_mut.where(n_mut > 0, 1), 0)
+    missing = [c for c in features if c not in df.columns]
+    if missing:
+        raise ValueError(f"Eksik feature kolonları: {missing}\nMevcut kolonlar: {list(df.columns)}")
+    X = np.column_stack([pd.to_numeric(df[c], errors="coerce").fillna(0).to_numpy(dtype=float) for c in features])
+    return X
+
+
+def as_pipeline(model):
+    """Kayıt için her zaman Pipeline (scaler adımı yoksa sadece 'clf')."""
+    from sklearn.pipeline import Pipeline
+
+    if isinstance(model, Pipeline):
+        return model
+    return Pipeline([("clf", model)])
+
+
+def _model_dir(registry_dir, name):
+    return os.path.join(registry_dir, name)
+
+
+def _read_index(registry_dir, name):
+    path = os.path.join(_model_dir(registry_dir, name), "registry.json")
+    if not os.path.exists(path):
+        return {"name": name, "versions": [], "latest": None}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_index(registry_dir, name, index):
+    path = os.path.join(_model_dir(registry_dir, name), "registry.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, path)
+
+
+def params_hash(model):
+    """Model (Pipeline) parametrelerinin hash'i; fit edilmiş / edilmemiş aynı modelde aynıdır."""
+    from memo_cache import content_hash
+
+    return content_hash(as_pipeline(model))
+
+
+def find_version(registry_dir, name, training_data_hash, features, model_params_hash):
+    """En son versiyon aynı veri / feature / parametrelerle eğitilmişse adı, değilse None."""
+    index = _read_index(registry_dir, name)
+    latest = next((v for v in index["versions"] if v["version"] == index["latest"]), None)
+    if latest is None:
+        return None
+    same = (latest.get("training_data_hash") == training_data_hash
+            and latest.get("features") == list(features)
+            and latest.get("params_hash") == model_params_hash)
+    return latest["version"] if same else None
+
+
+def save_model(registry_dir, model, features, X, y, name=DEFAULT_NAME, metrics=None, extra=None):
+    """
+    Fit edilmiş modeli yeni bir versiyon olarak kaydet; versiyon adını döndür.
+    En son versiyon aynı eğitim verisi, feature'lar ve parametrelerle kaydedilmişse onu döndürür.
+    """
+    import sklearn
+    from cv_engine import data_fingerprint
+
+    pipe = as_pipeline(model)
+    data_hash = data_fingerprint(X, y)
+    p_hash = params_hash(pipe)
+    existing = find_version(registry_dir, name, data_hash, features, p_hash)
+    if existing is not None:
+        return existing
+
+    index = _read_index(registry_dir, name)
+    version = f"v{len(index['versions']) + 1:04d}"
+    vdir = os.path.join(_model_dir(registry_dir, name), version)
+    os.makedirs(vdir, exist_ok=True)
+
+    with open(os.path.join(vdir, "model.pkl"), "wb") as f:
+        pickle.dump(pipe, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    meta = {
+        "name": name,
+        "version": version,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "features": list(features),
+        "steps": [step for step, _ in pipe.steps],
+        "estimator": type(pipe.steps[-1][1]).__name__,
+        "training_data_hash": data_hash,
+        "params_hash": p_hash,
+        "n_train": int(len(y)),
+        "n_pos": int(np.sum(y)),
+        "sklearn_version": sklearn.__version__,
+        "metrics": metrics or {},
+        "extra": extra or {},
+    }
+    with open(os.path.join(vdir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, default=float)
+
+    index["versions"].append({"version": version, "created": meta["created"],
+                              "estimator": meta["estimator"],
+                              "training_data_hash": meta["training_data_hash"],
+                              "features": meta["features"], "params_hash": p_hash})
+    index["latest"] = version
+    _write_index(registry_dir, name, index)
+    return version
+
+
+def load_model(registry_dir, name=DEFAULT_NAME, version="latest"):
+    """(pipeline, meta) döndür."""
+    import sklearn
+
+    if version in (None, "latest"):
+        version = _read_index(registry_dir, name)["latest"]
+        if version is None:
+            raise FileNotFoundError(f"Registry'de model yok: {_model_dir(registry_dir, name)}")
+    vdir = os.path.join(_model_dir(registry_dir, name), version)
+    with open(os.path.join(vdir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("sklearn_version") != sklearn.__version__:
+        print(f"⚠ Model sklearn {meta.get('sklearn_version')} ile kaydedilmiş, şu an {sklearn.__version__} yüklü.")
+    with open(os.path.join(vdir, "model.pkl"), "rb") as f:
+        pipe = pickle.load(f)
+    return pipe, meta
+
+
+def fit_and_save(registry_dir, model, features, X, y, name=DEFAULT_NAME, metrics=None, extra=None):
+    """
+    Modeli tüm veriyle yeniden fit edip kaydet (CV fold modelleri yerine final model).
+    En son versiyon aynı veri / feature / parametrelerle eğitilmişse fit edilmez, o versiyon yüklenir.
+    """
+    from sklearn.base import clone
+    from cv_engine import data_fingerprint
+
+    existing = find_version(registry_dir, name, data_fingerprint(X, y), features, params_hash(model))
+    if existing is not None:
+        return existing, load_model(registry_dir, name, existing)[0]
+
+    final = clone(model)
+    final.fit(X, y)
+    return save_model(registry_dir, final, features, X, y, name=name, metrics=metrics, extra=extra), final
+
+
+def _predict(pipe, X):
+    if hasattr(pipe, "predict_proba"):
+        return pipe.predict_proba(X)[:, 1]
+    s = pipe.decision_function(X)
+    return 1.0 / (1.0 + np.exp(-s))
+
+
+def score_frame(pipe, meta, df, gene_col="Hugo_Symbol", keep_columns=None):
+    X = prepare_feature_matrix(df, meta["features"])
+    cols = [gene_col] if gene_col in df.columns else []
+    cols += [c for c in (keep_columns or []) if c in df.columns and c not in cols]
+    out = df[cols].copy()
+    out[SCORE_COL] = _predict(pipe, X)
+    out["model_version"] = f"{meta['name']}:{meta['version']}"
+    return out
+
+
+def score_table(input_path, output_path, registry_dir, name=DEFAULT_NAME, version="latest",
+                chunksize=DEFAULT_CHUNKSIZE, gene_col="Hugo_Symbol", keep_columns=None):
+    """Büyük bir gen tablosunu (CSV) chunk chunk skorla; toplam satır sayısını döndür."""
+    pipe, meta = load_model(registry_dir, name, version)
+    print(f"Model yüklendi: {meta['name']}:{meta['version']} ({meta['estimator']}), features={meta['features']}")
+
+    n_rows = 0
+    first = True
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        scored = score_frame(pipe, meta, chunk, gene_col=gene_col, keep_columns=keep_columns)
+        scored.to_csv(output_path, mode="w" if first else "a", header=first, index=False)
+        first = False
+        n_rows += len(scored)
+    return n_rows
+
+
+def list_models(registry_dir, name=None):
+    if name:
+        names = [name]
+    elif os.path.isdir(registry_dir):
+        names = sorted(d for d in os.listdir(registry_dir) if os.path.isdir(os.path.join(registry_dir, d)))
+    else:
+        names = []
+    rows = []
+    for n in names:
+        index = _read_index(registry_dir, n)
+        for v in index["versions"]:
+            rows.append({"name": n, **v, "latest": v["version"] == index["latest"]})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="STEP 3D model registry + batch scoring")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_list = sub.add_parser("list", help="Kayıtlı modelleri listele")
+    p_list.add_argument("--registry", default="models")
+    p_list.add_argument("--name", default=None)
+
+    p_score = sub.add_parser("score", help="Gen tablosunu kayıtlı modelle skorla")
+    p_score.add_argument("input")
+    p_score.add_argument("output")
+    p_score.add_argument("--registry", default="models")
+    p_score.add_argument("--name", default=DEFAULT_NAME)
+    p_score.add_argument("--version", default="latest")
+    p_score.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    p_score.add_argument("--gene-col", default="Hugo_Symbol")
+    p_score.add_argument("--keep-columns", nargs="*", default=None)
+
+    args = ap.parse_args(argv)
+
+    if args.cmd == "list":
+        tab = list_models(args.registry, args.name)
+        print(tab.to_string(index=False) if len(tab) else "Registry boş.")
+    elif args.cmd == "score":
+        n = score_table(args.input, args.output, args.registry, name=args.name, version=args.version,
+                        chunksize=args.chunksize, gene_col=args.gene_col, keep_columns=args.keep_columns)
+        print(f"✅ {n} satır skorlandı ->", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import os
+import numpy as np
+import pandas as pd
+
+from memo_cache import MemoCache
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch
+
+# ============================================================
+# Mutasyonel imzalar (SBS-96)
+# - MAF'taki CONTEXT (11 baz, ortadaki = Reference_Allele) + Tumor_Seq_Allele2'den
+#   trinükleotid kataloğu: referans genoma gerek yok. Pürin referanslı SNV'ler
+#   (A/G) ters tamamlayıcıya çevrilir -> 6 sübstitüsyon x 16 bağlam = 96 kanal
+# - Hasta x 96 sayım matrisi vektörel kurulur (aynı hastanın aliquot'larındaki aynı
+#   varyant bir kez sayılır)
+# - De novo çıkarım: RANK_MIN..RANK_MAX her rank için N_RESTARTS NMF (KL, Poisson
+#   bootstrap + farklı seed), işler process pool'da (joblib/loky). Rank seçimi:
+#   restart'lar arası imza kararlılığı (cosine, Hungarian eşleme) >= STABILITY_MIN olan en büyük rank
+# - Referans imzalar (COSMIC biçimi: "Type" kolonu A[C>A]A ..., her imza bir kolon)
+#   varsa hasta maruziyetleri NNLS ile fit edilir; yoksa de novo imzalar kullanılır
+# - Maruziyetler (örn. SBS22 aristolokik asit, SBS24 aflatoksin) hasta kovaryatıdır:
+#   patient_table.py tabloya ekler, step4B COX_COVARIATES ile Cox'a katabilir
+# Inputs:
+#   merged_LIHC_MAF.csv
+#   references/sbs96_reference_signatures.tsv   (opsiyonel)
+# Outputs:
+#   outputs/sbs96_catalogue.csv                 hasta x 96
+#   outputs/signatures_rank_selection.csv       rank, hata, kararlılık
+#   outputs/signatures_denovo.csv               96 x k (seçilen rank)
+#   outputs/signature_exposures.csv             patient_id, n_snvs, <imza>, <imza>_frac
+#   outputs/signatures_denovo_profiles.png, outputs/signatures_rank_selection.png
+# ============================================================
+
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
+OUT_DIR = os.path.join(BASE_DIR, "outputs")
+
+MAF_PATH = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
+REF_SIGNATURES_PATH = os.path.join(BASE_DIR, "references", "sbs96_reference_signatures.tsv")
+REF_SIGNATURES = []          # boş -> referans dosyadaki tüm imzalar; örn. ["SBS1", "SBS5", "SBS22", "SBS24"]
+
+CATALOGUE_PATH = os.path.join(OUT_DIR, "sbs96_catalogue.csv")
+RANK_PATH = os.path.join(OUT_DIR, "signatures_rank_selection.csv")
+DENOVO_PATH = os.path.join(OUT_DIR, "signatures_denovo.csv")
+EXPOSURE_PATH = os.path.join(OUT_DIR, "signature_exposures.csv")
+PLOT_PROFILES_PATH = os.path.join(OUT_DIR, "signatures_denovo_profiles.png")
+PLOT_RANK_PATH = os.path.join(OUT_DIR, "signatures_rank_selection.png")
+
+RANK_MIN, RANK_MAX = 2, 6
+N_RESTARTS = 10
+NMF_MAX_ITER = 1000
+STABILITY_MIN = 0.80         # rank seçimi: restart'lar arası en kötü imza eşleşmesi (cosine)
+SEED = 42
+N_JOBS = -1                  # NMF restart'ları için process sayısı (-1 -> tüm çekirdekler)
+
+MEMO_DIR = os.path.join(OUT_DIR, ".memo_cache")   # None -> memo cache kapalı
+RUN_LOG_DIR = os.path.join(OUT_DIR, "run_logs")
+configure(globals(), "signatures")
+
+SUBSTITUTIONS = ["C>A", "C>G", "C>T", "T>A", "T>C", "T>G"]
+BASES = "ACGT"
+CHANNELS = [f"{l}[{s}]{r}" for s in SUBSTITUTIONS for l in BASES for r in BASES]
+SUB_COLORS = ["#1EBFF0", "#050708", "#E62725", "#CBCACB", "#A1CF64", "#EDC8C5"]
+_COMPLEMENT = str.maketrans("ACGT", "TGCA")
+
+
+# ------------------------------------------------------------
+# 1) SNV'ler + SBS-96 kataloğu
+# ------------------------------------------------------------
+def read_snvs(maf_path=MAF_PATH):
+    """MAF'tan tek baz SNV'ler: patient_id, ref, alt, trinükleotid (CONTEXT ortası)."""
+    from patient_table import normalize_patient_id
+
+    need = ["Tumor_Sample_Barcode", "Variant_Type", "Reference_Allele", "Tumor_Seq_Allele2", "CONTEXT"]
+    header = pd.read_csv(maf_path, nrows=0).columns
+    missing = [c for c in need if c not in header]
+    if missing:
+        raise ValueError(f"MAF dosyasında eksik kolonlar: {missing}")
+    key_cols = [c for c in ["Chromosome", "Start_Position"] if c in header]
+    maf = pd.read_csv(maf_path, usecols=need + key_cols, dtype=str, low_memory=False)
+
+    snv = maf[(maf["Variant_Type"] == "SNP")
+              & (maf["Reference_Allele"].str.len() == 1) & (maf["Tumor_Seq_Allele2"].str.len() == 1)]
+    ctx = snv["CONTEXT"].str.upper()
+    center = ctx.str.len() // 2
+    out = pd.DataFrame({
+        "patient_id": normalize_patient_id(snv["Tumor_Sample_Barcode"]).to_numpy(),
+        "ref": snv["Reference_Allele"].str.upper().to_numpy(),
+        "alt": snv["Tumor_Seq_Allele2"].str.upper().to_numpy(),
+        "tri": "",
+    })
+    # CONTEXT uzunluğu satırdan satıra değişebilir -> uzunluk grubu başına dilimle
+    for c in np.unique(center.dropna().to_numpy()):
+        sel = (center == c).to_numpy()
+        out.loc[sel, "tri"] = ctx[sel].str.slice(int(c) - 1, int(c) + 2).to_numpy()
+    ok = (out["tri"].str.len() == 3) & (out["tri"].str.slice(1, 2) == out["ref"])
+    for c in key_cols:
+        out[c] = snv[c].to_numpy()
+    out = out[ok.to_numpy()]
+    if key_cols:
+        out = out.drop_duplicates(["patient_id"] + key_cols + ["alt"])
+    print(f"SNV: {len(out)} / {len(maf)} MAF satırı (CONTEXT ile doğrulanan tek baz)")
+    return out[["patient_id", "ref", "alt", "tri"]].reset_index(drop=True)
+
+
+def sbs96_labels(snvs):
+    """Pirimidin referansa çevrilmiş 'A[C>T]G' etiketleri (vektörel)."""
+    purine = snvs["ref"].isin(["A", "G"])
+    tri = snvs["tri"].where(~purine, snvs["tri"].str.translate(_COMPLEMENT).str[::-1])
+    alt = snvs["alt"].where(~purine, snvs["alt"].str.translate(_COMPLEMENT))
+    ref = tri.str.slice(1, 2)
+    return tri.str.slice(0, 1) + "[" + ref + ">" + alt + "]" + tri.str.slice(2, 3)
+
+
+def build_catalogue(snvs):
+    """Hasta x 96 sayım matrisi (kolonlar CHANNELS sırasında)."""
+    ch = pd.Categorical(sbs96_labels(snvs), categories=CHANNELS).codes
+    keep = ch >= 0
+    pat_codes, patients = pd.factorize(snvs["patient_id"].to_numpy()[keep], sort=True)
+    flat = np.bincount(pat_codes * len(CHANNELS) + ch[keep], minlength=len(patients) * len(CHANNELS))
+    cat = pd.DataFrame(flat.reshape(len(patients), len(CHANNELS)), index=pd.Index(patients, name="patient_id"),
+                       columns=CHANNELS)
+    return cat
+
+
+# ------------------------------------------------------------
+# 2) De novo NMF (rank aralığı x restart, process pool)
+# ------------------------------------------------------------
+def fit_exposures(V, S):
+    """NNLS: V (hasta x 96) ~ E (hasta x n) @ S (n x 96); E döndür."""
+    from scipy.optimize import nnls
+
+    A = np.asarray(S, dtype=float).T
+    return np.vstack([nnls(A, v)[0] for v in np.asarray(V, dtype=float)]) if len(V) else np.zeros((0, len(S)))
+
+
+def nmf_restart(V, k, seed, max_iter=NMF_MAX_ITER):
+    """Tek restart: Poisson bootstrap kataloğuna KL-NMF; (imzalar k x 96, orijinal V üzerindeki hata)."""
+    import warnings
+    from sklearn.decomposition import NMF
+
+    rng = np.random.default_rng(seed)
+    Vb = rng.poisson(V).astype(float)
+    model = NMF(n_components=k, init="random", solver="mu", beta_loss="kullback-leibler",
+                max_iter=max_iter, tol=1e-6, random_state=seed)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   # max_iter'e takılan restart'lar kararlılık/hata ile zaten ölçülüyor
+        model.fit(Vb + 1e-9)
+    S = model.components_
+    S = S / np.maximum(S.sum(axis=1, keepdims=True), 1e-12)
+    E = fit_exposures(V, S)
+    err = float(np.linalg.norm(V - E @ S) / max(np.linalg.norm(V), 1e-12))
+    return S, err
+
+
+def _cosine(A, B):
+    A = A / np.maximum(np.linalg.norm(A, axis=1, keepdims=True), 1e-12)
+    B = B / np.maximum(np.linalg.norm(B, axis=1, keepdims=True), 1e-12)
+    return A @ B.T
+
+
+def match_signatures(ref, other):
+    """Hungarian eşleme: ref'in her imzası için other'daki eşinin cosine benzerliği."""
+    from scipy.optimize import linear_sum_assignment
+
+    sim = _cosine(ref, other)
+    r, c = linear_sum_assignment(-sim)
+    out = np.zeros(len(ref))
+    out[r] = sim[r, c]
+    return out, c[np.argsort(r)]
+
+
+def extract_signatures(V, rank_min=RANK_MIN, rank_max=RANK_MAX, n_restarts=N_RESTARTS, seed=SEED,
+                       n_jobs=N_JOBS, max_iter=NMF_MAX_ITER, stability_min=STABILITY_MIN):
+    """
+    Rank aralığı taraması. Dönen sözlük:
+      ranks      : rank, error_best, error_mean, stability_mean, stability_min tablosu
+      best_rank  : seçilen rank
+      signatures : {rank: en iyi restart'ın imzaları (k x 96)}
+    """
+    from joblib import Parallel, delayed
+
+    V = np.asarray(V, dtype=float)
+    ranks = [k for k in range(rank_min, rank_max + 1) if k <= min(V.shape)]
+    jobs = [(k, seed + 1000 * k + r) for k in ranks for r in range(n_restarts)]
+    print(f"⚙ NMF: {len(ranks)} rank x {n_restarts} restart = {len(jobs)} fit (n_jobs={n_jobs})")
+    fits = Parallel(n_jobs=n_jobs, backend="loky")(delayed(nmf_restart)(V, k, s, max_iter) for k, s in jobs)
+
+    rows, best = [], {}
+    for k in ranks:
+        runs = [f for (kk, _), f in zip(jobs, fits) if kk == k]
+        errs = np.array([e for _, e in runs])
+        S_best = runs[int(np.argmin(errs))][0]
+        sims = np.array([match_signatures(S_best, S)[0] for S, _ in runs])
+        best[k] = S_best
+        rows.append({"rank": k, "error_best": errs.min(), "error_mean": errs.mean(),
+                     "stability_mean": float(sims.mean()), "stability_min": float(sims.min(axis=0).min())})
+    table = pd.DataFrame(rows)
+    stable = table[table["stability_min"] >= stability_min]
+    best_rank = int(stable["rank"].max()) if len(stable) else int(table.loc[table["stability_mean"].idxmax(), "rank"])
+    table["selected"] = table["rank"] == best_rank
+    return {"ranks": table, "best_rank": best_rank, "signatures": best}
+
+
+# ------------------------------------------------------------
+# 3) Referans imzalar + maruziyet tablosu
+# ------------------------------------------------------------
+def load_reference_signatures(path=REF_SIGNATURES_PATH, subset=REF_SIGNATURES):
+    """COSMIC biçimi (Type + imza kolonları) -> imza x 96 (CHANNELS sırasında); dosya yoksa None."""
+    if not path or not os.path.exists(path):
+        return None
+    ref = pd.read_csv(path, sep=None, engine="python")
+    type_col = next((c for c in ref.columns if c.lower() in ("type", "mutationtype", "mutation_type")), ref.columns[0])
+    ref = ref.set_index(type_col)
+    missing = [c for c in CHANNELS if c not in ref.index]
+    if missing:
+        raise ValueError(f"{path}: SBS-96 kanalları eksik (örn. {missing[:3]})")
+    ref = ref.loc[CHANNELS]
+    if subset:
+        unknown = [s for s in subset if s not in ref.columns]
+        if unknown:
+            raise ValueError(f"{path}: imza bulunamadı: {unknown}")
+        ref = ref[subset]
+    return ref.T.astype(float)
+
+
+def exposure_table(catalogue, S, names):
+    """Hasta başına maruziyet (mutasyon sayısı) + oran kolonları."""
+    E = fit_exposures(catalogue.to_numpy(), np.asarray(S))
+    out = pd.DataFrame(E, index=catalogue.index, columns=names)
+    total = np.maximum(out.sum(axis=1).to_numpy(), 1e-12)
+    for n in names:
+        out[f"{n}_frac"] = out[n] / total
+    out.insert(0, "n_snvs", catalogue.sum(axis=1).astype(int))
+    return out.reset_index()
+
+
+# ------------------------------------------------------------
+# Grafikler
+# ------------------------------------------------------------
+def render_profiles(S, names):
+    import matplotlib.pyplot as plt
+
+    S = np.asarray(S)
+    colors = np.repeat(SUB_COLORS, 16)
+    fig, axes = plt.subplots(len(S), 1, figsize=(14, 2.2 * len(S)), sharex=True, squeeze=False)
+    for ax, sig, name in zip(axes[:, 0], S, names):
+        ax.bar(np.arange(96), sig, color=colors, width=0.8)
+        ax.set_ylabel(name)
+        for i, sub in enumerate(SUBSTITUTIONS):
+            ax.text(16 * i + 8, ax.get_ylim()[1] * 0.9, sub, ha="center", fontsize=9)
+    axes[-1, 0].set_xticks(np.arange(96))
+    axes[-1, 0].set_xticklabels(CHANNELS, rotation=90, fontsize=5)
+    plt.tight_layout()
+
+
+def render_rank_selection(ranks):
+    import matplotlib.pyplot as plt
+
+    fig, ax1 = plt.subplots(figsize=(7, 4.5))
+    ax1.plot(ranks["rank"], ranks["stability_min"], "o-", label="kararlılık (min cosine)")
+    ax1.plot(ranks["rank"], ranks["stability_mean"], "o--", label="kararlılık (ortalama)")
+    ax1.axhline(STABILITY_MIN, color="gray", lw=0.8, ls=":")
+    ax1.set_xlabel("rank (imza sayısı)")
+    ax1.set_ylabel("kararlılık")
+    ax2 = ax1.twinx()
+    ax2.plot(ranks["rank"], ranks["error_best"], "s-", color="tab:red", label="rekonstrüksiyon hatası")
+    ax2.set_ylabel("göreli hata")
+    sel = ranks.loc[ranks["selected"], "rank"]
+    if len(sel):
+        ax1.axvline(int(sel.iloc[0]), color="tab:green", lw=1)
+    ax1.legend(loc="lower left", fontsize=8)
+    plt.title("SBS-96 NMF rank seçimi")
+    plt.tight_layout()
+
+
+def main():
+    extract = extract_signatures
+    caches = []
+    if MEMO_DIR is not None:
+        # aynı katalog + parametrelerle NMF taraması tekrar koşmaz
+        memo = MemoCache(MEMO_DIR)
+        extract = memo.memoize("signatures.extract_signatures", ignore=("n_jobs",))(extract_signatures)
+        caches.append(memo)
+    prof = StepProfiler("signatures", log_dir=RUN_LOG_DIR, caches=caches)
+    figures = FigureBatch("signatures", OUT_DIR)
+
+    with prof.phase("read SNVs") as ph:
+        snvs = read_snvs(MAF_PATH)
+        ph["rows_out"] = len(snvs)
+
+    with prof.phase("catalogue", rows_in=len(snvs)) as ph:
+        catalogue = build_catalogue(snvs)
+        os.makedirs(OUT_DIR, exist_ok=True)
+        catalogue.to_csv(CATALOGUE_PATH)
+        ph["rows_out"] = len(catalogue)
+    print(f"✅ SBS-96 kataloğu: {catalogue.shape[0]} hasta x 96 -> {CATALOGUE_PATH}")
+
+    with prof.phase("NMF extraction", rows_in=len(catalogue)) as ph:
+        res = extract(catalogue.to_numpy(), RANK_MIN, RANK_MAX, N_RESTARTS, SEED, N_JOBS, NMF_MAX_ITER, STABILITY_MIN)
+        ph["extra"]["best_rank"] = res["best_rank"]
+    k = res["best_rank"]
+    denovo_names = [f"Sig{chr(ord('A') + i)}" for i in range(k)]
+    denovo = pd.DataFrame(res["signatures"][k].T, index=pd.Index(CHANNELS, name="Type"), columns=denovo_names)
+    res["ranks"].to_csv(RANK_PATH, index=False)
+    denovo.to_csv(DENOVO_PATH)
+    print("\nRank seçimi:")
+    print(res["ranks"].to_string(index=False))
+    print(f"✅ Seçilen rank: {k} -> {DENOVO_PATH}")
+
+    with prof.phase("exposures", rows_in=len(catalogue)) as ph:
+        ref = load_reference_signatures(REF_SIGNATURES_PATH, REF_SIGNATURES)
+        if ref is not None:
+            print(f"📚 Referans imzalar: {len(ref)} imza ({REF_SIGNATURES_PATH}) -> NNLS")
+            sims = _cosine(denovo.T.to_numpy(), ref.to_numpy())
+            for name, row in zip(denovo_names, sims):
+                j = int(np.argmax(row))
+                print(f"   {name} ~ {ref.index[j]} (cosine {row[j]:.2f})")
+            exposures = exposure_table(catalogue, ref.to_numpy(), list(ref.index))
+        else:
+            print(f"ℹ Referans imza dosyası yok ({REF_SIGNATURES_PATH}); maruziyetler de novo imzalarla")
+            exposures = exposure_table(catalogue, denovo.T.to_numpy(), denovo_names)
+        exposures.to_csv(EXPOSURE_PATH, index=False)
+        ph["rows_out"] = len(exposures)
+    print(f"✅ Maruziyetler: {EXPOSURE_PATH}")
+
+    figures.add(PLOT_PROFILES_PATH, render_profiles, denovo.T.to_numpy(), denovo_names)
+    figures.add(PLOT_RANK_PATH, render_rank_selection, res["ranks"])
+    with prof.phase("figures") as ph:
+        ph["extra"].update(figures.close())
+    prof.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import os
+import numpy as np
+import pandas as pd
+
+from memo_cache import MemoCache
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch
+from patient_table import load_patient_table, load_aliquots, barcode_to_patient_idx
+
+# ============================================================
+# Hasta moleküler alt tipleri (patient subtyping)
+# - step3B genleri kümeler; burada hastalar kümelenir.
+# - Hasta x gen ikili mutasyon matrisi (sadece rekürren genler) scipy.sparse CSR olarak
+#   kurulur ve baştan sona seyrek kalır (10k hasta x 20k gen pan-kanser için de).
+# - METHOD:
+#     "nmf"              seyrek Frobenius NMF (sklearn, cd solver); alt tip = argmax W
+#     "spherical_kmeans" satırları L2 normalize edip k-means (birim vektörlerde cosine)
+# - Rank seçimi: her k için N_RUNS konsensus koşusu (hastaların SUBSAMPLE'ı, farklı seed),
+#   process pool'da (joblib/loky). Kararlılık = koşu çiftleri arasında ortak hastalardaki
+#   ortalama adjusted Rand index (n x n konsensus matrisi kurulmaz -> O(n) bellek).
+# - Rekürren gende hiç mutasyonu olmayan hastalar alt tip 0 ("quiet") olur.
+# Inputs:
+#   merged_LIHC_MAF.csv
+#   outputs/patient_table.csv, outputs/patient_aliquots.csv (patient_table.py)
+# Outputs:
+#   outputs/patient_subtypes.csv          patient_idx, patient_id, subtype, subtype_label, subtype_score
+#   outputs/subtype_rank_selection.csv    k, stability_mean, stability_sd, error_mean
+#   outputs/subtype_gene_profile.csv      alt tip başına en yüklü genler + mutasyon frekansı
+#   outputs/subtype_rank_selection.png
+# step4B alt tipleri OS / DFS'ye karşı tek KM / log-rank geçişinde test eder.
+# ============================================================
+
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
+OUT_DIR = os.path.join(BASE_DIR, "outputs")
+
+MAF_PATH = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
+PATIENT_TABLE_PATH = os.path.join(OUT_DIR, "patient_table.csv")
+ALIQUOT_PATH = os.path.join(OUT_DIR, "patient_aliquots.csv")
+
+SUBTYPE_PATH = os.path.join(OUT_DIR, "patient_subtypes.csv")
+RANK_PATH = os.path.join(OUT_DIR, "subtype_rank_selection.csv")
+PROFILE_PATH = os.path.join(OUT_DIR, "subtype_gene_profile.csv")
+PLOT_RANK_PATH = os.path.join(OUT_DIR, "subtype_rank_selection.png")
+
+METHOD = "nmf"               # "nmf" veya "spherical_kmeans"
+MIN_PATIENTS_PER_GENE = 10   # rekürren gen eşiği (mutasyonlu hasta sayısı)
+K_MIN, K_MAX = 2, 6
+N_RUNS = 20                  # rank başına konsensus koşusu
+SUBSAMPLE = 0.8              # her koşuda kullanılan hasta oranı
+NMF_MAX_ITER = 500
+TOP_GENES = 15               # alt tip profili: alt tip başına gen sayısı
+SEED = 42
+N_JOBS = -1
+
+MEMO_DIR = os.path.join(OUT_DIR, ".memo_cache")   # None -> memo cache kapalı
+RUN_LOG_DIR = os.path.join(OUT_DIR, "run_logs")
+configure(globals(), "subtypes")
+
+
+# ------------------------------------------------------------
+# 1) Seyrek hasta x gen matrisi
+# ------------------------------------------------------------
+def read_mutation_pairs(maf_path=MAF_PATH, aliquot_path=ALIQUOT_PATH):
+    """MAF -> tekil (patient_idx, Hugo_Symbol) çiftleri."""
+    cols = ["Hugo_Symbol", "Tumor_Sample_Barcode"]
+    missing = [c for c in cols if c not in pd.read_csv(maf_path, nrows=0).columns]
+    if missing:
+        raise ValueError(f"MAF dosyasında eksik kolonlar: {missing}")
+    maf = pd.read_csv(maf_path, usecols=cols, dtype="string", low_memory=False)
+    pidx = barcode_to_patient_idx(maf["Tumor_Sample_Barcode"], load_aliquots(aliquot_path))
+    pairs = pd.DataFrame({"patient_idx": pidx, "Hugo_Symbol": maf["Hugo_Symbol"].to_numpy()})
+    pairs = pairs[(pairs["patient_idx"] >= 0) & pairs["Hugo_Symbol"].notna()].drop_duplicates()
+    print("merged MAF:", maf.shape, "->", len(pairs), "tekil hasta-gen çifti")
+    return pairs.reset_index(drop=True)
+
+
+def build_sparse_matrix(pairs, n_patients, min_patients=MIN_PATIENTS_PER_GENE):
+    """(X csr n_patients x n_genes ikili, gen isimleri); sadece >= min_patients hastada mutasyonlu genler."""
+    from scipy import sparse
+
+    counts = pairs["Hugo_Symbol"].value_counts()
+    genes = np.sort(counts.index[counts >= min_patients].to_numpy(dtype=str))
+    g = pd.Index(genes).get_indexer(pairs["Hugo_Symbol"].to_numpy(dtype=str))
+    keep = g >= 0
+    X = sparse.csr_matrix((np.ones(int(keep.sum()), dtype=np.float64),
+                           (pairs["patient_idx"].to_numpy(dtype=np.int64)[keep], g[keep])),
+                          shape=(n_patients, len(genes)))
+    X.sum_duplicates()
+    X.data[:] = 1.0
+    return X, genes
+
+
+# ------------------------------------------------------------
+# 2) Tek koşu + konsensus rank seçimi
+# ------------------------------------------------------------
+def fit_labels(X, k, seed, method=METHOD, max_iter=NMF_MAX_ITER, final=False):
+    """
+    Seyrek X üzerinde tek model: (etiketler 1..k, skor, yükler k x gen, hata).
+    final=True -> son model: NMF nndsvdar ile, k-means 10 başlangıçla başlatılır (konsensus
+    koşuları tek rastgele başlangıç kullanır). Her ikisi de seed'e bağlıdır (tekrarlanabilir).
+    """
+    import warnings
+
+    if method == "nmf":
+        from sklearn.decomposition import NMF
+
+        model = NMF(n_components=k, init="nndsvdar" if final else "random", solver="cd",
+                    max_iter=max_iter, random_state=seed)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            W = model.fit_transform(X)
+        loadings, err = model.components_, float(model.reconstruction_err_)
+        # W sütunlarını gen yüklerinin ölçeğine göre normalize et (argmax ölçekten bağımsız olsun)
+        scale = np.maximum(loadings.sum(axis=1), 1e-12)
+        W = W * scale
+        loadings = loadings / scale[:, None]
+        labels = W.argmax(axis=1) + 1
+        score = W.max(axis=1) / np.maximum(W.sum(axis=1), 1e-12)
+    elif method == "spherical_kmeans":
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import normalize
+
+        Xn = normalize(X, norm="l2")   # seyrek kalır
+        model = KMeans(n_clusters=k, n_init=10 if final else 1, random_state=seed).fit(Xn)
+        labels = model.labels_ + 1
+        sims = np.asarray(Xn @ model.cluster_centers_.T)
+        score = sims.max(axis=1)
+        loadings, err = model.cluster_centers_, float(model.inertia_)
+    else:
+        raise ValueError(f"Bilinmeyen METHOD: {method} (nmf / spherical_kmeans)")
+    return labels, score, loadings, err
+
+
+def consensus_run(X, k, seed, subsample=SUBSAMPLE, method=METHOD, max_iter=NMF_MAX_ITER):
+    """Hastaların subsample'ında tek koşu: (seçilen satırlar, etiketler, hata)."""
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+    rows = np.sort(rng.choice(n, size=max(k + 1, int(round(subsample * n))), replace=False))
+    labels, _, _, err = fit_labels(X[rows], k, seed, method, max_iter)
+    return rows, labels, err
+
+
+def pairwise_stability(runs):
+    """Koşu çiftleri arasında ortak hastalardaki ARI: (ortalama, sd)."""
+    from sklearn.metrics import adjusted_rand_score
+
+    aris = []
+    for i in range(len(runs)):
+        for j in range(i + 1, len(runs)):
+            (ri, li), (rj, lj) = runs[i], runs[j]
+            common, ai, aj = np.intersect1d(ri, rj, assume_unique=True, return_indices=True)
+            if len(common) > 1:
+                aris.append(adjusted_rand_score(li[ai], lj[aj]))
+    return (float(np.mean(aris)), float(np.std(aris))) if aris else (np.nan, np.nan)
+
+
+def select_rank(X, k_min=K_MIN, k_max=K_MAX, n_runs=N_RUNS, subsample=SUBSAMPLE, method=METHOD,
+                seed=SEED, n_jobs=N_JOBS, max_iter=NMF_MAX_ITER):
+    """Her k için konsensus koşuları (paralel); kararlılık tablosu + seçilen k."""
+    from joblib import Parallel, delayed
+
+    ks = [k for k in range(k_min, k_max + 1) if k < X.shape[0]]
+    jobs = [(k, seed + 1000 * k + r) for k in ks for r in range(n_runs)]
+    print(f"⚙ Konsensus: {method}, {len(ks)} rank x {n_runs} koşu = {len(jobs)} fit (n_jobs={n_jobs})")
+    fits = Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(consensus_run)(X, k, s, subsample, method, max_iter) for k, s in jobs)
+
+    rows = []
+    for k in ks:
+        runs = [(r, l) for (kk, _), (r, l, _) in zip(jobs, fits) if kk == k]
+        errs = [e for (kk, _), (_, _, e) in zip(jobs, fits) if kk == k]
+        mean, sd = pairwise_stability(runs)
+        rows.append({"k": k, "stability_mean": mean, "stability_sd": sd, "error_mean": float(np.mean(errs))})
+    table = pd.DataFrame(rows)
+    # eşitlikte küçük k (idxmax ilk maksimumu döndürür)
+    best_k = int(table.loc[table["stability_mean"].idxmax(), "k"])
+    table["selected"] = table["k"] == best_k
+    return table, best_k
+
+
+# ------------------------------------------------------------
+# 3) Son model + alt tip tablosu
+# ------------------------------------------------------------
+def assign_subtypes(X, k, method=METHOD, seed=SEED, max_iter=NMF_MAX_ITER):
+    """
+    Tüm hastalarda son model. Alt tipler büyükten küçüğe 1..k numaralanır (koşudan koşuya
+    aynı isimler); rekürren mutasyonu olmayan hastalar 0.
+    (etiketler, skor, yükler k x gen) döndürür.
+    """
+    active = np.flatnonzero(np.diff(X.indptr) > 0)
+    labels = np.zeros(X.shape[0], dtype=np.int64)
+    score = np.zeros(X.shape[0])
+    lab, sc, loadings, _ = fit_labels(X[active], k, seed, method, max_iter, final=True)
+    sizes = np.bincount(lab, minlength=k + 1)[1:]
+    order = np.argsort(-sizes, kind="stable")
+    remap = np.zeros(k + 1, dtype=np.int64)
+    remap[order + 1] = np.arange(1, k + 1)
+    labels[active] = remap[lab]
+    score[active] = sc
+    return labels, score, loadings[order]
+
+
+def subtype_profile(X, genes, labels, loadings, top_n=TOP_GENES):
+    """Alt tip başına en yüklü top_n gen: yük + alt tipteki / diğerlerindeki mutasyon frekansı."""
+    from scipy import sparse
+
+    k = loadings.shape[0]
+    # etiket göstergesi (seyrek) ile alt tip başına mutasyonlu hasta sayıları: (k+1) x gen
+    onehot = sparse.csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(k + 1, len(labels)))
+    counts = np.asarray((onehot @ X).todense())
+    sizes = np.bincount(labels, minlength=k + 1)
+    rows = []
+    for s in range(1, k + 1):
+        other_n = max(int(sizes.sum() - sizes[s]), 1)
+        for rank, g in enumerate(np.argsort(-loadings[s - 1], kind="stable")[:top_n], start=1):
+            rows.append({"subtype": s, "rank": rank, "Hugo_Symbol": genes[g], "loading": loadings[s - 1, g],
+                         "mut_freq_in": counts[s, g] / max(int(sizes[s]), 1),
+                         "mut_freq_out": (counts[:, g].sum() - counts[s, g]) / other_n})
+    return pd.DataFrame(rows)
+
+
+def render_rank_selection(ranks):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(7, 4.5))
+    plt.errorbar(ranks["k"], ranks["stability_mean"], yerr=ranks["stability_sd"], marker="o", capsize=3)
+    sel = ranks.loc[ranks["selected"], "k"]
+    if len(sel):
+        plt.axvline(int(sel.iloc[0]), color="tab:green", lw=1)
+    plt.xlabel("k (alt tip sayısı)")
+    plt.ylabel("konsensus kararlılığı (ortalama ARI)")
+    plt.title(f"Hasta alt tipleri: rank seçimi ({METHOD})")
+    plt.tight_layout()
+
+
+def main():
+    select = select_rank
+    caches = []
+    if MEMO_DIR is not None:
+        memo = MemoCache(MEMO_DIR)
+        select = memo.memoize("subtypes.select_rank", ignore=("n_jobs",))(select_rank)
+        caches.append(memo)
+    prof = StepProfiler("subtypes", log_dir=RUN_LOG_DIR, caches=caches)
+    figures = FigureBatch("subtypes", OUT_DIR)
+
+    with prof.phase("load") as ph:
+        patients = load_patient_table(PATIENT_TABLE_PATH)
+        pairs = read_mutation_pairs(MAF_PATH, ALIQUOT_PATH)
+        ph["rows_out"] = len(pairs)
+
+    with prof.phase("sparse matrix", rows_in=len(pairs)) as ph:
+        X, genes = build_sparse_matrix(pairs, len(patients))
+        in_maf = np.zeros(len(patients), dtype=bool)
+        in_maf[pairs["patient_idx"].to_numpy(dtype=np.int64)] = True
+        Xm = X[np.flatnonzero(in_maf)]            # MAF'ta olmayan hastalar alt tiplenmez
+        active = Xm[np.diff(Xm.indptr) > 0]
+        ph["rows_out"] = X.nnz
+    density = X.nnz / max(X.shape[0] * X.shape[1], 1)
+    print(f"✅ Seyrek matris: {Xm.shape[0]} hasta x {len(genes)} rekürren gen (>= {MIN_PATIENTS_PER_GENE} hasta), "
+          f"nnz={X.nnz}, yoğunluk={density:.3%}")
+    if len(genes) < 2 or active.shape[0] <= K_MIN:
+        raise ValueError("Alt tipleme için yeterli rekürren gen / hasta yok; MIN_PATIENTS_PER_GENE'i düşür.")
+
+    with prof.phase("consensus rank", rows_in=active.shape[0]) as ph:
+        ranks, best_k = select(active, K_MIN, K_MAX, N_RUNS, SUBSAMPLE, METHOD, SEED, N_JOBS, NMF_MAX_ITER)
+        ph["extra"]["best_k"] = best_k
+    print("\nRank seçimi:")
+    print(ranks.to_string(index=False))
+
+    with prof.phase("assign", rows_in=Xm.shape[0]) as ph:
+        labels, score, loadings = assign_subtypes(Xm, best_k, METHOD, SEED, NMF_MAX_ITER)
+        pidx = np.flatnonzero(in_maf)
+        out = pd.DataFrame({
+            "patient_idx": pidx,
+            "patient_id": patients["patient_id"].to_numpy()[pidx],
+            "subtype": labels,
+            "subtype_label": np.where(labels == 0, "quiet", np.char.add("S", labels.astype(str))),
+            "subtype_score": score,
+        })
+        profile = subtype_profile(Xm, genes, labels, loadings)
+        ph["rows_out"] = len(out)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    out.to_csv(SUBTYPE_PATH, index=False)
+    ranks.to_csv(RANK_PATH, index=False)
+    profile.to_csv(PROFILE_PATH, index=False)
+
+    figures.add(PLOT_RANK_PATH, render_rank_selection, ranks)
+    with prof.phase("figures") as ph:
+        ph["extra"].update(figures.close())
+    prof.finish()
+
+    print(f"\n✅ Alt tipler (k={best_k}): {SUBTYPE_PATH}")
+    print(out["subtype_label"].value_counts().sort_index().to_string())
+    print("\nAlt tip başına en yüklü genler:")
+    for s, grp in profile.groupby("subtype"):
+        print(f"   S{s}: " + ", ".join(grp["Hugo_Symbol"].head(5)))
+    print("✅ Profil:", PROFILE_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import os
+import numpy as np
+import pandas as pd
+
+from instrumentation import StepProfiler
+from config import base_dir, configure
+
+# ============================================================
+# Hasta boyut tablosu (patient dimension)
+# - Tek hasta ekseni: patient_idx = 0..n-1 (patient_id'ye göre sıralı, boşluksuz).
+#   Adımlar hastaları string eşleştirme yerine bu tamsayı pozisyonuyla hizalar.
+# - patient_id normalizasyonu tek yerde (normalize_patient_id):
+#   TCGA barkodu (TCGA-XX-XXXX-01A-11D-...) -> büyük harf, ilk 12 karakter
+# - Aliquot -> hasta eşlemesi: aynı hastanın birden fazla aliquot'u tek hastadır
+#   (step1'deki barkod bazlı hasta sayımı aliquot'ları çift sayıyordu)
+# Inputs:
+#   merged_LIHC_MAF.csv                 (aliquot'lar, hasta başına mutasyon yükü)
+#   outputs/clinical_prepared.csv       (OS, step4A)
+#   outputs/followup_prepared.csv       (DFS, step4A)
+#   clinical.tsv / pathology_detail.tsv (kovaryatlar, clinical_io.py; pathology opsiyonel)
+#   outputs/signature_exposures.csv     (opsiyonel; mutational_signatures.py imza maruziyetleri)
+#   outputs/patient_burden.csv          (opsiyonel; merge_maf ingestion'ında yazılan ham sayımlar,
+#                                        yoksa MAF'tan hesaplanır; TMB / hypermutator burada, güncel config'le)
+# Outputs:
+#   outputs/patient_table.csv     patient_idx, patient_id, in_maf, n_aliquots, n_mutations,
+#                                 n_genes, OS_time, OS_event, DFS_time, DFS_event, kovaryatlar,
+#                                 n_mutations_total, n_nonsynonymous, tmb_per_mb, hypermutator,
+#                                 n_snvs, <imza>, <imza>_frac (varsa)
+#   outputs/patient_aliquots.csv  Tumor_Sample_Barcode, patient_id, patient_idx, sample_type, n_mutations
+#
+# Kullanım (adım script'inde):
+#   from patient_table import load_patient_table, load_aliquots, barcode_to_patient_idx
+#   patients = load_patient_table(PATIENT_TABLE_PATH)          # satır i = patient_idx i
+#   idx = barcode_to_patient_idx(maf["Tumor_Sample_Barcode"], load_aliquots(ALIQUOT_PATH))
+# ============================================================
+
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
+OUT_DIR = os.path.join(BASE_DIR, "outputs")
+
+MAF_PATH = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
+OS_PATH = os.path.join(OUT_DIR, "clinical_prepared.csv")
+DFS_PATH = os.path.join(OUT_DIR, "followup_prepared.csv")
+SIGNATURE_PATH = os.path.join(OUT_DIR, "signature_exposures.csv")
+BURDEN_PATH = os.path.join(OUT_DIR, "patient_burden.csv")
+
+PATIENT_TABLE_PATH = os.path.join(OUT_DIR, "patient_table.csv")
+ALIQUOT_PATH = os.path.join(OUT_DIR, "patient_aliquots.csv")
+RUN_LOG_DIR = os.path.join(OUT_DIR, "run_logs")
+
+PATIENT_ID_LEN = 12                 # TCGA-XX-XXXX
+INCLUDE_COVARIATES = True           # clinical / pathology alanlarını tabloya ekle
+# clinical_io alanlarından tabloya girmeyenler (OS / DFS zaten step4A'dan geliyor)
+COVARIATE_EXCLUDE = ["is_primary", "days_to_follow_up", "days_to_recurrence", "days_to_progression"]
+# aynı hastanın aliquot'larındaki aynı varyant tek mutasyon sayılır
+MUTATION_KEY_COLS = ["Chromosome", "Start_Position", "Tumor_Seq_Allele2"]
+# Mutasyon yükü (TMB): nonsynonymous varyant / ekzom boyutu (Mb); >= HYPERMUTATOR_TMB -> hypermutator
+EXOME_SIZE_MB = 38.0
+HYPERMUTATOR_TMB = 10.0
+NONSYNONYMOUS_CLASSES = [
+    "Missense_Mutation", "Nonsense_Mutation", "Nonstop_Mutation", "Frame_Shift_Del", "Frame_Shift_Ins",
+    "In_Frame_Del", "In_Frame_Ins", "Splice_Site", "Translation_Start_Site",
+]
+configure(globals(), "patients")
+
+
+# ------------------------------------------------------------
+# ID normalizasyonu + hizalama
+# ------------------------------------------------------------
+def normalize_patient_id(values, length=PATIENT_ID_LEN):
+    """Barkod / vaka ID'leri -> patient_id (büyük harf, ilk 12 karakter)."""
+    return pd.Series(values).astype("string").str.strip().str.upper().str.slice(0, length)
+
+
+def load_patient_table(path=PATIENT_TABLE_PATH):
+    """patient_table.csv; satır sırası patient_idx'tir (0..n-1)."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} yok. Önce: python patient_table.py (pipeline adımı 'patients')")
+    table = pd.read_csv(path, dtype={"patient_id": "string"})
+    if not np.array_equal(table["patient_idx"].to_numpy(), np.arange(len(table))):
+        raise ValueError(f"{path}: patient_idx 0..n-1 sıralı değil; tabloyu yeniden üret")
+    return table
+
+
+def load_aliquots(path=ALIQUOT_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} yok. Önce: python patient_table.py (pipeline adımı 'patients')")
+    return pd.read_csv(path, dtype={"Tumor_Sample_Barcode": "string", "patient_id": "string"})
+
+
+def barcode_to_patient_idx(barcodes, aliquots):
+    """Tumor_Sample_Barcode dizisi -> patient_idx (int64); tabloda olmayan barkod -> -1."""
+    codes = pd.Index(aliquots["Tumor_Sample_Barcode"]).get_indexer(pd.Series(barcodes).astype("string"))
+    lut = np.append(aliquots["patient_idx"].to_numpy(dtype=np.int64), -1)
+    return lut[codes]
+
+
+def patient_positions(patient_ids, patients):
+    """patient_id dizisi -> patient_idx (int64); tabloda olmayan -> -1."""
+    return pd.Index(patients["patient_id"]).get_indexer(normalize_patient_id(patient_ids)).astype(np.int64)
+
+
+# ------------------------------------------------------------
+# Mutasyon yükü (TMB) + hypermutator
+# ------------------------------------------------------------
+def aliquot_burden(maf):
+    """Aliquot başına varyant sayısı + nonsynonymous sayısı (merge_maf'ta dosya başına çağrılır)."""
+    nonsyn = maf["Variant_Classification"].isin(NONSYNONYMOUS_CLASSES) if "Variant_Classification" in maf.columns \
+        else pd.Series(False, index=maf.index)
+    g = nonsyn.groupby(maf["Tumor_Sample_Barcode"].astype("string"), sort=False)
+    return pd.DataFrame({"n_mutations_total": g.size(), "n_nonsynonymous": g.sum().astype(int)}) \
+        .rename_axis("Tumor_Sample_Barcode").reset_index()
+
+
+def summarize_burden(aliquot_burdens):
+    """
+    Aliquot yükleri -> hasta başına ham yük sayımları (patient_id sıralı). Birden fazla aliquot'u
+    olan hastada en yüksek nonsynonymous yüklü aliquot alınır (aliquot'lar toplanmaz).
+    Config'e bağlı TMB / hypermutator burada hesaplanmaz (add_tmb): dosya ayar değişince bayatlamaz.
+    """
+    ab = aliquot_burdens.groupby("Tumor_Sample_Barcode", sort=False).sum().reset_index()
+    ab["patient_id"] = normalize_patient_id(ab["Tumor_Sample_Barcode"]).to_numpy()
+    ab = ab.sort_values(["patient_id", "n_nonsynonymous", "n_mutations_total"], ascending=[True, False, False],
+                        kind="mergesort")
+    out = ab.drop_duplicates("patient_id")[["patient_id", "n_mutations_total", "n_nonsynonymous"]]
+    return out.reset_index(drop=True)
+
+
+def add_tmb(burden, exome_mb=EXOME_SIZE_MB, threshold=HYPERMUTATOR_TMB):
+    """Ham yük tablosuna tmb_per_mb (nonsynonymous / ekzom Mb) ve hypermutator (TMB >= eşik) ekle."""
+    out = burden[["patient_id", "n_mutations_total", "n_nonsynonymous"]].copy()
+    out["tmb_per_mb"] = out["n_nonsynonymous"] / exome_mb
+    out["hypermutator"] = out["tmb_per_mb"] >= threshold
+    return out
+
+
+def load_burden(path=BURDEN_PATH, maf=None, exome_mb=EXOME_SIZE_MB, threshold=HYPERMUTATOR_TMB):
+    """
+    patient_burden.csv (merge_maf çıktısı); yoksa ve maf verildiyse bellekteki MAF'tan hesapla.
+    tmb_per_mb / hypermutator her okumada güncel [patients] ayarlarıyla hesaplanır.
+    """
+    if os.path.exists(path):
+        burden = pd.read_csv(path, dtype={"patient_id": "string"})
+    elif maf is None:
+        raise FileNotFoundError(f"{path} yok. Önce: python analysis.py (pipeline adımı 'merge_maf')")
+    else:
+        burden = summarize_burden(aliquot_burden(maf))
+    return add_tmb(burden, exome_mb, threshold)
+
+
+# ------------------------------------------------------------
+# Tablo üretimi
+# ------------------------------------------------------------
+def read_maf_for_patients(maf_path=MAF_PATH):
+    header = pd.read_csv(maf_path, nrows=0).columns
+    if "Tumor_Sample_Barcode" not in header:
+        raise ValueError("MAF dosyasında Tumor_Sample_Barcode yok.")
+    cols = ["Tumor_Sample_Barcode"] + [c for c in ["Hugo_Symbol", "Variant_Classification"] + MUTATION_KEY_COLS
+                                       if c in header]
+    maf = pd.read_csv(maf_path, usecols=cols, dtype={"Tumor_Sample_Barcode": "string"}, low_memory=False)
+    print("merged MAF:", maf.shape)
+    return maf
+
+
+def build_aliquots(maf):
+    """Aliquot başına satır: barkod, patient_id, sample_type (01A ...), mutasyon sayısı."""
+    counts = maf.groupby("Tumor_Sample_Barcode", sort=True).size()
+    aliquots = pd.DataFrame({"Tumor_Sample_Barcode": counts.index.astype("string"),
+                             "n_mutations": counts.to_numpy()})
+    aliquots["patient_id"] = normalize_patient_id(aliquots["Tumor_Sample_Barcode"]).to_numpy()
+    aliquots["sample_type"] = aliquots["Tumor_Sample_Barcode"].str.slice(13, 16).to_numpy()
+    return aliquots
+
+
+def mutation_burden(maf, aliquots):
+    """Hasta başına: aliquot sayısı, tekil mutasyon sayısı, mutasyonlu gen sayısı."""
+    pid = aliquots.set_index("Tumor_Sample_Barcode")["patient_id"]
+    m = pd.DataFrame({"patient_id": maf["Tumor_Sample_Barcode"].map(pid).to_numpy()})
+    key_cols = [c for c in MUTATION_KEY_COLS if c in maf.columns]
+    for c in key_cols + (["Hugo_Symbol"] if "Hugo_Symbol" in maf.columns else []):
+        m[c] = maf[c].to_numpy()
+    muts = m.drop_duplicates(["patient_id"] + key_cols) if key_cols else m
+    out = pd.DataFrame({
+        "n_aliquots": aliquots.groupby("patient_id").size(),
+        "n_mutations": muts.groupby("patient_id").size(),
+    })
+    if "Hugo_Symbol" in m.columns:
+        out["n_genes"] = m.groupby("patient_id")["Hugo_Symbol"].nunique()
+    return out
+
+
+def build_patient_table(maf, os_df=None, dfs_df=None, cases=None, signatures=None, tmb=None):
+    """
+    Tüm kaynaklardaki hastaların birleşimi, patient_id'ye göre sıralı -> patient_idx.
+    (patient_table, aliquots) döndürür; aliquots'a patient_idx eklenir.
+    """
+    aliquots = build_aliquots(maf)
+    burden = mutation_burden(maf, aliquots)
+
+    ids = [aliquots["patient_id"]]
+    frames = []
+    for df, cols in [(os_df, ["OS_time", "OS_event"]), (dfs_df, ["DFS_time", "DFS_event"]), (cases, None),
+                     (tmb, None), (signatures, None)]:
+        if df is None:
+            continue
+        df = df.copy()
+        df["patient_id"] = normalize_patient_id(df["patient_id"]).to_numpy()
+        df = df.drop_duplicates("patient_id").set_index("patient_id")
+        frames.append(df[cols] if cols else df)
+        ids.append(df.index.to_series())
+
+    patient_ids = pd.Index(pd.concat(ids, ignore_index=True).dropna().unique()).sort_values()
+    table = pd.DataFrame(index=patient_ids)
+    table.index.name = "patient_id"
+    table["in_maf"] = table.index.isin(aliquots["patient_id"])
+    table = table.join(burden)
+    for c in burden.columns:
+        table[c] = table[c].fillna(0).astype(int)
+    for df in frames:
+        table = table.join(df.drop(columns=[c for c in df.columns if c in table.columns]))
+    for c in ["OS_event", "DFS_event"]:
+        if c in table.columns:
+            table[c] = table[c].astype("Int64")
+
+    table = table.reset_index()
+    table.insert(0, "patient_idx", np.arange(len(table), dtype=np.int64))
+    aliquots["patient_idx"] = pd.Index(table["patient_id"]).get_indexer(aliquots["patient_id"])
+    aliquots = aliquots[["Tumor_Sample_Barcode", "patient_id", "patient_idx", "sample_type", "n_mutations"]]
+    return table, aliquots
+
+
+def main():
+    prof = StepProfiler("patients", log_dir=RUN_LOG_DIR)
+
+    with prof.phase("read MAF") as ph:
+        maf = read_maf_for_patients(MAF_PATH)
+        ph["rows_out"] = len(maf)
+
+    with prof.phase("read clinical") as ph:
+        os_df = pd.read_csv(OS_PATH) if os.path.exists(OS_PATH) else None
+        dfs_df = pd.read_csv(DFS_PATH) if os.path.exists(DFS_PATH) else None
+        for name, df in [("OS", os_df), ("DFS", dfs_df)]:
+            print(f"{name} tablosu:", "yok (step4A çalıştırılmamış)" if df is None else df.shape)
+        cases = None
+        if INCLUDE_COVARIATES:
+            from clinical_io import load_cases
+            try:
+                cases = load_cases(BASE_DIR)
+                cases = cases.drop(columns=[c for c in COVARIATE_EXCLUDE if c in cases.columns])
+            except FileNotFoundError as e:
+                print("⚠", e)
+        tmb = load_burden(BURDEN_PATH, maf)
+        print("Mutasyon yükü:", f"{int(tmb['hypermutator'].sum())} hypermutator "
+              f"(TMB >= {HYPERMUTATOR_TMB}/Mb, ekzom {EXOME_SIZE_MB} Mb)")
+        signatures = pd.read_csv(SIGNATURE_PATH) if os.path.exists(SIGNATURE_PATH) else None
+        print("İmza maruziyetleri:", "yok (signatures adımı çalıştırılmamış)" if signatures is None
+              else f"{signatures.shape[1] - 2} kolon")
+        ph["rows_out"] = 0 if cases is None else len(cases)
+
+    with prof.phase("build table", rows_in=len(maf)) as ph:
+        table, aliquots = build_patient_table(maf, os_df, dfs_df, cases, signatures, tmb)
+        ph["rows_out"] = len(table)
+
+    with prof.phase("write", rows_in=len(table)):
+        os.makedirs(OUT_DIR, exist_ok=True)
+        table.to_csv(PATIENT_TABLE_PATH, index=False)
+        aliquots.to_csv(ALIQUOT_PATH, index=False)
+    prof.finish()
+
+    n_multi = int((table["n_aliquots"] > 1).sum())
+    print("\n✅ patient_table.csv kaydedildi:", PATIENT_TABLE_PATH)
+    print("   hastalar          :", len(table))
+    print("   MAF'ta olan       :", int(table["in_maf"].sum()), f"({len(aliquots)} aliquot, {n_multi} hastada >1 aliquot)")
+    if "OS_time" in table.columns:
+        print("   OS verisi olan    :", int(table["OS_time"].notna().sum()))
+    if "DFS_time" in table.columns:
+        print("   DFS verisi olan   :", int(table["DFS_time"].notna().sum()))
+    print("✅ patient_aliquots.csv kaydedildi:", ALIQUOT_PATH)
+
+
+if __name__ == "__main__":
+    main()
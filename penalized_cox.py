@@ -0,0 +1,472 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from memo_cache import MemoCache
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch
+from patient_table import load_patient_table
+
+# ============================================================
+# Elastic-net Cox (çok değişkenli, seyrek hasta x gen matrisi)
+# - step4B genleri tek tek tarar; birlikte mutasyona uğrayan genler birbirinin etkisini
+#   taşıyabilir. Burada OS / DFS için tüm rekürren genler + klinik kovaryatlar tek modelde.
+# - Çözücü (glmnet Cox, Simon ve ark. 2011): kısmi olabilirliğin (Breslow) ikinci dereceden
+#   yaklaşımı etrafında coordinate descent. Gen kolonları CSC olarak kalır; bir koordinat
+#   güncellemesi sadece o genin mutant hastalarına dokunur (O(nnz_j)).
+# - lambda yolu lambda_max'tan warm-start ile iner; her lambda'da "strong rule" ile aday
+#   genler seçilir, çözümden sonra tüm genlerde KKT kontrolü yapılır (ihlal -> aday seti büyür).
+# - Kovaryatlar cezasızdır (penalty factor 0) ve standardize edilir. Gen kolonları 0/1
+#   ölçeğinde cezalanır (STANDARDIZE_GENES=False): standardize edilince 3 hastalı bir genin
+#   katsayısı ~5 kat ucuza gelir ve yol nadir genlerle dolar.
+# - lambda seçimi: CV_FOLDS katlı CV (katlar process pool'da, joblib/loky), Verweij &
+#   van Houwelingen kısmi olabilirlik sapması; LAMBDA_RULE "min" veya "1se".
+# Inputs:
+#   merged_LIHC_MAF.csv
+#   outputs/patient_table.csv, outputs/patient_aliquots.csv (patient_table.py)
+# Outputs:
+#   outputs/coxnet_genes.csv     endpoint, rank, Hugo_Symbol, n_mut, coef, hr, entry_lambda
+#                                (sıra: yola giriş sırası -> önce giren gen daha güçlü; eşitse |coef|)
+#   outputs/coxnet_cv.csv        endpoint, lambda, n_nonzero, cv_deviance, cv_se, selected
+#   outputs/coxnet_cv_{OS,DFS}.png
+# ============================================================
+
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
+OUT_DIR = os.path.join(BASE_DIR, "outputs")
+
+MAF_PATH = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
+PATIENT_TABLE_PATH = os.path.join(OUT_DIR, "patient_table.csv")
+ALIQUOT_PATH = os.path.join(OUT_DIR, "patient_aliquots.csv")
+
+GENES_PATH = os.path.join(OUT_DIR, "coxnet_genes.csv")
+CV_PATH = os.path.join(OUT_DIR, "coxnet_cv.csv")
+PLOT_CV_PATH = os.path.join(OUT_DIR, "coxnet_cv_{}.png")   # {} -> OS / DFS
+
+# Cezasız kovaryatlar (patient_table.csv kolonları). Kategorikler subgroup_analysis'teki
+# düzey gruplarıyla toplanıp dummy'lenir; kovaryatı eksik hasta modelden düşer.
+COVARIATES = ["age_at_index", "gender", "ajcc_pathologic_stage"]
+MIN_GENE_PATIENTS = 3        # en az bu kadar hastada mutasyonlu genler (1 -> tüm genler)
+L1_RATIO = 0.5               # elastic-net karışımı (1 -> lasso, 0 -> ridge)
+STANDARDIZE_GENES = False    # True -> glmnet varsayılanı (gen kolonları 1/sd ile ölçeklenir)
+N_LAMBDA = 50
+LAMBDA_MIN_RATIO = 0.02      # lambda_min = oran x lambda_max
+DFMAX = 150                  # bu kadar gen seçilince yol kesilir
+LAMBDA_RULE = "1se"          # "min" (en düşük CV sapması) veya "1se" (1 SE içindeki en seyrek model)
+CV_FOLDS = 5
+SEED = 42
+N_JOBS = -1
+TOL = 1e-7
+MAX_ITER = 100               # lambda başına dış (Newton) iterasyon üst sınırı
+
+MEMO_DIR = os.path.join(OUT_DIR, ".memo_cache")   # None -> memo cache kapalı
+RUN_LOG_DIR = os.path.join(OUT_DIR, "run_logs")
+configure(globals(), "coxnet")
+
+ENDPOINTS = [("OS", "OS_time", "OS_event"), ("DFS", "DFS_time", "DFS_event")]
+
+
+# ------------------------------------------------------------
+# 1) Tasarım matrisi: seyrek genler + yoğun kovaryatlar (CSC)
+# ------------------------------------------------------------
+def covariate_matrix(patients, covariates=COVARIATES):
+    """(n x c) kovaryat DataFrame'i (patient_idx sırasında); eksik değer NaN kalır."""
+    from subgroup_analysis import stratum_levels
+
+    cols = []
+    for var in covariates:
+        if var not in patients.columns:
+            print(f"⚠ {var} patient_table.csv'de yok, atlandı")
+            continue
+        v = patients[var]
+        if pd.api.types.is_bool_dtype(v) or pd.api.types.is_numeric_dtype(v):
+            cols.append(pd.to_numeric(v, errors="coerce").rename(var).astype(float))
+            continue
+        lv = stratum_levels(v, var)
+        dummies = pd.get_dummies(lv, prefix=var, dtype=float).sort_index(axis=1).iloc[:, 1:]   # ilk düzey referans
+        dummies[lv.isna().to_numpy()] = np.nan
+        cols.append(dummies)
+    if not cols:
+        return pd.DataFrame(index=patients.index)
+    return pd.concat(cols, axis=1)
+
+
+def design_matrix(genes_X, cov):
+    """[kovaryatlar | genler] CSC matrisi + penalty factor (kovaryat 0, gen 1). Kovaryatlar ortalanır."""
+    from scipy import sparse
+
+    c = cov.to_numpy(dtype=float)
+    c = c - np.nanmean(c, axis=0) if c.shape[1] else c     # Cox'ta sabit kayma önemsiz; CD daha hızlı yakınsar
+    C = sparse.csc_matrix(np.nan_to_num(c)) if c.shape[1] else sparse.csc_matrix((genes_X.shape[0], 0))
+    X = sparse.hstack([C, genes_X.tocsc()], format="csc")
+    X.sort_indices()
+    pf = np.r_[np.zeros(cov.shape[1]), np.ones(genes_X.shape[1])]
+    return X, pf
+
+
+# ------------------------------------------------------------
+# 2) Cox kısmi olabilirlik (Breslow) türevleri
+# ------------------------------------------------------------
+class RiskSets:
+    """Süreye göre sıralı risk setleri; eta değişince türevler O(n)'de yeniden hesaplanır."""
+
+    def __init__(self, time, event):
+        time = np.asarray(time, dtype=float)
+        self.event = np.asarray(event, dtype=float)
+        times, self.uidx = np.unique(time, return_inverse=True)
+        self.k = len(times)
+        self.d = np.bincount(self.uidx, weights=self.event, minlength=self.k)
+
+    def _risk(self, eta):
+        ex = np.exp(eta - eta.max())
+        s = np.cumsum(np.bincount(self.uidx, weights=ex, minlength=self.k)[::-1])[::-1]   # t >= u olanlar
+        return ex, s
+
+    def loglik(self, eta):
+        ex, s = self._risk(eta)
+        pos = self.d > 0
+        return float(self.event @ (eta - eta.max()) - self.d[pos] @ np.log(s[pos]))
+
+    def derivs(self, eta):
+        """(gradyan, Hessian köşegeni) eta'ya göre."""
+        ex, s = self._risk(eta)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c1 = np.cumsum(np.where(self.d > 0, self.d / s, 0.0))
+            c2 = np.cumsum(np.where(self.d > 0, self.d / s ** 2, 0.0))
+        a = ex * c1[self.uidx]
+        return self.event - a, a - ex ** 2 * c2[self.uidx]
+
+
+# ------------------------------------------------------------
+# 3) Coordinate descent + warm-start lambda yolu
+# ------------------------------------------------------------
+def column_scales(X, pf, standardize_genes=STANDARDIZE_GENES):
+    """Kolon ölçekleri: kovaryatlar (ve istenirse genler) 1/sd, diğer genler 1; sabit kolon 0."""
+    n = X.shape[0]
+    mean = np.asarray(X.sum(axis=0)).ravel() / n
+    sq = np.asarray(X.multiply(X).sum(axis=0)).ravel() / n
+    sd = np.sqrt(np.maximum(sq - mean ** 2, 0.0))
+    inv = np.where(sd > 0, 1.0 / np.where(sd > 0, sd, 1.0), 0.0)
+    return inv if standardize_genes else np.where(pf > 0, (sd > 0).astype(float), inv)
+
+
+def column_slices(X, scale):
+    """Kolon başına (satır indeksleri, ölçekli değerler); CD döngüsünde tekrar dilimlenmez."""
+    indptr, indices, data = X.indptr, X.indices, X.data
+    return [(indices[indptr[j]:indptr[j + 1]], data[indptr[j]:indptr[j + 1]] * scale[j]) for j in range(X.shape[1])]
+
+
+def _cd_inner(cols_x, beta, cols, w, wr, lam, l1, pf, tol, n, max_sweeps=1000):
+    """
+    Ağırlıklı en küçük kareler yaklaşımında coordinate descent (beta / wr yerinde güncellenir).
+    glmnet gibi: cols üzerinde tam tur, sonra sadece sıfır olmayanlarda yakınsayana kadar tur;
+    tam tur değişiklik getirmeyince biter.
+    """
+    v = np.array([w[cols_x[j][0]] @ (cols_x[j][1] ** 2) / n for j in cols])
+    v_of = dict(zip(cols.tolist(), v))
+
+    def sweep(idx):
+        max_delta = 0.0
+        for j in idx:
+            vj = v_of[j]
+            if vj <= 0:
+                continue
+            rows, x = cols_x[j]
+            old = beta[j]
+            g = x @ wr[rows] / n + vj * old
+            new = np.sign(g) * max(abs(g) - lam * l1 * pf[j], 0.0) / (vj + lam * (1 - l1) * pf[j])
+            if new != old:
+                wr[rows] -= w[rows] * x * (new - old)
+                beta[j] = new
+                max_delta = max(max_delta, vj * (new - old) ** 2)
+        return max_delta
+
+    cols = cols.tolist()
+    for _ in range(max_sweeps):
+        if sweep(cols) < tol:
+            break
+        active = [j for j in cols if beta[j] != 0]
+        for _ in range(max_sweeps):
+            if sweep(active) < tol:
+                break
+    return v_of
+
+
+def _objective(rs, X, scale, beta, lam, l1, pf):
+    n = X.shape[0]
+    pen = lam * (l1 * np.abs(beta) + 0.5 * (1 - l1) * beta ** 2) @ pf
+    return -rs.loglik(X @ (beta * scale)) / n + pen
+
+
+def _solve(rs, X, cols_x, scale, beta, cols, lam, l1, pf, tol=TOL, max_iter=MAX_ITER):
+    """
+    Tek lambda: dış Newton (IRLS) döngüsü; objektif artarsa adım yarılanır.
+    Yakınsama: ardışık iki çözüm arasında max_j v_j * dbeta_j^2 < tol (glmnet ölçütü).
+    """
+    n = X.shape[0]
+    obj = _objective(rs, X, scale, beta, lam, l1, pf)
+    for _ in range(max_iter):
+        grad, w = rs.derivs(X @ (beta * scale))
+        new = beta.copy()
+        v_of = _cd_inner(cols_x, new, cols, w, grad, lam, l1, pf, tol, n)
+        new_obj = _objective(rs, X, scale, new, lam, l1, pf)
+        for _ in range(20):
+            if new_obj <= obj + 1e-12:
+                break
+            new = 0.5 * (beta + new)
+            new_obj = _objective(rs, X, scale, new, lam, l1, pf)
+        done = max((v_of[j] * (new[j] - beta[j]) ** 2 for j in cols), default=0.0) < tol
+        beta, obj = new, new_obj
+        if done:
+            break
+    return beta
+
+
+def _full_grad(rs, X, scale, beta):
+    """Tüm kolonlarda -d(loglik/n)/d(beta) (ölçekli); strong rule / KKT için tek seyrek matvec."""
+    grad, _ = rs.derivs(X @ (beta * scale))
+    return (X.T @ grad) * scale / X.shape[0]
+
+
+def lambda_path(time, event, X, pf, scale, l1=L1_RATIO, n_lambda=N_LAMBDA, min_ratio=LAMBDA_MIN_RATIO,
+                tol=TOL, max_iter=MAX_ITER):
+    """Önce cezasız kovaryat modeli; lambda_max = o noktada en büyük gen gradyanı / l1."""
+    rs = RiskSets(time, event)
+    beta = np.zeros(X.shape[1])
+    base = np.flatnonzero(pf == 0)
+    if len(base):
+        beta = _solve(rs, X, column_slices(X, scale), scale, beta, base, 0.0, l1, pf, tol, max_iter)
+    g = np.abs(_full_grad(rs, X, scale, beta))[pf > 0]
+    lam_max = g.max() / max(l1, 1e-3) if len(g) else 1.0
+    return np.geomspace(lam_max, lam_max * min_ratio, n_lambda)
+
+
+def fit_path(time, event, X, pf, scale, lambdas, l1=L1_RATIO, dfmax=DFMAX, tol=TOL, max_iter=MAX_ITER):
+    """
+    Warm-start yol: (n_fit x p) ölçekli katsayılar (yol erken kesilirse n_fit < len(lambdas)).
+    Her lambda'da strong rule aday seti + KKT kontrolü. Yol min(DFMAX, olay sayısı) gende ya da
+    model doyunca (açıklanan sapma >= %99) kesilir: olaydan fazla gen seçen modeller aşırı uyar,
+    hem yavaş yakınsar hem de CV'de seçilmez.
+    """
+    rs = RiskSets(time, event)
+    cols_x = column_slices(X, scale)
+    p = X.shape[1]
+    beta = np.zeros(p)
+    ever = pf == 0
+    path = []
+    prev_lam = lambdas[0]
+    grad = _full_grad(rs, X, scale, beta)
+    pos = rs.d > 0
+    ll_sat = -float(rs.d[pos] @ np.log(rs.d[pos]))
+    dev_null = 2 * (ll_sat - rs.loglik(np.zeros(X.shape[0])))
+    dfmax = min(dfmax, int(rs.d.sum()))
+    for lam in lambdas:
+        strong = ever | (np.abs(grad) >= l1 * (2 * lam - prev_lam) * pf)
+        while True:
+            beta = _solve(rs, X, cols_x, scale, beta, np.flatnonzero(strong), lam, l1, pf, tol, max_iter)
+            grad = _full_grad(rs, X, scale, beta)
+            viol = ~strong & (np.abs(grad) > l1 * lam * pf * (1 + 1e-6))
+            if not viol.any():
+                break
+            strong |= viol
+        ever |= beta != 0
+        path.append(beta.copy())
+        prev_lam = lam
+        ratio = 1 - 2 * (ll_sat - rs.loglik(X @ (beta * scale))) / dev_null if dev_null > 0 else 1.0
+        if int(((beta != 0) & (pf > 0)).sum()) >= dfmax or ratio >= 0.99:
+            break
+    return np.array(path)
+
+
+# ------------------------------------------------------------
+# 4) Çapraz doğrulama (katlar paralel)
+# ------------------------------------------------------------
+def make_folds(event, n_folds=CV_FOLDS, seed=SEED):
+    """Olaya göre tabakalı kat numarası (hasta başına)."""
+    rng = np.random.default_rng(seed)
+    fold = np.empty(len(event), dtype=np.int64)
+    for e in (0, 1):
+        idx = rng.permutation(np.flatnonzero(np.asarray(event) == e))
+        fold[idx] = np.arange(len(idx)) % n_folds
+    return fold
+
+
+def cv_fold(time, event, X, pf, scale, lambdas, train, l1=L1_RATIO, dfmax=DFMAX, tol=TOL, max_iter=MAX_ITER):
+    """Tek kat: eğitimde yol, sonra Verweij-van Houwelingen katkısı l(tümü) - l(eğitim) lambda başına."""
+    Xtr = X[train].tocsc()
+    path = fit_path(time[train], event[train], Xtr, pf, scale, lambdas, l1, dfmax, tol, max_iter)
+    rs_all, rs_tr = RiskSets(time, event), RiskSets(time[train], event[train])
+    cvl = np.full(len(lambdas), np.nan)
+    for i, b in enumerate(path):
+        cvl[i] = rs_all.loglik(X @ (b * scale)) - rs_tr.loglik(Xtr @ (b * scale))
+    return cvl
+
+
+def cross_validate(time, event, X, pf, scale, lambdas, n_folds=CV_FOLDS, seed=SEED, n_jobs=N_JOBS,
+                   l1=L1_RATIO, dfmax=DFMAX, tol=TOL, max_iter=MAX_ITER):
+    """Lambda başına CV sapması (olay sayısıyla ağırlıklı ortalama) ve standart hatası."""
+    from joblib import Parallel, delayed
+
+    folds = make_folds(event, n_folds, seed)
+    print(f"⚙ CV: {n_folds} kat x {len(lambdas)} lambda (n_jobs={n_jobs})")
+    cvls = Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(cv_fold)(time, event, X, pf, scale, lambdas, folds != k, l1, dfmax, tol, max_iter)
+        for k in range(n_folds))
+    d = np.array([event[folds == k].sum() for k in range(n_folds)], dtype=float)
+    raw = -2.0 * np.array(cvls) / np.maximum(d, 1.0)[:, None]
+    wts = d / d.sum()
+    mean = wts @ raw
+    se = np.sqrt(wts @ (raw - mean) ** 2 / max(n_folds - 1, 1))
+    return mean, se
+
+
+def select_lambda(lambdas, mean, se, rule=LAMBDA_RULE):
+    """Seçilen lambda indeksi; yol kesilen lambdalar (NaN) yok sayılır."""
+    ok = np.isfinite(mean)
+    i_min = int(np.nanargmin(np.where(ok, mean, np.nan)))
+    if rule == "min":
+        return i_min
+    if rule != "1se":
+        raise ValueError(f"Bilinmeyen LAMBDA_RULE: {rule} (min / 1se)")
+    within = np.flatnonzero(ok & (mean <= mean[i_min] + se[i_min]))
+    return int(within.min())              # lambdalar azalan sırada -> en büyük lambda = en seyrek
+
+
+def fit_endpoint(time, event, X, pf, l1=L1_RATIO, n_lambda=N_LAMBDA, min_ratio=LAMBDA_MIN_RATIO, dfmax=DFMAX,
+                 n_folds=CV_FOLDS, seed=SEED, n_jobs=N_JOBS, rule=LAMBDA_RULE, tol=TOL,
+                 standardize_genes=STANDARDIZE_GENES, max_iter=MAX_ITER):
+    """
+    Tüm veride yol + CV -> (ölçekli yol, cv tablosu, seçilen indeks, ölçekler).
+    Çözücü ayarları (tol, max_iter) açıkça geçirilir: memo anahtarına girerler.
+    """
+    scale = column_scales(X, pf, standardize_genes)
+    lambdas = lambda_path(time, event, X, pf, scale, l1, n_lambda, min_ratio, tol, max_iter)
+    path = fit_path(time, event, X, pf, scale, lambdas, l1, dfmax, tol, max_iter)
+    lambdas = lambdas[:len(path)]
+    mean, se = cross_validate(time, event, X, pf, scale, lambdas, n_folds, seed, n_jobs, l1, dfmax, tol, max_iter)
+    best = select_lambda(lambdas, mean, se, rule)
+    cv = pd.DataFrame({"lambda": lambdas, "n_nonzero": ((path != 0) & (pf > 0)).sum(axis=1),
+                       "cv_deviance": mean, "cv_se": se, "selected": np.arange(len(lambdas)) == best})
+    return path, cv, best, scale
+
+
+def gene_table(path, best, scale, lambdas, names, n_mut, pf):
+    """Seçilen lambdada sıfır olmayan genler; yola giriş sırasına (sonra |coef|) göre sıralı."""
+    b = path[best]
+    genes = np.flatnonzero((b != 0) & (pf > 0))
+    entered = (path[:, genes] != 0).argmax(axis=0)
+    coef = b[genes] * scale[genes]
+    out = pd.DataFrame({"Hugo_Symbol": names[genes], "n_mut": n_mut[genes], "coef": coef, "hr": np.exp(coef),
+                        "entry_lambda": lambdas[entered], "_abs": np.abs(coef)})
+    out = out.sort_values(["entry_lambda", "_abs"], ascending=False, kind="mergesort") \
+        .drop(columns="_abs").reset_index(drop=True)
+    out.insert(0, "rank", np.arange(1, len(out) + 1))
+    return out
+
+
+def render_cv(cv, endpoint):
+    import matplotlib.pyplot as plt
+
+    cv = cv[np.isfinite(cv["cv_deviance"])]
+    fig, ax = plt.subplots(figsize=(7, 4.5))
+    x = np.log(cv["lambda"].to_numpy())
+    ax.errorbar(x, cv["cv_deviance"], yerr=cv["cv_se"], marker="o", ms=3, capsize=2, color="tab:red")
+    sel = cv.loc[cv["selected"]]
+    if len(sel):
+        ax.axvline(float(np.log(sel["lambda"].iloc[0])), color="tab:gray", ls="--", lw=1)
+    step = max(len(x) // 8, 1)
+    ax2 = ax.twiny()
+    ax2.set_xlim(ax.get_xlim())
+    ax2.set_xticks(x[::step])
+    ax2.set_xticklabels(cv["n_nonzero"].to_numpy()[::step])
+    ax2.set_xlabel("seçilen gen sayısı")
+    ax.set_xlabel("log(lambda)")
+    ax.set_ylabel("CV kısmi olabilirlik sapması")
+    plt.title(f"Elastic-net Cox ({endpoint}, l1_ratio={L1_RATIO}, {LAMBDA_RULE})")
+    plt.tight_layout()
+
+
+def main():
+    from patient_subtypes import read_mutation_pairs, build_sparse_matrix
+
+    fit = fit_endpoint
+    caches = []
+    if MEMO_DIR is not None:
+        memo = MemoCache(MEMO_DIR)
+        # anahtara modülün tüm kaynağı girer: fit_path / _cd_inner / _solve değişince cache geçersiz
+        fit = memo.memoize("coxnet.fit_endpoint", ignore=("n_jobs",),
+                           sources=(sys.modules[__name__],))(fit_endpoint)
+        caches.append(memo)
+    prof = StepProfiler("coxnet", log_dir=RUN_LOG_DIR, caches=caches)
+    figures = FigureBatch("coxnet", OUT_DIR)
+
+    with prof.phase("load") as ph:
+        patients = load_patient_table(PATIENT_TABLE_PATH)
+        pairs = read_mutation_pairs(MAF_PATH, ALIQUOT_PATH)
+        ph["rows_out"] = len(pairs)
+
+    with prof.phase("design matrix", rows_in=len(pairs)) as ph:
+        G, genes = build_sparse_matrix(pairs, len(patients), MIN_GENE_PATIENTS)
+        cov = covariate_matrix(patients, COVARIATES)
+        X_all, pf = design_matrix(G, cov)
+        names = np.r_[cov.columns.to_numpy(dtype=str), genes]
+        ph["rows_out"] = X_all.nnz
+    print(f"✅ Tasarım matrisi: {len(genes)} gen (>= {MIN_GENE_PATIENTS} hasta, nnz={G.nnz}) + "
+          f"{cov.shape[1]} cezasız kovaryat kolonu ({', '.join(cov.columns) or '-'})")
+
+    gene_tables, cv_tables = [], []
+    for ep, t_col, e_col in ENDPOINTS:
+        if t_col not in patients.columns or e_col not in patients.columns:
+            print(f"⚠ {ep}: {t_col} / {e_col} patient_table.csv'de yok (step4A çalıştı mı?), atlandı")
+            continue
+        rows = (patients["in_maf"].to_numpy(bool) & patients[[t_col, e_col]].notna().all(axis=1).to_numpy()
+                & cov.notna().all(axis=1).to_numpy())
+        idx = np.flatnonzero(rows)
+        time = patients[t_col].to_numpy(dtype=float)[idx]
+        event = patients[e_col].to_numpy(dtype=float)[idx]
+        if len(idx) < 2 * CV_FOLDS or event.sum() < CV_FOLDS:
+            print(f"⚠ {ep}: yeterli hasta / olay yok ({len(idx)} hasta, {int(event.sum())} olay), atlandı")
+            continue
+        X = X_all[idx].tocsc()
+        n_mut = np.asarray(X.getnnz(axis=0)).ravel()
+        print(f"\n🔎 {ep}: {len(idx)} hasta, {int(event.sum())} olay "
+              f"({int(patients['in_maf'].sum()) - len(idx)} hasta eksik süre/kovaryat nedeniyle dışarıda)")
+
+        with prof.phase(f"fit {ep}", rows_in=len(idx)) as ph:
+            path, cv, best, scale = fit(time, event, X, pf, L1_RATIO, N_LAMBDA, LAMBDA_MIN_RATIO, DFMAX,
+                                        CV_FOLDS, SEED, N_JOBS, LAMBDA_RULE, TOL, STANDARDIZE_GENES, MAX_ITER)
+            ph["extra"]["n_lambda"] = len(cv)
+        table = gene_table(path, best, scale, cv["lambda"].to_numpy(), names, n_mut, pf)
+        table.insert(0, "endpoint", ep)
+        cv.insert(0, "endpoint", ep)
+        gene_tables.append(table)
+        cv_tables.append(cv)
+        figures.add(PLOT_CV_PATH.format(ep), render_cv, cv, ep)
+
+        lam = cv["lambda"].iloc[best]
+        print(f"   lambda ({LAMBDA_RULE}) = {lam:.4g}: {len(table)} gen, "
+              f"CV sapması {cv['cv_deviance'].iloc[best]:.3f} ± {cv['cv_se'].iloc[best]:.3f}")
+        cov_coef = path[best][pf == 0] * scale[pf == 0]
+        for name, c in zip(names[pf == 0], cov_coef):
+            print(f"   kovaryat {name}: HR={np.exp(c):.3f}")
+        if len(table):
+            print(table.head(10)[["rank", "Hugo_Symbol", "n_mut", "hr"]].to_string(index=False))
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    gene_cols = ["endpoint", "rank", "Hugo_Symbol", "n_mut", "coef", "hr", "entry_lambda"]
+    cv_cols = ["endpoint", "lambda", "n_nonzero", "cv_deviance", "cv_se", "selected"]
+    (pd.concat(gene_tables, ignore_index=True) if gene_tables else pd.DataFrame(columns=gene_cols)) \
+        .to_csv(GENES_PATH, index=False)
+    (pd.concat(cv_tables, ignore_index=True) if cv_tables else pd.DataFrame(columns=cv_cols)) \
+        .to_csv(CV_PATH, index=False)
+
+    with prof.phase("figures") as ph:
+        ph["extra"].update(figures.close())
+    prof.finish()
+    print(f"\n✅ Seçilen genler: {GENES_PATH}")
+    print(f"✅ CV yolu: {CV_PATH}")
+
+
+if __name__ == "__main__":
+    main()
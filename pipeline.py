@@ -0,0 +1,673 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from instrumentation import StepProfiler, new_run_id, ENV_RUN_ID, ENV_PROFILE
+from config import base_dir as config_base_dir, load_config, section_hash, parse_overrides, overrides_env, \
+    ENV_CONFIG, ENV_SET
+
+# ============================================================
+# Pipeline runner
+# - Her adımın girdileri / çıktıları / kod dosyaları aşağıda tanımlı
+# - Girdi içerik hash'i + kod (parametreler script içinde) hash'i değişmediyse
+#   ve çıktılar yerindeyse adım atlanır
+# - Birbirinden bağımsız dallar (3A / 3B / 3D, 4A vs MAF dalı) paralel koşar
+#
+# Kullanım:
+#   python pipeline.py                 # tüm pipeline (güncel olanları atla)
+#   python pipeline.py step3d step4c   # sadece bu adımlar + gerekli upstream
+#   python pipeline.py --dry-run       # ne çalışacağını göster
+#   python pipeline.py --force step2   # step2'yi zorla (downstream hash ile takip eder)
+#   python pipeline.py --list          # adımlar ve bağımlılıklar
+#   python pipeline.py --in-process    # gen dalı (MAF -> 3D) tek process'te, bellekte zincirlenir
+#   python pipeline.py --in-process --no-write step3d   # sadece bellek, CSV yazma
+#   python pipeline.py --profile       # adım başına cProfile dump (outputs/run_logs/<run_id>/)
+#   python pipeline.py --no-plots      # grafik yok (LIHC_PLOTS=0); sadece grafik üreten adımlar atlanır
+#   python pipeline.py --set step4b.min_mut_patients=5 step4b   # parametre override (config.py)
+#
+# Adım parametreleri lihc.toml'dan (config.py) okunur; adımın config bölümü de kod
+# hash'ine girer -> parametre değişince adım (ve downstream'i) yeniden çalışır.
+# Başka bir adımın bölümünü okuyan adımlar onu "config" listesinde belirtir
+# (örn. step1, [patients] hypermutator_tmb'yi kullanır).
+# Her adım süre / CPU / peak RSS / satır / cache ölçümlerini outputs/run_logs/runs.csv'ye
+# yazar; bir pipeline koşusundaki adımlar aynı run_id'yi paylaşır (python instrumentation.py).
+# ============================================================
+
+BASE_DIR = config_base_dir()   # lihc.toml [paths] base_dir (veya --base-dir)
+STATE_FILE = os.path.join("outputs", ".pipeline_state.json")
+MAX_WORKERS = 4
+# Script'ler bu klasörden çalıştırılır; veri klasörü (base_dir) ayrı olabilir
+# (örn. synthetic_cohort.py ile üretilen kohortlar). BASE_DIR kullanan script'ler
+# LIHC_BASE_DIR ortam değişkeniyle base_dir'e yönlendirilir.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_BASE_DIR = "LIHC_BASE_DIR"
+ENV_PLOTS = "LIHC_PLOTS"       # figures.py: 0 -> grafik çizilmez
+
+# "figures": grafik çıktıları; --no-plots ile güncellik kontrolüne katılmaz
+# (bu çıktıları figures.py hash'le takip eder, veri değişmediyse tekrar çizmez)
+
+# In-process modda desteklenen adımlar (fonksiyon olarak import edilebilenler)
+IN_PROCESS_STEPS = ["merge_maf", "step1", "step2", "step3a", "step3b", "step3c", "step3d"]
+
+STEPS = [
+    {
+        "name": "merge_maf",
+        "script": "analysis.py",
+        "inputs": ["maf_files"],
+        "code": ["patient_table.py"],
+        "outputs": ["merged_LIHC_MAF.csv", "outputs/patient_burden.csv"],
+    },
+    {
+        "name": "step1",
+        "script": "step1_gene_feature_table.py",
+        "code": ["patient_table.py"],
+        "config": ["patients"],
+        "inputs": ["merged_LIHC_MAF.csv", "outputs/patient_burden.csv"],
+        "outputs": ["outputs/gene_feature_table.csv"],
+    },
+    {
+        "name": "step2",
+        "script": "step2_gene_priority_score.py",
+        "inputs": ["outputs/gene_feature_table.csv"],
+        "code": ["figures.py"],
+        "outputs": ["outputs/gene_priority_score.csv"],
+        "figures": ["outputs/top20_gene_priority_score.png",
+                    "outputs/gene_priority_score_distribution.png"],
+    },
+    {
+        "name": "step3a",
+        "script": "step3A_validate_and_report.py",
+        "code": ["ranking_eval.py", "figures.py"],
+        "inputs": ["outputs/gene_priority_score.csv", "references"],
+        "outputs": ["outputs/step3A_top_genes.csv",
+                    "outputs/step3A_known_driver_check.csv",
+                    "outputs/step3A_ranking_eval.csv",
+                    "outputs/step3A_report.txt"],
+        "figures": ["outputs/step3A_top20_score.png", "outputs/step3A_score_vs_patientfreq.png"],
+    },
+    {
+        "name": "step3b",
+        "script": "step3B_clustering.py",
+        "code": ["figures.py"],
+        "inputs": ["outputs/gene_priority_score.csv"],
+        "outputs": ["outputs/step3b_kmeans_genes.csv",
+                    "outputs/step3b_report.txt",
+                    "outputs/step3b_top20_with_clusters.csv"],
+        "figures": ["outputs/step3b_elbow_inertia.png", "outputs/step3b_silhouette_scores.png",
+                    "outputs/step3b_cluster_sizes.png", "outputs/step3b_pca_clusters.png"],
+    },
+    {
+        "name": "step3c",
+        "script": "step3c_cluster_interpretation.py",
+        "code": ["figures.py"],
+        "inputs": ["outputs/step3b_kmeans_genes.csv"],
+        "outputs": ["outputs/step3c_cluster_summary.csv",
+                    "outputs/step3c_cluster_labels.csv",
+                    "outputs/step3c_cluster_interpretation_report.txt"],
+        "figures": ["outputs/step3c_score_by_cluster.png"],
+    },
+    {
+        "name": "step3d",
+        "script": "step3d_ml_driver_like_score.py",
+        "code": ["ranking_eval.py", "cv_engine.py", "pu_learning.py", "model_registry.py", "figures.py"],
+        "inputs": ["outputs/gene_priority_score.csv", "references"],
+        "outputs": ["outputs/step3d_ml_gene_scores.csv",
+                    "outputs/step3d_report.txt",
+                    "outputs/step3d_ranking_eval.csv"],
+        "figures": ["outputs/step3d_roc_curve.png", "outputs/step3d_pr_curve.png"],
+    },
+    {
+        "name": "target_gene",
+        "script": "target_gene.py",
+        "code": ["maf_index.py", "patient_table.py"],
+        "inputs": ["merged_LIHC_MAF.csv"],
+        "outputs": ["outputs/target_gene_mutation_counts.csv"],
+    },
+    {
+        "name": "step4a",
+        "script": "step4A_prepare_clinical.py",
+        "code": ["clinical_io.py"],
+        "inputs": ["clinical.tsv", "follow_up.tsv"],
+        "outputs": ["outputs/clinical_prepared.csv", "outputs/followup_prepared.csv"],
+    },
+    {
+        "name": "signatures",
+        "script": "mutational_signatures.py",
+        "code": ["figures.py", "patient_table.py"],
+        "inputs": ["merged_LIHC_MAF.csv", "references"],
+        "outputs": ["outputs/sbs96_catalogue.csv", "outputs/signatures_rank_selection.csv",
+                    "outputs/signatures_denovo.csv", "outputs/signature_exposures.csv"],
+        "figures": ["outputs/signatures_denovo_profiles.png", "outputs/signatures_rank_selection.png"],
+    },
+    {
+        "name": "patients",
+        "script": "patient_table.py",
+        "code": ["clinical_io.py"],
+        "inputs": ["merged_LIHC_MAF.csv", "outputs/clinical_prepared.csv", "outputs/followup_prepared.csv",
+                   "clinical.tsv", "outputs/signature_exposures.csv", "outputs/patient_burden.csv"],
+        "outputs": ["outputs/patient_table.csv", "outputs/patient_aliquots.csv"],
+    },
+    {
+        "name": "subtypes",
+        "script": "patient_subtypes.py",
+        "code": ["figures.py", "patient_table.py"],
+        "inputs": ["merged_LIHC_MAF.csv", "outputs/patient_table.csv", "outputs/patient_aliquots.csv"],
+        "outputs": ["outputs/patient_subtypes.csv", "outputs/subtype_rank_selection.csv",
+                    "outputs/subtype_gene_profile.csv"],
+        "figures": ["outputs/subtype_rank_selection.png"],
+    },
+    {
+        "name": "step4b",
+        "script": "step4B_survival_by_gene.py",
+        "code": ["figures.py", "work_queue.py", "patient_table.py", "km_engine.py"],
+        "inputs": ["outputs/patient_table.csv", "outputs/patient_aliquots.csv",
+                   "merged_LIHC_MAF.csv", "outputs/gene_priority_score.csv", "outputs/patient_subtypes.csv"],
+        "outputs": ["outputs/step4b_os_gene_results.csv", "outputs/step4b_dfs_gene_results.csv",
+                    "outputs/step4b_subtype_results.csv"],
+        "figures": ["outputs/step4b_plots_os", "outputs/step4b_plots_dfs", "outputs/step4b_subtype_KM_OS.png",
+                    "outputs/step4b_subtype_KM_DFS.png"],
+    },
+    {
+        "name": "subgroups",
+        "script": "subgroup_analysis.py",
+        "code": ["step1_gene_feature_table.py", "step2_gene_priority_score.py", "step4B_survival_by_gene.py",
+                 "km_engine.py", "patient_table.py", "figures.py"],
+        "config": ["step1", "patients", "step2", "step4b"],
+        "inputs": ["outputs/patient_table.csv", "outputs/patient_aliquots.csv", "merged_LIHC_MAF.csv",
+                   "outputs/gene_priority_score.csv", "outputs/patient_burden.csv"],
+        "outputs": ["outputs/subgroup_gene_features.csv", "outputs/subgroup_survival.csv",
+                    "outputs/subgroup_interaction.csv"],
+        "figures": ["outputs/subgroup_top_interactions.png"],
+    },
+    {
+        "name": "coxnet",
+        "script": "penalized_cox.py",
+        "code": ["patient_subtypes.py", "subgroup_analysis.py", "patient_table.py", "figures.py"],
+        "inputs": ["merged_LIHC_MAF.csv", "outputs/patient_table.csv", "outputs/patient_aliquots.csv"],
+        "outputs": ["outputs/coxnet_genes.csv", "outputs/coxnet_cv.csv"],
+        "figures": ["outputs/coxnet_cv_OS.png", "outputs/coxnet_cv_DFS.png"],
+    },
+    {
+        "name": "step4c",
+        "script": "step4c_big_picture_plots.py",
+        "code": ["figures.py"],
+        "inputs": ["outputs/step4b_os_gene_results.csv", "outputs/step4b_dfs_gene_results.csv"],
+        "outputs": [],
+        "figures": ["outputs/step4c_big_picture"],
+    },
+]
+
+
+# ------------------------------------------------------------
+# Hash yardımcıları
+# - Büyük dosyalar (merged MAF) her seferinde yeniden okunmasın diye
+#   (boyut, mtime) -> hash önbelleği state dosyasında tutulur
+# ------------------------------------------------------------
+def _file_sha1(path, bufsize=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(bufsize)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+class Hasher:
+    def __init__(self, base_dir, cache):
+        self.base_dir = base_dir
+        self.cache = cache      # {abs_path: [size, mtime_ns, sha1]}
+
+    def file(self, path):
+        st = os.stat(path)
+        hit = self.cache.get(path)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        digest = _file_sha1(path)
+        self.cache[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def path(self, rel):
+        """Dosya veya klasör hash'i; yoksa None."""
+        p = os.path.join(self.base_dir, rel)
+        if os.path.isfile(p):
+            return self.file(p)
+        if os.path.isdir(p):
+            h = hashlib.sha1()
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                for fn in sorted(files):
+                    fp = os.path.join(root, fn)
+                    h.update(os.path.relpath(fp, p).replace(os.sep, "/").encode())
+                    h.update(self.file(fp).encode())
+            return h.hexdigest()
+        return None
+
+
+def step_code_files(step):
+    return [step["script"]] + list(step.get("code", []))
+
+
+def step_outputs(step, plots=True):
+    """Güncellik kontrolüne giren çıktılar (plots=False -> grafikler hariç)."""
+    return list(step["outputs"]) + (list(step.get("figures", [])) if plots else [])
+
+
+def build_graph(steps):
+    """Çıktı -> üretici adım eşlemesinden adım bağımlılıklarını çıkar."""
+    producer = {}
+    for st in steps:
+        for o in st["outputs"]:
+            producer[o] = st["name"]
+    deps = {}
+    for st in steps:
+        deps[st["name"]] = sorted({producer[i] for i in st["inputs"] if i in producer and producer[i] != st["name"]})
+    return deps
+
+
+def select_steps(steps, targets):
+    """Hedef adımlar + upstream'leri (hedef yoksa hepsi)."""
+    if not targets:
+        return [st["name"] for st in steps]
+    names = {st["name"] for st in steps}
+    unknown = [t for t in targets if t not in names]
+    if unknown:
+        raise ValueError(f"Bilinmeyen adım(lar): {unknown}. Mevcut: {sorted(names)}")
+    deps = build_graph(steps)
+    keep, stack = set(), list(targets)
+    while stack:
+        n = stack.pop()
+        if n not in keep:
+            keep.add(n)
+            stack.extend(deps[n])
+    return [st["name"] for st in steps if st["name"] in keep]
+
+
+def fingerprint(step, hasher, cfg=None):
+    """(girdi hash'leri, kod + config bölümü hash'i); eksik girdi varsa girdi hash'i None olur."""
+    inputs = {i: hasher.path(i) for i in step["inputs"]}
+    code = hashlib.sha1()
+    for c in step_code_files(step):
+        code.update(c.encode())
+        code.update((hasher.path(c) or "").encode())
+    sec = section_hash(step["name"], cfg or {})
+    if sec:
+        code.update(f"config:{sec}".encode())
+    for name in step.get("config", []):
+        sec = section_hash(name, cfg or {})
+        if sec:
+            code.update(f"config:{name}:{sec}".encode())
+    return inputs, code.hexdigest()
+
+
+def is_up_to_date(step, state, hasher, plots=True, cfg=None):
+    rec = state.get("steps", {}).get(step["name"])
+    if rec is None:
+        return False, "daha önce çalışmadı"
+    inputs, code = fingerprint(step, hasher, cfg)
+    if code != rec.get("code"):
+        return False, "kod/parametre değişti"
+    changed = [i for i, h in inputs.items() if h != rec.get("inputs", {}).get(i)]
+    if changed:
+        return False, f"girdi değişti: {changed}"
+    for o in step_outputs(step, plots):
+        h = hasher.path(o)
+        if h is None:
+            return False, f"çıktı yok: {o}"
+        if h != rec.get("outputs", {}).get(o):
+            return False, f"çıktı elle değişmiş: {o}"
+    return True, "güncel"
+
+
+def load_state(base_dir):
+    path = os.path.join(base_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"steps": {}, "hash_cache": {}}
+
+
+def save_state(base_dir, state):
+    path = os.path.join(base_dir, STATE_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+
+def run_script(step, base_dir, log_dir, run_id=None, profile=False, plots=True, env=None):
+    """env: ek ortam değişkenleri (örn. sweep koşusunun LIHC_SET'i)."""
+    env = {**os.environ, **(env or {})}
+    env.setdefault("MPLBACKEND", "Agg")    # figures.py kullanmayan script'ler de headless çalışsın
+    if not plots:
+        env[ENV_PLOTS] = "0"
+    env[ENV_BASE_DIR] = os.path.abspath(base_dir)
+    if run_id:
+        env[ENV_RUN_ID] = run_id
+    if profile:
+        env[ENV_PROFILE] = "1"
+    log_path = os.path.join(log_dir, f"{step['name']}.log")
+    t0 = time.time()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, step["script"])], cwd=base_dir, env=env,
+                              stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, time.time() - t0, log_path
+
+
+def run_pipeline(base_dir=BASE_DIR, targets=None, force=(), dry_run=False, max_workers=MAX_WORKERS, steps=STEPS,
+                 profile=False, plots=True, env=None):
+    """env: adım process'lerine eklenecek ortam değişkenleri (config: LIHC_CONFIG / LIHC_SET)."""
+    run_id = new_run_id()
+    cfg = load_config(environ={**os.environ, **(env or {})})
+    state = load_state(base_dir)
+    hasher = Hasher(base_dir, state.setdefault("hash_cache", {}))
+    by_name = {st["name"]: st for st in steps}
+    deps = build_graph(steps)
+    selected = select_steps(steps, targets)
+    force = set(force)
+
+    log_dir = os.path.join(base_dir, "outputs", "pipeline_logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    pending = list(selected)
+    done, failed = set(), set()
+    would_run = set()      # --dry-run: çalışacak adımlar (downstream'leri de çalışacak sayılır)
+    summary = []
+
+    def ready(n):
+        return all(d in done or d not in selected for d in deps[n])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while pending or running:
+            # upstream'i başarısız olanları at
+            for n in list(pending):
+                if any(d in failed for d in deps[n]):
+                    pending.remove(n)
+                    failed.add(n)
+                    summary.append((n, "atlandı (upstream hata)", 0.0))
+
+            for n in [n for n in pending if ready(n)]:
+                st = by_name[n]
+                if not plots and not st["outputs"]:
+                    pending.remove(n)
+                    done.add(n)
+                    summary.append((n, "atlandı (--no-plots)", 0.0))
+                    print(f"⏭  {n}: sadece grafik üretiyor, --no-plots")
+                    continue
+                if dry_run and any(d in would_run for d in deps[n]):
+                    # upstream çalışacak: diskteki (eski) girdiler hash'lenmez
+                    pending.remove(n)
+                    done.add(n)
+                    would_run.add(n)
+                    summary.append((n, "çalışacak (upstream)", 0.0))
+                    print(f"▶  {n}: çalışacak (upstream)")
+                    continue
+                ok, reason = (False, "--force") if n in force else is_up_to_date(st, state, hasher, plots, cfg)
+                if ok:
+                    pending.remove(n)
+                    done.add(n)
+                    summary.append((n, "güncel, atlandı", 0.0))
+                    print(f"⏭  {n}: güncel")
+                    continue
+                missing = [i for i in st["inputs"] if hasher.path(i) is None]
+                if missing and all(hasher.path(o) is not None for o in step_outputs(st, plots)):
+                    # Örn. merged MAF yok ama çıktılar repoda mevcut: onları kullan
+                    pending.remove(n)
+                    done.add(n)
+                    summary.append((n, f"girdi yok {missing}, mevcut çıktılar kullanıldı", 0.0))
+                    print(f"⚠  {n}: girdi yok {missing}, mevcut çıktılar kullanılıyor")
+                    continue
+                if missing:
+                    pending.remove(n)
+                    failed.add(n)
+                    summary.append((n, f"girdi yok: {missing}", 0.0))
+                    print(f"❌ {n}: girdi yok {missing}")
+                    continue
+                pending.remove(n)
+                if dry_run:
+                    done.add(n)
+                    would_run.add(n)
+                    summary.append((n, f"çalışacak ({reason})", 0.0))
+                    print(f"▶  {n}: çalışacak ({reason})")
+                    continue
+                print(f"▶  {n}: başlıyor ({reason})")
+                running[pool.submit(run_script, st, base_dir, log_dir, run_id, profile, plots, env)] = n
+
+            if not running:
+                if pending and not any(ready(n) for n in pending):
+                    break
+                continue
+
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                n = running.pop(fut)
+                st = by_name[n]
+                rc, secs, log_path = fut.result()
+                if rc != 0:
+                    failed.add(n)
+                    summary.append((n, f"HATA (rc={rc}, log: {log_path})", secs))
+                    print(f"❌ {n}: hata (rc={rc}) -> {log_path}")
+                    continue
+                inputs, code = fingerprint(st, hasher, cfg)
+                state["steps"][n] = {
+                    "inputs": inputs,
+                    "code": code,
+                    "outputs": {o: hasher.path(o) for o in step_outputs(st, plots)},
+                    "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "seconds": round(secs, 2),
+                }
+                save_state(base_dir, state)
+                done.add(n)
+                summary.append((n, "çalıştı", secs))
+                print(f"✅ {n}: {secs:.1f} sn")
+
+    if not dry_run:
+        save_state(base_dir, state)
+        print(f"\n⏱ Ölçümler: {os.path.join(base_dir, 'outputs', 'run_logs')} (run {run_id})")
+    return summary, failed
+
+
+# ------------------------------------------------------------
+# In-process mod: adımlar import edilip DataFrame'ler bellekte aktarılır
+# - Ara CSV'ler yalnızca "sink" olarak yazılır (write_outputs=False -> hiç yazılmaz)
+# - Hash/state kontrolü yok: seçilen adımlar her zaman yeniden hesaplanır
+# ------------------------------------------------------------
+def run_in_process(base_dir=BASE_DIR, targets=None, write_outputs=True, make_plots=False, steps=STEPS,
+                   profile=False):
+    """Gen dalını (merge_maf -> step3d) tek process'te çalıştır; {adım: sonuç} döndür."""
+    if base_dir not in sys.path:
+        sys.path.insert(0, base_dir)
+
+    selected = select_steps(steps, targets)
+    unsupported = [n for n in selected if n not in IN_PROCESS_STEPS]
+    if unsupported:
+        raise ValueError(f"In-process modda desteklenmeyen adım(lar): {unsupported}. "
+                         f"Bunlar için subprocess modunu kullan (--in-process olmadan).")
+
+    import pandas as pd
+    from ranking_eval import load_reference_lists
+    from figures import FigureBatch
+
+    out_dir = os.path.join(base_dir, "outputs")
+    os.makedirs(out_dir, exist_ok=True)
+    results, timings = {}, []
+    prof = StepProfiler("in_process", log_dir=os.path.join(out_dir, "run_logs"), profile=profile)
+    # Tüm adımların grafik spec'leri tek batch'te toplanır; çizim sonraki adımların
+    # analiziyle paralel arka planda yürür, en sonda beklenir
+    make_plots = make_plots and write_outputs
+    figures = FigureBatch("in_process", out_dir) if make_plots else None
+
+    def timed(name, fn):
+        with prof.phase(name) as ph:
+            val = fn()
+            df = val.get("df", val.get("df_sorted")) if isinstance(val, dict) else val
+            if hasattr(df, "shape"):
+                ph["rows_out"] = int(df.shape[0])
+        timings.append((name, prof.records[-1]["wall_s"]))
+        print(f"✅ {name}: {timings[-1][1]:.1f} sn")
+        return val
+
+    def need(name):
+        return name in selected
+
+    def upstream_csv(rel, name):
+        # Upstream adım seçilmediyse mevcut CSV'den oku
+        path = os.path.join(base_dir, rel)
+        print(f"⏭  {name}: seçilmedi, {rel} okunuyor")
+        return pd.read_csv(path)
+
+    if need("merge_maf"):
+        import analysis
+        merged_path = os.path.join(base_dir, analysis.MERGED_MAF_PATH)
+        maf_dir = os.path.join(base_dir, analysis.MAF_DIR)
+
+        def _merge():
+            if os.path.isdir(maf_dir):
+                maf = analysis.read_maf_files(maf_dir)
+                if write_outputs:
+                    maf.to_csv(merged_path, index=False)
+                    analysis.write_burden(maf, os.path.join(base_dir, analysis.BURDEN_PATH))
+                return maf
+            print(f"⚠  merge_maf: {maf_dir} yok, {merged_path} okunuyor")
+            return pd.read_csv(merged_path, low_memory=False)
+        results["merge_maf"] = timed("merge_maf", _merge)
+
+    if need("step1"):
+        import step1_gene_feature_table as s1
+        maf = results.get("merge_maf")
+        if maf is None:
+            maf = s1.read_merged_maf(os.path.join(base_dir, s1.MAF_PATH))
+        results["step1"] = timed("step1", lambda: s1.build_gene_feature_table(
+            maf, os.path.join(base_dir, s1.BURDEN_PATH)))
+        if write_outputs:
+            results["step1"].to_csv(os.path.join(base_dir, s1.OUTPUT_PATH), index=False)
+
+    if need("step2"):
+        import step2_gene_priority_score as s2
+        feat = results.get("step1")
+        if feat is None:
+            feat = s2.read_gene_feature_table(os.path.join(out_dir, "gene_feature_table.csv"))
+        results["step2"] = timed("step2", lambda: s2.compute_gene_priority_score(feat))
+        if write_outputs:
+            results["step2"].to_csv(os.path.join(out_dir, os.path.basename(s2.OUTPUT_PATH)), index=False)
+            if make_plots:
+                s2.plot_gene_priority_score(results["step2"], out_dir, figures)
+
+    def priority():
+        if "step2" in results:
+            return results["step2"]
+        return upstream_csv("outputs/gene_priority_score.csv", "step2")
+
+    references = None
+    if need("step3a") or need("step3d"):
+        refs_dir = os.path.join(base_dir, "references")
+        references = load_reference_lists(
+            [os.path.join(refs_dir, f) for f in sorted(os.listdir(refs_dir)) if f.endswith(".txt")])
+
+    if need("step3a"):
+        import step3A_validate_and_report as s3a
+        results["step3a"] = timed("step3a", lambda: s3a.validate_scores(
+            priority(), references, output_dir=out_dir if write_outputs else None, make_plots=make_plots,
+            figures=figures))
+
+    if need("step3b"):
+        import step3B_clustering as s3b
+        results["step3b"] = timed("step3b", lambda: s3b.cluster_genes(priority()))
+        if write_outputs:
+            s3b.write_clustering_outputs(results["step3b"], out_dir, make_plots=make_plots, figures=figures)
+
+    if need("step3c"):
+        import step3c_cluster_interpretation as s3c
+        clustered = results["step3b"]["df"] if "step3b" in results else \
+            upstream_csv("outputs/step3b_kmeans_genes.csv", "step3b")
+        results["step3c"] = timed("step3c", lambda: s3c.interpret_clusters(clustered))
+        if write_outputs:
+            s3c.write_interpretation_outputs(results["step3c"], out_dir, input_label="step3b (in-process)",
+                                             make_plots=make_plots, figures=figures)
+
+    if need("step3d"):
+        import step3d_ml_driver_like_score as s3d
+        registry_dir = os.path.join(base_dir, "models") if (write_outputs and s3d.SAVE_MODEL) else None
+        cache_dir = os.path.join(out_dir, "step3d_cv_cache") if s3d.CV_CACHE_DIR else None
+        results["step3d"] = timed("step3d", lambda: s3d.score_driver_likeness(
+            priority(), references, cv_cache_dir=cache_dir, registry_dir=registry_dir,
+            input_label="step2 (in-process)"))
+        if write_outputs:
+            s3d.write_driver_outputs(results["step3d"], out_dir, input_label="step2 (in-process)",
+                                     registry_dir=registry_dir, make_plots=make_plots, figures=figures)
+
+    if figures is not None:
+        with prof.phase("figures") as ph:
+            ph["extra"].update(figures.close())
+    prof.finish()
+    results["_timings"] = timings
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LIHC pipeline runner (hash tabanlı güncellik kontrolü)")
+    ap.add_argument("targets", nargs="*", help="Çalıştırılacak adımlar (boş -> hepsi)")
+    ap.add_argument("--base-dir", default=None, help="Veri klasörü (varsayılan: config [paths] base_dir)")
+    ap.add_argument("--force", action="append", default=[], metavar="STEP",
+                    help="Güncel olsa da çalıştırılacak adım (tekrarlanabilir)")
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("-j", "--jobs", type=int, default=MAX_WORKERS)
+    ap.add_argument("--list", action="store_true", help="Adımları ve bağımlılıkları listele")
+    ap.add_argument("--in-process", action="store_true",
+                    help="Gen dalını tek process'te, DataFrame'leri bellekte aktararak çalıştır")
+    ap.add_argument("--no-write", action="store_true", help="In-process modda CSV/rapor yazma")
+    ap.add_argument("--plots", action="store_true", help="In-process modda grafikleri de üret")
+    ap.add_argument("--no-plots", action="store_true",
+                    help="Grafik üretme (LIHC_PLOTS=0); sadece grafik üreten adımlar (step4c) atlanır")
+    ap.add_argument("--profile", action="store_true", help="Adım başına cProfile dump yaz")
+    ap.add_argument("--config", default=None, help=f"Config dosyası ({ENV_CONFIG}; varsayılan: lihc.toml)")
+    ap.add_argument("--set", action="append", default=[], metavar="BÖLÜM.ANAHTAR=DEĞER",
+                    help="Config override (tekrarlanabilir), örn. step4b.min_mut_patients=5")
+    args = ap.parse_args(argv)
+
+    # Adım process'leri (ve in-process import'lar) config'i ortam değişkenlerinden okur
+    if args.config:
+        os.environ[ENV_CONFIG] = os.path.abspath(args.config)
+    if args.set:
+        os.environ[ENV_SET] = overrides_env(parse_overrides(args.set))
+    load_config()   # hatalı config'te adımlar başlamadan dur
+    args.base_dir = args.base_dir or config_base_dir()
+
+    if args.list:
+        deps = build_graph(STEPS)
+        for st in STEPS:
+            print(f"{st['name']:12s} <- {', '.join(deps[st['name']]) or '-'}")
+        return
+
+    if args.in_process:
+        res = run_in_process(args.base_dir, args.targets or IN_PROCESS_STEPS,
+                             write_outputs=not args.no_write, make_plots=args.plots, profile=args.profile)
+        print("\n====================")
+        print("IN-PROCESS ÖZETİ")
+        print("====================")
+        for n, secs in res["_timings"]:
+            print(f"{n:12s} {secs:.1f} sn")
+        return
+
+    summary, failed = run_pipeline(args.base_dir, args.targets, force=args.force,
+                                   dry_run=args.dry_run, max_workers=args.jobs, profile=args.profile,
+                                   plots=not args.no_plots)
+    print("\n====================")
+    print("PIPELINE ÖZETİ")
+    print("====================")
+    for n, status, secs in summary:
+        print(f"{n:12s} {status}" + (f"  ({secs:.1f} sn)" if secs else ""))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import numpy as np
+
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.tree import DecisionTreeClassifier
+
+# ============================================================
+# Positive-Unlabeled (PU) bagging
+# - Listede olmayan genler "negatif" değil "etiketsiz" (unlabeled) kabul edilir
+# - Her base model: pozitifler + etiketsizlerden küçük rastgele bir alt örnek
+# - Her gen yalnızca kendisini eğitimde görmeyen modellerle (out-of-bag) skorlanır
+# - OOB skorlar ortalanır, sonra örnekleme oranı + Elkan-Noto ile kalibre edilir
+#
+# Pozitiflerin de OOB skoru olabilsin diye pozitifler POS_HOLDOUT_GROUPS
+# gruba bölünür; her bag bir grubu dışarıda bırakır (kalan pozitiflerin hepsi
+# eğitimde).
+# ============================================================
+
+POS_HOLDOUT_GROUPS = 5
+
+
+def default_base_estimator(seed=42):
+    return DecisionTreeClassifier(max_depth=6, min_samples_leaf=2, max_features="sqrt", random_state=seed)
+
+
+def make_bags(n_unlabeled, n_bags, bag_size, rng):
+    """(n_bags, bag_size) etiketsiz indeks matrisi; tek argpartition çağrısı (tekrarsız örnekleme)."""
+    bag_size = int(min(bag_size, n_unlabeled))
+    return rng.random((n_bags, n_unlabeled)).argpartition(bag_size - 1, axis=1)[:, :bag_size]
+
+
+def _predict_batched(model, X, batch_size):
+    out = np.empty(X.shape[0], dtype=float)
+    for i in range(0, X.shape[0], batch_size):
+        sl = slice(i, i + batch_size)
+        if hasattr(model, "predict_proba"):
+            out[sl] = model.predict_proba(X[sl])[:, 1]
+        else:
+            out[sl] = model.decision_function(X[sl])
+    return out
+
+
+def _fit_bag_chunk(base, X, pos_idx, unl_idx, bag_rows, pos_train_rows, seeds, batch_size):
+    """Bir grup bag'i fit et; genler için (OOB skor toplamı, OOB tahmin sayısı) döndür."""
+    n = X.shape[0]
+    sums = np.zeros(n, dtype=float)
+    counts = np.zeros(n, dtype=np.int64)
+    for bag, pos_tr, seed in zip(bag_rows, pos_train_rows, seeds):
+        unl = unl_idx[bag]
+        pos = pos_idx[pos_tr]
+        tr = np.concatenate([pos, unl])
+        yy = np.concatenate([np.ones(len(pos), dtype=int), np.zeros(len(unl), dtype=int)])
+
+        m = clone(base)
+        if "random_state" in m.get_params():
+            m.set_params(random_state=int(seed))
+        m.fit(X[tr], yy)
+
+        oob = np.ones(n, dtype=bool)
+        oob[tr] = False
+        idx = np.flatnonzero(oob)
+        sums[idx] += _predict_batched(m, X[idx], batch_size)
+        counts[idx] += 1
+    return sums, counts
+
+
+def fit_pu_bagging(X, y, base_estimator=None, n_bags=200, bag_ratio=1.0, n_jobs=-1,
+                   batch_size=4096, seed=42):
+    """
+    X, y        : özellik matrisi, y=1 pozitif (bilinen driver), y=0 etiketsiz
+    bag_ratio   : her bag'deki etiketsiz örnek sayısı = bag_ratio * (bag'deki pozitif sayısı)
+    Dönen dict:
+      "score"       : (n,) OOB skor ortalaması (dengeli bag ölçeğinde)
+      "probability" : (n,) kalibre edilmiş driver-benzerlik olasılığı
+      "oob_count"   : (n,) her genin kaç OOB tahmin aldığı
+      "c_hat"       : Elkan-Noto etiketlenme olasılığı tahmini
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y).astype(int)
+    if base_estimator is None:
+        base_estimator = default_base_estimator(seed)
+
+    rng = np.random.default_rng(seed)
+    pos_idx = np.flatnonzero(y == 1)
+    unl_idx = np.flatnonzero(y == 0)
+    n_pos, n_unl = len(pos_idx), len(unl_idx)
+    if n_pos < 2:
+        raise ValueError(f"PU bagging için en az 2 pozitif gerekli (bulunan: {n_pos}).")
+
+    # Pozitif hold-out grupları: bag b, (b % G) grubunu dışarıda bırakır
+    n_groups = max(1, min(POS_HOLDOUT_GROUPS, n_pos))
+    pos_group = rng.permutation(n_pos) % n_groups
+    pos_train_rows = [np.flatnonzero(pos_group != (b % n_groups)) if n_groups > 1 else np.arange(n_pos)
+                      for b in range(n_bags)]
+    n_pos_bag = int(np.median([len(r) for r in pos_train_rows]))
+
+    bag_size = max(1, int(round(bag_ratio * n_pos_bag)))
+    bags = make_bags(n_unl, n_bags, bag_size, rng)
+    bag_size = bags.shape[1]
+    seeds = rng.integers(0, 2**31 - 1, size=n_bags)
+
+    # Bag'leri worker sayısı kadar parçaya böl (iş başına overhead az olsun)
+    # negatif n_jobs joblib'deki gibi: -1 -> tüm çekirdekler, -2 -> biri hariç tümü ...
+    n_cpu = os.cpu_count() or 1
+    workers = n_cpu if n_jobs is None else max(1, n_cpu + 1 + n_jobs if n_jobs < 0 else n_jobs)
+    n_chunks = min(n_bags, workers * 4)
+    chunks = np.array_split(np.arange(n_bags), n_chunks)
+
+    out = Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(_fit_bag_chunk)(base_estimator, X, pos_idx, unl_idx,
+                                bags[ch], [pos_train_rows[b] for b in ch], seeds[ch], batch_size)
+        for ch in chunks if len(ch)
+    )
+
+    sums = np.sum([o[0] for o in out], axis=0)
+    counts = np.sum([o[1] for o in out], axis=0)
+    score = np.divide(sums, counts, out=np.full(len(y), np.nan), where=counts > 0)
+
+    # Kalibrasyon:
+    # 1) Dengeli örnekleme düzeltmesi: bag'deki pozitif/etiketsiz oranından gerçek orana (prior shift)
+    # 2) Elkan-Noto: p(driver|x) = p(etiketli|x) / c,  c = E[p(etiketli|x) | pozitif]
+    s = np.clip(score, 1e-6, 1 - 1e-6)
+    prior_factor = (n_pos / n_unl) / (n_pos_bag / bag_size)
+    odds = s / (1 - s) * prior_factor
+    p_labeled = odds / (1 + odds)
+    c_hat = float(np.nanmean(p_labeled[pos_idx]))
+    prob = np.clip(p_labeled / c_hat, 0, 1) if c_hat > 0 else p_labeled
+    prob = np.where(np.isnan(score), np.nan, prob)
+
+    return {
+        "score": score,
+        "probability": prob,
+        "oob_count": counts,
+        "c_hat": c_hat,
+        "n_bags": n_bags,
+        "bag_size": bag_size,
+    }
@@ -0,0 +1,227 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# Ranking evaluation engine (known-driver recovery)
+# - Herhangi sayıda skor kolonu x herhangi sayıda referans gen listesi
+# - Tüm sıralar tek seferde argsort ile hesaplanır (gen başına .index() yok)
+# - Çıktılar: recall@k eğrisi, AUROC, AUPRC, MRR, permütasyon p-value
+#
+# Kullanım (script olarak):
+#   python ranking_eval.py outputs/gene_priority_score.csv \
+#       --score gene_priority_score --ref references/lihc_known_drivers.txt
+# ============================================================
+
+DEFAULT_KS = (10, 20, 50, 100, 200, 500, 1000)
+DEFAULT_N_PERM = 1000
+PERM_CHUNK = 256
+
+
+def load_reference_list(path):
+    """Bir referans gen listesi oku: satır başına bir gen, '#' yorum satırı."""
+    genes = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            g = line.split("#", 1)[0].strip()
+            if g:
+                genes.append(g.split()[0].split(",")[0].split("\t")[0])
+    # sırayı koru, tekrarları at
+    return list(dict.fromkeys(genes))
+
+
+def load_reference_lists(paths):
+    """{liste_adı: [gen, ...]} döndür; liste adı = dosya adı (uzantısız)."""
+    refs = {}
+    for p in paths:
+        name = os.path.splitext(os.path.basename(p))[0]
+        refs[name] = load_reference_list(p)
+    return refs
+
+
+def rank_scores(scores):
+    """
+    scores: (n_genes, n_scores) matris (yüksek skor = iyi)
+    Dönen: 1-tabanlı ordinal sıralar (aynı şekil). NaN skorlar en sona düşer.
+    """
+    S = np.asarray(scores, dtype=float)
+    if S.ndim == 1:
+        S = S[:, None]
+    S = np.where(np.isnan(S), -np.inf, S)
+    n, m = S.shape
+    order = np.argsort(-S, axis=0, kind="stable")
+    ranks = np.empty((n, m), dtype=np.int64)
+    ranks[order, np.arange(m)[None, :]] = np.arange(1, n + 1)[:, None]
+    return ranks
+
+
+def _null_mean_ranks(n_genes, n_pos, n_perm, rng):
+    """Rastgele n_pos genlik setlerin ortalama sırası (null dağılım)."""
+    out = np.empty(n_perm, dtype=float)
+    done = 0
+    while done < n_perm:
+        b = min(PERM_CHUNK, n_perm - done)
+        # her satır için rastgele n_pos farklı pozisyon (argpartition ile)
+        r = rng.random((b, n_genes)).argpartition(n_pos - 1, axis=1)[:, :n_pos] + 1
+        out[done:done + b] = r.mean(axis=1)
+        done += b
+    return out
+
+
+def evaluate_rankings(df, score_cols, references, gene_col="Hugo_Symbol",
+                      ks=DEFAULT_KS, n_perm=DEFAULT_N_PERM, seed=42):
+    """
+    df         : gen tablosu (gene_col + skor kolonları)
+    score_cols : değerlendirilecek skor kolonları (yüksek = daha driver-benzeri)
+    references : {liste_adı: [gen, ...]}
+
+    Dönen dict:
+      "summary"      : skor x referans başına AUROC/AUPRC/MRR/perm_p + recall@k
+      "recall_curve" : long format (score, reference, k, recall)
+      "gene_ranks"   : referans genlerinin her skordaki sırası
+    """
+    if isinstance(score_cols, str):
+        score_cols = [score_cols]
+    missing = [c for c in [gene_col] + list(score_cols) if c not in df.columns]
+    if missing:
+        raise ValueError(f"Eksik kolonlar var: {missing}\nMevcut kolonlar: {list(df.columns)}")
+
+    genes = df[gene_col].astype(str).to_numpy()
+    S = np.column_stack([pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float) for c in score_cols])
+    n = len(genes)
+    ranks = rank_scores(S)                      # (n, m)
+    # AUROC için eşit skorlara ortalama sıra (sklearn roc_auc_score ile aynı sonuç)
+    from scipy.stats import rankdata   # scipy.stats ~1 sn import; sadece değerlendirme yapılınca yüklenir
+    avg_ranks = rankdata(-np.where(np.isnan(S), -np.inf, S), method="average", axis=0)
+    ks = np.asarray(sorted(set(int(k) for k in ks if 0 < k <= n)), dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    null_cache = {}
+
+    summary_rows = []
+    curve_rows = []
+    rank_rows = []
+
+    for ref_name, ref_genes in references.items():
+        ref_genes = list(dict.fromkeys(str(g) for g in ref_genes))
+        is_pos = np.isin(genes, ref_genes)
+        n_pos = int(is_pos.sum())
+        n_neg = n - n_pos
+
+        if n_pos == 0:
+            for c in score_cols:
+                summary_rows.append({"score": c, "reference": ref_name, "n_genes": n,
+                                     "n_ref": len(ref_genes), "n_found": 0})
+            continue
+
+        # (n_pos, m): pozitiflerin sıraları, her kolonda küçükten büyüğe
+        pos_ranks = np.sort(ranks[is_pos], axis=0)
+        i = np.arange(1, n_pos + 1)[:, None]
+
+        # AUROC (Mann-Whitney U, eşitliklerde ortalama sıra)
+        if n_neg > 0:
+            auroc = ((n + 1 - avg_ranks[is_pos]).sum(axis=0) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+        else:
+            auroc = np.full(len(score_cols), np.nan)
+        # AUPRC (average precision): pozitiflerin kendi sıralarındaki precision ortalaması
+        auprc = (i / pos_ranks).mean(axis=0)
+        # MRR
+        mrr = (1.0 / pos_ranks).mean(axis=0)
+        mean_rank = pos_ranks.mean(axis=0)
+        median_rank = np.median(pos_ranks, axis=0)
+
+        # recall@k: searchsorted ile (k, m)
+        recall = np.column_stack([
+            np.searchsorted(pos_ranks[:, j], ks, side="right") for j in range(pos_ranks.shape[1])
+        ]) / n_pos if len(ks) else np.empty((0, len(score_cols)))
+
+        # Permütasyon p-value: rastgele n_pos genlik set ortalama sırası <= gözlenen
+        # (ordinal sıralar her kolonda 1..n olduğundan null dağılım kolonlar arasında ortak)
+        if n_perm and n_perm > 0:
+            if n_pos not in null_cache:
+                null_cache[n_pos] = np.sort(_null_mean_ranks(n, n_pos, n_perm, rng))
+            null = null_cache[n_pos]
+            perm_p = (1 + np.searchsorted(null, mean_rank, side="right")) / (n_perm + 1)
+        else:
+            perm_p = np.full(len(score_cols), np.nan)
+
+        for j, c in enumerate(score_cols):
+            row = {
+                "score": c,
+                "reference": ref_name,
+                "n_genes": n,
+                "n_ref": len(ref_genes),
+                "n_found": n_pos,
+                "auroc": float(auroc[j]),
+                "auprc": float(auprc[j]),
+                "mrr": float(mrr[j]),
+                "mean_rank": float(mean_rank[j]),
+                "median_rank": float(median_rank[j]),
+                "perm_p": float(perm_p[j]),
+            }
+            for kk, k in enumerate(ks):
+                row[f"recall@{k}"] = float(recall[kk, j])
+            summary_rows.append(row)
+
+            curve_rows.append(pd.DataFrame({"score": c, "reference": ref_name, "k": ks, "recall": recall[:, j]}))
+
+        pos_idx = np.flatnonzero(is_pos)
+        for j, c in enumerate(score_cols):
+            rank_rows.append(pd.DataFrame({
+                "score": c,
+                "reference": ref_name,
+                gene_col: genes[pos_idx],
+                "rank": ranks[pos_idx, j],
+                "score_value": S[pos_idx, j],
+            }))
+
+    summary = pd.DataFrame(summary_rows)
+    recall_curve = pd.concat(curve_rows, ignore_index=True) if curve_rows else \
+        pd.DataFrame(columns=["score", "reference", "k", "recall"])
+    gene_ranks = pd.concat(rank_rows, ignore_index=True).sort_values(["score", "reference", "rank"]) \
+        .reset_index(drop=True) if rank_rows else \
+        pd.DataFrame(columns=["score", "reference", gene_col, "rank", "score_value"])
+
+    return {"summary": summary, "recall_curve": recall_curve, "gene_ranks": gene_ranks}
+
+
+def format_summary(summary, ks=(10, 50, 100)):
+    """Rapor dosyalarına yazmak için kısa metin tablo."""
+    cols = ["score", "reference", "n_found", "auroc", "auprc", "mrr", "median_rank", "perm_p"]
+    cols += [f"recall@{k}" for k in ks if f"recall@{k}" in summary.columns]
+    cols = [c for c in cols if c in summary.columns]
+    return summary[cols].to_string(index=False, float_format=lambda v: f"{v:.4f}")
+
+
+# ------------------------------------------------------------
+# Komut satırı: herhangi bir adımın skor dosyasını referanslara karşı ölç
+# ------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Gen sıralamalarını referans driver listelerine karşı değerlendir.")
+    ap.add_argument("input", help="Skor içeren gen tablosu (CSV)")
+    ap.add_argument("--score", nargs="+", required=True, help="Skor kolon(lar)ı")
+    ap.add_argument("--ref", nargs="+", required=True, help="Referans gen listesi dosya(lar)ı")
+    ap.add_argument("--gene-col", default="Hugo_Symbol")
+    ap.add_argument("--ks", nargs="+", type=int, default=list(DEFAULT_KS))
+    ap.add_argument("--n-perm", type=int, default=DEFAULT_N_PERM)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out-prefix", default=None, help="Örn: outputs/eval_step2 -> *_summary.csv, *_recall_curve.csv, *_gene_ranks.csv")
+    args = ap.parse_args(argv)
+
+    df = pd.read_csv(args.input)
+    refs = load_reference_lists(args.ref)
+    res = evaluate_rankings(df, args.score, refs, gene_col=args.gene_col,
+                            ks=args.ks, n_perm=args.n_perm, seed=args.seed)
+
+    print(format_summary(res["summary"], ks=args.ks))
+
+    if args.out_prefix:
+        for key, tab in res.items():
+            path = f"{args.out_prefix}_{key}.csv"
+            tab.to_csv(path, index=False)
+            print("✅ Kaydedildi:", path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+from synthetic_cohort import generate_cohort, N_PATIENTS, SEED
+from instrumentation import load_runs, new_run_id
+from pipeline import STEPS, run_script
+
+# ============================================================
+# Ölçekleme benchmark'ı (sentetik kohortlar üzerinde)
+# - Her ölçek için (1x = 377 hasta) synthetic_cohort.py ile kohort üretilir
+# - Seçilen adımlar kohort klasöründe ayrı process olarak (pipeline.run_script)
+#   sırayla çalışır; süre / CPU / peak RSS / satır sayıları adımların kendi
+#   run log'undan (instrumentation.py) okunur -> her adımın belleği ayrı ölçülür
+# - Memo cache kapalı (LIHC_MEMO=0): soğuk çalışma süreleri ölçülür
+# - Özet: adım başına ölçek üssü (log süre ~ b * log ölçek; b≈1 lineer, b>1 süper-lineer)
+#
+# Kullanım:
+#   python scaling_benchmark.py                          # 1x, 10x, 100x
+#   python scaling_benchmark.py --scales 1 10 --steps merge_maf step1 step4b
+#   python scaling_benchmark.py --keep                   # üretilen kohortları silme
+#
+# Not: 100x ≈ 37.7k hasta, ~4.5M mutasyon; merged MAF CSV'si ~8 GB disk ister.
+# ============================================================
+
+SCALES = [1, 10, 100]
+BENCH_STEPS = ["merge_maf", "step1", "step2", "step3b", "step3d", "step4a", "patients", "step4b"]
+WORK_DIR = os.path.join("outputs", "scaling_bench")
+OUT_CSV = os.path.join("outputs", "scaling_benchmark.csv")
+SUMMARY_CSV = os.path.join("outputs", "scaling_benchmark_summary.csv")
+
+
+def _scale_label(scale):
+    return f"{scale:g}x"
+
+
+def run_scale(scale, steps, work_dir, seed=SEED, n_jobs=-1, keep=False, memo=False, gen_kwargs=None):
+    """Tek ölçek: kohort üret, adımları çalıştır; adım başına bir satırlık tablo döndür."""
+    cohort_dir = os.path.join(work_dir, f"scale_{_scale_label(scale)}")
+    n_patients = max(int(round(N_PATIENTS * scale)), 1)
+    print(f"\n🧪 Ölçek {_scale_label(scale)}: {n_patients} hasta -> {cohort_dir}")
+
+    man = generate_cohort(cohort_dir, n_patients=n_patients, seed=seed, n_jobs=n_jobs, **(gen_kwargs or {}))
+    print(f"   kohort: {man['n_maf_files']} MAF, {man['n_mutations']} mutasyon ({man['seconds']} sn)")
+
+    out_dir = os.path.join(cohort_dir, "outputs")
+    shutil.rmtree(out_dir, ignore_errors=True)   # önceki koşunun cache / çıktıları ölçümü bozmasın
+    log_dir = os.path.join(out_dir, "pipeline_logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    run_id = f"bench-{_scale_label(scale)}-{new_run_id()}"
+    os.environ["LIHC_MEMO"] = "1" if memo else "0"
+    rows = [{"step": "generate", "rc": 0, "process_s": man["seconds"], "wall_s": man["seconds"]}]
+    failed = set()
+    by_name = {st["name"]: st for st in STEPS}
+    for name in steps:
+        st = by_name[name]
+        upstream = [s for s in failed if any(o in st["inputs"] for o in by_name[s]["outputs"])]
+        if upstream:
+            print(f"   ⏭  {name}: upstream hata ({upstream})")
+            rows.append({"step": name, "rc": None})
+            failed.add(name)
+            continue
+        rc, secs, log_path = run_script(st, cohort_dir, log_dir, run_id)
+        print(f"   {'✅' if rc == 0 else '❌'} {name}: {secs:.1f} sn" + ("" if rc == 0 else f" (log: {log_path})"))
+        rows.append({"step": name, "rc": rc, "process_s": round(secs, 3)})
+        if rc != 0:
+            failed.add(name)
+
+    # Adımların kendi ölçümleri (__total__ satırı + ilk fazın girdi satırı)
+    runs = load_runs(os.path.join(out_dir, "run_logs"))
+    runs = runs[runs["run_id"] == run_id]
+    tab = pd.DataFrame(rows)
+    if not runs.empty:
+        totals = runs[runs["phase"] == "__total__"].drop_duplicates("step", keep="last").set_index("step")
+        for c in ["wall_s", "cpu_s", "peak_rss_mb", "rows_in", "rows_out"]:
+            measured = tab["step"].map(totals[c])
+            tab[c] = measured if c not in tab.columns else measured.fillna(tab[c])
+        phases = runs[runs["phase"] != "__total__"]
+        tab["slowest_phase"] = tab["step"].map(
+            phases.sort_values("wall_s").drop_duplicates("step", keep="last").set_index("step")["phase"])
+
+    tab.insert(0, "scale", scale)
+    tab.insert(1, "n_patients", n_patients)
+    tab.insert(2, "n_maf_files", man["n_maf_files"])
+    tab.insert(3, "n_mutations", man["n_mutations"])
+
+    if not keep:
+        shutil.rmtree(cohort_dir, ignore_errors=True)
+    return tab
+
+
+def scaling_summary(res):
+    """Adım x ölçek süre/bellek tablosu + log-log eğim (ölçek üssü)."""
+    ok = res[(res["rc"] == 0) & res["wall_s"].notna()]
+    wall = ok.pivot_table(index="step", columns="scale", values="wall_s", aggfunc="last")
+    rss = ok.pivot_table(index="step", columns="scale", values="peak_rss_mb", aggfunc="last")
+
+    def slope(row):
+        row = row.dropna()
+        row = row[row > 0]
+        if len(row) < 2:
+            return np.nan
+        return float(np.polyfit(np.log(row.index.astype(float)), np.log(row.to_numpy(dtype=float)), 1)[0])
+
+    out = wall.add_prefix("wall_s_")
+    out = out.join(rss.add_prefix("peak_rss_mb_"))
+    out["time_exponent"] = wall.apply(slope, axis=1)
+    out["memory_exponent"] = rss.apply(slope, axis=1)
+    order = {n: i for i, n in enumerate(["generate"] + [st["name"] for st in STEPS])}
+    out = out.loc[sorted(out.index, key=lambda n: order.get(n, len(order)))]
+    return out.reset_index()
+
+
+def run_benchmark(scales=SCALES, steps=BENCH_STEPS, work_dir=WORK_DIR, seed=SEED, n_jobs=-1,
+                  keep=False, memo=False, out_csv=OUT_CSV, summary_csv=SUMMARY_CSV, gen_kwargs=None):
+    known = [st["name"] for st in STEPS]
+    unknown = [s for s in steps if s not in known]
+    if unknown:
+        raise ValueError(f"Bilinmeyen adım(lar): {unknown}. Mevcut: {known}")
+    steps = [n for n in known if n in steps]      # pipeline sırası
+
+    tabs = []
+    for scale in scales:
+        tabs.append(run_scale(scale, steps, work_dir, seed=seed, n_jobs=n_jobs, keep=keep, memo=memo,
+                              gen_kwargs=gen_kwargs))
+        # her ölçekten sonra yaz (100x yarıda kesilse de 1x / 10x sonuçları kalsın)
+        res = pd.concat(tabs, ignore_index=True)
+        os.makedirs(os.path.dirname(out_csv) or ".", exist_ok=True)
+        res.to_csv(out_csv, index=False)
+
+    summary = scaling_summary(res)
+    summary.to_csv(summary_csv, index=False)
+    with open(os.path.splitext(summary_csv)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump({"scales": list(scales), "steps": steps, "seed": seed, "memo": memo,
+                   "gen_kwargs": gen_kwargs or {}}, f, indent=1)
+    return res, summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sentetik kohortlarla adım bazlı ölçekleme benchmark'ı")
+    ap.add_argument("--scales", type=float, nargs="+", default=SCALES, help="Hasta sayısı çarpanları (1x = 377)")
+    ap.add_argument("--steps", nargs="+", default=BENCH_STEPS)
+    ap.add_argument("--work-dir", default=WORK_DIR)
+    ap.add_argument("--mut-median", type=float, default=None, help="Örnek başına medyan mutasyon")
+    ap.add_argument("--genes", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=SEED)
+    ap.add_argument("-j", "--jobs", type=int, default=-1, help="Kohort üretimi için paralel iş sayısı")
+    ap.add_argument("--keep", action="store_true", help="Üretilen kohort klasörlerini silme")
+    ap.add_argument("--memo", action="store_true", help="Memo cache açık ölç (varsayılan: kapalı)")
+    ap.add_argument("--out", default=OUT_CSV)
+    ap.add_argument("--summary", default=SUMMARY_CSV)
+    args = ap.parse_args(argv)
+
+    gen_kwargs = {}
+    if args.mut_median is not None:
+        gen_kwargs["mut_median"] = args.mut_median
+    if args.genes is not None:
+        gen_kwargs["n_genes"] = args.genes
+
+    res, summary = run_benchmark(args.scales, args.steps, args.work_dir, seed=args.seed, n_jobs=args.jobs,
+                                 keep=args.keep, memo=args.memo, out_csv=args.out, summary_csv=args.summary,
+                                 gen_kwargs=gen_kwargs)
+    print("\n====================")
+    print("ÖLÇEKLEME ÖZETİ")
+    print("====================")
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    print("\n(time_exponent ≈ 1: lineer, > 1: süper-lineer, ≈ 0: ölçekten bağımsız)")
+    print("✅ Kaydedildi:", args.out, "|", args.summary)
+
+
+if __name__ == "__main__":
+    main()
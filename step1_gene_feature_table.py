@@ -4,111 +4,206 @@
 # =========================================================
 
 import pandas as pd
+import numpy as np
 import os
 
+from memo_cache import MemoCache
+from instrumentation import StepProfiler
+from config import configure
+from patient_table import normalize_patient_id, load_burden
+
 # ---------------------------------------------------------
 # 1) Çalışma dizinini ayarla (gerekirse)
 # ---------------------------------------------------------
 # os.chdir("D:/ALSU/GDC_TCGA_LIHC")
 
-# ---------------------------------------------------------
-# 2) Birleştirilmiş MAF dosyasını oku
-# ---------------------------------------------------------
-maf_path = "merged_LIHC_MAF.csv"
-df = pd.read_csv(maf_path, low_memory=False)
+MAF_PATH = "merged_LIHC_MAF.csv"
+OUTPUT_PATH = "outputs/gene_feature_table.csv"
+MEMO_DIR = os.path.join("outputs", ".memo_cache")   # None -> memo cache kapalı
+RUN_LOG_DIR = os.path.join("outputs", "run_logs")
+BURDEN_PATH = os.path.join("outputs", "patient_burden.csv")   # merge_maf çıktısı; yoksa MAF'tan hesaplanır
 
-print("MAF dosyası yüklendi.")
-print("Toplam mutasyon sayısı (satır):", df.shape[0])
-print("Toplam sütun sayısı:", df.shape[1])
+# Hypermutator hastalar (TMB >= [patients] hypermutator_tmb) birkaç örnekle genleri rekürren
+# gösterebilir. n_patients / patient_frequency hesabında:
+#   "none"       -> her hasta 1 (varsayılan)
+#   "exclude"    -> hypermutator'lar sayılmaz (paydadan da çıkar)
+#   "downweight" -> hypermutator ağırlığı = eşik / TMB (örn. 5x eşik -> 0.2 hasta)
+HYPERMUTATOR_MODE = "none"
 
 # ---------------------------------------------------------
-# 3) Gerekli sütunları seç
+# 3) Gerekli sütunlar
 # ---------------------------------------------------------
-required_cols = [
+REQUIRED_COLS = [
     "Hugo_Symbol",
     "Tumor_Sample_Barcode",
     "Variant_Classification",
     "IMPACT",
     "hotspot"
 ]
-
-df = df[required_cols]
-
-print("\nKullanılan sütunlar:")
-print(df.columns.tolist())
-
-# ---------------------------------------------------------
-# 4) Toplam hasta sayısını hesapla
-# ---------------------------------------------------------
-total_patients = df["Tumor_Sample_Barcode"].nunique()
-print("\nToplam hasta sayısı:", total_patients)
-
-# ---------------------------------------------------------
-# 5) Gen bazlı özet metrikleri hesapla
-# ---------------------------------------------------------
-
-# Toplam mutasyon sayısı (gen başına)
-mutation_counts = df.groupby("Hugo_Symbol").size()
-
-# Kaç farklı hastada mutasyon var
-patient_counts = df.groupby("Hugo_Symbol")["Tumor_Sample_Barcode"].nunique()
-
-# HIGH impact mutasyon sayısı
-high_impact_counts = (
-    df[df["IMPACT"] == "HIGH"]
-    .groupby("Hugo_Symbol")
-    .size()
-)
-
-# Hotspot mutasyon sayısı
-hotspot_counts = (
-    df[df["hotspot"] == True]
-    .groupby("Hugo_Symbol")
-    .size()
-)
-
-# ---------------------------------------------------------
-# 6) Hepsini tek tabloda birleştir
-# ---------------------------------------------------------
-gene_features = pd.DataFrame({
-    "n_mutations": mutation_counts,
-    "n_patients": patient_counts,
-    "n_high_impact": high_impact_counts,
-    "hotspot_count": hotspot_counts
-})
-
-# NaN olanları 0 yap (örneğin hiç high-impact yoksa)
-gene_features = gene_features.fillna(0)
-
-# Oran hesapla
-gene_features["high_impact_ratio"] = (
-    gene_features["n_high_impact"] / gene_features["n_mutations"]
-)
-
-# Hasta frekansı (%)
-gene_features["patient_frequency"] = (
-    gene_features["n_patients"] / total_patients
-)
-
-# ---------------------------------------------------------
-# 7) Sonuçları sırala (en çok mutasyona uğrayan genler üstte)
-# ---------------------------------------------------------
-gene_features = gene_features.sort_values(
-    by="n_mutations",
-    ascending=False
-)
-
-print("\nGen özet tablosu oluşturuldu.")
-print("Toplam gen sayısı:", gene_features.shape[0])
-
-print("\nİlk 10 gen:")
-print(gene_features.head(10))
-
-# ---------------------------------------------------------
-# 8) Çıktıyı kaydet
-# ---------------------------------------------------------
-output_path = "outputs/gene_feature_table.csv"
-gene_features.to_csv(output_path)
-
-print("\nGen özet tablosu kaydedildi:")
-print(output_path)
+configure(globals(), "step1")
+
+
+def read_merged_maf(maf_path: str = MAF_PATH) -> pd.DataFrame:
+    """Birleştirilmiş MAF dosyasını oku (sadece gerekli sütunlar)."""
+    df = pd.read_csv(maf_path, usecols=REQUIRED_COLS, low_memory=False)
+
+    print("MAF dosyası yüklendi.")
+    print("Toplam mutasyon sayısı (satır):", df.shape[0])
+    return df
+
+
+def is_hotspot(values) -> np.ndarray:
+    """MAF hotspot kolonu ("Y" / "N"; bellekte bool da olabilir) -> bool dizi (step1 + subgroups aynı kural)."""
+    return pd.Series(values).astype("string").str.upper().isin(["Y", "TRUE"]).fillna(False).to_numpy(dtype=bool)
+
+
+def patient_weights(patient_ids: pd.Index, burden: pd.DataFrame, mode: str = HYPERMUTATOR_MODE):
+    """patient_id dizisi için ağırlık (HYPERMUTATOR_MODE'a göre); yük tablosunda olmayan hasta 1."""
+    from patient_table import HYPERMUTATOR_TMB
+
+    # burden: load_burden çıktısı (TMB / bayrak güncel [patients] ayarlarıyla hesaplanmış)
+    b = burden.set_index("patient_id")
+    tmb = pd.Series(patient_ids).map(b["tmb_per_mb"]).to_numpy(dtype=float)
+    hyper = pd.Series(patient_ids).map(b["hypermutator"]).fillna(False).to_numpy(dtype=bool)
+    if mode == "exclude":
+        return np.where(hyper, 0.0, 1.0)
+    if mode == "downweight":
+        return np.where(hyper, np.minimum(1.0, HYPERMUTATOR_TMB / np.maximum(tmb, 1e-12)), 1.0)
+    raise ValueError(f"Bilinmeyen HYPERMUTATOR_MODE: {mode} (none / exclude / downweight)")
+
+
+def build_gene_feature_table(df: pd.DataFrame, burden_path: str = BURDEN_PATH) -> pd.DataFrame:
+    """
+    Mutasyon tablosundan (MAF) gen bazlı özet tablo üret.
+    Dönen tablo: Hugo_Symbol kolonu + n_mutations, n_patients, n_high_impact,
+    hotspot_count, high_impact_ratio, patient_frequency (n_mutations'a göre sıralı).
+    HYPERMUTATOR_MODE "none" değilse n_patients / patient_frequency hasta ağırlıklıdır.
+    """
+    df = df[REQUIRED_COLS]
+
+    print("\nKullanılan sütunlar:")
+    print(df.columns.tolist())
+
+    # ---------------------------------------------------------
+    # 4) Toplam hasta sayısını hesapla
+    # Barkod aliquot'tur (TCGA-XX-XXXX-01A-...); aynı hastanın birden fazla aliquot'u
+    # tek hasta sayılır -> barkod, tamsayı hasta koduna çevrilir (patient_table.py ile aynı ID)
+    # ---------------------------------------------------------
+    patient_code, patient_ids = pd.factorize(normalize_patient_id(df["Tumor_Sample_Barcode"]))
+    df = df.assign(patient_code=patient_code)
+    total_patients = int(patient_code.max()) + 1 if len(df) else 0
+    print("\nToplam hasta sayısı:", total_patients,
+          f"({df['Tumor_Sample_Barcode'].nunique()} aliquot)")
+
+    weights = None
+    if HYPERMUTATOR_MODE != "none":
+        weights = patient_weights(patient_ids, load_burden(burden_path, df), HYPERMUTATOR_MODE)
+        n_hyper = int((weights < 1).sum())
+        total_patients = float(weights.sum())
+        print(f"Hypermutator ({HYPERMUTATOR_MODE}): {n_hyper} hasta, efektif hasta sayısı {total_patients:.1f}")
+
+    # ---------------------------------------------------------
+    # 5) Gen bazlı özet metrikleri hesapla
+    # ---------------------------------------------------------
+
+    # Toplam mutasyon sayısı (gen başına)
+    mutation_counts = df.groupby("Hugo_Symbol").size()
+
+    # Kaç farklı hastada mutasyon var (hypermutator modunda: hasta ağırlıkları toplamı)
+    if weights is None:
+        patient_counts = df.groupby("Hugo_Symbol")["patient_code"].nunique()
+    else:
+        pairs = df[["Hugo_Symbol", "patient_code"]].drop_duplicates()
+        patient_counts = pd.Series(weights[pairs["patient_code"].to_numpy()], index=pairs.index) \
+            .groupby(pairs["Hugo_Symbol"]).sum()
+
+    # HIGH impact mutasyon sayısı
+    high_impact_counts = (
+        df[df["IMPACT"] == "HIGH"]
+        .groupby("Hugo_Symbol")
+        .size()
+    )
+
+    # Hotspot mutasyon sayısı
+    hotspot_counts = (
+        df[is_hotspot(df["hotspot"])]
+        .groupby("Hugo_Symbol")
+        .size()
+    )
+
+    # ---------------------------------------------------------
+    # 6) Hepsini tek tabloda birleştir
+    # ---------------------------------------------------------
+    gene_features = pd.DataFrame({
+        "n_mutations": mutation_counts,
+        "n_patients": patient_counts,
+        "n_high_impact": high_impact_counts,
+        "hotspot_count": hotspot_counts
+    })
+
+    # NaN olanları 0 yap (örneğin hiç high-impact yoksa)
+    gene_features = gene_features.fillna(0)
+
+    # Oran hesapla
+    gene_features["high_impact_ratio"] = (
+        gene_features["n_high_impact"] / gene_features["n_mutations"]
+    )
+
+    # Hasta frekansı (%)
+    gene_features["patient_frequency"] = (
+        gene_features["n_patients"] / total_patients
+    )
+
+    # ---------------------------------------------------------
+    # 7) Sonuçları sırala (en çok mutasyona uğrayan genler üstte)
+    # ---------------------------------------------------------
+    gene_features = gene_features.sort_values(
+        by="n_mutations",
+        ascending=False
+    )
+
+    print("\nGen özet tablosu oluşturuldu.")
+    print("Toplam gen sayısı:", gene_features.shape[0])
+
+    print("\nİlk 10 gen:")
+    print(gene_features.head(10))
+
+    gene_features.index.name = "Hugo_Symbol"
+    return gene_features.reset_index()
+
+
+def main():
+    # ---------------------------------------------------------
+    # 2) Birleştirilmiş MAF dosyasını oku
+    # ---------------------------------------------------------
+    read = read_merged_maf
+    caches = []
+    if MEMO_DIR is not None:
+        # merged MAF içeriği aynıysa CSV parse edilmez, binary cache'ten yüklenir
+        memo = MemoCache(MEMO_DIR)
+        read = memo.memoize("step1.read_merged_maf", files=("maf_path",))(read_merged_maf)
+        caches.append(memo)
+    prof = StepProfiler("step1", log_dir=RUN_LOG_DIR, caches=caches)
+
+    with prof.phase("read merged MAF") as ph:
+        df = read(MAF_PATH)
+        ph["rows_out"] = len(df)
+
+    with prof.phase("build gene table", rows_in=len(df)) as ph:
+        gene_features = build_gene_feature_table(df)
+        ph["rows_out"] = len(gene_features)
+
+    # ---------------------------------------------------------
+    # 8) Çıktıyı kaydet
+    # ---------------------------------------------------------
+    with prof.phase("write", rows_in=len(gene_features)):
+        os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+        gene_features.to_csv(OUTPUT_PATH, index=False)
+    prof.finish()
+
+    print("\nGen özet tablosu kaydedildi:")
+    print(OUTPUT_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch, figure_batch
 
 # ============================================================
 # STEP 2: Gene priority score (mutasyon özelliklerinden skor)
@@ -9,54 +12,33 @@ import matplotlib.pyplot as plt
 # Çıktı: outputs/gene_priority_score.csv + grafikler
 # ============================================================
 
-BASE_DIR = r"D:\ALSU\GDC_TCGA_LIHC"   # <-- KENDİ YOLUN FARKLIYSA DEĞİŞTİR
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
 
 INPUT_PATH = os.path.join(BASE_DIR, "outputs", "gene_feature_table.csv")
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
 OUTPUT_PATH = os.path.join(OUTPUT_DIR, "gene_priority_score.csv")
+RUN_LOG_DIR = os.path.join(OUTPUT_DIR, "run_logs")
+PLOT_TOP20_NAME = "top20_gene_priority_score.png"
+PLOT_DIST_NAME = "gene_priority_score_distribution.png"
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-print("Okunan dosya:", INPUT_PATH)
-
-# ------------------------------------------------------------
-# 1) Gene feature tablosunu oku
-# ------------------------------------------------------------
-df = pd.read_csv(INPUT_PATH)
-
-print("\nGene feature table shape:", df.shape)
-print("Kolonlar:", list(df.columns))
-
-# ------------------------------------------------------------
-# 2) Zorunlu kolon kontrolü (hotspot_ratio dosyada yok, biz üreteceğiz)
 # ------------------------------------------------------------
-required_cols = ["Hugo_Symbol", "n_mutations", "n_patients", "hotspot_count", "high_impact_ratio", "patient_frequency"]
-missing = [c for c in required_cols if c not in df.columns]
-
-if missing:
-    raise ValueError(f"Eksik kolonlar var: {missing}\n"
-                     f"Mevcut kolonlar: {list(df.columns)}")
-
-# ------------------------------------------------------------
-# 3) Sayısal kolonları güvenli şekilde numeric'e çevir
+# Skor ağırlıkları
+#   0.50 * patient_frequency_norm
+# + 0.30 * high_impact_ratio_norm
+# + 0.20 * hotspot_ratio_norm
 # ------------------------------------------------------------
-numeric_cols = ["n_mutations", "n_patients", "hotspot_count", "high_impact_ratio", "patient_frequency"]
-for c in numeric_cols:
-    df[c] = pd.to_numeric(df[c], errors="coerce")
+W_PATIENT = 0.50
+W_IMPACT  = 0.30
+W_HOTSPOT = 0.20
 
-df = df.dropna(subset=["Hugo_Symbol"])  # gen adı boşsa at
-df = df.fillna(0)  # numeric NaN -> 0
+# Zorunlu kolonlar (hotspot_ratio dosyada yok, biz üreteceğiz)
+REQUIRED_COLS = ["Hugo_Symbol", "n_mutations", "n_patients", "hotspot_count", "high_impact_ratio", "patient_frequency"]
+NUMERIC_COLS = ["n_mutations", "n_patients", "hotspot_count", "high_impact_ratio", "patient_frequency"]
+configure(globals(), "step2")
 
-# ------------------------------------------------------------
-# 4) hotspot_ratio üret (bölme hatalarına karşı güvenli)
-# ------------------------------------------------------------
-# n_mutations 0 ise oranı 0 yap
-df["hotspot_ratio"] = np.where(df["n_mutations"] > 0,
-                               df["hotspot_count"] / df["n_mutations"],
-                               0)
 
 # ------------------------------------------------------------
-# 5) Normalize (0-1 arası) fonksiyonu
+# Normalize (0-1 arası) fonksiyonu
 # ------------------------------------------------------------
 def minmax(series: pd.Series) -> pd.Series:
     s = series.astype(float)
@@ -65,78 +47,140 @@ def minmax(series: pd.Series) -> pd.Series:
         return pd.Series(np.zeros(len(s)), index=s.index)
     return (s - mn) / (mx - mn)
 
-# ------------------------------------------------------------
-# 6) Skor metrikleri
-#   0.50 * patient_frequency_norm
-# + 0.30 * high_impact_ratio_norm
-# + 0.20 * hotspot_ratio_norm
-# ------------------------------------------------------------
-df["patient_frequency_norm"] = minmax(df["patient_frequency"])
-df["high_impact_ratio_norm"] = minmax(df["high_impact_ratio"])
-df["hotspot_ratio_norm"] = minmax(df["hotspot_ratio"])
-
-w_patient = 0.50
-w_impact  = 0.30
-w_hotspot = 0.20
-
-df["gene_priority_score"] = (
-    w_patient * df["patient_frequency_norm"] +
-    w_impact  * df["high_impact_ratio_norm"] +
-    w_hotspot * df["hotspot_ratio_norm"]
-)
-
-df["log_n_mutations"] = np.log1p(df["n_mutations"])
-
-# ------------------------------------------------------------
-# 7) Skora göre sırala ve kaydet
-# ------------------------------------------------------------
-df_sorted = df.sort_values("gene_priority_score", ascending=False).reset_index(drop=True)
-df_sorted.to_csv(OUTPUT_PATH, index=False)
-
-print("\n✅ Gene priority score oluşturuldu ve kaydedildi:")
-print("->", OUTPUT_PATH)
 
-print("\nToplam gen sayısı:", df_sorted.shape[0])
+def read_gene_feature_table(path: str = INPUT_PATH) -> pd.DataFrame:
+    """CSV'den oku ve sayısal kolonları güvenli şekilde numeric'e çevir."""
+    print("Okunan dosya:", path)
+    df = pd.read_csv(path)
+
+    print("\nGene feature table shape:", df.shape)
+    print("Kolonlar:", list(df.columns))
 
-print("\n📌 Top 20 gen (skora göre):")
-print(df_sorted[["Hugo_Symbol", "gene_priority_score", "patient_frequency", "high_impact_ratio", "hotspot_ratio",
-                 "n_mutations", "n_patients"]].head(20))
-
-# ------------------------------------------------------------
-# 8) Grafikler (EKRANA GÖSTER + outputs klasörüne KAYDET)
-# ------------------------------------------------------------
-
-# Grafik 1: Top 20 gen - barplot
-top20 = df_sorted.head(20).copy()
-
-plt.figure(figsize=(12, 6))
-plt.bar(top20["Hugo_Symbol"], top20["gene_priority_score"])
-plt.xticks(rotation=75, ha="right")
-plt.title("Top 20 Gene Priority Score (LIHC)")
-plt.xlabel("Gene")
-plt.ylabel("Gene Priority Score")
-plt.tight_layout()
-
-# Kaydet
-plot1_path = os.path.join(OUTPUT_DIR, "top20_gene_priority_score.png")
-plt.savefig(plot1_path, dpi=300)
-plt.show()
-
-print("📊 Grafik kaydedildi:", plot1_path)
-
-# ------------------------------------------------------------
+    for c in NUMERIC_COLS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df
 
-# Grafik 2: Skor dağılımı
-plt.figure(figsize=(10, 5))
-plt.hist(df_sorted["gene_priority_score"], bins=50)
-plt.title("Gene Priority Score Distribution")
-plt.xlabel("Score")
-plt.ylabel("Number of genes")
-plt.tight_layout()
 
-# Kaydet
-plot2_path = os.path.join(OUTPUT_DIR, "gene_priority_score_distribution.png")
-plt.savefig(plot2_path, dpi=300)
-plt.show()
+def compute_gene_priority_score(df: pd.DataFrame,
+                                w_patient: float = W_PATIENT,
+                                w_impact: float = W_IMPACT,
+                                w_hotspot: float = W_HOTSPOT) -> pd.DataFrame:
+    """
+    Gen feature tablosundan (STEP 1) gene_priority_score üret.
+    Dönen tablo skora göre azalan sıralı (index 0..n-1).
+    """
+    # ------------------------------------------------------------
+    # 2) Zorunlu kolon kontrolü
+    # ------------------------------------------------------------
+    missing = [c for c in REQUIRED_COLS if c not in df.columns]
+
+    if missing:
+        raise ValueError(f"Eksik kolonlar var: {missing}\n"
+                         f"Mevcut kolonlar: {list(df.columns)}")
+
+    df = df.dropna(subset=["Hugo_Symbol"])  # gen adı boşsa at
+    df = df.fillna(0)  # numeric NaN -> 0
+
+    # ------------------------------------------------------------
+    # 4) hotspot_ratio üret (bölme hatalarına karşı güvenli)
+    # ------------------------------------------------------------
+    # n_mutations 0 ise oranı 0 yap
+    df["hotspot_ratio"] = np.where(df["n_mutations"] > 0,
+                                   df["hotspot_count"] / df["n_mutations"],
+                                   0)
+
+    # ------------------------------------------------------------
+    # 6) Skor metrikleri
+    # ------------------------------------------------------------
+    df["patient_frequency_norm"] = minmax(df["patient_frequency"])
+    df["high_impact_ratio_norm"] = minmax(df["high_impact_ratio"])
+    df["hotspot_ratio_norm"] = minmax(df["hotspot_ratio"])
+
+    df["gene_priority_score"] = (
+        w_patient * df["patient_frequency_norm"] +
+        w_impact  * df["high_impact_ratio_norm"] +
+        w_hotspot * df["hotspot_ratio_norm"]
+    )
+
+    df["log_n_mutations"] = np.log1p(df["n_mutations"])
+
+    # ------------------------------------------------------------
+    # 7) Skora göre sırala
+    # ------------------------------------------------------------
+    df_sorted = df.sort_values("gene_priority_score", ascending=False).reset_index(drop=True)
+
+    print("\nToplam gen sayısı:", df_sorted.shape[0])
+
+    print("\n📌 Top 20 gen (skora göre):")
+    print(df_sorted[["Hugo_Symbol", "gene_priority_score", "patient_frequency", "high_impact_ratio", "hotspot_ratio",
+                     "n_mutations", "n_patients"]].head(20))
+    return df_sorted
+
+
+# ------------------------------------------------------------
+# Grafikler (figures.py ile arka planda, Agg backend ile çizilir)
+# ------------------------------------------------------------
+def render_top20(genes, scores):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(12, 6))
+    plt.bar(genes, scores)
+    plt.xticks(rotation=75, ha="right")
+    plt.title("Top 20 Gene Priority Score (LIHC)")
+    plt.xlabel("Gene")
+    plt.ylabel("Gene Priority Score")
+    plt.tight_layout()
+
+
+def render_score_distribution(scores):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 5))
+    plt.hist(scores, bins=50)
+    plt.title("Gene Priority Score Distribution")
+    plt.xlabel("Score")
+    plt.ylabel("Number of genes")
+    plt.tight_layout()
+
+
+def plot_gene_priority_score(df_sorted: pd.DataFrame, output_dir: str = OUTPUT_DIR, figures=None) -> None:
+    """Top 20 barplot + skor dağılımı (figures verilmezse burada çizilip beklenir)."""
+    top20 = df_sorted.head(20)
+    plot1_path = os.path.join(output_dir, PLOT_TOP20_NAME)
+    plot2_path = os.path.join(output_dir, PLOT_DIST_NAME)
+    with figure_batch(figures, "step2", output_dir) as fb:
+        fb.add(plot1_path, render_top20, top20["Hugo_Symbol"].to_numpy(), top20["gene_priority_score"].to_numpy(),
+               dpi=300)
+        fb.add(plot2_path, render_score_distribution, df_sorted["gene_priority_score"].to_numpy(), dpi=300)
+    print("📊 Grafikler:", plot1_path, "|", plot2_path)
+
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # ------------------------------------------------------------
+    # 1) Gene feature tablosunu oku
+    # ------------------------------------------------------------
+    prof = StepProfiler("step2", log_dir=RUN_LOG_DIR)
+    with prof.phase("read") as ph:
+        df = read_gene_feature_table(INPUT_PATH)
+        ph["rows_out"] = len(df)
+
+    with prof.phase("score", rows_in=len(df)) as ph:
+        df_sorted = compute_gene_priority_score(df)
+        df_sorted.to_csv(OUTPUT_PATH, index=False)
+        ph["rows_out"] = len(df_sorted)
+
+    print("\n✅ Gene priority score oluşturuldu ve kaydedildi:")
+    print("->", OUTPUT_PATH)
+
+    figures = FigureBatch("step2", OUTPUT_DIR)
+    plot_gene_priority_score(df_sorted, OUTPUT_DIR, figures)
+    with prof.phase("figures", rows_in=len(df_sorted)) as ph:
+        ph["extra"].update(figures.close())
+    prof.finish()
+
 
-print("📊 Grafik kaydedildi:", plot2_path)
+if __name__ == "__main__":
+    main()
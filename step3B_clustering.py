@@ -1,11 +1,11 @@
 import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+from memo_cache import MemoCache
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch, figure_batch
 
 # ============================================================
 # STEP 3B: Unsupervised ML (KMeans) + Elbow + Silhouette
@@ -13,74 +13,38 @@ from sklearn.metrics import silhouette_score
 # Çıktı : outputs/step3b_kmeans_genes.csv + grafikler + kısa rapor
 # ============================================================
 
-BASE_DIR = r"D:\ALSU\GDC_TCGA_LIHC"   # <-- kendi yolun
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
 INPUT_PATH = os.path.join(BASE_DIR, "outputs", "gene_priority_score.csv")
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-OUT_CSV = os.path.join(OUTPUT_DIR, "step3b_kmeans_genes.csv")
-PLOT_ELBOW = os.path.join(OUTPUT_DIR, "step3b_elbow_inertia.png")
-PLOT_SIL = os.path.join(OUTPUT_DIR, "step3b_silhouette_scores.png")
-REPORT_TXT = os.path.join(OUTPUT_DIR, "step3b_report.txt")
+OUT_CSV_NAME = "step3b_kmeans_genes.csv"
+PLOT_ELBOW_NAME = "step3b_elbow_inertia.png"
+PLOT_SIL_NAME = "step3b_silhouette_scores.png"
+REPORT_NAME = "step3b_report.txt"
+PLOT_CLUSTER_SIZES_NAME = "step3b_cluster_sizes.png"
+PLOT_PCA_NAME = "step3b_pca_clusters.png"
+TOP20_CSV_NAME = "step3b_top20_with_clusters.csv"
 
-print("Okunan dosya:", INPUT_PATH)
-df = pd.read_csv(INPUT_PATH)
-print("Shape:", df.shape)
-print("Kolonlar:", list(df.columns))
+K_MIN, K_MAX = 2, 12
+SEED = 42
+
+MEMO_DIR = os.path.join(OUTPUT_DIR, ".memo_cache")   # None -> memo cache kapalı
+RUN_LOG_DIR = os.path.join(OUTPUT_DIR, "run_logs")
 
 # ------------------------------------------------------------
-# 1) Cluster feature seti seçelim
-# (skorlar + oranlar; gen ismi hariç)
+# Cluster feature seti (skorlar + oranlar; gen ismi hariç)
+# Eğer hotspot_ratio varsa eklenir
 # ------------------------------------------------------------
-feature_cols = [
+BASE_FEATURE_COLS = [
     "n_mutations",
     "n_patients",
     "high_impact_ratio",
     "patient_frequency",
     "gene_priority_score"
 ]
+configure(globals(), "step3b")
 
-# Eğer hotspot_ratio varsa ekleyelim
-if "hotspot_ratio" in df.columns:
-    feature_cols.append("hotspot_ratio")
-
-# güvenlik
-missing = [c for c in feature_cols if c not in df.columns]
-if missing:
-    raise ValueError(f"Feature kolonları eksik: {missing}\nMevcut kolonlar: {list(df.columns)}")
-
-X = df[feature_cols].copy()
-
-# numeric'e zorlama
-for c in feature_cols:
-    X[c] = pd.to_numeric(X[c], errors="coerce")
-X = X.fillna(0)
-
-# ------------------------------------------------------------
-# 2) Ölçekleme (çok önemli!)
-# ------------------------------------------------------------
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# ------------------------------------------------------------
-# 3) Elbow (Inertia) + Silhouette hesapla
-# ------------------------------------------------------------
-k_min, k_max = 2, 12
-k_values = list(range(k_min, k_max + 1))
-
-inertias = []
-sil_scores = []
-
-for k in k_values:
-    km = KMeans(n_clusters=k, random_state=42, n_init=10)
-    labels = km.fit_predict(X_scaled)
-    inertias.append(km.inertia_)
-    sil_scores.append(silhouette_score(X_scaled, labels))
 
-# ------------------------------------------------------------
-# 4) Basit "dirsek/knee" bulma (çizgiye en uzak nokta)
-#   - inertia grafiğinde en iyi elbow tahmini
-# ------------------------------------------------------------
 def find_knee_point(x, y):
     """
     x: k değerleri
@@ -103,153 +67,261 @@ def find_knee_point(x, y):
     knee_index = int(np.argmax(dist))
     return int(x[knee_index])
 
-k_elbow = find_knee_point(k_values, inertias)
 
-# Elbow çevresinde silhouette ile ince ayar: (k_elbow-2 .. k_elbow+2) aralığında en iyi silhouette
-candidate_window = [k for k in k_values if (k_elbow - 2) <= k <= (k_elbow + 2)]
-best_k = max(candidate_window, key=lambda k: sil_scores[k_values.index(k)])
-
-print("\nElbow (knee) tahmini:", k_elbow)
-print("Elbow çevresinde en iyi silhouette veren k:", best_k)
+def cluster_genes(df: pd.DataFrame, k_min: int = K_MIN, k_max: int = K_MAX, seed: int = SEED) -> dict:
+    """
+    Gen tablosunu ölçekle, k aralığında elbow + silhouette hesapla, best_k ile final KMeans.
+    Dönen dict: df (cluster kolonlu), feature_cols, X_scaled, k_values, inertias,
+                sil_scores, k_elbow, best_k
+    """
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+
+    feature_cols = list(BASE_FEATURE_COLS)
+    if "hotspot_ratio" in df.columns:
+        feature_cols.append("hotspot_ratio")
+
+    # güvenlik
+    missing = [c for c in feature_cols if c not in df.columns]
+    if missing:
+        raise ValueError(f"Feature kolonları eksik: {missing}\nMevcut kolonlar: {list(df.columns)}")
+
+    X = df[feature_cols].copy()
+
+    # numeric'e zorlama
+    for c in feature_cols:
+        X[c] = pd.to_numeric(X[c], errors="coerce")
+    X = X.fillna(0)
+
+    # ------------------------------------------------------------
+    # Ölçekleme (çok önemli!)
+    # ------------------------------------------------------------
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # ------------------------------------------------------------
+    # Elbow (Inertia) + Silhouette hesapla
+    # ------------------------------------------------------------
+    k_values = list(range(k_min, k_max + 1))
+
+    inertias = []
+    sil_scores = []
+
+    for k in k_values:
+        km = KMeans(n_clusters=k, random_state=seed, n_init=10)
+        labels = km.fit_predict(X_scaled)
+        inertias.append(km.inertia_)
+        sil_scores.append(silhouette_score(X_scaled, labels))
+
+    k_elbow = find_knee_point(k_values, inertias)
+
+    # Elbow çevresinde silhouette ile ince ayar: (k_elbow-2 .. k_elbow+2) aralığında en iyi silhouette
+    candidate_window = [k for k in k_values if (k_elbow - 2) <= k <= (k_elbow + 2)]
+    best_k = max(candidate_window, key=lambda k: sil_scores[k_values.index(k)])
+
+    print("\nElbow (knee) tahmini:", k_elbow)
+    print("Elbow çevresinde en iyi silhouette veren k:", best_k)
+
+    # ------------------------------------------------------------
+    # Final KMeans (best_k ile)
+    # ------------------------------------------------------------
+    df = df.copy()
+    final_km = KMeans(n_clusters=best_k, random_state=seed, n_init=10)
+    df["cluster"] = final_km.fit_predict(X_scaled)
+
+    return {
+        "df": df,
+        "feature_cols": feature_cols,
+        "X_scaled": X_scaled,
+        "k_values": k_values,
+        "inertias": inertias,
+        "sil_scores": sil_scores,
+        "k_elbow": k_elbow,
+        "best_k": best_k,
+    }
 
-# ------------------------------------------------------------
-# 5) Grafikler (outputs'a kaydet)
-# ------------------------------------------------------------
-plt.figure(figsize=(8, 5))
-plt.plot(k_values, inertias, marker="o")
-plt.axvline(k_elbow, linestyle="--")
-plt.title("Elbow Method (Inertia / WCSS)")
-plt.xlabel("k")
-plt.ylabel("Inertia (WCSS)")
-plt.tight_layout()
-plt.savefig(PLOT_ELBOW, dpi=200)
-plt.show()
-
-plt.figure(figsize=(8, 5))
-plt.plot(k_values, sil_scores, marker="o")
-plt.axvline(best_k, linestyle="--")
-plt.title("Silhouette Scores by k")
-plt.xlabel("k")
-plt.ylabel("Silhouette Score")
-plt.tight_layout()
-plt.savefig(PLOT_SIL, dpi=200)
-plt.show()
-
-print("\n✅ Grafikler kaydedildi:")
-print(" -", PLOT_ELBOW)
-print(" -", PLOT_SIL)
 
 # ------------------------------------------------------------
-# 6) Final KMeans (best_k ile)
+# Grafikler (figures.py ile arka planda, Agg backend ile çizilir)
 # ------------------------------------------------------------
-final_km = KMeans(n_clusters=best_k, random_state=42, n_init=10)
-df["cluster"] = final_km.fit_predict(X_scaled)
-
-# cluster özet
-cluster_counts = df["cluster"].value_counts().sort_index()
-
-# cluster bazlı feature ortalamaları
-cluster_means = df.groupby("cluster")[feature_cols].mean()
-
-# kaydet
-df.to_csv(OUT_CSV, index=False)
-
-# rapor yaz
-with open(REPORT_TXT, "w", encoding="utf-8") as f:
-    f.write("STEP 3B - KMeans Clustering (Genes)\n")
-    f.write("=================================\n\n")
-    f.write(f"k range: {k_min}-{k_max}\n")
-    f.write(f"Elbow(knee) suggested k: {k_elbow}\n")
-    f.write(f"Final chosen k (elbow-window + best silhouette): {best_k}\n\n")
-
-    f.write("Silhouette scores:\n")
-    for k, s in zip(k_values, sil_scores):
-        f.write(f"- k={k:2d}  silhouette={s:.4f}\n")
-
-    f.write("\nInertias:\n")
-    for k, inn in zip(k_values, inertias):
-        f.write(f"- k={k:2d}  inertia={inn:.2f}\n")
-
-    f.write("\nCluster counts:\n")
-    for c, cnt in cluster_counts.items():
-        f.write(f"- cluster {c}: {cnt} genes\n")
-
-    f.write("\nCluster means (feature averages):\n")
-    f.write(cluster_means.to_string())
-    f.write("\n")
-
-print("\n✅ STEP 3B tamamlandı.")
-print("-> Cluster'lı çıktı:", OUT_CSV)
-print("-> Rapor:", REPORT_TXT)
-print("\nCluster counts:\n", cluster_counts)
-
-# ============================================================
-# 7) EK: Zengin özetler + ekstra grafikler (outputs'a kaydet)
-# ============================================================
-
-# Ek çıktı yolları
-PLOT_CLUSTER_SIZES = os.path.join(OUTPUT_DIR, "step3b_cluster_sizes.png")
-PLOT_PCA = os.path.join(OUTPUT_DIR, "step3b_pca_clusters.png")
-TOP20_CSV = os.path.join(OUTPUT_DIR, "step3b_top20_with_clusters.csv")
-
-# --- Top 20 gen + cluster bilgisi
-top20 = df.sort_values("gene_priority_score", ascending=False).head(20).copy()
-top20.to_csv(TOP20_CSV, index=False)
-
-print("\n📌 Top 20 gen + cluster kaydedildi:")
-print("->", TOP20_CSV)
-print(top20[["Hugo_Symbol", "gene_priority_score", "cluster"]].head(20))
-
-# --- Cluster boyutları grafiği
-cluster_counts = df["cluster"].value_counts().sort_index()
-
-plt.figure(figsize=(8, 5))
-plt.bar(cluster_counts.index.astype(str), cluster_counts.values)
-plt.title("Cluster Sizes (Number of Genes)")
-plt.xlabel("Cluster")
-plt.ylabel("Gene count")
-plt.tight_layout()
-plt.savefig(PLOT_CLUSTER_SIZES, dpi=200)
-plt.show()
-
-print("\n✅ Cluster size grafiği kaydedildi:")
-print("->", PLOT_CLUSTER_SIZES)
-
-# --- PCA ile 2D görselleştirme
-from sklearn.decomposition import PCA
-
-pca = PCA(n_components=2, random_state=42)
-X_2d = pca.fit_transform(X_scaled)
-
-plt.figure(figsize=(8, 6))
-plt.scatter(X_2d[:, 0], X_2d[:, 1], s=10, alpha=0.6, c=df["cluster"])
-plt.title("PCA (2D) - Genes colored by cluster")
-plt.xlabel("PC1")
-plt.ylabel("PC2")
-plt.tight_layout()
-plt.savefig(PLOT_PCA, dpi=200)
-plt.show()
-
-print("\n✅ PCA grafiği kaydedildi:")
-print("->", PLOT_PCA)
-
-# --- Cluster bazlı özet istatistikleri (mean + median)
-cluster_summary_mean = df.groupby("cluster")[feature_cols].mean()
-cluster_summary_median = df.groupby("cluster")[feature_cols].median()
-
-print("\nCluster means:\n", cluster_summary_mean)
-print("\nCluster medians:\n", cluster_summary_median)
-
-# --- Rapor dosyasına ekleme
-with open(REPORT_TXT, "a", encoding="utf-8") as f:
-    f.write("\n\nEXTRA OUTPUTS\n")
-    f.write("=============\n")
-    f.write(f"Top20 with clusters: {TOP20_CSV}\n")
-    f.write(f"Cluster sizes plot:  {PLOT_CLUSTER_SIZES}\n")
-    f.write(f"PCA plot:            {PLOT_PCA}\n\n")
-
-    f.write("Cluster summary (MEAN):\n")
-    f.write(cluster_summary_mean.to_string())
-    f.write("\n\nCluster summary (MEDIAN):\n")
-    f.write(cluster_summary_median.to_string())
-    f.write("\n")
+def render_k_curve(k_values, values, k_mark, title, ylabel):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 5))
+    plt.plot(k_values, values, marker="o")
+    plt.axvline(k_mark, linestyle="--")
+    plt.title(title)
+    plt.xlabel("k")
+    plt.ylabel(ylabel)
+    plt.tight_layout()
+
+
+def render_cluster_sizes(labels, counts):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 5))
+    plt.bar(labels, counts)
+    plt.title("Cluster Sizes (Number of Genes)")
+    plt.xlabel("Cluster")
+    plt.ylabel("Gene count")
+    plt.tight_layout()
+
+
+def render_pca(X_scaled, clusters):
+    import matplotlib.pyplot as plt
+    from sklearn.decomposition import PCA
+
+    # PCA ile 2D görselleştirme (worker'da hesaplanır)
+    X_2d = PCA(n_components=2, random_state=42).fit_transform(X_scaled)
+    plt.figure(figsize=(8, 6))
+    plt.scatter(X_2d[:, 0], X_2d[:, 1], s=10, alpha=0.6, c=clusters)
+    plt.title("PCA (2D) - Genes colored by cluster")
+    plt.xlabel("PC1")
+    plt.ylabel("PC2")
+    plt.tight_layout()
+
+
+def plot_clustering(res: dict, output_dir: str, figures=None):
+    """Elbow, silhouette, cluster boyutları ve PCA grafikleri."""
+    df = res["df"]
+    k_values = list(res["k_values"])
+    plot_elbow = os.path.join(output_dir, PLOT_ELBOW_NAME)
+    plot_sil = os.path.join(output_dir, PLOT_SIL_NAME)
+    plot_sizes = os.path.join(output_dir, PLOT_CLUSTER_SIZES_NAME)
+    plot_pca = os.path.join(output_dir, PLOT_PCA_NAME)
+    cluster_counts = df["cluster"].value_counts().sort_index()
+
+    with figure_batch(figures, "step3b", output_dir) as fb:
+        fb.add(plot_elbow, render_k_curve, k_values, list(res["inertias"]), res["k_elbow"],
+               "Elbow Method (Inertia / WCSS)", "Inertia (WCSS)")
+        fb.add(plot_sil, render_k_curve, k_values, list(res["sil_scores"]), res["best_k"],
+               "Silhouette Scores by k", "Silhouette Score")
+        fb.add(plot_sizes, render_cluster_sizes, cluster_counts.index.astype(str).to_numpy(),
+               cluster_counts.to_numpy())
+        fb.add(plot_pca, render_pca, res["X_scaled"], df["cluster"].to_numpy())
+
+    print("\n✅ Grafikler:")
+    for p in [plot_elbow, plot_sil, plot_sizes, plot_pca]:
+        print(" -", p)
+
+
+def write_clustering_outputs(res: dict, output_dir: str, make_plots: bool = True, figures=None):
+    """Cluster'lı gen tablosu, top20 csv, rapor (+ grafikler; figures verilirse o batch'e eklenir)."""
+    os.makedirs(output_dir, exist_ok=True)
+    df = res["df"]
+    feature_cols = res["feature_cols"]
+    k_values = res["k_values"]
+
+    out_csv = os.path.join(output_dir, OUT_CSV_NAME)
+    report_txt = os.path.join(output_dir, REPORT_NAME)
+    top20_csv = os.path.join(output_dir, TOP20_CSV_NAME)
+
+    if make_plots:
+        plot_clustering(res, output_dir, figures)
+
+    # cluster özet
+    cluster_counts = df["cluster"].value_counts().sort_index()
+
+    # cluster bazlı feature ortalamaları
+    cluster_means = df.groupby("cluster")[feature_cols].mean()
+
+    # kaydet
+    df.to_csv(out_csv, index=False)
+
+    # rapor yaz
+    with open(report_txt, "w", encoding="utf-8") as f:
+        f.write("STEP 3B - KMeans Clustering (Genes)\n")
+        f.write("=================================\n\n")
+        f.write(f"k range: {k_values[0]}-{k_values[-1]}\n")
+        f.write(f"Elbow(knee) suggested k: {res['k_elbow']}\n")
+        f.write(f"Final chosen k (elbow-window + best silhouette): {res['best_k']}\n\n")
+
+        f.write("Silhouette scores:\n")
+        for k, s in zip(k_values, res["sil_scores"]):
+            f.write(f"- k={k:2d}  silhouette={s:.4f}\n")
+
+        f.write("\nInertias:\n")
+        for k, inn in zip(k_values, res["inertias"]):
+            f.write(f"- k={k:2d}  inertia={inn:.2f}\n")
+
+        f.write("\nCluster counts:\n")
+        for c, cnt in cluster_counts.items():
+            f.write(f"- cluster {c}: {cnt} genes\n")
+
+        f.write("\nCluster means (feature averages):\n")
+        f.write(cluster_means.to_string())
+        f.write("\n")
+
+    print("\n✅ STEP 3B tamamlandı.")
+    print("-> Cluster'lı çıktı:", out_csv)
+    print("-> Rapor:", report_txt)
+    print("\nCluster counts:\n", cluster_counts)
+
+    # ============================================================
+    # EK: Zengin özetler (outputs'a kaydet)
+    # ============================================================
+
+    # --- Top 20 gen + cluster bilgisi
+    top20 = df.sort_values("gene_priority_score", ascending=False).head(20).copy()
+    top20.to_csv(top20_csv, index=False)
+
+    print("\n📌 Top 20 gen + cluster kaydedildi:")
+    print("->", top20_csv)
+    print(top20[["Hugo_Symbol", "gene_priority_score", "cluster"]].head(20))
+
+    # --- Cluster bazlı özet istatistikleri (mean + median)
+    cluster_summary_mean = df.groupby("cluster")[feature_cols].mean()
+    cluster_summary_median = df.groupby("cluster")[feature_cols].median()
+
+    print("\nCluster means:\n", cluster_summary_mean)
+    print("\nCluster medians:\n", cluster_summary_median)
+
+    # --- Rapor dosyasına ekleme
+    with open(report_txt, "a", encoding="utf-8") as f:
+        f.write("\n\nEXTRA OUTPUTS\n")
+        f.write("=============\n")
+        f.write(f"Top20 with clusters: {top20_csv}\n")
+        f.write(f"Cluster sizes plot:  {os.path.join(output_dir, PLOT_CLUSTER_SIZES_NAME)}\n")
+        f.write(f"PCA plot:            {os.path.join(output_dir, PLOT_PCA_NAME)}\n\n")
+
+        f.write("Cluster summary (MEAN):\n")
+        f.write(cluster_summary_mean.to_string())
+        f.write("\n\nCluster summary (MEDIAN):\n")
+        f.write(cluster_summary_median.to_string())
+        f.write("\n")
+
+
+def main():
+    cluster = cluster_genes
+    caches = []
+    if MEMO_DIR is not None:
+        # KMeans taraması (k aralığı x n_init) aynı gen tablosu + parametrelerle tekrar koşmaz
+        memo = MemoCache(MEMO_DIR)
+        cluster = memo.memoize("step3b.cluster_genes")(cluster_genes)
+        caches.append(memo)
+    prof = StepProfiler("step3b", log_dir=RUN_LOG_DIR, caches=caches)
+
+    with prof.phase("read") as ph:
+        print("Okunan dosya:", INPUT_PATH)
+        df = pd.read_csv(INPUT_PATH)
+        print("Shape:", df.shape)
+        print("Kolonlar:", list(df.columns))
+        ph["rows_out"] = len(df)
+
+    with prof.phase("kmeans scan + final fit", rows_in=len(df)) as ph:
+        res = cluster(df, K_MIN, K_MAX)
+        ph["rows_out"] = len(res["df"])
+        ph["extra"]["best_k"] = res["best_k"]
+
+    figures = FigureBatch("step3b", OUTPUT_DIR)
+    with prof.phase("outputs", rows_in=len(res["df"])):
+        write_clustering_outputs(res, OUTPUT_DIR, figures=figures)
+
+    with prof.phase("figures") as ph:
+        ph["extra"].update(figures.close())
+    prof.finish()
+
+
+if __name__ == "__main__":
+    main()
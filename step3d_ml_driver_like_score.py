@@ -1,14 +1,15 @@
 import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import roc_auc_score, roc_curve, classification_report, precision_recall_curve, average_precision_score
+from ranking_eval import load_reference_lists, evaluate_rankings, format_summary
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch, figure_batch
+
+# sklearn / matplotlib (ve sklearn'ü yükleyen cv_engine, pu_learning, model_registry)
+# kullanıldıkları fonksiyonlarda import edilir: modülü import etmek (lihc.py, pipeline
+# --in-process) ~2 sn'lik ağır import maliyeti getirmez.
 
 # ============================================================
 # STEP 3D: Weak-supervised ML -> "driver-like" score
@@ -17,220 +18,448 @@ from sklearn.metrics import roc_auc_score, roc_curve, classification_report, pre
 #         outputs/step3d_roc_curve.png
 #         outputs/step3d_pr_curve.png
 #         outputs/step3d_report.txt
+#         outputs/step3d_ranking_eval.csv
+#         outputs/step3d_cv_fold_metrics.csv
+#         outputs/step3d_cv_summary.csv
+#         outputs/step3d_model_benchmark.csv   (BENCHMARK_MODELS = True ise)
 # ============================================================
 
-BASE_DIR = r"D:\ALSU\GDC_TCGA_LIHC"   # gerekirse değiştir
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
 INPUT_PATH = os.path.join(OUTPUT_DIR, "gene_priority_score.csv")
-
-OUT_SCORES = os.path.join(OUTPUT_DIR, "step3d_ml_gene_scores.csv")
-OUT_ROC    = os.path.join(OUTPUT_DIR, "step3d_roc_curve.png")
-OUT_PR     = os.path.join(OUTPUT_DIR, "step3d_pr_curve.png")
-OUT_REPORT = os.path.join(OUTPUT_DIR, "step3d_report.txt")
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-print("Okunan dosya:", INPUT_PATH)
-df = pd.read_csv(INPUT_PATH)
-
-print("Shape:", df.shape)
-print("Kolonlar:", list(df.columns))
-
-# ------------------------------------------------------------
-# 1) Özellik kolonları (varsa hotspot_ratio kullan)
-# ------------------------------------------------------------
-base_features = ["patient_frequency", "high_impact_ratio", "n_mutations", "n_patients"]
-if "hotspot_ratio" in df.columns:
-    base_features.append("hotspot_ratio")
-
-# log transform (mutasyon sayısı gene-length bias etkisini yumuşatır)
-df["log_n_mutations"] = np.log1p(pd.to_numeric(df["n_mutations"], errors="coerce").fillna(0))
-features = ["patient_frequency", "high_impact_ratio", "log_n_mutations", "n_patients"]
-if "hotspot_ratio" in df.columns:
-    features.append("hotspot_ratio")
-
-# numeric'e çevir
-for c in features:
-    df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
-
-# ------------------------------------------------------------
-# 2) Weak label oluştur: mini driver list = 1, diğerleri = 0
-#    (İstersen listeyi büyütürüz)
-# ------------------------------------------------------------
-known_driver_genes = set([
-    "TP53", "CTNNB1", "AXIN1", "ARID1A", "ALB",
-    "ACVR2A", "RB1", "RPS6KA3", "BAP1", "APOB",
-    "CDKN2A", "KEAP1", "NFE2L2", "PIK3CA", "TERT"
-])
-
-df["weak_label_driver"] = df["Hugo_Symbol"].astype(str).isin(known_driver_genes).astype(int)
-
-pos = int(df["weak_label_driver"].sum())
-neg = int((df["weak_label_driver"] == 0).sum())
-print(f"Weak labels -> Positive(driver): {pos}, Negative: {neg}")
-
-# Çok az pozitif varsa öğrenme zorlaşır ama yine de çalışır.
-# ------------------------------------------------------------
-# 3) Train/Test split (stratify ile)
-# ------------------------------------------------------------
-X = df[features].values
-y = df["weak_label_driver"].values
-
-# Eğer pos çok azsa stratify hata verebilir; güvenli kontrol:
-stratify = y if (pos >= 5) else None
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.25, random_state=42, stratify=stratify
-)
-
-# ------------------------------------------------------------
-# 4) Modeller
-#    A) Logistic Regression (yorumlanabilir, hızlı)
-#    B) Random Forest (non-linear)
-# ------------------------------------------------------------
-logreg = Pipeline([
-    ("scaler", StandardScaler()),
-    ("clf", LogisticRegression(max_iter=2000, class_weight="balanced", random_state=42))
-])
-
-rf = RandomForestClassifier(
-    n_estimators=400,
-    random_state=42,
-    class_weight="balanced_subsample",
-    max_depth=None
-)
-
-models = {
-    "LogReg": logreg,
-    "RandomForest": rf
-}
-
-results = {}
-
-for name, model in models.items():
-    model.fit(X_train, y_train)
-
-    # probability
-    if hasattr(model, "predict_proba"):
-        prob_test = model.predict_proba(X_test)[:, 1]
+RUN_LOG_DIR = os.path.join(OUTPUT_DIR, "run_logs")
+
+OUT_SCORES_NAME = "step3d_ml_gene_scores.csv"
+OUT_ROC_NAME    = "step3d_roc_curve.png"
+OUT_PR_NAME     = "step3d_pr_curve.png"
+OUT_REPORT_NAME = "step3d_report.txt"
+OUT_RANK_EVAL_NAME = "step3d_ranking_eval.csv"
+
+# Weak label + değerlendirme için referans gen listeleri
+REFERENCE_PATHS = [
+    os.path.join(BASE_DIR, "references", "lihc_known_drivers.txt"),
+]
+KNOWN_DRIVER_REF = "lihc_known_drivers"
+
+# Repeated stratified CV (tek 75/25 split yerine)
+OUT_CV_FOLDS_NAME   = "step3d_cv_fold_metrics.csv"
+OUT_CV_SUMMARY_NAME = "step3d_cv_summary.csv"
+CV_CACHE_DIR   = os.path.join(OUTPUT_DIR, "step3d_cv_cache")   # None -> cache yok
+CV_N_SPLITS  = 5
+CV_N_REPEATS = 10     # 5 x 10 x 3 model fit; daha dar AUC aralığı için [step3d] cv_n_repeats = 50
+CV_N_JOBS    = -1      # tüm çekirdekler
+CV_SEED      = 42
+
+RF_N_ESTIMATORS = 400      # Random Forest ağaç sayısı
+
+# Histogram gradient boosting (binned features + early stopping)
+HGB_MAX_ITER      = 500
+HGB_LEARNING_RATE = 0.05
+HGB_MAX_BINS      = 255
+HGB_VALIDATION_FRACTION = 0.2   # early stopping için iç (stratified) validation fold
+HGB_N_ITER_NO_CHANGE    = 20
+
+# Fit/predict süre karşılaştırması (tüm veri üzerinde): her modeli BENCHMARK_N_REPEATS kez
+# ek olarak fit eder -> varsayılan kapalı; gerektiğinde:
+#   python lihc.py step3d --set step3d.benchmark_models=true
+OUT_BENCHMARK_NAME  = "step3d_model_benchmark.csv"
+BENCHMARK_MODELS    = False
+BENCHMARK_N_REPEATS = 3
+
+# Model modu:
+#   "supervised" -> listede olmayan genler negatif (LogReg / RF + repeated CV)
+#   "pu"         -> listede olmayan genler etiketsiz (PU bagging, OOB skor)
+MODEL_MODE = "supervised"
+PU_N_BAGS     = 200
+PU_BAG_RATIO  = 1.0     # bag başına etiketsiz örnek = oran x pozitif sayısı
+PU_N_JOBS     = -1
+PU_BATCH_SIZE = 4096
+
+# Model registry: seçilen model tüm veriyle fit edilip versiyonlu kaydedilir.
+# Yeni kohortları skorlamak için: python model_registry.py score <genes.csv> <out.csv> --registry models
+SAVE_MODEL   = True
+REGISTRY_DIR = os.path.join(BASE_DIR, "models")
+REGISTRY_NAME = "step3d"
+configure(globals(), "step3d")
+
+
+def build_models() -> dict:
+    """
+    A) Logistic Regression (yorumlanabilir, hızlı)
+    B) Random Forest (non-linear)
+    C) Histogram Gradient Boosting (feature'lar 255 bin'e ayrılır; büyük
+       gen tablolarında tam büyümüş ağaçlardan çok daha hızlı/az bellek)
+    Not: paralellik CV işleri seviyesinde; RF içinde n_jobs=1 (oversubscription yok)
+    """
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.pipeline import Pipeline
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+
+    logreg = Pipeline([
+        ("scaler", StandardScaler()),
+        ("clf", LogisticRegression(max_iter=2000, class_weight="balanced", random_state=42))
+    ])
+
+    rf = RandomForestClassifier(
+        n_estimators=RF_N_ESTIMATORS,
+        random_state=42,
+        class_weight="balanced_subsample",
+        max_depth=None,
+        n_jobs=1
+    )
+
+    hgb = HistGradientBoostingClassifier(
+        learning_rate=HGB_LEARNING_RATE,
+        max_iter=HGB_MAX_ITER,
+        max_bins=HGB_MAX_BINS,
+        early_stopping=True,
+        validation_fraction=HGB_VALIDATION_FRACTION,
+        n_iter_no_change=HGB_N_ITER_NO_CHANGE,
+        scoring="loss",
+        class_weight="balanced",
+        random_state=42
+    )
+
+    return {
+        "LogReg": logreg,
+        "RandomForest": rf,
+        "HistGradientBoosting": hgb
+    }
+
+
+def score_driver_likeness(df: pd.DataFrame, references: dict, mode: str = MODEL_MODE,
+                          cv_n_repeats: int = CV_N_REPEATS, cv_cache_dir: str = CV_CACHE_DIR,
+                          benchmark: bool = BENCHMARK_MODELS, registry_dir: str = None,
+                          input_label: str = INPUT_PATH) -> dict:
+    """
+    STEP 2 gen tablosundan weak-supervised (veya PU) driver-benzerlik skoru.
+    registry_dir verilirse (supervised modda) seçilen model registry'ye kaydedilir.
+    Dönen dict: df_sorted, features, best_name, results, prob_oof, y, cv, pu,
+                bench, rank_eval, model_version, n_pos, n_neg, mode
+    """
+    from sklearn.metrics import roc_auc_score, average_precision_score
+    from cv_engine import make_folds, run_repeated_cv, pick_best_model, benchmark_models
+    from pu_learning import fit_pu_bagging, default_base_estimator
+    from model_registry import fit_and_save
+
+    df = df.copy()
+
+    # ------------------------------------------------------------
+    # 1) Özellik kolonları (varsa hotspot_ratio kullan)
+    # ------------------------------------------------------------
+    # log transform (mutasyon sayısı gene-length bias etkisini yumuşatır)
+    df["log_n_mutations"] = np.log1p(pd.to_numeric(df["n_mutations"], errors="coerce").fillna(0))
+    features = ["patient_frequency", "high_impact_ratio", "log_n_mutations", "n_patients"]
+    if "hotspot_ratio" in df.columns:
+        features.append("hotspot_ratio")
+
+    # numeric'e çevir
+    for c in features:
+        df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+
+    # ------------------------------------------------------------
+    # 2) Weak label oluştur: mini driver list = 1, diğerleri = 0
+    #    (Liste references/lihc_known_drivers.txt içinden okunur)
+    # ------------------------------------------------------------
+    known_driver_genes = set(references[KNOWN_DRIVER_REF])
+
+    df["weak_label_driver"] = df["Hugo_Symbol"].astype(str).isin(known_driver_genes).astype(int)
+
+    pos = int(df["weak_label_driver"].sum())
+    neg = int((df["weak_label_driver"] == 0).sum())
+    print(f"Weak labels -> Positive(driver): {pos}, Negative: {neg}")
+
+    # Çok az pozitif varsa öğrenme zorlaşır ama yine de çalışır.
+    # ------------------------------------------------------------
+    # 3) Özellik matrisi + etiketler
+    # ------------------------------------------------------------
+    X = df[features].values
+    y = df["weak_label_driver"].values
+
+    cv = None
+    pu = None
+    bench = None
+    model_version = None
+
+    if mode == "pu":
+        # --------------------------------------------------------
+        # 4-PU) Positive-unlabeled bagging: her base model pozitifler + küçük
+        #       dengeli bir etiketsiz alt örnek görür; skorlar out-of-bag.
+        # --------------------------------------------------------
+        pu = fit_pu_bagging(X, y, base_estimator=default_base_estimator(CV_SEED),
+                            n_bags=PU_N_BAGS, bag_ratio=PU_BAG_RATIO, n_jobs=PU_N_JOBS,
+                            batch_size=PU_BATCH_SIZE, seed=CV_SEED)
+        best_name = "PU-Bagging"
+        prob_oof = pu["probability"]
+        results = {best_name: {"model": None,
+                               "auc": roc_auc_score(y, prob_oof),
+                               "ap": average_precision_score(y, prob_oof)}}
+        df["pu_score"] = pu["score"]
+        df["pu_oob_count"] = pu["oob_count"]
+        print(f"\nPU bagging: {pu['n_bags']} bag, bag başına {pu['bag_size']} etiketsiz gen, c_hat={pu['c_hat']:.4f}")
+        print("PU (positive vs unlabeled) AUC:", results[best_name]["auc"], "AP:", results[best_name]["ap"])
     else:
-        # fallback
-        prob_test = model.decision_function(X_test)
-
-    auc = roc_auc_score(y_test, prob_test) if len(np.unique(y_test)) > 1 else np.nan
-    ap  = average_precision_score(y_test, prob_test) if len(np.unique(y_test)) > 1 else np.nan
-
-    results[name] = {"model": model, "auc": auc, "ap": ap}
-
-# En iyi modeli seç (AUC yüksek olan)
-best_name = sorted(results.keys(), key=lambda k: (results[k]["auc"] if not np.isnan(results[k]["auc"]) else -1), reverse=True)[0]
-best_model = results[best_name]["model"]
-
-print("\nEn iyi model:", best_name, "AUC:", results[best_name]["auc"], "AP:", results[best_name]["ap"])
-
-# ------------------------------------------------------------
-# 5) Tüm genlere ML probability üret
-# ------------------------------------------------------------
-if hasattr(best_model, "predict_proba"):
-    df["ml_driver_probability"] = best_model.predict_proba(X)[:, 1]
-else:
-    # normalize decision score to 0-1
-    s = best_model.decision_function(X)
-    df["ml_driver_probability"] = (s - s.min()) / (s.max() - s.min() + 1e-9)
-
-# İstersen hibrit skor (eski score + ML)
-# 0.6 ML + 0.4 gene_priority_score
-if "gene_priority_score" in df.columns:
-    df["hybrid_score"] = 0.6 * df["ml_driver_probability"] + 0.4 * pd.to_numeric(df["gene_priority_score"], errors="coerce").fillna(0)
-else:
-    df["hybrid_score"] = df["ml_driver_probability"]
-
-# Sırala
-df_sorted = df.sort_values("ml_driver_probability", ascending=False).reset_index(drop=True)
-
-df_sorted.to_csv(OUT_SCORES, index=False)
-print("\n✅ ML skor dosyası kaydedildi:")
-print("->", OUT_SCORES)
-
-# ------------------------------------------------------------
-# 6) ROC + PR eğrileri (test set)
-# ------------------------------------------------------------
-# Test probability again
-if hasattr(best_model, "predict_proba"):
-    prob_test = best_model.predict_proba(X_test)[:, 1]
-else:
-    s = best_model.decision_function(X_test)
-    prob_test = (s - s.min()) / (s.max() - s.min() + 1e-9)
-
-# ROC
-if len(np.unique(y_test)) > 1:
-    fpr, tpr, _ = roc_curve(y_test, prob_test)
+        # ------------------------------------------------------------
+        # 3b) Repeated stratified CV fold'ları (önceden hesaplanır)
+        #    ~15 pozitif var; tek bir 75/25 split'te test setinde ~4 driver kalıyor
+        #    ve model seçimi gürültüye dönüyor. Bunun yerine 5-fold x N repeat.
+        # ------------------------------------------------------------
+        folds = make_folds(y, n_splits=CV_N_SPLITS, n_repeats=cv_n_repeats, seed=CV_SEED)
+        print(f"CV: {CV_N_SPLITS}-fold x {cv_n_repeats} repeat = {len(folds)} fold")
+
+        # ------------------------------------------------------------
+        # 4) Modeller
+        # ------------------------------------------------------------
+        models = build_models()
+
+        if benchmark:
+            bench = benchmark_models(models, X, y, n_repeats=BENCHMARK_N_REPEATS)
+            print("\nFit/predict süreleri (tüm veri):")
+            print(bench.to_string(index=False))
+
+        cv = run_repeated_cv(models, X, y, folds, n_jobs=CV_N_JOBS, cache_dir=cv_cache_dir)
+
+        print(f"\nCV tamamlandı (cache hit: {cv['cache_hits']}/{len(folds) * len(models)}, "
+              f"eski veriye ait {cv['cache_pruned']} girdi silindi)")
+        print(cv["summary"].to_string(index=False))
+
+        results = {}
+        for _, row in cv["summary"].iterrows():
+            results[row["model"]] = {"model": models[row["model"]], "auc": row["auc_mean"], "ap": row["ap_mean"]}
+
+        # En iyi model: repeat'ler üzerinden ortalama OOF AUC
+        best_name = pick_best_model(cv["summary"], metric="auc_mean")
+        best_model = results[best_name]["model"]
+        prob_oof = cv["oof"][best_name]
+
+        if registry_dir is not None:
+            best_row = cv["summary"][cv["summary"]["model"] == best_name].iloc[0]
+            model_version, best_model = fit_and_save(
+                registry_dir, best_model, features, X, y, name=REGISTRY_NAME,
+                metrics={k: float(v) for k, v in best_row.items() if k != "model"},
+                extra={"model_name": best_name, "input": input_label,
+                       "reference_lists": list(references.keys())},
+            )
+            print(f"\n✅ Model registry'ye kaydedildi: {REGISTRY_NAME}:{model_version} -> {registry_dir}")
+
+    print("\nEn iyi model:", best_name, "AUC:", results[best_name]["auc"], "AP:", results[best_name]["ap"])
+
+    # ------------------------------------------------------------
+    # 5) Tüm genlere ML probability: out-of-fold (CV: repeat ortalaması, PU: OOB)
+    #    Her gen, kendisini eğitimde görmeyen modellerle skorlanır.
+    # ------------------------------------------------------------
+    df["ml_driver_probability"] = prob_oof
+
+    # İstersen hibrit skor (eski score + ML)
+    # 0.6 ML + 0.4 gene_priority_score
+    if "gene_priority_score" in df.columns:
+        df["hybrid_score"] = 0.6 * df["ml_driver_probability"] + 0.4 * pd.to_numeric(df["gene_priority_score"], errors="coerce").fillna(0)
+    else:
+        df["hybrid_score"] = df["ml_driver_probability"]
+
+    # Sırala
+    df_sorted = df.sort_values("ml_driver_probability", ascending=False).reset_index(drop=True)
+
+    # known drivers top kaçta? (ranking_eval: tüm skorlar x tüm referanslar tek çağrıda)
+    eval_cols = ["ml_driver_probability", "hybrid_score"]
+    if "gene_priority_score" in df_sorted.columns:
+        eval_cols.append("gene_priority_score")
+    rank_eval = evaluate_rankings(df_sorted, eval_cols, references)
+
+    return {
+        "df_sorted": df_sorted,
+        "features": features,
+        "best_name": best_name,
+        "results": results,
+        "prob_oof": prob_oof,
+        "y": y,
+        "cv": cv,
+        "pu": pu,
+        "bench": bench,
+        "rank_eval": rank_eval,
+        "model_version": model_version,
+        "n_pos": pos,
+        "n_neg": neg,
+        "mode": mode,
+    }
+
+
+def render_roc(y, prob_oof, best_name):
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import roc_auc_score, roc_curve
+
+    fpr, tpr, _ = roc_curve(y, prob_oof)
     plt.figure(figsize=(7, 5))
     plt.plot(fpr, tpr)
     plt.plot([0, 1], [0, 1], linestyle="--")
-    plt.title(f"ROC Curve ({best_name})  AUC={results[best_name]['auc']:.3f}")
+    plt.title(f"ROC Curve ({best_name}, OOF)  AUC={roc_auc_score(y, prob_oof):.3f}")
     plt.xlabel("False Positive Rate")
     plt.ylabel("True Positive Rate")
     plt.tight_layout()
-    plt.savefig(OUT_ROC, dpi=200)
-    plt.show()
 
-    # PR
-    prec, rec, _ = precision_recall_curve(y_test, prob_test)
-    ap = average_precision_score(y_test, prob_test)
+
+def render_pr(y, prob_oof, best_name):
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import precision_recall_curve, average_precision_score
+
+    prec, rec, _ = precision_recall_curve(y, prob_oof)
+    ap = average_precision_score(y, prob_oof)
     plt.figure(figsize=(7, 5))
     plt.plot(rec, prec)
-    plt.title(f"Precision-Recall ({best_name})  AP={ap:.3f}")
+    plt.title(f"Precision-Recall ({best_name}, OOF)  AP={ap:.3f}")
     plt.xlabel("Recall")
     plt.ylabel("Precision")
     plt.tight_layout()
-    plt.savefig(OUT_PR, dpi=200)
-    plt.show()
-
-    print("\n✅ ROC ve PR grafikleri kaydedildi:")
-    print("->", OUT_ROC)
-    print("->", OUT_PR)
-else:
-    print("\n⚠️ Test set tek sınıf içeriyor, ROC/PR çizilemedi.")
-
-# ------------------------------------------------------------
-# 7) Mini rapor üret
-# ------------------------------------------------------------
-top20 = df_sorted[["Hugo_Symbol", "ml_driver_probability", "hybrid_score", "patient_frequency", "high_impact_ratio"] + (["hotspot_ratio"] if "hotspot_ratio" in df.columns else [])].head(20)
-
-# known drivers top kaçta?
-driver_ranks = []
-sym_list = df_sorted["Hugo_Symbol"].astype(str).tolist()
-for g in sorted(list(known_driver_genes)):
-    if g in sym_list:
-        driver_ranks.append((g, sym_list.index(g) + 1, float(df_sorted.loc[sym_list.index(g), "ml_driver_probability"])))
-
-with open(OUT_REPORT, "w", encoding="utf-8") as f:
-    f.write("STEP 3D REPORT - Weak-supervised ML driver-like scoring\n")
-    f.write("======================================================\n\n")
-    f.write(f"Input file: {INPUT_PATH}\n")
-    f.write(f"Best model: {best_name}\n")
-    f.write(f"AUC: {results[best_name]['auc']}\n")
-    f.write(f"AP : {results[best_name]['ap']}\n\n")
-    f.write(f"Weak labels -> Positive(driver): {pos}, Negative: {neg}\n")
-    f.write(f"Features used: {features}\n\n")
-
-    f.write("Top 20 genes by ML probability:\n")
-    f.write("--------------------------------\n")
-    f.write(top20.to_string(index=False))
-    f.write("\n\n")
-
-    f.write("Known driver mini-list ranks (gene, rank, prob):\n")
-    f.write("-----------------------------------------------\n")
-    for g, r, p in driver_ranks:
-        f.write(f"- {g:10s} rank={r:4d}  prob={p:.4f}\n")
-
-    f.write("\nNotes:\n")
-    f.write("- This is weak-supervised learning (not true ground truth).\n")
-    f.write("- Next improvement: use external curated driver lists (IntOGen, COSMIC Cancer Gene Census, OncoKB) as labels.\n")
-    f.write("- Or do pan-cancer training then test on LIHC.\n")
-
-print("\n✅ STEP 3D raporu kaydedildi:")
-print("->", OUT_REPORT)
-
-print("\nBİTTİ ✅ STEP 3D tamam.")
+
+
+def plot_roc_pr(y, prob_oof, best_name, output_dir, figures=None):
+    """ROC + PR eğrileri (OOF olasılıklar, tüm genler)."""
+    out_roc = os.path.join(output_dir, OUT_ROC_NAME)
+    out_pr = os.path.join(output_dir, OUT_PR_NAME)
+    if len(np.unique(y)) <= 1:
+        print("\n⚠️ Etiketler tek sınıf içeriyor, ROC/PR çizilemedi.")
+        return
+
+    y, prob_oof = np.asarray(y), np.asarray(prob_oof)
+    with figure_batch(figures, "step3d", output_dir) as fb:
+        fb.add(out_roc, render_roc, y, prob_oof, best_name)
+        fb.add(out_pr, render_pr, y, prob_oof, best_name)
+
+    print("\n✅ ROC ve PR grafikleri:")
+    print("->", out_roc)
+    print("->", out_pr)
+
+
+def write_driver_outputs(res: dict, output_dir: str, input_label: str = INPUT_PATH,
+                         registry_dir: str = REGISTRY_DIR, make_plots: bool = True, figures=None):
+    """Skor tablosu, CV/benchmark CSV'leri, ranking eval, ROC/PR (figures: FigureBatch) ve mini rapor."""
+    os.makedirs(output_dir, exist_ok=True)
+    df_sorted = res["df_sorted"]
+    best_name = res["best_name"]
+    results = res["results"]
+    cv, pu, bench = res["cv"], res["pu"], res["bench"]
+    rank_eval = res["rank_eval"]
+
+    out_scores = os.path.join(output_dir, OUT_SCORES_NAME)
+    out_rank_eval = os.path.join(output_dir, OUT_RANK_EVAL_NAME)
+    out_report = os.path.join(output_dir, OUT_REPORT_NAME)
+
+    if bench is not None:
+        bench.to_csv(os.path.join(output_dir, OUT_BENCHMARK_NAME), index=False)
+    if cv is not None:
+        cv["fold_metrics"].to_csv(os.path.join(output_dir, OUT_CV_FOLDS_NAME), index=False)
+        cv["summary"].to_csv(os.path.join(output_dir, OUT_CV_SUMMARY_NAME), index=False)
+
+    df_sorted.to_csv(out_scores, index=False)
+    print("\n✅ ML skor dosyası kaydedildi:")
+    print("->", out_scores)
+
+    # ------------------------------------------------------------
+    # 6) ROC + PR eğrileri (OOF olasılıklar, tüm genler)
+    # ------------------------------------------------------------
+    if make_plots:
+        plot_roc_pr(res["y"], res["prob_oof"], best_name, output_dir, figures)
+
+    # ------------------------------------------------------------
+    # 7) Mini rapor üret
+    # ------------------------------------------------------------
+    top20 = df_sorted[["Hugo_Symbol", "ml_driver_probability", "hybrid_score", "patient_frequency", "high_impact_ratio"] + (["hotspot_ratio"] if "hotspot_ratio" in df_sorted.columns else [])].head(20)
+
+    rank_eval["summary"].to_csv(out_rank_eval, index=False)
+    print("\n✅ Ranking değerlendirmesi kaydedildi:")
+    print("->", out_rank_eval)
+
+    ranks = rank_eval["gene_ranks"]
+    ranks = ranks[(ranks["score"] == "ml_driver_probability") & (ranks["reference"] == KNOWN_DRIVER_REF)]
+    driver_ranks = [
+        (row["Hugo_Symbol"], int(row["rank"]), float(row["score_value"]))
+        for _, row in ranks.sort_values("Hugo_Symbol").iterrows()
+    ]
+
+    with open(out_report, "w", encoding="utf-8") as f:
+        f.write("STEP 3D REPORT - Weak-supervised ML driver-like scoring\n")
+        f.write("======================================================\n\n")
+        f.write(f"Input file: {input_label}\n")
+        f.write(f"Best model: {best_name}\n")
+        f.write(f"Model mode: {res['mode']}\n")
+        if res["model_version"] is not None:
+            f.write(f"Registry model: {REGISTRY_NAME}:{res['model_version']} ({registry_dir})\n")
+        if cv is not None:
+            f.write(f"AUC (mean over CV repeats): {results[best_name]['auc']}\n")
+            f.write(f"AP  (mean over CV repeats): {results[best_name]['ap']}\n")
+            f.write(f"CV: {CV_N_SPLITS}-fold x {int(cv['summary']['n_repeats'].iloc[0])} repeats (ml_driver_probability = out-of-fold mean)\n\n")
+            f.write("CV metric distribution (per-repeat OOF AUC/AP):\n")
+            f.write(cv["summary"].to_string(index=False))
+            f.write("\n\n")
+            if bench is not None:
+                f.write("Fit / predict time on all genes (seconds):\n")
+                f.write(bench.to_string(index=False))
+                f.write("\n\n")
+        else:
+            f.write(f"AUC (positive vs unlabeled, OOB): {results[best_name]['auc']}\n")
+            f.write(f"AP  (positive vs unlabeled, OOB): {results[best_name]['ap']}\n")
+            f.write(f"PU bagging: {pu['n_bags']} bags, {pu['bag_size']} unlabeled genes per bag, c_hat={pu['c_hat']:.4f}\n")
+            f.write("ml_driver_probability = OOB mean, prior-shift + Elkan-Noto calibrated\n\n")
+        f.write(f"Weak labels -> Positive(driver): {res['n_pos']}, Negative: {res['n_neg']}\n")
+        f.write(f"Features used: {res['features']}\n\n")
+
+        f.write("Top 20 genes by ML probability:\n")
+        f.write("--------------------------------\n")
+        f.write(top20.to_string(index=False))
+        f.write("\n\n")
+
+        f.write("Known driver mini-list ranks (gene, rank, prob):\n")
+        f.write("-----------------------------------------------\n")
+        for g, r, p in driver_ranks:
+            f.write(f"- {g:10s} rank={r:4d}  prob={p:.4f}\n")
+
+        f.write("\nRanking evaluation vs reference lists:\n")
+        f.write("--------------------------------------\n")
+        f.write(format_summary(rank_eval["summary"]))
+        f.write("\n")
+
+        f.write("\nNotes:\n")
+        f.write("- This is weak-supervised learning (not true ground truth).\n")
+        f.write("- Next improvement: use external curated driver lists (IntOGen, COSMIC Cancer Gene Census, OncoKB) as labels.\n")
+        f.write("- Or do pan-cancer training then test on LIHC.\n")
+
+    print("\n✅ STEP 3D raporu kaydedildi:")
+    print("->", out_report)
+
+
+def main():
+    prof = StepProfiler("step3d", log_dir=RUN_LOG_DIR)
+    with prof.phase("read") as ph:
+        print("Okunan dosya:", INPUT_PATH)
+        df = pd.read_csv(INPUT_PATH)
+
+        print("Shape:", df.shape)
+        print("Kolonlar:", list(df.columns))
+
+        references = load_reference_lists(REFERENCE_PATHS)
+        ph["rows_out"] = len(df)
+
+    with prof.phase(f"fit ({MODEL_MODE})", rows_in=len(df)) as ph:
+        res = score_driver_likeness(df, references, mode=MODEL_MODE,
+                                    registry_dir=REGISTRY_DIR if SAVE_MODEL else None)
+        ph["rows_out"] = len(res["df_sorted"])
+        if res["cv"] is not None:
+            # CV fold cache'i (cv_engine) memo sayaçlarıyla aynı kolonlarda raporlanır
+            n_jobs = len(res["cv"]["fold_metrics"])
+            prof.add("cache_hits", res["cv"]["cache_hits"])
+            prof.add("cache_misses", n_jobs - res["cv"]["cache_hits"])
+
+    figures = FigureBatch("step3d", OUTPUT_DIR)
+    with prof.phase("outputs", rows_in=len(res["df_sorted"])):
+        write_driver_outputs(res, OUTPUT_DIR, figures=figures)
+
+    with prof.phase("figures") as ph:
+        ph["extra"].update(figures.close())
+    prof.finish()
+
+    print("\nBİTTİ ✅ STEP 3D tamam.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,50 @@
 import os
+import argparse
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-
-# lifelines (survival analysis)
-try:
-    from lifelines import KaplanMeierFitter, CoxPHFitter
-    from lifelines.statistics import logrank_test
-except ImportError:
-    raise ImportError(
-        "lifelines yüklü değil. Kurmak için terminal/Anaconda Prompt:\n"
-        "pip install lifelines"
-    )
+
+from memo_cache import MemoCache
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch
+from patient_table import load_patient_table, load_aliquots, barcode_to_patient_idx
+import km_engine
+from km_engine import km_compare, km_group_table, horizon_labels, DAYS_PER_YEAR
 
 # ============================================================
 # STEP 4B: Gene-based survival & recurrence analysis
 # - Mutasyon (gene mutated vs not mutated) -> OS, DFS farkı var mı?
+# - KM medyanları, sabit ufuklarda S(t) ve RMST farkı tüm genler için tek seferde
+#   (km_engine.py); log-rank / Cox gen başına lifelines ile
 # Inputs:
-#   outputs/clinical_prepared.csv
-#   outputs/followup_prepared.csv
+#   outputs/patient_table.csv    (patient_table.py: OS / DFS, patient_idx ekseni)
+#   outputs/patient_aliquots.csv (Tumor_Sample_Barcode -> patient_idx)
 #   merged_LIHC_MAF.csv  (veya merged MAF dosyan)
 # Optional:
 #   outputs/gene_priority_score.csv (gene seçimini top N ile sınırlamak için)
+#   outputs/patient_subtypes.csv    (patient_subtypes.py; alt tipler OS / DFS'ye karşı tek log-rank)
 # Outputs:
 #   outputs/step4b_os_gene_results.csv
 #   outputs/step4b_dfs_gene_results.csv
+#   outputs/step4b_subtype_results.csv, outputs/step4b_subtype_KM_{OS,DFS}.png (alt tipler varsa)
 #   outputs/step4b_plots_os/*.png
 #   outputs/step4b_plots_dfs/*.png
 # ============================================================
 
-BASE_DIR = r"D:\ALSU\GDC_TCGA_LIHC"
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
 OUT_DIR = os.path.join(BASE_DIR, "outputs")
-os.makedirs(OUT_DIR, exist_ok=True)
 
 # ---- Input paths
-CLIN_PATH = os.path.join(OUT_DIR, "clinical_prepared.csv")
-FU_PATH   = os.path.join(OUT_DIR, "followup_prepared.csv")
+PATIENT_TABLE_PATH = os.path.join(OUT_DIR, "patient_table.csv")
+ALIQUOT_PATH       = os.path.join(OUT_DIR, "patient_aliquots.csv")
 
 # merged MAF yolu (senin dosyana göre güncelle)
 MAF_PATH  = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
 
 # (opsiyonel) gen skor dosyası varsa top gen seçmek için
 SCORE_PATH = os.path.join(OUT_DIR, "gene_priority_score.csv")
+# (opsiyonel) hasta alt tipleri (patient_subtypes.py)
+SUBTYPE_PATH = os.path.join(OUT_DIR, "patient_subtypes.csv")
 
 # ---- Params (istersen değiştir)
 TOP_N_GENES = 500        # 14k genin hepsini yapmak ağır olabilir; önce 500 öneriyorum
@@ -49,81 +52,282 @@ MIN_MUT_PATIENTS = 10    # mutasyonlu grupta en az kaç hasta olsun
 MIN_WT_PATIENTS  = 10    # mutasyonsuz grupta en az kaç hasta olsun
 SAVE_TOP_PLOTS = 15      # en anlamlı kaç genin grafiğini kaydedelim (OS ve DFS ayrı)
 ALPHA = 0.05
+# Cox modeline eklenecek hasta kovaryatları (patient_table.csv kolonları); boş -> tek değişkenli Cox.
+# Örn. mutasyonel imza maruziyetleri (mutational_signatures.py): ["SBS22_frac", "SBS24_frac"]
+COX_COVARIATES = []
+# KM özetleri: bu ufuklarda (yıl) S(t) + RMST_TAU_YEARS'a kadar kısıtlı ortalama sağkalım.
+# Medyan çoğu DFS geninde inf (olay < %50); RMST farkı (gün) her zaman tanımlı etki ölçüsü.
+KM_HORIZONS_YEARS = [1, 3, 5]
+RMST_TAU_YEARS = 5.0
+
+# Memo cache: MAF -> gen/hasta setleri ve gen bazlı survival taramaları içerik hash'iyle
+# saklanır; sadece SAVE_TOP_PLOTS gibi çizim ayarları değişince tarama tekrar koşmaz.
+MEMO_DIR = os.path.join(OUT_DIR, ".memo_cache")   # None -> memo cache kapalı
+RUN_LOG_DIR = os.path.join(OUT_DIR, "run_logs")
 
 # ---- Output paths
 OS_RES_PATH  = os.path.join(OUT_DIR, "step4b_os_gene_results.csv")
 DFS_RES_PATH = os.path.join(OUT_DIR, "step4b_dfs_gene_results.csv")
+SUBTYPE_RES_PATH = os.path.join(OUT_DIR, "step4b_subtype_results.csv")
+PLOT_SUBTYPE_PATH = os.path.join(OUT_DIR, "step4b_subtype_KM_{}.png")   # {} -> OS / DFS
 
 PLOT_OS_DIR  = os.path.join(OUT_DIR, "step4b_plots_os")
 PLOT_DFS_DIR = os.path.join(OUT_DIR, "step4b_plots_dfs")
-os.makedirs(PLOT_OS_DIR, exist_ok=True)
-os.makedirs(PLOT_DFS_DIR, exist_ok=True)
 
-print("📥 Dosyalar okunuyor...")
-clin = pd.read_csv(CLIN_PATH)
-fu   = pd.read_csv(FU_PATH)
-maf  = pd.read_csv(MAF_PATH, low_memory=False)
+# ---- Shard'lı tarama (work_queue.py): gen listesi SHARD_SIZE'lık parçalara bölünüp
+# dosya kuyruğuna yazılır; bu makinede SHARD_WORKERS worker çalışır, başka node'lar
+# "python work_queue.py work <QUEUE_DIR>" ile katılabilir. Bitince sonuçlar birleştirilir.
+#   python step4B_survival_by_gene.py --workers 4
+#   python step4B_survival_by_gene.py --publish-only     # sonra node'larda worker, en son --sharded
+SHARD_SIZE = 100
+SHARD_WORKERS = 0        # 0 -> tek process (kuyruk yok)
+QUEUE_DIR = os.path.join(OUT_DIR, "step4b_queue")
+QUEUE_LEASE_S = 120.0
+configure(globals(), "step4b")
 
-print("clinical_prepared:", clin.shape)
-print("followup_prepared:", fu.shape)
-print("merged MAF:", maf.shape)
 
 # ------------------------------------------------------------
-# 1) Patient ID eşleştirme
-# clinical/followup 'patient_id' formatı: TCGA-XX-XXXX
-# MAF Tumor_Sample_Barcode: TCGA-XX-XXXX-01A-... -> ilk 12 karakter patient
+# lifelines (survival analysis) / matplotlib sadece kullanıldıkları yerde yüklenir:
+# tarama memo cache'ten gelirse ~1.3 sn'lik lifelines import'u hiç ödenmez.
 # ------------------------------------------------------------
-required_maf_cols = ["Hugo_Symbol", "Tumor_Sample_Barcode"]
-missing_maf = [c for c in required_maf_cols if c not in maf.columns]
-if missing_maf:
-    raise ValueError(f"MAF dosyasında eksik kolonlar: {missing_maf}")
-
-maf["patient_id"] = maf["Tumor_Sample_Barcode"].astype(str).str.upper().str.slice(0, 12)
-maf["Hugo_Symbol"] = maf["Hugo_Symbol"].astype(str)
+def _lifelines():
+    """(KaplanMeierFitter, CoxPHFitter, logrank_test)"""
+    try:
+        from lifelines import KaplanMeierFitter, CoxPHFitter
+        from lifelines.statistics import logrank_test
+    except ImportError:
+        raise ImportError(
+            "lifelines yüklü değil. Kurmak için terminal/Anaconda Prompt:\n"
+            "pip install lifelines"
+        )
+    return KaplanMeierFitter, CoxPHFitter, logrank_test
 
-# Klinik ID'leri normalize
-clin["patient_id"] = clin["patient_id"].astype(str).str.upper().str.slice(0, 12)
-fu["patient_id"]   = fu["patient_id"].astype(str).str.upper().str.slice(0, 12)
 
-# Ortak hastalar
-patients_os  = set(clin["patient_id"].unique())
-patients_dfs = set(fu["patient_id"].unique())
+# ------------------------------------------------------------
+# 1) Hasta hizalama + gene -> patient_idx dizisi
+# Hastalar patient_table.py'nin tamsayı ekseninde (patient_idx) hizalanır:
+# MAF barkodu aliquot tablosundan patient_idx'e çevrilir, string normalizasyonu yok.
+# ------------------------------------------------------------
+def load_maf_patients(maf_path, aliquot_path=ALIQUOT_PATH):
+    """Merged MAF'tan (Hugo_Symbol, patient_idx) tablosu (sadece gerekli kolonlar okunur)."""
+    required_maf_cols = ["Hugo_Symbol", "Tumor_Sample_Barcode"]
+    header = pd.read_csv(maf_path, nrows=0).columns
+    missing_maf = [c for c in required_maf_cols if c not in header]
+    if missing_maf:
+        raise ValueError(f"MAF dosyasında eksik kolonlar: {missing_maf}")
+
+    maf = pd.read_csv(maf_path, usecols=required_maf_cols, dtype={"Tumor_Sample_Barcode": "string"},
+                      low_memory=False)
+    print("merged MAF:", maf.shape)
+
+    maf["patient_idx"] = barcode_to_patient_idx(maf["Tumor_Sample_Barcode"], load_aliquots(aliquot_path))
+    unknown = int((maf["patient_idx"] < 0).sum())
+    if unknown:
+        print(f"⚠ {unknown} MAF satırının barkodu patient_aliquots.csv'de yok (patient_table.py eski?), atlandı")
+        maf = maf[maf["patient_idx"] >= 0]
+    maf["Hugo_Symbol"] = maf["Hugo_Symbol"].astype(str)
+    return maf[["Hugo_Symbol", "patient_idx"]].reset_index(drop=True)
+
+
+def build_gene_to_patients(maf):
+    """{gen: sıralı, tekil patient_idx dizisi (int64)}"""
+    print("\n⚙ Gen->hasta dizileri hazırlanıyor...")
+    pairs = maf.drop_duplicates().sort_values(["Hugo_Symbol", "patient_idx"], kind="mergesort")
+    genes = pairs["Hugo_Symbol"].to_numpy()
+    idx = pairs["patient_idx"].to_numpy(dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, genes[1:] != genes[:-1]]) if len(genes) else np.array([], dtype=int)
+    return dict(zip(genes[starts], np.split(idx, starts[1:])))
+
+
+def patient_mask(pidx, mut_idx):
+    """pidx (satır başına patient_idx) içinde mut_idx'teki hastalar -> bool maske."""
+    n = int(max(pidx.max(initial=-1), mut_idx.max(initial=-1))) + 1
+    hit = np.zeros(n, dtype=bool)
+    hit[mut_idx] = True
+    return hit[pidx]
+
+
+def survival_scan(surv_df, time_col, event_col, gene_list, gene_to_patients,
+                  min_mut=MIN_MUT_PATIENTS, min_wt=MIN_WT_PATIENTS, covariates=(),
+                  horizons_years=KM_HORIZONS_YEARS, rmst_tau_years=RMST_TAU_YEARS):
+    """
+    Her gen için mutant vs WT: log-rank p, Cox HR, KM medyanları, ufuklarda S(t) ve RMST farkı.
+    covariates verilirse Cox HR bu kolonlara göre düzeltilmiştir (eksik kovaryatlı hasta Cox'tan düşer).
+    horizons_years / rmst_tau_years: S(t) ufukları ve RMST sınırı (yıl; memo anahtarına girer).
+    time_col "OS_time" ise kolonlar median_OS_mut_days, surv_OS_mut_1y, rmst_OS_mut_days ... olur.
+    """
+    covariates = list(covariates)
+    _, CoxPHFitter, logrank_test = _lifelines()
+    endpoint = time_col.replace("_time", "")
+    surv_df = surv_df.copy()
+    pidx = surv_df["patient_idx"].to_numpy(dtype=np.int64)
+    no_patients = np.array([], dtype=np.int64)
+    t = surv_df[time_col].to_numpy(dtype=float)
+    e = surv_df[event_col].to_numpy(dtype=float)
+    labels = horizon_labels(horizons_years)
+
+    # Tüm genlerin maskeleri (G x n) -> eşik filtresi -> KM özetleri tek seferde
+    genes = list(gene_list)
+    masks = np.array([patient_mask(pidx, gene_to_patients.get(g, no_patients)) for g in genes],
+                     dtype=bool).reshape(len(genes), len(pidx))
+    n_mut_all = masks.sum(axis=1)
+    keep = np.flatnonzero((n_mut_all >= min_mut) & (len(pidx) - n_mut_all >= min_wt))
+    km = km_compare(t, e, masks[keep], np.asarray(horizons_years, dtype=float) * DAYS_PER_YEAR,
+                    float(rmst_tau_years) * DAYS_PER_YEAR)
+    results = []
+
+    for j, gi in enumerate(keep):
+        gene = genes[gi]
+        m = masks[gi]
+        surv_df["mut"] = m.astype(int)
+        n_mut = int(n_mut_all[gi])
+        n_wt = len(m) - n_mut
+
+        # Log-rank test
+        lr = logrank_test(t[m], t[~m], e[m], e[~m])
+        p = float(lr.p_value)
+
+        # Cox HR (mut + varsa kovaryatlar)
+        hr = np.nan
+        try:
+            cox_df = surv_df[[time_col, event_col, "mut"] + covariates].dropna()
+            cox_df.columns = ["T", "E", "mut"] + covariates
+            cph = CoxPHFitter()
+            cph.fit(cox_df, duration_col="T", event_col="E")
+            hr = float(np.exp(cph.params_["mut"]))
+        except Exception:
+            hr = np.nan
+
+        results.append({
+            "gene": gene,
+            "n_mut": n_mut,
+            "n_wt": n_wt,
+            "p_value": p,
+            "cox_hr_mut_vs_wt": hr,
+            f"median_{endpoint}_mut_days": float(km["median_mut"][j]),
+            f"median_{endpoint}_wt_days": float(km["median_wt"][j]),
+            **{f"surv_{endpoint}_{grp}_{lab}": float(km[f"surv_{grp}"][j, h])
+               for h, lab in enumerate(labels) for grp in ("mut", "wt")},
+            f"rmst_{endpoint}_mut_days": float(km["rmst_mut"][j]),
+            f"rmst_{endpoint}_wt_days": float(km["rmst_wt"][j]),
+            f"rmst_{endpoint}_diff_days": float(km["rmst_diff"][j]),
+            f"rmst_{endpoint}_diff_se": float(km["rmst_diff_se"][j]),
+            f"rmst_{endpoint}_p_value": float(km["rmst_p"][j]),
+            "rmst_tau_days": float(km["tau"][j]),
+        })
+
+    cols = ["gene", "n_mut", "n_wt", "p_value", "cox_hr_mut_vs_wt",
+            f"median_{endpoint}_mut_days", f"median_{endpoint}_wt_days"] + \
+        [f"surv_{endpoint}_{grp}_{lab}" for lab in labels for grp in ("mut", "wt")] + \
+        [f"rmst_{endpoint}_mut_days", f"rmst_{endpoint}_wt_days", f"rmst_{endpoint}_diff_days",
+         f"rmst_{endpoint}_diff_se", f"rmst_{endpoint}_p_value", "rmst_tau_days"]
+    # stabil sıralama: eşit p'lerde gen sırası korunur (shard'lı tarama ile aynı sonuç)
+    return pd.DataFrame(results, columns=cols).sort_values("p_value", kind="mergesort").reset_index(drop=True)
 
-print("\n👤 OS hastaları:", len(patients_os))
-print("👤 DFS hastaları:", len(patients_dfs))
 
 # ------------------------------------------------------------
-# 2) Analiz edilecek gen listesini belirle
-# - varsa gene_priority_score.csv içinden top N al
-# - yoksa MAF'tan en çok hastada görülen top N al
+# Shard'lı tarama: publish -> worker'lar (scan_shard) -> reduce
 # ------------------------------------------------------------
-gene_list = None
-
-if os.path.exists(SCORE_PATH):
-    score_df = pd.read_csv(SCORE_PATH)
-    if "Hugo_Symbol" in score_df.columns:
-        gene_list = score_df["Hugo_Symbol"].astype(str).head(TOP_N_GENES).tolist()
-        print(f"\n✅ Gen listesi gene_priority_score.csv içinden alındı: Top {TOP_N_GENES}")
-    else:
+def make_shards(endpoints, gene_list, shard_size=SHARD_SIZE):
+    """[{endpoint, genes}] task listesi (endpoint başına gen listesi parçaları)."""
+    return [{"endpoint": ep, "genes": gene_list[i:i + shard_size]}
+            for ep in endpoints for i in range(0, len(gene_list), shard_size)]
+
+
+def scan_shard(task, context):
+    """
+    work_queue task'ı: bir endpoint için bir gen parçasını tara.
+    Tüm ayarlar yayınlayanın context'inden gelir (worker'ın yerel lihc.toml'u kullanılmaz).
+    """
+    surv_df, time_col, event_col = context["endpoints"][task["endpoint"]]
+    return survival_scan(surv_df, time_col, event_col, task["genes"], context["gene_to_patients"],
+                         context["min_mut"], context["min_wt"], context["covariates"],
+                         context["horizons_years"], context["rmst_tau_years"])
+
+
+def reduce_shards(parts):
+    """Shard sonuçlarını (task sırasıyla) birleştir; tek process taramasıyla aynı sıralama."""
+    nonempty = [p for p in parts if len(p)]
+    if not nonempty:
+        return parts[0] if parts else pd.DataFrame()
+    return pd.concat(nonempty, ignore_index=True).sort_values("p_value", kind="mergesort").reset_index(drop=True)
+
+
+def sharded_scan(endpoints, gene_list, gene_to_patients, queue_dir=QUEUE_DIR, n_workers=SHARD_WORKERS,
+                 shard_size=SHARD_SIZE, lease_s=QUEUE_LEASE_S, publish_only=False):
+    """
+    endpoints: {"OS": (df, time_col, event_col), ...}
+    Kuyruğa yaz (aynı iş yarım kaldıysa devam et), n_workers yerel worker başlat,
+    bitmesini bekle; {endpoint: sonuç tablosu} döndür (publish_only -> None).
+    """
+    from work_queue import WorkQueue, spawn_local_workers
+
+    context = {
+        "endpoints": {ep: (df[["patient_idx", t, e] + list(COX_COVARIATES)].reset_index(drop=True), t, e)
+                      for ep, (df, t, e) in endpoints.items()},
+        "gene_to_patients": {g: gene_to_patients[g] for g in gene_list if g in gene_to_patients},
+        "min_mut": MIN_MUT_PATIENTS,
+        "min_wt": MIN_WT_PATIENTS,
+        "covariates": list(COX_COVARIATES),
+        "horizons_years": [float(h) for h in KM_HORIZONS_YEARS],
+        "rmst_tau_years": float(RMST_TAU_YEARS),
+    }
+    tasks = make_shards(list(endpoints), gene_list, shard_size)
+    queue_dir = os.path.abspath(queue_dir)
+    q = WorkQueue(queue_dir, lease_s=lease_s)
+    fresh = q.publish("step4B_survival_by_gene:scan_shard", tasks, context=context)
+    st = q.status()
+    print(f"\n📦 Kuyruk {'yayınlandı' if fresh else 'devam ediyor'}: {queue_dir} "
+          f"({st['total']} shard, {st['done']} bitmiş)")
+    print(f"   diğer node'lar: python work_queue.py work {queue_dir}")
+    if publish_only:
+        return None
+
+    procs = spawn_local_workers(queue_dir, n_workers, lease_s=lease_s,
+                                log_dir=os.path.join(queue_dir, "logs")) if n_workers > 0 else []
+    try:
+        q.wait(procs)
+    finally:
+        for p in procs:
+            p.wait()
+    parts = q.results()
+    return {ep: reduce_shards([r for t, r in zip(tasks, parts) if t["endpoint"] == ep]) for ep in endpoints}
+
+
+def select_genes(gene_to_patients, score_path=SCORE_PATH, top_n=TOP_N_GENES):
+    """
+    Analiz edilecek gen listesi:
+    - varsa gene_priority_score.csv içinden top N
+    - yoksa MAF'tan en çok hastada görülen top N
+    """
+    if os.path.exists(score_path):
+        score_df = pd.read_csv(score_path)
+        if "Hugo_Symbol" in score_df.columns:
+            print(f"\n✅ Gen listesi gene_priority_score.csv içinden alındı: Top {top_n}")
+            return score_df["Hugo_Symbol"].astype(str).head(top_n).tolist()
         print("\n⚠ gene_priority_score.csv bulundu ama Hugo_Symbol yok, MAF'a düşüyorum...")
 
-if gene_list is None:
     # MAF'tan gene patient count çıkar
-    tmp = maf.groupby("Hugo_Symbol")["patient_id"].nunique().sort_values(ascending=False)
-    gene_list = tmp.head(TOP_N_GENES).index.tolist()
-    print(f"\n✅ Gen listesi MAF içinden seçildi: Top {TOP_N_GENES} (hasta sayısına göre)")
+    tmp = pd.Series({g: len(p) for g, p in gene_to_patients.items()}).sort_index().sort_values(ascending=False)
+    print(f"\n✅ Gen listesi MAF içinden seçildi: Top {top_n} (hasta sayısına göre)")
+    return tmp.head(top_n).index.tolist()
+
+
+def prepare_endpoint(df, time_col, event_col):
+    """Süre / olay kolonlarını sayıya çevir, eksik satırları at."""
+    out = df.dropna(subset=[time_col, event_col]).copy()
+    out[time_col] = pd.to_numeric(out[time_col], errors="coerce")
+    out[event_col] = pd.to_numeric(out[event_col], errors="coerce")
+    return out.dropna(subset=[time_col, event_col])
 
-# ------------------------------------------------------------
-# 3) Hasta->mutasyon matrisi için hızlı yapı
-# gene -> set(patient_id)
-# ------------------------------------------------------------
-print("\n⚙ Gen->hasta setleri hazırlanıyor...")
-gene_to_patients = maf.groupby("Hugo_Symbol")["patient_id"].apply(lambda s: set(s)).to_dict()
 
 # ------------------------------------------------------------
-# Yardımcı: KM plot kaydet
+# KM grafikleri (figures.py ile arka planda, Agg backend ile çizilir)
 # ------------------------------------------------------------
-def save_km_plot(time, event, mutated_mask, gene, out_png, title_prefix):
+def render_km_plot(time, event, mutated_mask, gene, title_prefix):
+    import matplotlib.pyplot as plt
+
+    KaplanMeierFitter = _lifelines()[0]
     kmf = KaplanMeierFitter()
 
     plt.figure(figsize=(8, 6))
@@ -140,173 +344,225 @@ def save_km_plot(time, event, mutated_mask, gene, out_png, title_prefix):
     plt.xlabel("Gün")
     plt.ylabel("Sağkalım Olasılığı")
     plt.tight_layout()
-    plt.savefig(out_png, dpi=200)
-    plt.close()
-
-# ------------------------------------------------------------
-# 4) OS Analizi (log-rank + Cox HR)
-# ------------------------------------------------------------
-print("\n🧬 OS analizi (gene mutated vs WT) başlıyor...")
-os_results = []
-
-os_df = clin.dropna(subset=["OS_time", "OS_event"]).copy()
-os_df["OS_time"] = pd.to_numeric(os_df["OS_time"], errors="coerce")
-os_df["OS_event"] = pd.to_numeric(os_df["OS_event"], errors="coerce")
-os_df = os_df.dropna(subset=["OS_time", "OS_event"])
-
-for gene in gene_list:
-    mut_patients = gene_to_patients.get(gene, set())
-    # Bu gene mutasyonu var mı?
-    os_df["mut"] = os_df["patient_id"].apply(lambda pid: 1 if pid in mut_patients else 0).astype(int)
-
-    n_mut = int(os_df["mut"].sum())
-    n_wt = int((os_df["mut"] == 0).sum())
-
-    if n_mut < MIN_MUT_PATIENTS or n_wt < MIN_WT_PATIENTS:
-        continue
-
-    t = os_df["OS_time"].values
-    e = os_df["OS_event"].values
-    m = os_df["mut"].values.astype(bool)
 
-    # Log-rank test
-    lr = logrank_test(t[m], t[~m], e[m], e[~m])
-    p = float(lr.p_value)
 
-    # Median survival (KM)
-    kmf = KaplanMeierFitter()
-    kmf.fit(t[m], e[m])
-    med_mut = float(kmf.median_survival_time_) if kmf.median_survival_time_ is not None else np.nan
-    kmf.fit(t[~m], e[~m])
-    med_wt = float(kmf.median_survival_time_) if kmf.median_survival_time_ is not None else np.nan
-
-    # Cox HR (tek değişken: mut)
-    hr = np.nan
-    try:
-        cox_df = os_df[["OS_time", "OS_event", "mut"]].copy()
-        cox_df.columns = ["T", "E", "mut"]
-        cph = CoxPHFitter()
-        cph.fit(cox_df, duration_col="T", event_col="E")
-        hr = float(np.exp(cph.params_["mut"]))
-    except Exception:
-        hr = np.nan
+def add_km_plots(figures, res, surv_df, time_col, event_col, gene_to_patients, plot_dir, prefix, title_prefix,
+                 n_top=SAVE_TOP_PLOTS):
+    """En anlamlı n_top gen için KM grafiği spec'lerini batch'e ekle."""
+    t = surv_df[time_col].to_numpy()
+    e = surv_df[event_col].to_numpy()
+    pidx = surv_df["patient_idx"].to_numpy(dtype=np.int64)
+    for i, gene in enumerate(res["gene"].head(n_top)):
+        m = patient_mask(pidx, gene_to_patients.get(gene, np.array([], dtype=np.int64)))
+        out_png = os.path.join(plot_dir, f"{prefix}_KM_{i+1:02d}_{gene}.png")
+        figures.add(out_png, render_km_plot, t, e, m, gene, title_prefix)
 
-    os_results.append({
-        "gene": gene,
-        "n_mut": n_mut,
-        "n_wt": n_wt,
-        "p_value": p,
-        "cox_hr_mut_vs_wt": hr,
-        "median_OS_mut_days": med_mut,
-        "median_OS_wt_days": med_wt
-    })
-
-os_res = pd.DataFrame(os_results).sort_values("p_value").reset_index(drop=True)
-os_res.to_csv(OS_RES_PATH, index=False)
-print("✅ OS sonuçları kaydedildi:", OS_RES_PATH)
-print("OS test edilen gen sayısı:", os_res.shape[0])
-print("\nTop 10 (OS) en küçük p-value:")
-print(os_res.head(10))
-
-# OS plot kaydet (top)
-print(f"\n🖼 OS için top {SAVE_TOP_PLOTS} KM grafiği kaydediliyor...")
-for i, row in os_res.head(SAVE_TOP_PLOTS).iterrows():
-    gene = row["gene"]
-    mut_patients = gene_to_patients.get(gene, set())
-    dfp = os_df.copy()
-    dfp["mut"] = dfp["patient_id"].apply(lambda pid: 1 if pid in mut_patients else 0).astype(int)
-    m = dfp["mut"].values.astype(bool)
-    out_png = os.path.join(PLOT_OS_DIR, f"OS_KM_{i+1:02d}_{gene}.png")
-    save_km_plot(dfp["OS_time"].values, dfp["OS_event"].values, m, gene, out_png, "Overall Survival (OS)")
-print("✅ OS plotlar kaydedildi:", PLOT_OS_DIR)
 
 # ------------------------------------------------------------
-# 5) DFS/PFS Analizi (log-rank + Cox HR)
+# Hasta alt tipleri (patient_subtypes.py): tüm alt tipler tek log-rank testinde
 # ------------------------------------------------------------
-print("\n🧬 DFS/PFS analizi (gene mutated vs WT) başlıyor...")
-dfs_results = []
-
-dfs_df = fu.dropna(subset=["DFS_time", "DFS_event"]).copy()
-dfs_df["DFS_time"] = pd.to_numeric(dfs_df["DFS_time"], errors="coerce")
-dfs_df["DFS_event"] = pd.to_numeric(dfs_df["DFS_event"], errors="coerce")
-dfs_df = dfs_df.dropna(subset=["DFS_time", "DFS_event"])
-
-for gene in gene_list:
-    mut_patients = gene_to_patients.get(gene, set())
-    dfs_df["mut"] = dfs_df["patient_id"].apply(lambda pid: 1 if pid in mut_patients else 0).astype(int)
-
-    n_mut = int(dfs_df["mut"].sum())
-    n_wt = int((dfs_df["mut"] == 0).sum())
-
-    if n_mut < MIN_MUT_PATIENTS or n_wt < MIN_WT_PATIENTS:
-        continue
-
-    t = dfs_df["DFS_time"].values
-    e = dfs_df["DFS_event"].values
-    m = dfs_df["mut"].values.astype(bool)
-
-    lr = logrank_test(t[m], t[~m], e[m], e[~m])
-    p = float(lr.p_value)
+def subtype_test(surv_df, time_col, event_col, subtypes):
+    """
+    Alt tip başına n / olay / KM medyanı + tüm alt tipler için tek çok gruplu log-rank p.
+    subtypes: patient_idx, subtype_label tablosu; alt tipi olmayan hastalar dışarıda kalır.
+    """
+    from lifelines.statistics import multivariate_logrank_test
+
+    endpoint = time_col.replace("_time", "")
+    df = surv_df[["patient_idx", time_col, event_col]].merge(
+        subtypes[["patient_idx", "subtype_label"]], on="patient_idx", how="inner")
+    cols = ["endpoint", "subtype_label", "n", "n_events", "median_days", "p_value_logrank"]
+    if df["subtype_label"].nunique() < 2:
+        return pd.DataFrame(columns=cols), df
+    p = float(multivariate_logrank_test(df[time_col], df["subtype_label"], df[event_col]).p_value)
+    out = km_group_table(df[time_col], df[event_col], df["subtype_label"]).rename(columns={"label": "subtype_label"})
+    out.insert(0, "endpoint", endpoint)
+    out["p_value_logrank"] = p
+    return out[cols], df
+
+
+def render_subtype_km(time, event, labels, title):
+    import matplotlib.pyplot as plt
+    KaplanMeierFitter, _, _ = _lifelines()
 
+    plt.figure(figsize=(8, 6))
+    ax = plt.gca()
     kmf = KaplanMeierFitter()
-    kmf.fit(t[m], e[m])
-    med_mut = float(kmf.median_survival_time_) if kmf.median_survival_time_ is not None else np.nan
-    kmf.fit(t[~m], e[~m])
-    med_wt = float(kmf.median_survival_time_) if kmf.median_survival_time_ is not None else np.nan
-
-    hr = np.nan
-    try:
-        cox_df = dfs_df[["DFS_time", "DFS_event", "mut"]].copy()
-        cox_df.columns = ["T", "E", "mut"]
-        cph = CoxPHFitter()
-        cph.fit(cox_df, duration_col="T", event_col="E")
-        hr = float(np.exp(cph.params_["mut"]))
-    except Exception:
-        hr = np.nan
+    for label in sorted(set(labels)):
+        m = labels == label
+        kmf.fit(time[m], event[m], label=f"{label} (n={m.sum()})")
+        kmf.plot(ax=ax, ci_show=False)
+    plt.title(title)
+    plt.xlabel("Gün")
+    plt.ylabel("Sağkalım Olasılığı")
+    plt.tight_layout()
 
-    dfs_results.append({
-        "gene": gene,
-        "n_mut": n_mut,
-        "n_wt": n_wt,
-        "p_value": p,
-        "cox_hr_mut_vs_wt": hr,
-        "median_DFS_mut_days": med_mut,
-        "median_DFS_wt_days": med_wt
-    })
-
-dfs_res = pd.DataFrame(dfs_results).sort_values("p_value").reset_index(drop=True)
-dfs_res.to_csv(DFS_RES_PATH, index=False)
-print("✅ DFS/PFS sonuçları kaydedildi:", DFS_RES_PATH)
-print("DFS test edilen gen sayısı:", dfs_res.shape[0])
-print("\nTop 10 (DFS) en küçük p-value:")
-print(dfs_res.head(10))
-
-print(f"\n🖼 DFS için top {SAVE_TOP_PLOTS} KM grafiği kaydediliyor...")
-for i, row in dfs_res.head(SAVE_TOP_PLOTS).iterrows():
-    gene = row["gene"]
-    mut_patients = gene_to_patients.get(gene, set())
-    dfp = dfs_df.copy()
-    dfp["mut"] = dfp["patient_id"].apply(lambda pid: 1 if pid in mut_patients else 0).astype(int)
-    m = dfp["mut"].values.astype(bool)
-    out_png = os.path.join(PLOT_DFS_DIR, f"DFS_KM_{i+1:02d}_{gene}.png")
-    save_km_plot(dfp["DFS_time"].values, dfp["DFS_event"].values, m, gene, out_png, "Disease-Free / Progression-Free (DFS/PFS)")
-print("✅ DFS plotlar kaydedildi:", PLOT_DFS_DIR)
 
-# ------------------------------------------------------------
-# 6) Mini özet
-# ------------------------------------------------------------
-print("\n====================")
-print("STEP 4B BİTTİ ✅")
-print("====================")
-print("OS results :", OS_RES_PATH)
-print("DFS results:", DFS_RES_PATH)
-print("OS plots   :", PLOT_OS_DIR)
-print("DFS plots  :", PLOT_DFS_DIR)
-
-if os_res.shape[0] > 0:
-    best = os_res.iloc[0]
-    print(f"\n🏁 OS en anlamlı gen: {best['gene']} (p={best['p_value']:.3g}, HR={best['cox_hr_mut_vs_wt']})")
-
-if dfs_res.shape[0] > 0:
-    best = dfs_res.iloc[0]
-    print(f"🏁 DFS en anlamlı gen: {best['gene']} (p={best['p_value']:.3g}, HR={best['cox_hr_mut_vs_wt']})")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="STEP 4B: gen bazlı OS / DFS taraması")
+    ap.add_argument("--workers", type=int, default=SHARD_WORKERS,
+                    help="Shard'lı tarama: bu makinede kaç worker (0 -> tek process)")
+    ap.add_argument("--sharded", action="store_true",
+                    help="Yerel worker olmasa da kuyruğu kullan (uzak worker'ları bekle + reduce)")
+    ap.add_argument("--publish-only", action="store_true", help="Shard'ları kuyruğa yaz ve çık")
+    ap.add_argument("--queue-dir", default=QUEUE_DIR)
+    args = ap.parse_args(argv)
+    sharded = args.workers > 0 or args.sharded or args.publish_only
+
+    os.makedirs(PLOT_OS_DIR, exist_ok=True)
+    os.makedirs(PLOT_DFS_DIR, exist_ok=True)
+
+    load_maf = load_maf_patients
+    build_sets = build_gene_to_patients
+    scan = survival_scan
+    caches = []
+    if MEMO_DIR is not None:
+        memo = MemoCache(MEMO_DIR)
+        load_maf = memo.memoize("step4b.load_maf_patients", files=("maf_path", "aliquot_path"))(load_maf_patients)
+        build_sets = memo.memoize("step4b.build_gene_to_patients")(build_gene_to_patients)
+        scan = memo.memoize("step4b.survival_scan", sources=(km_engine,))(survival_scan)
+        caches.append(memo)
+
+    prof = StepProfiler("step4b", log_dir=RUN_LOG_DIR, caches=caches)
+    # KM grafikleri taramalar sürerken arka planda çizilir (OS grafikleri DFS taramasıyla paralel)
+    figures = FigureBatch("step4b", OUT_DIR)
+
+    prof.begin("load patients")
+    print("📥 Dosyalar okunuyor...")
+    patients = load_patient_table(PATIENT_TABLE_PATH)
+    print("patient_table:", patients.shape)
+    prof.end(rows_out=len(patients))
+
+    # Hasta->mutasyon için hızlı yapı: gene -> patient_idx dizisi
+    prof.begin("load MAF")
+    maf_patients = load_maf(MAF_PATH, ALIQUOT_PATH)
+    prof.end(rows_out=len(maf_patients))
+
+    prof.begin("build gene_to_patients", rows_in=len(maf_patients))
+    gene_to_patients = build_sets(maf_patients)
+    prof.end(rows_out=len(gene_to_patients))
+
+    print("\n👤 OS hastaları:", int(patients["OS_time"].notna().sum()))
+    print("👤 DFS hastaları:", int(patients["DFS_time"].notna().sum()))
+
+    # ------------------------------------------------------------
+    # 2) Analiz edilecek gen listesini belirle
+    # ------------------------------------------------------------
+    gene_list = select_genes(gene_to_patients)
+
+    # ------------------------------------------------------------
+    # 4) OS Analizi (log-rank + Cox HR)
+    # ------------------------------------------------------------
+    missing = [c for c in COX_COVARIATES if c not in patients.columns]
+    if missing:
+        raise ValueError(f"COX_COVARIATES patient_table.csv'de yok: {missing} "
+                         "(imza maruziyetleri için önce: python lihc.py signatures && python lihc.py patients)")
+    if COX_COVARIATES:
+        print("⚙️ Cox kovaryatları:", ", ".join(COX_COVARIATES))
+    covs = list(COX_COVARIATES)
+    os_df = prepare_endpoint(patients[["patient_idx", "patient_id", "OS_time", "OS_event"] + covs], "OS_time", "OS_event")
+    dfs_df = prepare_endpoint(patients[["patient_idx", "patient_id", "DFS_time", "DFS_event"] + covs],
+                              "DFS_time", "DFS_event")
+
+    sharded_res = None
+    if sharded:
+        ph = prof.begin("sharded scan", rows_in=2 * len(gene_list))
+        sharded_res = sharded_scan({"OS": (os_df, "OS_time", "OS_event"), "DFS": (dfs_df, "DFS_time", "DFS_event")},
+                                   gene_list, gene_to_patients, queue_dir=args.queue_dir, n_workers=args.workers,
+                                   publish_only=args.publish_only)
+        ph["extra"]["n_workers"] = args.workers
+        prof.end()
+        if sharded_res is None:
+            prof.finish()
+            print("\n✅ Shard'lar yayınlandı. Worker'lar bitince reduce için: "
+                  "python step4B_survival_by_gene.py --sharded")
+            return
+
+    print("\n🧬 OS analizi (gene mutated vs WT) başlıyor...")
+    if sharded_res is not None:
+        os_res = sharded_res["OS"]
+    else:
+        prof.begin("OS scan", rows_in=len(gene_list))
+        os_res = scan(os_df, "OS_time", "OS_event", gene_list, gene_to_patients,
+                      MIN_MUT_PATIENTS, MIN_WT_PATIENTS, COX_COVARIATES, KM_HORIZONS_YEARS, RMST_TAU_YEARS)
+        prof.end(rows_out=len(os_res))
+    os_res.to_csv(OS_RES_PATH, index=False)
+    print("✅ OS sonuçları kaydedildi:", OS_RES_PATH)
+    print("OS test edilen gen sayısı:", os_res.shape[0])
+    print("\nTop 10 (OS) en küçük p-value:")
+    print(os_res.head(10))
+
+    print(f"\n🖼 OS için top {SAVE_TOP_PLOTS} KM grafiği çizime gönderiliyor...")
+    add_km_plots(figures, os_res, os_df, "OS_time", "OS_event", gene_to_patients,
+                 PLOT_OS_DIR, "OS", "Overall Survival (OS)")
+
+    # ------------------------------------------------------------
+    # 5) DFS/PFS Analizi (log-rank + Cox HR)
+    # ------------------------------------------------------------
+    print("\n🧬 DFS/PFS analizi (gene mutated vs WT) başlıyor...")
+    if sharded_res is not None:
+        dfs_res = sharded_res["DFS"]
+    else:
+        prof.begin("DFS scan", rows_in=len(gene_list))
+        dfs_res = scan(dfs_df, "DFS_time", "DFS_event", gene_list, gene_to_patients,
+                       MIN_MUT_PATIENTS, MIN_WT_PATIENTS, COX_COVARIATES, KM_HORIZONS_YEARS, RMST_TAU_YEARS)
+        prof.end(rows_out=len(dfs_res))
+    dfs_res.to_csv(DFS_RES_PATH, index=False)
+    print("✅ DFS/PFS sonuçları kaydedildi:", DFS_RES_PATH)
+    print("DFS test edilen gen sayısı:", dfs_res.shape[0])
+    print("\nTop 10 (DFS) en küçük p-value:")
+    print(dfs_res.head(10))
+
+    print(f"\n🖼 DFS için top {SAVE_TOP_PLOTS} KM grafiği çizime gönderiliyor...")
+    add_km_plots(figures, dfs_res, dfs_df, "DFS_time", "DFS_event", gene_to_patients,
+                 PLOT_DFS_DIR, "DFS", "Disease-Free / Progression-Free (DFS/PFS)")
+
+    # ------------------------------------------------------------
+    # 5b) Hasta alt tipleri vs OS / DFS (tek KM / log-rank geçişi)
+    # ------------------------------------------------------------
+    if os.path.exists(SUBTYPE_PATH):
+        prof.begin("subtype test")
+        subtypes = pd.read_csv(SUBTYPE_PATH)
+        parts = []
+        for ep, df, t, e in [("OS", os_df, "OS_time", "OS_event"), ("DFS", dfs_df, "DFS_time", "DFS_event")]:
+            res, merged = subtype_test(df, t, e, subtypes)
+            parts.append(res)
+            if len(res):
+                print(f"\n👥 Alt tipler vs {ep}: log-rank p={res['p_value_logrank'].iloc[0]:.3g}")
+                print(res[["subtype_label", "n", "n_events", "median_days"]].to_string(index=False))
+                figures.add(PLOT_SUBTYPE_PATH.format(ep), render_subtype_km, merged[t].to_numpy(),
+                            merged[e].to_numpy(), merged["subtype_label"].to_numpy(), f"{ep}: hasta alt tipleri")
+        subtype_res = pd.concat(parts, ignore_index=True)
+        subtype_res.to_csv(SUBTYPE_RES_PATH, index=False)
+        print("✅ Alt tip sonuçları kaydedildi:", SUBTYPE_RES_PATH)
+        prof.end(rows_out=len(subtype_res))
+    else:
+        print(f"\nℹ {SUBTYPE_PATH} yok; alt tip testi atlandı (python lihc.py subtypes)")
+
+    ph = prof.begin("KM plots")
+    ph["extra"].update(figures.close())
+    prof.end()
+    prof.finish()
+
+    # ------------------------------------------------------------
+    # 6) Mini özet
+    # ------------------------------------------------------------
+    print("\n====================")
+    print("STEP 4B BİTTİ ✅")
+    print("====================")
+    print("OS results :", OS_RES_PATH)
+    print("DFS results:", DFS_RES_PATH)
+    print("OS plots   :", PLOT_OS_DIR)
+    print("DFS plots  :", PLOT_DFS_DIR)
+
+    if os_res.shape[0] > 0:
+        best = os_res.iloc[0]
+        print(f"\n🏁 OS en anlamlı gen: {best['gene']} (p={best['p_value']:.3g}, HR={best['cox_hr_mut_vs_wt']})")
+
+    if dfs_res.shape[0] > 0:
+        best = dfs_res.iloc[0]
+        print(f"🏁 DFS en anlamlı gen: {best['gene']} (p={best['p_value']:.3g}, HR={best['cox_hr_mut_vs_wt']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import os
+import json
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch
 
 # =========================
 # STEP 4C: Big picture plots (robust)
@@ -10,21 +14,41 @@ import matplotlib.pyplot as plt
 #  - outputs/step4b_dfs_gene_results.csv
 # Outputs:
 #  - outputs/step4c_big_picture/*.png
+#  - outputs/step4c_big_picture/bigpic_interactive.html  (boyutu sınırlı, tek dosya)
+#
+# Genom çapı taramalar (~14.6k gen x 2 endpoint) için:
+#  - OS/DFS tabloları gene göre index'lenir; matris / scatter index join ile kurulur
+#  - DENSITY_MIN_POINTS'ten büyük nokta bulutları yoğunluk (hexbin) olarak rasterize
+#    çizilir; sadece anlamlı genler (p < ALPHA, en fazla MAX_VECTOR_POINTS) vektör
+#    nokta, en anlamlı LABEL_TOP_N gen etiketli
 # =========================
 
-BASE_DIR = r"D:\ALSU\GDC_TCGA_LIHC"
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
 OUT_DIR = os.path.join(BASE_DIR, "outputs")
 PLOT_DIR = os.path.join(OUT_DIR, "step4c_big_picture")
-os.makedirs(PLOT_DIR, exist_ok=True)
 
 OS_PATH  = os.path.join(OUT_DIR, "step4b_os_gene_results.csv")
 DFS_PATH = os.path.join(OUT_DIR, "step4b_dfs_gene_results.csv")
+RUN_LOG_DIR = os.path.join(OUT_DIR, "run_logs")
+HTML_PATH = os.path.join(PLOT_DIR, "bigpic_interactive.html")
+
+ALPHA = 0.05
+DENSITY_MIN_POINTS = 2000    # bundan büyük bulutlar hexbin yoğunluğu olarak çizilir
+HEXBIN_GRIDSIZE = 80
+MAX_VECTOR_POINTS = 500      # anlamlı genlerden en fazla bu kadarı ayrı nokta (kalanı yoğunlukta)
+LABEL_TOP_N = 15
+EXTRA_FORMATS = []           # örn. ["svg"]: yoğunluk katmanı rasterize, anlamlı genler vektör kalır
+
+# Etkileşimli HTML (harici kütüphane yok: gömülü JSON + canvas)
+HTML_MAX_POINTS = 2000       # panel başına hover'lı nokta üst sınırı
+HTML_GRID = 60               # kalan genler HTML_GRID x HTML_GRID yoğunluk hücresi olarak gömülür
+HTML_MAX_BYTES = 1_500_000
 
-os_df = pd.read_csv(OS_PATH)
-dfs_df = pd.read_csv(DFS_PATH)
+P_CANDIDATES = ["logrank_p", "p_value", "pvalue", "p", "pval", "logrank_pvalue", "logrank_p_value"]
+HR_CANDIDATES = ["cox_hr_mut_vs_wt", "hr", "hazard_ratio", "cox_hr", "cox_hr_mutant_vs_wt"]
+GENE_CANDIDATES = ["gene", "Hugo_Symbol", "hugo_symbol"]
+configure(globals(), "step4c")
 
-print("OS columns:", list(os_df.columns))
-print("DFS columns:", list(dfs_df.columns))
 
 def pick_first_existing(df, candidates):
     """Return first candidate column that exists in df (case-insensitive)."""
@@ -34,156 +58,344 @@ def pick_first_existing(df, candidates):
             return lower_map[cand.lower()]
     return None
 
-# Gene kolonu (genelde 'gene' olur)
-gene_col_os  = pick_first_existing(os_df,  ["gene", "Hugo_Symbol", "hugo_symbol"])
-gene_col_dfs = pick_first_existing(dfs_df, ["gene", "Hugo_Symbol", "hugo_symbol"])
-if gene_col_os is None or gene_col_dfs is None:
-    raise ValueError("Gene kolonu bulunamadı. OS/DFS CSV içindeki gen kolonunu kontrol et.")
-
-# p-value kolonu (seninkinde farklı isim olabilir)
-p_candidates = ["logrank_p", "p_value", "pvalue", "p", "pval", "logrank_pvalue", "logrank_p_value"]
-p_col_os  = pick_first_existing(os_df, p_candidates)
-p_col_dfs = pick_first_existing(dfs_df, p_candidates)
-if p_col_os is None or p_col_dfs is None:
-    raise ValueError(f"p-value kolonu bulunamadı. Aranan adaylar: {p_candidates}")
-
-# HR kolonu (cox model sonucu)
-hr_candidates = ["cox_hr_mut_vs_wt", "hr", "hazard_ratio", "cox_hr", "cox_hr_mutant_vs_wt"]
-hr_col_os  = pick_first_existing(os_df, hr_candidates)
-hr_col_dfs = pick_first_existing(dfs_df, hr_candidates)
-if hr_col_os is None or hr_col_dfs is None:
-    raise ValueError(f"HR kolonu bulunamadı. Aranan adaylar: {hr_candidates}")
-
-print("\nSeçilen kolonlar:")
-print("OS  gene:", gene_col_os, " p:", p_col_os, " HR:", hr_col_os)
-print("DFS gene:", gene_col_dfs," p:", p_col_dfs," HR:", hr_col_dfs)
-
-# gerekli kolonları normalize edip ortak isim verelim
-os_df = os_df.rename(columns={gene_col_os: "gene", p_col_os: "p_value", hr_col_os: "HR"})
-dfs_df = dfs_df.rename(columns={gene_col_dfs: "gene", p_col_dfs: "p_value", hr_col_dfs: "HR"})
-
-# numeric dönüşüm
-os_df["p_value"] = pd.to_numeric(os_df["p_value"], errors="coerce")
-dfs_df["p_value"] = pd.to_numeric(dfs_df["p_value"], errors="coerce")
-os_df["HR"] = pd.to_numeric(os_df["HR"], errors="coerce")
-dfs_df["HR"] = pd.to_numeric(dfs_df["HR"], errors="coerce")
 
 # yardımcı fonksiyonlar
 def neglog10p(p):
     p = np.clip(p, 1e-300, 1.0)
     return -np.log10(p)
 
+
 def log2hr(hr):
     hr = np.clip(hr, 1e-9, None)
     return np.log2(hr)
 
-os_df["neglog10_p"] = neglog10p(os_df["p_value"])
-dfs_df["neglog10_p"] = neglog10p(dfs_df["p_value"])
-os_df["log2HR"] = log2hr(os_df["HR"])
-dfs_df["log2HR"] = log2hr(dfs_df["HR"])
 
+def load_results(path, label):
+    """
+    4B sonuç tablosunu oku, kolonları ortak isimlere çevir (p_value, HR),
+    neglog10_p / log2HR ekle; gene göre index'li döndür (tekrarlı genlerde en küçük p).
+    """
+    df = pd.read_csv(path)
+    print(f"{label} columns:", list(df.columns))
 
-# ------------------------------------------------------------
-# 1) Volcano: log2(HR) vs -log10(p)
-# ------------------------------------------------------------
-plt.figure(figsize=(10, 6))
-plt.scatter(os_df["log2HR"], os_df["neglog10_p"])
-plt.axvline(0, linestyle="--")
-plt.axhline(-np.log10(0.05), linestyle="--")
-plt.title("OS: Etki (log2(HR)) vs Anlamlılık (-log10 p)")
-plt.xlabel("log2(HR) (mutant vs WT)")
-plt.ylabel("-log10(p)")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOT_DIR, "bigpic_os_volcano.png"), dpi=200)
-plt.close()
-
-plt.figure(figsize=(10, 6))
-plt.scatter(dfs_df["log2HR"], dfs_df["neglog10_p"])
-plt.axvline(0, linestyle="--")
-plt.axhline(-np.log10(0.05), linestyle="--")
-plt.title("DFS/PFS: Etki (log2(HR)) vs Anlamlılık (-log10 p)")
-plt.xlabel("log2(HR) (mutant vs WT)")
-plt.ylabel("-log10(p)")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOT_DIR, "bigpic_dfs_volcano.png"), dpi=200)
-plt.close()
+    gene_col = pick_first_existing(df, GENE_CANDIDATES)
+    if gene_col is None:
+        raise ValueError("Gene kolonu bulunamadı. OS/DFS CSV içindeki gen kolonunu kontrol et.")
+    p_col = pick_first_existing(df, P_CANDIDATES)
+    if p_col is None:
+        raise ValueError(f"p-value kolonu bulunamadı. Aranan adaylar: {P_CANDIDATES}")
+    hr_col = pick_first_existing(df, HR_CANDIDATES)
+    if hr_col is None:
+        raise ValueError(f"HR kolonu bulunamadı. Aranan adaylar: {HR_CANDIDATES}")
+    print(f"{label:3s} gene: {gene_col}  p: {p_col}  HR: {hr_col}")
+
+    df = df.rename(columns={gene_col: "gene", p_col: "p_value", hr_col: "HR"})
+    df["gene"] = df["gene"].astype(str)
+    df["p_value"] = pd.to_numeric(df["p_value"], errors="coerce")
+    df["HR"] = pd.to_numeric(df["HR"], errors="coerce")
+    df["neglog10_p"] = neglog10p(df["p_value"])
+    df["log2HR"] = log2hr(df["HR"])
+
+    df = df.sort_values("p_value", kind="mergesort").drop_duplicates("gene", keep="first")
+    return df.set_index("gene")[["p_value", "HR", "neglog10_p", "log2HR"]]
+
+
+def highlight_mask(p, alpha=ALPHA, max_points=MAX_VECTOR_POINTS):
+    """p < alpha olan genler (en küçük p'li max_points tanesi)."""
+    p = np.asarray(p, dtype=float)
+    sig = np.flatnonzero(np.nan_to_num(p, nan=1.0) < alpha)
+    sig = sig[np.argsort(p[sig], kind="mergesort")][:max_points]
+    mask = np.zeros(len(p), dtype=bool)
+    mask[sig] = True
+    return mask
+
+
+def top_label_index(p, mask, n=LABEL_TOP_N):
+    idx = np.flatnonzero(mask)
+    return idx[np.argsort(np.asarray(p, dtype=float)[idx], kind="mergesort")][:n]
+
+
+def direction_matrix(os_idx, dfs_idx, genes):
+    """(gen x [OS, DFS]) HR matrisi; index join (gen başına tablo taraması yok)."""
+    return np.column_stack([
+        os_idx["HR"].reindex(genes).to_numpy(dtype=float),
+        dfs_idx["HR"].reindex(genes).to_numpy(dtype=float),
+    ])
 
 
 # ------------------------------------------------------------
-# 2) Top 10 bar: -log10(p)
+# Render fonksiyonları (figures.py ile arka planda çizilir)
 # ------------------------------------------------------------
-def top_bar(df, title, filename, topn=10):
-    tmp = df.sort_values("p_value").head(topn).copy()
+def _draw_cloud(ax, x, y, highlight, label_idx, genes):
+    """Büyük bulut: yoğunluk (hexbin, rasterize) + anlamlılar vektör nokta; küçük bulut: tüm noktalar."""
+    ok = np.isfinite(x) & np.isfinite(y)
+    bg = ok & ~highlight
+    if ok.sum() > DENSITY_MIN_POINTS:
+        hb = ax.hexbin(x[bg], y[bg], gridsize=HEXBIN_GRIDSIZE, bins="log", mincnt=1, cmap="Greys",
+                       linewidths=0, rasterized=True)
+        ax.figure.colorbar(hb, ax=ax, label="gen sayısı (log)")
+    else:
+        ax.scatter(x[bg], y[bg], s=12)
+    hl = ok & highlight
+    ax.scatter(x[hl], y[hl], s=14, color="tab:red", label=f"p < {ALPHA} (n={int(hl.sum())})")
+    for i in label_idx:
+        if ok[i]:
+            ax.annotate(genes[i], (x[i], y[i]), fontsize=7, xytext=(3, 3), textcoords="offset points")
+    if hl.any():
+        ax.legend(loc="upper left", fontsize=8)
+
+
+def render_volcano(log2hr_values, neglog10_p, highlight, label_idx, genes, title):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    _draw_cloud(ax, log2hr_values, neglog10_p, highlight, label_idx, genes)
+    ax.axvline(0, linestyle="--")
+    ax.axhline(-np.log10(ALPHA), linestyle="--")
+    ax.set_title(title)
+    ax.set_xlabel("log2(HR) (mutant vs WT)")
+    ax.set_ylabel("-log10(p)")
+    fig.tight_layout()
+
+
+def render_top_bar(genes, neglog10_p, title):
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(10, 5))
-    plt.bar(tmp["gene"], neglog10p(tmp["p_value"]))
+    plt.bar(genes, neglog10_p)
     plt.xticks(rotation=45, ha="right")
     plt.title(title)
     plt.xlabel("Gen")
     plt.ylabel("-log10(p)")
     plt.tight_layout()
-    plt.savefig(os.path.join(PLOT_DIR, filename), dpi=200)
-    plt.close()
 
-top_bar(os_df,  "OS: En anlamlı Top 10 gen (-log10 p)",  "bigpic_os_top10_p.png",  10)
-top_bar(dfs_df, "DFS: En anlamlı Top 10 gen (-log10 p)", "bigpic_dfs_top10_p.png", 10)
 
+def render_os_vs_dfs(x, y, highlight, label_idx, genes):
+    import matplotlib.pyplot as plt
 
-# ------------------------------------------------------------
-# 3) OS vs DFS log2(HR) scatter (ortak genler)
-# ------------------------------------------------------------
-merged = pd.merge(
-    os_df[["gene", "HR", "p_value"]],
-    dfs_df[["gene", "HR", "p_value"]],
-    on="gene",
-    suffixes=("_OS", "_DFS")
-)
-
-if merged.shape[0] > 0:
-    merged["log2HR_OS"] = log2hr(merged["HR_OS"])
-    merged["log2HR_DFS"] = log2hr(merged["HR_DFS"])
-
-    plt.figure(figsize=(7, 7))
-    plt.scatter(merged["log2HR_OS"], merged["log2HR_DFS"])
-    plt.axvline(0, linestyle="--")
-    plt.axhline(0, linestyle="--")
-    plt.title("OS vs DFS: log2(HR) karşılaştırma (ortak genler)")
-    plt.xlabel("log2(HR) - OS")
-    plt.ylabel("log2(HR) - DFS")
+    fig, ax = plt.subplots(figsize=(7, 7))
+    _draw_cloud(ax, x, y, highlight, label_idx, genes)
+    ax.axvline(0, linestyle="--")
+    ax.axhline(0, linestyle="--")
+    ax.set_title("OS vs DFS: log2(HR) karşılaştırma (ortak genler)")
+    ax.set_xlabel("log2(HR) - OS")
+    ax.set_ylabel("log2(HR) - DFS")
+    fig.tight_layout()
+
+
+def render_direction_matrix(mat_log2, genes):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(6, max(4, 0.35 * len(genes))))
+    plt.imshow(mat_log2, aspect="auto")
+    plt.yticks(range(len(genes)), genes)
+    plt.xticks([0, 1], ["OS log2(HR)", "DFS log2(HR)"])
+    plt.title("Top genler: Mutasyon etkisi yön özeti (log2 HR)")
+    plt.colorbar(label="log2(HR)")
     plt.tight_layout()
-    plt.savefig(os.path.join(PLOT_DIR, "bigpic_os_vs_dfs_log2hr_scatter.png"), dpi=200)
-    plt.close()
-else:
-    print("Uyarı: OS ve DFS tablolarında ortak gen bulunamadı, scatter çizilmedi.")
+
+
+def add_figure(figures, name, render, *args):
+    """PNG + (varsa) EXTRA_FORMATS kopyaları."""
+    for ext in ["png"] + list(EXTRA_FORMATS):
+        figures.add(os.path.join(PLOT_DIR, f"{name}.{ext}"), render, *args)
 
 
 # ------------------------------------------------------------
-# 4) Yön matrisi (Top 10 OS + Top 10 DFS genleri)
+# Etkileşimli HTML (boyutu sınırlı)
 # ------------------------------------------------------------
-top_os = os_df.sort_values("p_value").head(10)["gene"].tolist()
-top_dfs = dfs_df.sort_values("p_value").head(10)["gene"].tolist()
-genes = list(dict.fromkeys(top_os + top_dfs))
-
-mat = []
-for g in genes:
-    row = []
-    r_os = os_df.loc[os_df["gene"] == g, "HR"]
-    row.append(r_os.values[0] if len(r_os) else np.nan)
-    r_dfs = dfs_df.loc[dfs_df["gene"] == g, "HR"]
-    row.append(r_dfs.values[0] if len(r_dfs) else np.nan)
-    mat.append(row)
-
-mat = np.array(mat, dtype=float)
-mat_log2 = log2hr(mat)
-
-plt.figure(figsize=(6, max(4, 0.35 * len(genes))))
-plt.imshow(mat_log2, aspect="auto")
-plt.yticks(range(len(genes)), genes)
-plt.xticks([0, 1], ["OS log2(HR)", "DFS log2(HR)"])
-plt.title("Top genler: Mutasyon etkisi yön özeti (log2 HR)")
-plt.colorbar(label="log2(HR)")
-plt.tight_layout()
-plt.savefig(os.path.join(PLOT_DIR, "bigpic_direction_matrix_log2hr.png"), dpi=200)
-plt.close()
-
-print("\n✅ STEP 4C bitti. Grafikler kaydedildi:")
-print("->", PLOT_DIR)
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>STEP 4C - Big picture</title>
+<style>
+body{font-family:sans-serif;margin:16px} .panel{display:inline-block;margin:8px;vertical-align:top}
+canvas{border:1px solid #ccc} #tip{position:absolute;background:#fff;border:1px solid #999;
+padding:2px 6px;font-size:12px;display:none;pointer-events:none}
+</style></head><body>
+<h2>STEP 4C - Büyük resim (etkileşimli)</h2>
+<p>Gri hücreler: gen yoğunluğu. Kırmızı noktalar: p &lt; __ALPHA__ genler (üzerine gelince detay).</p>
+<div id="panels"></div><div id="tip"></div>
+<script>
+const DATA = __DATA__;
+const W = 520, H = 420, M = 48;
+const tip = document.getElementById("tip");
+DATA.forEach(function (pn) {
+  const div = document.createElement("div"); div.className = "panel";
+  div.innerHTML = "<b>" + pn.title + "</b><br>";
+  const cv = document.createElement("canvas"); cv.width = W; cv.height = H; div.appendChild(cv);
+  document.getElementById("panels").appendChild(div);
+  const g = cv.getContext("2d");
+  const x0 = pn.extent[0], x1 = pn.extent[1], y0 = pn.extent[2], y1 = pn.extent[3];
+  const sx = v => M + (v - x0) / ((x1 - x0) || 1) * (W - 2 * M);
+  const sy = v => H - M - (v - y0) / ((y1 - y0) || 1) * (H - 2 * M);
+  const dx = (x1 - x0) / pn.grid, dy = (y1 - y0) / pn.grid;
+  let cmax = 1; pn.cells.forEach(c => { if (c[2] > cmax) cmax = c[2]; });
+  pn.cells.forEach(function (c) {
+    g.fillStyle = "rgba(0,0,0," + (0.08 + 0.6 * Math.log1p(c[2]) / Math.log1p(cmax)).toFixed(3) + ")";
+    const px = sx(x0 + c[0] * dx), py = sy(y0 + (c[1] + 1) * dy);
+    g.fillRect(px, py, sx(x0 + (c[0] + 1) * dx) - px + 0.5, sy(y0 + c[1] * dy) - py + 0.5);
+  });
+  g.strokeStyle = "#888"; g.setLineDash([4, 4]);
+  pn.vlines.forEach(v => { g.beginPath(); g.moveTo(sx(v), M); g.lineTo(sx(v), H - M); g.stroke(); });
+  pn.hlines.forEach(v => { g.beginPath(); g.moveTo(M, sy(v)); g.lineTo(W - M, sy(v)); g.stroke(); });
+  g.setLineDash([]); g.strokeStyle = "#000"; g.strokeRect(M, M, W - 2 * M, H - 2 * M);
+  g.fillStyle = "#000"; g.font = "11px sans-serif";
+  g.fillText(x0.toFixed(2), M, H - M + 14); g.fillText(x1.toFixed(2), W - M - 24, H - M + 14);
+  g.fillText(y0.toFixed(2), 4, H - M); g.fillText(y1.toFixed(2), 4, M + 8);
+  g.fillText(pn.xlabel, W / 2 - 40, H - 8);
+  g.save(); g.translate(12, H / 2 + 30); g.rotate(-Math.PI / 2); g.fillText(pn.ylabel, 0, 0); g.restore();
+  g.fillStyle = "#d62728";
+  pn.points.forEach(pt => { g.beginPath(); g.arc(sx(pt[0]), sy(pt[1]), 3, 0, 6.2832); g.fill(); });
+  cv.addEventListener("mousemove", function (ev) {
+    const r = cv.getBoundingClientRect(), mx = ev.clientX - r.left, my = ev.clientY - r.top;
+    let best = null, bd = 49;
+    pn.points.forEach(pt => { const d = (sx(pt[0]) - mx) ** 2 + (sy(pt[1]) - my) ** 2; if (d < bd) { bd = d; best = pt; } });
+    if (!best) { tip.style.display = "none"; return; }
+    tip.innerHTML = "<b>" + best[2] + "</b><br>" + pn.xlabel + ": " + best[0] + "<br>" + pn.ylabel + ": " + best[1]
+      + "<br>" + best[3];
+    tip.style.left = (ev.pageX + 12) + "px"; tip.style.top = (ev.pageY + 12) + "px"; tip.style.display = "block";
+  });
+  cv.addEventListener("mouseleave", () => { tip.style.display = "none"; });
+});
+</script></body></html>
+"""
+
+
+def html_panel(title, xlabel, ylabel, x, y, genes, info, highlight, max_points, grid=HTML_GRID,
+               vlines=(0,), hlines=()):
+    """Tek panel: vurgulanan genler nokta (en fazla max_points), kalanlar seyrek yoğunluk hücreleri."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = np.isfinite(x) & np.isfinite(y)
+    if not ok.any():
+        return None
+    x0, x1 = float(x[ok].min()), float(x[ok].max())
+    y0, y1 = float(y[ok].min()), float(y[ok].max())
+
+    pts = np.flatnonzero(ok & highlight)[:max_points]      # highlight zaten p'ye göre sıralı seçildi
+    rest = ok.copy()
+    rest[pts] = False
+    ix = np.clip(((x[rest] - x0) / ((x1 - x0) or 1) * grid).astype(int), 0, grid - 1)
+    iy = np.clip(((y[rest] - y0) / ((y1 - y0) or 1) * grid).astype(int), 0, grid - 1)
+    cells = pd.Series(1, index=pd.MultiIndex.from_arrays([ix, iy])).groupby(level=[0, 1]).sum()
+
+    return {
+        "title": title, "xlabel": xlabel, "ylabel": ylabel,
+        "extent": [round(x0, 3), round(x1, 3), round(y0, 3), round(y1, 3)],
+        "grid": grid,
+        "cells": [[int(i), int(j), int(c)] for (i, j), c in cells.items()],
+        "points": [[round(float(x[i]), 3), round(float(y[i]), 3), str(genes[i]), info[i]] for i in pts],
+        "vlines": list(vlines), "hlines": list(hlines),
+    }
+
+
+def write_interactive_html(panel_args, out_path, max_points=HTML_MAX_POINTS, max_bytes=HTML_MAX_BYTES):
+    """Panelleri tek HTML dosyasına göm; max_bytes aşılırsa nokta sayısını yarıya indir."""
+    while True:
+        panels = [p for p in (html_panel(*a, max_points=max_points, **kw) for a, kw in panel_args) if p]
+        html = HTML_TEMPLATE.replace("__ALPHA__", str(ALPHA)).replace(
+            "__DATA__", json.dumps(panels, separators=(",", ":")))
+        size = len(html.encode("utf-8"))
+        if size <= max_bytes or max_points <= 50:
+            break
+        max_points //= 2
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return size, max_points
+
+
+def main():
+    os.makedirs(PLOT_DIR, exist_ok=True)
+    prof = StepProfiler("step4c", log_dir=RUN_LOG_DIR)
+    figures = FigureBatch("step4c", OUT_DIR)
+
+    prof.begin("read")
+    os_idx = load_results(OS_PATH, "OS")
+    dfs_idx = load_results(DFS_PATH, "DFS")
+    prof.end(rows_out=len(os_idx) + len(dfs_idx))
+
+    # ------------------------------------------------------------
+    # 1) Volcano: log2(HR) vs -log10(p)
+    # ------------------------------------------------------------
+    prof.begin("volcano", rows_in=len(os_idx) + len(dfs_idx))
+    hl = {}
+    for label, df, name, title in [
+        ("OS", os_idx, "bigpic_os_volcano", "OS: Etki (log2(HR)) vs Anlamlılık (-log10 p)"),
+        ("DFS", dfs_idx, "bigpic_dfs_volcano", "DFS/PFS: Etki (log2(HR)) vs Anlamlılık (-log10 p)"),
+    ]:
+        p = df["p_value"].to_numpy()
+        hl[label] = highlight_mask(p)
+        add_figure(figures, name, render_volcano, df["log2HR"].to_numpy(), df["neglog10_p"].to_numpy(),
+                   hl[label], top_label_index(p, hl[label]), df.index.to_numpy(), title)
+
+    # ------------------------------------------------------------
+    # 2) Top 10 bar: -log10(p)
+    # ------------------------------------------------------------
+    prof.begin("top10 bars")
+    for df, name, title in [
+        (os_idx, "bigpic_os_top10_p", "OS: En anlamlı Top 10 gen (-log10 p)"),
+        (dfs_idx, "bigpic_dfs_top10_p", "DFS: En anlamlı Top 10 gen (-log10 p)"),
+    ]:
+        tmp = df.nsmallest(10, "p_value")
+        add_figure(figures, name, render_top_bar, tmp.index.to_numpy(), tmp["neglog10_p"].to_numpy(), title)
+
+    # ------------------------------------------------------------
+    # 3) OS vs DFS log2(HR) scatter (ortak genler, index join)
+    # ------------------------------------------------------------
+    prof.begin("OS vs DFS scatter")
+    merged = os_idx.join(dfs_idx, how="inner", lsuffix="_OS", rsuffix="_DFS")
+    if merged.shape[0] > 0:
+        p_min = np.fmin(merged["p_value_OS"].to_numpy(), merged["p_value_DFS"].to_numpy())
+        hl_both = highlight_mask(p_min)
+        add_figure(figures, "bigpic_os_vs_dfs_log2hr_scatter", render_os_vs_dfs,
+                   merged["log2HR_OS"].to_numpy(), merged["log2HR_DFS"].to_numpy(),
+                   hl_both, top_label_index(p_min, hl_both), merged.index.to_numpy())
+    else:
+        print("Uyarı: OS ve DFS tablolarında ortak gen bulunamadı, scatter çizilmedi.")
+
+    # ------------------------------------------------------------
+    # 4) Yön matrisi (Top 10 OS + Top 10 DFS genleri)
+    # ------------------------------------------------------------
+    prof.begin("direction matrix")
+    top_os = os_idx.nsmallest(10, "p_value").index.tolist()
+    top_dfs = dfs_idx.nsmallest(10, "p_value").index.tolist()
+    genes = list(dict.fromkeys(top_os + top_dfs))
+    mat_log2 = log2hr(direction_matrix(os_idx, dfs_idx, genes))
+    add_figure(figures, "bigpic_direction_matrix_log2hr", render_direction_matrix, mat_log2, genes)
+    prof.end(rows_out=len(genes))
+
+    # ------------------------------------------------------------
+    # 5) Etkileşimli HTML (tek dosya, boyutu sınırlı)
+    # ------------------------------------------------------------
+    if figures.enabled:
+        prof.begin("interactive html")
+
+        def info(df):
+            return [f"p={p:.3g}, HR={h:.3g}" for p, h in zip(df["p_value"], df["HR"])]
+
+        panel_args = [
+            (("OS volcano", "log2(HR)", "-log10(p)", os_idx["log2HR"], os_idx["neglog10_p"], os_idx.index,
+              info(os_idx), hl["OS"]), {"hlines": [float(-np.log10(ALPHA))]}),
+            (("DFS/PFS volcano", "log2(HR)", "-log10(p)", dfs_idx["log2HR"], dfs_idx["neglog10_p"], dfs_idx.index,
+              info(dfs_idx), hl["DFS"]), {"hlines": [float(-np.log10(ALPHA))]}),
+        ]
+        if merged.shape[0] > 0:
+            panel_args.append((("OS vs DFS log2(HR)", "log2(HR) OS", "log2(HR) DFS", merged["log2HR_OS"],
+                                merged["log2HR_DFS"], merged.index,
+                                [f"p_OS={a:.3g}, p_DFS={b:.3g}" for a, b in
+                                 zip(merged["p_value_OS"], merged["p_value_DFS"])], hl_both),
+                               {"hlines": [0.0]}))
+        size, n_points = write_interactive_html(panel_args, HTML_PATH)
+        print(f"🌐 Etkileşimli HTML: {HTML_PATH} ({size / 1024:.0f} KB, panel başına ≤{n_points} nokta)")
+        prof.end()
+
+    ph = prof.begin("figures")
+    ph["extra"].update(figures.close())
+    prof.end()
+    prof.finish()
+
+    print("\n✅ STEP 4C bitti. Grafikler kaydedildi:")
+    print("->", PLOT_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import os
+import io
+import contextlib
+import numpy as np
+import pandas as pd
+
+from instrumentation import StepProfiler
+from config import base_dir, configure
+from figures import FigureBatch
+from patient_table import load_patient_table
+
+# ============================================================
+# Alt grup analizi (klinik katmanlar)
+# - step4B sonuçları tüm kohort üzerinden; HCC'de etkiler etiyoloji / evre / cinsiyet /
+#   fibroz ile değişir. Bu adım STRATA'daki her değişkenin her düzeyinde (katman):
+#     * gen özelliklerini (step1; hypermutator ağırlıkları step1'in patient_weights'iyle)
+#       ve gene_priority_score'u (step2) yeniden hesaplar
+#     * OS / DFS gen taramasını (step4B survival_scan) tekrar koşar
+# - Mutasyon verisi bir kez kurulur ve paylaşılır (MAF satır dizileri + gen->hasta dizileri);
+#   katman = patient_idx maskesi: satırlar mask[patient_idx] ile seçilir, DataFrame tekrar
+#   filtrelenmez. Katmanlar process pool'da (joblib/loky) eşzamanlı koşar; büyük diziler
+#   worker'lara memmap ile paylaşılır.
+# - Etkileşim testi (gen x değişken x endpoint): Cox LR testi
+#     T,E ~ mut + katman + mut:katman   vs   T,E ~ mut + katman   (df = düzey sayısı - 1)
+# Inputs:
+#   outputs/patient_table.csv, outputs/patient_aliquots.csv, merged_LIHC_MAF.csv
+#   outputs/gene_priority_score.csv (gen listesi: top SUBGROUP_TOP_N)
+#   outputs/patient_burden.csv      ([step1] hypermutator_mode "none" değilse)
+# Outputs (uzun format):
+#   outputs/subgroup_gene_features.csv   variable, stratum, Hugo_Symbol, step1 özellikleri, gene_priority_score
+#   outputs/subgroup_survival.csv        variable, stratum, endpoint, gene, n_mut, n_wt, p_value, HR, p_interaction
+#   outputs/subgroup_interaction.csv     variable, endpoint, gene, lr_stat, df, p_interaction, q_interaction
+#   outputs/subgroup_top_interactions.png
+# ============================================================
+
+BASE_DIR = base_dir()   # LIHC_BASE_DIR > lihc.toml [paths] base_dir > varsayılan (config.py)
+OUT_DIR = os.path.join(BASE_DIR, "outputs")
+
+MAF_PATH = os.path.join(BASE_DIR, "merged_LIHC_MAF.csv")
+PATIENT_TABLE_PATH = os.path.join(OUT_DIR, "patient_table.csv")
+ALIQUOT_PATH = os.path.join(OUT_DIR, "patient_aliquots.csv")
+SCORE_PATH = os.path.join(OUT_DIR, "gene_priority_score.csv")
+BURDEN_PATH = os.path.join(OUT_DIR, "patient_burden.csv")
+
+FEATURES_PATH = os.path.join(OUT_DIR, "subgroup_gene_features.csv")
+SURVIVAL_PATH = os.path.join(OUT_DIR, "subgroup_survival.csv")
+INTERACTION_PATH = os.path.join(OUT_DIR, "subgroup_interaction.csv")
+PLOT_PATH = os.path.join(OUT_DIR, "subgroup_top_interactions.png")
+
+# Katman değişkenleri: patient_table.csv kolonları (clinical_io alan adları).
+# Etiyoloji (HBV / HCV / alkol) kolonu tabloya eklenirse buraya yazılması yeterli.
+STRATA = ["gender", "ajcc_pathologic_stage", "ishak_fibrosis_score", "tumor_grade"]
+# Ham düzeyleri gruplara topla (regex, baştan eşleşme); eşleşmeyen değer (Unknown ...) -> katman dışı.
+# Burada olmayan değişkenlerde ham değerler kullanılır (DROP_LEVELS hariç).
+STRATUM_GROUPS = {
+    "ajcc_pathologic_stage": {"I-II": r"^Stage I{1,2}[A-C]?$", "III-IV": r"^Stage (III|IV)[A-C]?$"},
+    "ishak_fibrosis_score": {"F0-4": r"^[0-4]", "F5-6": r"^[56]"},
+    "tumor_grade": {"G1-2": r"^G[12]$", "G3-4": r"^G[34]$"},
+}
+DROP_LEVELS = ["Unknown", "unknown", "Not Reported", "not reported", "Not Allowed To Collect", "GX"]
+MIN_STRATUM_PATIENTS = 30    # bundan küçük katmanlar atlanır
+SUBGROUP_TOP_N = 100         # taranan gen sayısı (gene_priority_score top N)
+MIN_MUT_PATIENTS = 5         # katman içinde mutant / WT alt sınırları (step4B'den düşük: katmanlar küçük)
+MIN_WT_PATIENTS = 5
+INTERACTION_MIN_MUT = 3      # etkileşim testi: her düzeyde en az bu kadar mutant hasta
+N_JOBS = -1
+
+RUN_LOG_DIR = os.path.join(OUT_DIR, "run_logs")
+configure(globals(), "subgroups")
+
+ENDPOINTS = [("OS", "OS_time", "OS_event"), ("DFS", "DFS_time", "DFS_event")]
+
+
+# ------------------------------------------------------------
+# 1) Katmanlar
+# ------------------------------------------------------------
+def stratum_levels(values, variable, groups=STRATUM_GROUPS, drop=DROP_LEVELS):
+    """Ham değerler -> katman düzeyi (grup adı / ham değer); katman dışı -> NaN."""
+    values = pd.Series(values, dtype="string")
+    if variable not in groups:
+        return values.where(~values.isin(drop))
+    out = pd.Series(pd.NA, index=values.index, dtype="string")
+    for label, pattern in groups[variable].items():
+        hit = values.str.match(pattern).fillna(False).astype(bool) & out.isna()
+        out[hit] = label
+    return out
+
+
+def build_strata(patients, strata=STRATA, min_patients=MIN_STRATUM_PATIENTS):
+    """
+    [(variable, level, patient_idx dizisi)] + {variable: düzey Series (patient_idx sırasında)}.
+    Sadece MAF'ta olan hastalar; min_patients'tan küçük düzeyler atlanır.
+    """
+    specs, levels = [("all", "all", patients.loc[patients["in_maf"], "patient_idx"].to_numpy(np.int64))], {}
+    for var in strata:
+        if var not in patients.columns:
+            print(f"⚠ {var} patient_table.csv'de yok, atlandı")
+            continue
+        lv = stratum_levels(patients[var], var)
+        lv[~patients["in_maf"].to_numpy(bool)] = pd.NA
+        counts = lv.value_counts()
+        keep = counts[counts >= min_patients].index
+        small = counts[counts < min_patients]
+        if len(small):
+            print(f"   {var}: küçük katmanlar atlandı {small.to_dict()}")
+        if len(keep) < 2:
+            print(f"⚠ {var}: >= {min_patients} hastalı en az iki düzey yok, atlandı")
+            continue
+        lv = lv.where(lv.isin(keep))
+        levels[var] = lv
+        for level in sorted(keep):
+            specs.append((var, level, np.flatnonzero((lv == level).fillna(False).to_numpy(bool)).astype(np.int64)))
+    return specs, levels
+
+
+# ------------------------------------------------------------
+# 2) Paylaşılan mutasyon verisi
+# ------------------------------------------------------------
+def load_mutation_arrays(maf_path=MAF_PATH, aliquot_path=ALIQUOT_PATH):
+    """
+    MAF satırları numpy dizileri olarak (step1 kolonları): gene kodu, patient_idx,
+    HIGH impact / hotspot bayrakları + tekil (gen, hasta) çiftleri.
+    """
+    from patient_table import load_aliquots, barcode_to_patient_idx
+    from step1_gene_feature_table import is_hotspot
+
+    cols = ["Hugo_Symbol", "Tumor_Sample_Barcode", "IMPACT", "hotspot"]
+    maf = pd.read_csv(maf_path, usecols=cols, low_memory=False)
+    pidx = barcode_to_patient_idx(maf["Tumor_Sample_Barcode"], load_aliquots(aliquot_path))
+    keep = (pidx >= 0) & maf["Hugo_Symbol"].notna().to_numpy()
+    gene_code, genes = pd.factorize(maf["Hugo_Symbol"].to_numpy()[keep], sort=True)
+    arrays = {
+        "gene": gene_code.astype(np.int64),
+        "pidx": pidx[keep],
+        "high": (maf["IMPACT"] == "HIGH").to_numpy()[keep],
+        "hot": is_hotspot(maf["hotspot"])[keep],   # step1 ile aynı kural
+    }
+    pair = np.unique(arrays["gene"] * (int(pidx.max(initial=0)) + 1) + arrays["pidx"])
+    arrays["pair_gene"] = pair // (int(pidx.max(initial=0)) + 1)
+    arrays["pair_pidx"] = pair % (int(pidx.max(initial=0)) + 1)
+    print("merged MAF:", maf.shape, "->", len(arrays["gene"]), "satır,", len(genes), "gen")
+    return arrays, np.asarray(genes, dtype=str)
+
+
+def patient_weight_array(patients, burden_path=BURDEN_PATH):
+    """
+    patient_idx sırasında hasta ağırlıkları: step1'in patient_weights'i ve [step1] hypermutator_mode'u
+    (katman özellikleri ana skorlarla aynı ağırlıklandırmayı kullanır). "none" -> hepsi 1.
+    """
+    import step1_gene_feature_table as s1
+    from patient_table import load_burden
+
+    if s1.HYPERMUTATOR_MODE == "none":
+        return np.ones(len(patients))
+    weights = s1.patient_weights(pd.Index(patients["patient_id"]), load_burden(burden_path), s1.HYPERMUTATOR_MODE)
+    print(f"Hypermutator ({s1.HYPERMUTATOR_MODE}): {int((weights < 1).sum())} hasta düşük ağırlıklı")
+    return weights
+
+
+def stratum_gene_features(arrays, genes, mask, weights):
+    """
+    step1 gen özellik tablosu, sadece mask'teki hastalar (bincount; DataFrame filtresi yok).
+    weights: patient_idx başına hasta ağırlığı (patient_weight_array); n_patients / patient_frequency
+    step1'deki gibi ağırlıklıdır.
+    """
+    rm = mask[arrays["pidx"]]
+    g = arrays["gene"][rm]
+    n = len(genes)
+    pm = mask[arrays["pair_pidx"]]
+    n_patients = float(weights[mask].sum())
+    pair_counts = np.bincount(arrays["pair_gene"][pm], weights=weights[arrays["pair_pidx"][pm]], minlength=n)
+    if (weights[mask] == 1).all():
+        pair_counts = pair_counts.astype(np.int64)     # ağırlıksız: step1 gibi tamsayı hasta sayısı
+    feats = pd.DataFrame({
+        "Hugo_Symbol": genes,
+        "n_mutations": np.bincount(g, minlength=n),
+        "n_patients": pair_counts,
+        "n_high_impact": np.bincount(g, weights=arrays["high"][rm], minlength=n),
+        "hotspot_count": np.bincount(g, weights=arrays["hot"][rm], minlength=n),
+    })
+    feats = feats[feats["n_mutations"] > 0].copy()
+    feats["high_impact_ratio"] = feats["n_high_impact"] / feats["n_mutations"]
+    feats["patient_frequency"] = feats["n_patients"] / max(n_patients, 1)
+    return feats.sort_values("n_mutations", ascending=False, kind="mergesort").reset_index(drop=True)
+
+
+# ------------------------------------------------------------
+# 3) Katman işi + etkileşim işi (worker'larda)
+# ------------------------------------------------------------
+def run_stratum(variable, level, rows, shared):
+    """Tek katman: gen özellikleri + skor (step1/step2) ve OS / DFS taraması (step4B)."""
+    from step2_gene_priority_score import compute_gene_priority_score
+    from step4B_survival_by_gene import survival_scan
+
+    mask = np.zeros(shared["n_patients"], dtype=bool)
+    mask[rows] = True
+    with contextlib.redirect_stdout(io.StringIO()):   # step2/step4B çıktıları katman başına basılmasın
+        feats = stratum_gene_features(shared["arrays"], shared["genes"], mask, shared["weights"])
+        scored = compute_gene_priority_score(feats)
+        scored.insert(0, "stratum", level)
+        scored.insert(0, "variable", variable)
+        scored["rank"] = np.arange(1, len(scored) + 1)
+
+        scans = []
+        for ep, t, e in ENDPOINTS:
+            surv = shared["endpoints"][ep]
+            sub = surv.iloc[np.flatnonzero(mask[surv["patient_idx"].to_numpy(np.int64)])]
+            res = survival_scan(sub, t, e, shared["gene_list"], shared["gene_to_patients"],
+                                shared["min_mut"], shared["min_wt"], (),
+                                shared["horizons_years"], shared["rmst_tau_years"])
+            res = res.rename(columns=lambda c: c.replace(f"_{ep}_", "_"))   # OS / DFS aynı kolonlarda
+            res.insert(0, "n_stratum", len(sub))
+            res.insert(0, "endpoint", ep)
+            res.insert(0, "stratum", level)
+            res.insert(0, "variable", variable)
+            scans.append(res)
+    return scored, pd.concat(scans, ignore_index=True)
+
+
+def interaction_test(surv_df, time_col, event_col, levels, gene_list, gene_to_patients,
+                     min_mut=INTERACTION_MIN_MUT):
+    """Gen başına Cox LR etkileşim testi (mut x katman düzeyi)."""
+    from scipy.stats import chi2
+    from lifelines import CoxPHFitter
+    from step4B_survival_by_gene import patient_mask
+
+    df = surv_df[["patient_idx", time_col, event_col]].copy()
+    df["level"] = levels.to_numpy()[df["patient_idx"].to_numpy(np.int64)]
+    df = df.dropna(subset=["level"]).reset_index(drop=True)
+    dummies = pd.get_dummies(df["level"], prefix="L", drop_first=True, dtype=float)
+    base = pd.concat([df[[time_col, event_col]].set_axis(["T", "E"], axis=1), dummies], axis=1)
+    pidx = df["patient_idx"].to_numpy(np.int64)
+    dof = dummies.shape[1]
+    rows = []
+    for gene in gene_list:
+        mut = patient_mask(pidx, gene_to_patients.get(gene, np.array([], dtype=np.int64))).astype(float)
+        per_level = pd.Series(mut).groupby(df["level"]).agg(["sum", "count"])
+        if dof < 1 or (per_level["sum"] < min_mut).any() or ((per_level["count"] - per_level["sum"]) < min_mut).any():
+            continue
+        red = base.assign(mut=mut)
+        full = red.copy()
+        for c in dummies.columns:
+            full[f"mut:{c}"] = mut * dummies[c].to_numpy()
+        try:
+            ll_red = CoxPHFitter().fit(red, "T", "E").log_likelihood_
+            ll_full = CoxPHFitter().fit(full, "T", "E").log_likelihood_
+        except Exception:
+            continue
+        lr = max(2.0 * (ll_full - ll_red), 0.0)
+        rows.append({"gene": gene, "lr_stat": lr, "df": dof, "p_interaction": float(chi2.sf(lr, dof))})
+    return pd.DataFrame(rows, columns=["gene", "lr_stat", "df", "p_interaction"])
+
+
+def run_interaction(variable, endpoint, shared):
+    ep = {e: (t, ev) for e, t, ev in ENDPOINTS}[endpoint]
+    res = interaction_test(shared["endpoints"][endpoint], ep[0], ep[1], shared["levels"][variable],
+                           shared["gene_list"], shared["gene_to_patients"])
+    res.insert(0, "endpoint", endpoint)
+    res.insert(0, "variable", variable)
+    return res
+
+
+def bh_qvalues(p):
+    """Benjamini-Hochberg q değerleri."""
+    p = np.asarray(p, dtype=float)
+    n = len(p)
+    if n == 0:
+        return p
+    order = np.argsort(p)
+    q = p[order] * n / np.arange(1, n + 1)
+    q = np.minimum.accumulate(q[::-1])[::-1]
+    out = np.empty(n)
+    out[order] = np.minimum(q, 1.0)
+    return out
+
+
+def render_top_interactions(surv, top):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, max(3, 0.45 * len(top))))
+    for i, (var, ep, gene) in enumerate(top):
+        sub = surv[(surv["variable"] == var) & (surv["endpoint"] == ep) & (surv["gene"] == gene)]
+        for _, r in sub.iterrows():
+            ax.scatter(np.log2(r["cox_hr_mut_vs_wt"]), i, s=30)
+            ax.annotate(str(r["stratum"]), (np.log2(r["cox_hr_mut_vs_wt"]), i), fontsize=7,
+                        xytext=(3, 3), textcoords="offset points")
+    ax.axvline(0, color="gray", lw=0.8)
+    ax.set_yticks(range(len(top)))
+    ax.set_yticklabels([f"{g} ({ep}, {v})" for v, ep, g in top], fontsize=8)
+    ax.invert_yaxis()
+    ax.set_xlabel("log2 HR (mutant vs WT), katman başına")
+    plt.title("En güçlü gen x katman etkileşimleri")
+    plt.tight_layout()
+
+
+def main():
+    from joblib import Parallel, delayed
+    from step4B_survival_by_gene import (load_maf_patients, build_gene_to_patients, select_genes,
+                                         prepare_endpoint, KM_HORIZONS_YEARS, RMST_TAU_YEARS)
+
+    prof = StepProfiler("subgroups", log_dir=RUN_LOG_DIR)
+    figures = FigureBatch("subgroups", OUT_DIR)
+
+    with prof.phase("load") as ph:
+        patients = load_patient_table(PATIENT_TABLE_PATH)
+        arrays, genes = load_mutation_arrays(MAF_PATH, ALIQUOT_PATH)
+        gene_to_patients = build_gene_to_patients(load_maf_patients(MAF_PATH, ALIQUOT_PATH))
+        gene_list = select_genes(gene_to_patients, SCORE_PATH, SUBGROUP_TOP_N)
+        weights = patient_weight_array(patients, BURDEN_PATH)
+        ph["rows_out"] = len(arrays["gene"])
+
+    with prof.phase("strata") as ph:
+        specs, levels = build_strata(patients)
+        ph["rows_out"] = len(specs)
+    print("\n👥 Katmanlar:")
+    for var, level, rows in specs:
+        print(f"   {var:<24} {level:<12} n={len(rows)}")
+
+    shared = {
+        "n_patients": len(patients),
+        "weights": weights,
+        "arrays": arrays,
+        "genes": genes,
+        "gene_list": gene_list,
+        "gene_to_patients": {g: gene_to_patients[g] for g in gene_list if g in gene_to_patients},
+        "endpoints": {ep: prepare_endpoint(patients[["patient_idx", t, e]], t, e) for ep, t, e in ENDPOINTS},
+        "levels": levels,
+        "min_mut": MIN_MUT_PATIENTS,
+        "min_wt": MIN_WT_PATIENTS,
+        # KM ufukları / RMST sınırı step4B'nin [step4b] ayarları (ana tarama ile aynı kolonlar)
+        "horizons_years": list(KM_HORIZONS_YEARS),
+        "rmst_tau_years": float(RMST_TAU_YEARS),
+    }
+    jobs = [delayed(run_stratum)(var, level, rows, shared) for var, level, rows in specs]
+    jobs += [delayed(run_interaction)(var, ep, shared) for var in levels for ep, _, _ in ENDPOINTS]
+    with prof.phase("parallel scans", rows_in=len(jobs)) as ph:
+        print(f"\n⚙ {len(specs)} katman + {len(jobs) - len(specs)} etkileşim işi, {len(gene_list)} gen "
+              f"(n_jobs={N_JOBS})")
+        out = Parallel(n_jobs=N_JOBS, backend="loky")(jobs)
+        ph["extra"]["n_strata"] = len(specs)
+
+    with prof.phase("merge") as ph:
+        features = pd.concat([o[0] for o in out[:len(specs)]], ignore_index=True)
+        surv = pd.concat([o[1] for o in out[:len(specs)]], ignore_index=True)
+        inter_parts = [o for o in out[len(specs):] if len(o)]
+        inter = (pd.concat(inter_parts, ignore_index=True) if inter_parts
+                 else pd.DataFrame(columns=["variable", "endpoint", "gene", "lr_stat", "df", "p_interaction"]))
+        inter["q_interaction"] = np.nan
+        for _, idx in inter.groupby(["variable", "endpoint"]).groups.items():
+            inter.loc[idx, "q_interaction"] = bh_qvalues(inter.loc[idx, "p_interaction"])
+        inter = inter.sort_values("p_interaction", kind="mergesort").reset_index(drop=True)
+        surv = surv.merge(inter[["variable", "endpoint", "gene", "p_interaction", "q_interaction"]],
+                          on=["variable", "endpoint", "gene"], how="left")
+        surv = surv.merge(features[["variable", "stratum", "Hugo_Symbol", "gene_priority_score", "patient_frequency"]]
+                          .rename(columns={"Hugo_Symbol": "gene"}), on=["variable", "stratum", "gene"], how="left")
+        ph["rows_out"] = len(surv)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    features.to_csv(FEATURES_PATH, index=False)
+    surv.to_csv(SURVIVAL_PATH, index=False)
+    inter.to_csv(INTERACTION_PATH, index=False)
+
+    top = [tuple(r) for r in inter[["variable", "endpoint", "gene"]].head(10).itertuples(index=False)]
+    if top:
+        figures.add(PLOT_PATH, render_top_interactions, surv, top)
+    with prof.phase("figures") as ph:
+        ph["extra"].update(figures.close())
+    prof.finish()
+
+    print("\n✅ Katman gen özellikleri:", FEATURES_PATH)
+    print("✅ Katman OS / DFS taramaları:", SURVIVAL_PATH, f"({len(surv)} satır)")
+    print("✅ Etkileşim testleri:", INTERACTION_PATH, f"({len(inter)} gen x değişken x endpoint)")
+    if len(inter):
+        print("\nEn güçlü etkileşimler:")
+        print(inter.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
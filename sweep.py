@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import time
+import shutil
+import argparse
+import itertools
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (load_config, parse_value, parse_overrides, overrides_env, validate, step_scripts,
+                    ConfigError, ENV_CONFIG, ENV_SET, PATHS_SECTION)
+from pipeline import STEPS, build_graph, select_steps, run_pipeline
+
+# ============================================================
+# Parametre taraması (sensitivity / sweep runner)
+# - Grid: "adım.anahtar" -> değer listesi; kartezyen çarpımın her noktası bir koşu
+#     python sweep.py --grid step4b.min_mut_patients=5,10,20
+#     python sweep.py --grid step3b.k_max=8,12,16 --grid step3b.seed=1,2 -j 3
+#     python sweep.py --spec sweeps/min_mut.toml          # [grid] / [set] tabloları + name
+# - Grid'de (veya --set'te) geçen adımlar + downstream'leri "etkilenen" adımlardır.
+#   Upstream adımlar base_dir'de bir kez çalışır (pipeline hash kontrolüyle; güncelse atlanır).
+#   Her koşu kendi klasöründe (outputs/sweeps/<ad>/<koşu>/) sadece etkilenen adımları
+#   çalıştırır; upstream çıktıları koşu klasörüne hard link edilir (kopya yok), memo
+#   cache base_dir'deki ile paylaşılır (aynı MAF -> aynı gen/hasta setleri, tek hesap).
+# - Koşular paralel (-j), her biri kendi pipeline state'i ile: aynı sweep tekrar
+#   çalıştırılınca güncel koşular atlanır.
+# - Özet: outputs/sweeps/<ad>/sweep_runs.csv (koşu, parametreler, durum, süre, klasör)
+# ============================================================
+
+SWEEP_DIR = os.path.join("outputs", "sweeps")
+MAX_PARALLEL_RUNS = 2
+STEP_WORKERS = 2          # koşu içi paralel adım sayısı
+PARAMS_FILE = "sweep_params.json"
+
+
+def parse_grid_item(text):
+    """'step4b.min_mut_patients=5,10,20' -> ('step4b.min_mut_patients', [5, 10, 20])."""
+    key, sep, values = text.partition("=")
+    if not sep or "." not in key:
+        raise ConfigError(f"Grid 'bölüm.anahtar=d1,d2,...' biçiminde olmalı: {text!r}")
+    try:
+        vals = tomllib.loads(f"v = [{values}]")["v"]
+    except tomllib.TOMLDecodeError:
+        vals = [parse_value(v.strip()) for v in values.split(",")]
+    return key.strip(), vals
+
+
+def load_spec(path):
+    with open(path, "rb") as f:
+        spec = tomllib.load(f)
+    return {
+        "name": spec.get("name") or os.path.splitext(os.path.basename(path))[0],
+        "grid": {k: v if isinstance(v, list) else [v] for k, v in spec.get("grid", {}).items()},
+        "set": dict(spec.get("set", {})),
+        "targets": list(spec.get("steps", [])),
+    }
+
+
+def expand_grid(grid):
+    """{anahtar: [değerler]} -> [{anahtar: değer}, ...] (kartezyen çarpım, sıra korunur)."""
+    keys = list(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+def run_label(params):
+    text = "__".join(f"{k.split('.', 1)[1]}={json.dumps(v) if not isinstance(v, str) else v}"
+                     for k, v in params.items())
+    return re.sub(r"[^A-Za-z0-9_.=+-]", "_", text) or "default"
+
+
+def affected_steps(sections, steps=STEPS):
+    """Parametresi değişen adımlar + tüm downstream'leri (pipeline sırasıyla)."""
+    deps = build_graph(steps)
+    hit = {st["name"] for st in steps if st["name"] in sections}
+    changed = True
+    while changed:
+        changed = False
+        for st in steps:
+            if st["name"] not in hit and any(d in hit for d in deps[st["name"]]):
+                hit.add(st["name"])
+                changed = True
+    return [st["name"] for st in steps if st["name"] in hit]
+
+
+def link_into(src_root, dst_root, rel):
+    """src_root/rel -> dst_root/rel hard link (klasörse dosya dosya); link olmazsa kopya."""
+    src = os.path.join(src_root, rel)
+    dst = os.path.join(dst_root, rel)
+    if os.path.isdir(src):
+        for root, _, files in os.walk(src):
+            for fn in files:
+                link_into(src_root, dst_root, os.path.relpath(os.path.join(root, fn), src_root))
+        return
+    if not os.path.exists(src):
+        return
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def shared_inputs(run_steps, steps=STEPS):
+    """Koşu adımlarının, koşu dışında üretilen (paylaşılan) girdileri."""
+    by_name = {st["name"]: st for st in steps}
+    produced = {o for n in run_steps for o in by_name[n]["outputs"]}
+    return sorted({i for n in run_steps for i in by_name[n]["inputs"] if i not in produced})
+
+
+def run_sweep(grid, base_dir, name="sweep", fixed=None, targets=None, max_parallel=MAX_PARALLEL_RUNS,
+              step_workers=STEP_WORKERS, plots=True, dry_run=False, config_file=None):
+    """Grid'i koşulara aç, upstream'i bir kez çalıştır, koşuları paralel yürüt; özet satırları döndür."""
+    fixed = dict(fixed or {})
+    base_dir = os.path.abspath(base_dir)
+    env_base = {}
+    if config_file:
+        env_base[ENV_CONFIG] = os.path.abspath(config_file)
+
+    # Tüm koşuların config'i baştan doğrulanır (koşular başladıktan sonra tip hatası olmasın)
+    points = expand_grid(grid)
+    scripts = step_scripts()
+    for params in points:
+        cfg = load_config(env_base.get(ENV_CONFIG), {**fixed, **params}, environ={})
+        errors = validate(cfg, scripts)
+        if errors:
+            raise ConfigError("Geçersiz sweep parametreleri:\n  " + "\n  ".join(errors))
+
+    sections = {k.split(".", 1)[0] for k in list(grid) + list(fixed)} - {PATHS_SECTION}
+    run_steps = affected_steps(sections)
+    if targets:
+        wanted = set(select_steps(STEPS, targets))
+        run_steps = [n for n in run_steps if n in wanted]
+    if not run_steps:
+        raise ConfigError(f"Grid hiçbir pipeline adımını etkilemiyor: {sorted(sections)}")
+    upstream = [n for n in select_steps(STEPS, run_steps) if n not in run_steps]
+
+    sweep_dir = os.path.join(base_dir, SWEEP_DIR, name)
+    print(f"🧪 Sweep '{name}': {len(points)} koşu, adımlar: {', '.join(run_steps)}")
+    print(f"   paylaşılan upstream: {', '.join(upstream) or '-'}  ->  {sweep_dir}")
+
+    # 1) Upstream: base_dir'de bir kez (güncelse atlanır), sweep parametreleri olmadan
+    if upstream:
+        print("\n▶  Upstream adımlar (base_dir)")
+        _, failed = run_pipeline(base_dir, upstream, dry_run=dry_run, max_workers=step_workers, plots=plots,
+                                 env=env_base)
+        if failed:
+            raise RuntimeError(f"Upstream adım(lar) başarısız: {sorted(failed)}; sweep durduruldu.")
+
+    memo_dir = os.path.join(base_dir, "outputs", ".memo_cache")
+    inputs = shared_inputs(run_steps)
+
+    def one(i, params):
+        label = run_label(params)
+        run_dir = os.path.join(sweep_dir, label)
+        overrides = {**fixed, **params, f"{PATHS_SECTION}.memo_dir": memo_dir}
+        row = {"run": label, **params, "status": "", "seconds": 0.0, "dir": run_dir}
+        if dry_run:
+            row["status"] = "dry-run"
+            return row
+        os.makedirs(run_dir, exist_ok=True)
+        for rel in inputs:
+            link_into(base_dir, run_dir, rel)
+        with open(os.path.join(run_dir, PARAMS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"sweep": name, "params": params, "fixed": fixed}, f, indent=1)
+
+        t0 = time.time()
+        print(f"▶  [{i + 1}/{len(points)}] {label}")
+        # sadece etkilenen adımlar: upstream çıktıları link edilmiş girdi dosyalarıdır
+        summary, failed = run_pipeline(run_dir, run_steps, max_workers=step_workers, plots=plots,
+                                       steps=[st for st in STEPS if st["name"] in run_steps],
+                                       env={**env_base, ENV_SET: overrides_env(overrides)})
+        row["seconds"] = round(time.time() - t0, 2)
+        row["status"] = "HATA: " + ", ".join(sorted(failed)) if failed else \
+            "ok" if any(s == "çalıştı" for _, s, _ in summary) else "güncel"
+        print(f"{'❌' if failed else '✅'} [{i + 1}/{len(points)}] {label}: {row['status']} ({row['seconds']} sn)")
+        return row
+
+    # 2) Koşular: paralel, her biri kendi klasörü + pipeline state'i
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        rows = list(pool.map(lambda a: one(*a), enumerate(points)))
+
+    if not dry_run:
+        import pandas as pd
+        os.makedirs(sweep_dir, exist_ok=True)
+        pd.DataFrame(rows).to_csv(os.path.join(sweep_dir, "sweep_runs.csv"), index=False)
+    return rows
+
+
+def main(argv=None):
+    from config import base_dir as config_base_dir
+
+    ap = argparse.ArgumentParser(description="Parametre grid'i için paralel pipeline koşuları (sweep)")
+    ap.add_argument("--grid", action="append", default=[], metavar="BÖLÜM.ANAHTAR=D1,D2,...",
+                    help="Taranacak parametre (tekrarlanabilir; kartezyen çarpım)")
+    ap.add_argument("--set", action="append", default=[], metavar="BÖLÜM.ANAHTAR=DEĞER",
+                    help="Tüm koşularda sabit override")
+    ap.add_argument("--spec", default=None, help="TOML sweep tanımı (name, steps, [grid], [set])")
+    ap.add_argument("--name", default=None, help="Sweep adı (klasör: outputs/sweeps/<ad>)")
+    ap.add_argument("--steps", nargs="+", default=None, help="Sadece bu adımlara kadar koş (örn. step4b)")
+    ap.add_argument("--base-dir", default=None, help="Veri klasörü (varsayılan: config [paths] base_dir)")
+    ap.add_argument("--config", default=None, help=f"Config dosyası ({ENV_CONFIG}; varsayılan: lihc.toml)")
+    ap.add_argument("-j", "--jobs", type=int, default=MAX_PARALLEL_RUNS, help="Paralel koşu sayısı")
+    ap.add_argument("--step-jobs", type=int, default=STEP_WORKERS, help="Koşu içi paralel adım sayısı")
+    ap.add_argument("--no-plots", action="store_true", help="Grafik üretme (LIHC_PLOTS=0)")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+
+    spec = load_spec(args.spec) if args.spec else {"name": "sweep", "grid": {}, "set": {}, "targets": []}
+    grid = {**spec["grid"], **dict(parse_grid_item(g) for g in args.grid)}
+    if not grid:
+        ap.error("En az bir --grid (veya --spec içinde [grid]) gerekli")
+    fixed = {**spec["set"], **parse_overrides(args.set)}
+    if args.config:
+        os.environ[ENV_CONFIG] = os.path.abspath(args.config)
+    base_dir = args.base_dir or config_base_dir()
+
+    try:
+        rows = run_sweep(grid, base_dir, name=args.name or spec["name"], fixed=fixed,
+                         targets=args.steps or spec["targets"] or None, max_parallel=args.jobs,
+                         step_workers=args.step_jobs, plots=not args.no_plots, dry_run=args.dry_run,
+                         config_file=args.config)
+    except ConfigError as e:
+        print(f"❌ {e}")
+        raise SystemExit(2)
+
+    print("\n====================")
+    print("SWEEP ÖZETİ")
+    print("====================")
+    for r in rows:
+        params = ", ".join(f"{k}={r[k]!r}" for k in grid)
+        print(f"{r['run']:40s} {r['status']:10s} {r['seconds']:7.1f} sn   {params}")
+    if any(r["status"].startswith("HATA") for r in rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,594 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+
+from joblib import Parallel, delayed
+
+# ============================================================
+# Sentetik kohort üretici (MAF + clinical.tsv + follow_up.tsv)
+# - maf_files/ altındaki GDC dosyalarıyla aynı 140 kolonlu şema
+#   (#version ... başlık satırları + aliquot başına bir .maf.gz)
+# - clinical.tsv / follow_up.tsv: GDC TSV düzeni (NA = '--, vaka başına çok satır)
+# - Ayarlanabilir: hasta sayısı, gen sayısı, örnek başına mutasyon (lognormal),
+#   hipermutatör oranı, driver gen frekans profili, driver -> sağkalım HR etkisi
+# - Aynı seed ile çıktı n_jobs'tan bağımsız olarak aynıdır (chunk başına ayrı RNG)
+#
+# Kullanım:
+#   python synthetic_cohort.py synth/lihc_1x                 # LIHC boyutunda (377 hasta)
+#   python synthetic_cohort.py synth/lihc_10x --scale 10
+#   python synthetic_cohort.py synth/x --patients 2000 --genes 19000 --mut-median 300 \
+#       --driver-profile my_drivers.tsv                      # gen<TAB>hasta frekansı
+#
+# Üretilen klasör pipeline'ın beklediği düzende olur (maf_files/, clinical.tsv,
+# follow_up.tsv, references/); scaling_benchmark.py bu klasörler üzerinde koşar.
+# ============================================================
+
+N_PATIENTS = 377                 # TCGA-LIHC vaka sayısı (1x)
+N_GENES = 18000
+MUT_PER_SAMPLE_MEDIAN = 85       # + hipermutatörler -> ~120/aliquot (LIHC: ~48.8k mutasyon / 415 aliquot)
+MUT_PER_SAMPLE_SIGMA = 0.6       # lognormal sigma
+HYPERMUTATOR_FRAC = 0.01
+HYPERMUTATOR_FOLD = 20
+DUP_ALIQUOT_FRAC = 0.10          # ikinci tümör aliquot'u olan hasta oranı (LIHC: 415 MAF / 377 vaka)
+CLINICAL_ROWS_MEAN = 7           # clinical.tsv'de vaka başına ortalama ek satır (treatments)
+CHUNK_PATIENTS = 200
+GZIP_LEVEL = 6
+SEED = 42
+
+PROJECT_ID = "TCGA-LIHC"
+NA = "'--"                        # GDC TSV'lerindeki boş değer
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CLINICAL_TEMPLATE = os.path.join(REPO_DIR, "clinical.tsv")   # varsa kolon düzeni buradan alınır
+REFERENCES_DIR = os.path.join(REPO_DIR, "references")        # 3A / 3D driver listeleri kohorta kopyalanır
+
+# LIHC benzeri driver frekansları (hastaların yüzde kaçında mutant)
+DEFAULT_DRIVER_PROFILE = {
+    "TP53": 0.30, "CTNNB1": 0.26, "ALB": 0.12, "APOB": 0.09, "AXIN1": 0.07,
+    "ARID1A": 0.06, "ARID2": 0.05, "RPS6KA3": 0.04, "BAP1": 0.04, "RB1": 0.04,
+    "TSC2": 0.03, "NFE2L2": 0.03, "KEAP1": 0.02, "CDKN2A": 0.02, "PIK3CA": 0.02,
+    "ACVR2A": 0.02, "TERT": 0.01,
+}
+# Driver -> sağkalım hazard oranı (OS ve DFS aynı yönde)
+DEFAULT_SURVIVAL_HR = {"TP53": 1.6, "RB1": 1.5, "CTNNB1": 0.9}
+
+# Uzun genler (gen uzunluğu etkisi: çok mutasyon, driver değil)
+LONG_GENES = {
+    "TTN": 30.0, "MUC16": 14.0, "OBSCN": 6.0, "RYR2": 6.0, "CSMD1": 6.0, "LRP1B": 5.0,
+    "USH2A": 5.0, "SYNE1": 5.0, "FLG": 4.0, "PCLO": 4.0, "DNAH5": 4.0, "XIRP2": 3.0,
+}
+
+MAF_COLUMNS = [
+    "Hugo_Symbol", "Entrez_Gene_Id", "Center", "NCBI_Build", "Chromosome", "Start_Position",
+    "End_Position", "Strand", "Variant_Classification", "Variant_Type", "Reference_Allele",
+    "Tumor_Seq_Allele1", "Tumor_Seq_Allele2", "dbSNP_RS", "dbSNP_Val_Status",
+    "Tumor_Sample_Barcode", "Matched_Norm_Sample_Barcode", "Match_Norm_Seq_Allele1",
+    "Match_Norm_Seq_Allele2", "Tumor_Validation_Allele1", "Tumor_Validation_Allele2",
+    "Match_Norm_Validation_Allele1", "Match_Norm_Validation_Allele2", "Verification_Status",
+    "Validation_Status", "Mutation_Status", "Sequencing_Phase", "Sequence_Source",
+    "Validation_Method", "Score", "BAM_File", "Sequencer", "Tumor_Sample_UUID",
+    "Matched_Norm_Sample_UUID", "HGVSc", "HGVSp", "HGVSp_Short", "Transcript_ID", "Exon_Number",
+    "t_depth", "t_ref_count", "t_alt_count", "n_depth", "n_ref_count", "n_alt_count", "all_effects",
+    "Allele", "Gene", "Feature", "Feature_type", "One_Consequence", "Consequence", "cDNA_position",
+    "CDS_position", "Protein_position", "Amino_acids", "Codons", "Existing_variation", "DISTANCE",
+    "TRANSCRIPT_STRAND", "SYMBOL", "SYMBOL_SOURCE", "HGNC_ID", "BIOTYPE", "CANONICAL", "CCDS",
+    "ENSP", "SWISSPROT", "TREMBL", "UNIPARC", "UNIPROT_ISOFORM", "RefSeq", "MANE", "APPRIS",
+    "FLAGS", "SIFT", "PolyPhen", "EXON", "INTRON", "DOMAINS", "1000G_AF", "1000G_AFR_AF",
+    "1000G_AMR_AF", "1000G_EAS_AF", "1000G_EUR_AF", "1000G_SAS_AF", "ESP_AA_AF", "ESP_EA_AF",
+    "gnomAD_AF", "gnomAD_AFR_AF", "gnomAD_AMR_AF", "gnomAD_ASJ_AF", "gnomAD_EAS_AF",
+    "gnomAD_FIN_AF", "gnomAD_NFE_AF", "gnomAD_OTH_AF", "gnomAD_SAS_AF", "MAX_AF", "MAX_AF_POPS",
+    "gnomAD_non_cancer_AF", "gnomAD_non_cancer_AFR_AF", "gnomAD_non_cancer_AMI_AF",
+    "gnomAD_non_cancer_AMR_AF", "gnomAD_non_cancer_ASJ_AF", "gnomAD_non_cancer_EAS_AF",
+    "gnomAD_non_cancer_FIN_AF", "gnomAD_non_cancer_MID_AF", "gnomAD_non_cancer_NFE_AF",
+    "gnomAD_non_cancer_OTH_AF", "gnomAD_non_cancer_SAS_AF", "gnomAD_non_cancer_MAX_AF_adj",
+    "gnomAD_non_cancer_MAX_AF_POPS_adj", "CLIN_SIG", "SOMATIC", "PUBMED", "TRANSCRIPTION_FACTORS",
+    "MOTIF_NAME", "MOTIF_POS", "HIGH_INF_POS", "MOTIF_SCORE_CHANGE", "miRNA", "IMPACT", "PICK",
+    "VARIANT_CLASS", "TSL", "HGVS_OFFSET", "PHENO", "GENE_PHENO", "CONTEXT", "tumor_bam_uuid",
+    "normal_bam_uuid", "case_id", "GDC_FILTER", "COSMIC", "hotspot", "RNA_Support", "RNA_depth",
+    "RNA_ref_count", "RNA_alt_count", "callers",
+]
+
+CONTIGS = [f"chr{i}" for i in range(1, 23)] + ["chrX", "chrY"]
+# GRCh38 kromozom uzunlukları (Mb, yaklaşık) -> gen yerleşimi için ağırlık
+CONTIG_MB = [248, 242, 198, 190, 181, 171, 159, 145, 138, 134, 135, 133, 114, 107, 102, 90,
+             83, 80, 59, 64, 47, 51, 156, 57]
+
+# (Variant_Classification, Variant_Type, Consequence, IMPACT, VARIANT_CLASS, passenger p, driver p)
+VARIANT_TABLE = [
+    ("Missense_Mutation", "SNP", "missense_variant", "MODERATE", "SNV", 0.600, 0.52),
+    ("Silent", "SNP", "synonymous_variant", "LOW", "SNV", 0.240, 0.02),
+    ("Nonsense_Mutation", "SNP", "stop_gained", "HIGH", "SNV", 0.045, 0.15),
+    ("Frame_Shift_Del", "DEL", "frameshift_variant", "HIGH", "deletion", 0.040, 0.12),
+    ("Frame_Shift_Ins", "INS", "frameshift_variant", "HIGH", "insertion", 0.008, 0.05),
+    ("Splice_Site", "SNP", "splice_acceptor_variant", "HIGH", "SNV", 0.025, 0.07),
+    ("Splice_Region", "SNP", "splice_region_variant", "LOW", "SNV", 0.008, 0.0),
+    ("In_Frame_Del", "DEL", "inframe_deletion", "MODERATE", "deletion", 0.004, 0.05),
+    ("Intron", "SNP", "intron_variant", "MODIFIER", "SNV", 0.010, 0.0),
+    ("3'UTR", "SNP", "3_prime_UTR_variant", "MODIFIER", "SNV", 0.006, 0.0),
+    ("5'UTR", "SNP", "5_prime_UTR_variant", "MODIFIER", "SNV", 0.003, 0.0),
+    ("RNA", "SNP", "non_coding_transcript_exon_variant", "MODIFIER", "SNV", 0.004, 0.0),
+    ("Nonstop_Mutation", "SNP", "stop_lost", "HIGH", "SNV", 0.002, 0.01),
+    ("Translation_Start_Site", "SNP", "start_lost", "HIGH", "SNV", 0.002, 0.01),
+]
+DRIVER_HOTSPOT_PROB = 0.35
+PASSENGER_HOTSPOT_PROB = 0.001
+CALLERS = ["muse;mutect2;varscan2", "muse;mutect2", "mutect2;varscan2", "muse;varscan2"]
+CALLER_P = [0.80, 0.10, 0.05, 0.05]
+INDEL_CALLERS = ["mutect2;pindel;varscan2", "mutect2;pindel", "pindel;varscan2"]
+INDEL_CALLER_P = [0.55, 0.35, 0.10]
+
+STAGES = ["Stage I", "Stage II", "Stage IIIA", "Stage IIIB", "Stage IIIC", "Stage IV"]
+STAGE_P = [0.49, 0.25, 0.17, 0.03, 0.03, 0.03]
+STAGE_HR = [1.0, 1.3, 2.0, 2.3, 2.5, 3.5]
+STAGE_TNM = {"Stage I": ("T1", "N0", "M0"), "Stage II": ("T2", "N0", "M0"), "Stage IIIA": ("T3a", "N0", "M0"),
+             "Stage IIIB": ("T3b", "N0", "M0"), "Stage IIIC": ("T4", "N0", "M0"), "Stage IV": ("T3", "N1", "M1")}
+OS_MEDIAN_DAYS = 3000
+DFS_MEDIAN_DAYS = 1400
+MAX_FOLLOW_UP_DAYS = 2800
+
+FOLLOW_UP_COLUMNS = [
+    "project.project_id", "cases.case_id", "cases.submitter_id", "follow_ups.follow_up_id",
+    "follow_ups.submitter_id", "follow_ups.timepoint_category", "follow_ups.days_to_follow_up",
+    "follow_ups.days_to_progression", "follow_ups.days_to_recurrence", "follow_ups.disease_response",
+    "follow_ups.progression_or_recurrence", "follow_ups.progression_or_recurrence_type",
+    "follow_ups.ecog_performance_status",
+]
+# Şablon (gerçek clinical.tsv) yoksa kullanılan asgari kolon seti
+CLINICAL_COLUMNS = [
+    "project.project_id", "cases.case_id", "cases.consent_type", "cases.disease_type", "cases.index_date",
+    "cases.lost_to_followup", "cases.primary_site", "cases.submitter_id", "demographic.age_at_index",
+    "demographic.days_to_birth", "demographic.days_to_death", "demographic.demographic_id",
+    "demographic.ethnicity", "demographic.gender", "demographic.race", "demographic.submitter_id",
+    "demographic.vital_status", "diagnoses.age_at_diagnosis", "diagnoses.ajcc_pathologic_m",
+    "diagnoses.ajcc_pathologic_n", "diagnoses.ajcc_pathologic_stage", "diagnoses.ajcc_pathologic_t",
+    "diagnoses.days_to_last_follow_up", "diagnoses.diagnosis_id", "diagnoses.primary_diagnosis",
+    "diagnoses.site_of_resection_or_biopsy", "diagnoses.submitter_id", "diagnoses.tissue_or_organ_of_origin",
+    "diagnoses.tumor_grade", "treatments.submitter_id", "treatments.treatment_id",
+    "treatments.treatment_or_therapy", "treatments.treatment_type",
+]
+TREATMENT_TYPES = ["Pharmaceutical Therapy, NOS", "Radiation Therapy, NOS", "Ablation or Embolization, NOS",
+                   "Surgery, NOS", "Chemoembolization"]
+
+
+def _uuids(rng, n):
+    return [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(n)]
+
+
+def read_driver_profile(path):
+    """gen<TAB>frekans dosyası ('#' yorum) -> {gen: frekans}"""
+    prof = pd.read_csv(path, sep="\t", header=None, names=["gene", "freq"], comment="#")
+    return dict(zip(prof["gene"].astype(str), prof["freq"].astype(float)))
+
+
+# ------------------------------------------------------------
+# 1) Gen evreni
+# ------------------------------------------------------------
+def make_gene_table(n_genes=N_GENES, driver_profile=None, seed=SEED):
+    """
+    Hugo_Symbol, Entrez_Gene_Id, Gene, Chromosome, start, length, Strand,
+    weight (passenger mutasyon oranı ~ gen uzunluğu), driver_freq, hotspots.
+    """
+    rng = np.random.default_rng([seed, 0])
+    driver_profile = DEFAULT_DRIVER_PROFILE if driver_profile is None else driver_profile
+    named = list(driver_profile) + [g for g in LONG_GENES if g not in driver_profile]
+    n_bg = max(n_genes - len(named), 0)
+    symbols = named + [f"SYNG{i:05d}" for i in range(1, n_bg + 1)]
+    n = len(symbols)
+
+    weight = rng.lognormal(0.0, 0.9, size=n)
+    for i, g in enumerate(symbols):
+        if g in LONG_GENES:
+            weight[i] = LONG_GENES[g]
+    length = np.maximum((weight * 25_000).astype(np.int64), 1_000)
+
+    contig_p = np.asarray(CONTIG_MB, dtype=float) / sum(CONTIG_MB)
+    chrom = rng.choice(len(CONTIGS), size=n, p=contig_p)
+    chrom_len = np.asarray(CONTIG_MB, dtype=np.int64)[chrom] * 1_000_000
+    start = rng.integers(1_000_000, chrom_len - length - 1_000_000)
+
+    genes = pd.DataFrame({
+        "Hugo_Symbol": symbols,
+        "Entrez_Gene_Id": rng.choice(np.arange(1, 200_000), size=n, replace=False),
+        "Gene": [f"ENSG{i:011d}" for i in rng.choice(np.arange(1, 300_000), size=n, replace=False)],
+        "chrom_idx": chrom,
+        "Chromosome": np.asarray(CONTIGS)[chrom],
+        "start": start,
+        "length": length,
+        "Strand": "+",
+        "weight": weight,
+        "driver_freq": [float(driver_profile.get(g, 0.0)) for g in symbols],
+    })
+    # Driver başına 3 hotspot pozisyonu
+    genes["hotspots"] = [tuple(s + rng.integers(0, ln, size=3)) if f > 0 else ()
+                         for s, ln, f in zip(genes["start"], genes["length"], genes["driver_freq"])]
+    return genes
+
+
+# ------------------------------------------------------------
+# 2) Hastalar: TMB, driver genotipi, evre, OS/DFS
+# ------------------------------------------------------------
+def make_patients(genes, n_patients=N_PATIENTS, mut_median=MUT_PER_SAMPLE_MEDIAN,
+                  mut_sigma=MUT_PER_SAMPLE_SIGMA, hypermutator_frac=HYPERMUTATOR_FRAC,
+                  dup_aliquot_frac=DUP_ALIQUOT_FRAC, survival_hr=None, seed=SEED):
+    """Hasta tablosu + (n_patients x n_driver) bool driver genotip matrisi."""
+    rng = np.random.default_rng([seed, 1])
+    survival_hr = DEFAULT_SURVIVAL_HR if survival_hr is None else survival_hr
+    drivers = genes.loc[genes["driver_freq"] > 0, "Hugo_Symbol"].tolist()
+    freqs = genes.loc[genes["driver_freq"] > 0, "driver_freq"].to_numpy()
+
+    idx = np.arange(n_patients)
+    # 12 karakterlik TCGA-benzeri barkod: TCGA-Z<site>-NNNN (site harfi 10k hastada bir artar)
+    patient_id = [f"TCGA-Z{chr(65 + (i // 10_000) % 26)}-{i % 10_000:04d}" for i in idx]
+
+    hyper = rng.random(n_patients) < hypermutator_frac
+    n_pass = rng.lognormal(np.log(mut_median), mut_sigma, size=n_patients)
+    n_pass = np.maximum(np.where(hyper, n_pass * HYPERMUTATOR_FOLD, n_pass).astype(np.int64), 1)
+    geno = rng.random((n_patients, len(drivers))) < freqs
+
+    stage = rng.choice(len(STAGES), size=n_patients, p=STAGE_P)
+    log_hr = np.log(np.asarray(STAGE_HR))[stage]
+    for j, g in enumerate(drivers):
+        if g in survival_hr:
+            log_hr = log_hr + geno[:, j] * np.log(survival_hr[g])
+    hr = np.exp(log_hr)
+
+    censor = rng.uniform(30, MAX_FOLLOW_UP_DAYS, size=n_patients)
+    death = rng.exponential(OS_MEDIAN_DAYS / np.log(2) / hr)
+    os_event = death <= censor
+    os_time = np.where(os_event, death, censor).round()
+    rec = rng.exponential(DFS_MEDIAN_DAYS / np.log(2) / hr)
+    dfs_event = rec <= os_time
+    dfs_time = np.where(dfs_event, rec, os_time).round()
+
+    age_years = np.clip(rng.normal(60, 13, size=n_patients), 18, 90).astype(int)
+    patients = pd.DataFrame({
+        "patient_id": patient_id,
+        "case_id": _uuids(rng, n_patients),
+        "center": rng.choice(["BCM", "WUGSC"], size=n_patients, p=[0.85, 0.15]),
+        "n_passenger": n_pass,
+        "hypermutator": hyper,
+        "n_aliquots": 1 + (rng.random(n_patients) < dup_aliquot_frac),
+        "stage": np.asarray(STAGES)[stage],
+        "age_years": age_years,
+        "days_to_birth": -(age_years * 365.25 + rng.integers(0, 365, size=n_patients)).astype(int),
+        "gender": rng.choice(["male", "female"], size=n_patients, p=[0.67, 0.33]),
+        "race": rng.choice(["white", "asian", "black or african american", "not reported"],
+                           size=n_patients, p=[0.49, 0.43, 0.05, 0.03]),
+        "OS_time": os_time.astype(int),
+        "OS_event": os_event.astype(int),
+        "DFS_time": dfs_time.astype(int),
+        "DFS_event": dfs_event.astype(int),
+    })
+    return patients, geno, drivers
+
+
+# ------------------------------------------------------------
+# 3) Mutasyonlar (chunk başına, vektörel)
+# ------------------------------------------------------------
+def _simulate_chunk(chunk_idx, patients, geno, drivers, genes, seed):
+    """Bir hasta chunk'ı için aliquot başına mutasyon tablosu (MAF kolonlarıyla)."""
+    rng = np.random.default_rng([seed, 2, chunk_idx])
+    n_pat = len(patients)
+    gene_idx_of = {g: i for i, g in enumerate(genes["Hugo_Symbol"])}
+
+    # passenger: gen seçimi ~ weight
+    cw = np.cumsum(genes["weight"].to_numpy())
+    n_pass = patients["n_passenger"].to_numpy()
+    pat_p = np.repeat(np.arange(n_pat), n_pass)
+    gene_p = np.searchsorted(cw, rng.random(len(pat_p)) * cw[-1], side="right")
+    gene_p = np.minimum(gene_p, len(cw) - 1)
+
+    # driver: genotipteki her True için bir mutasyon
+    pat_d, drv = np.nonzero(geno)
+    gene_d = np.asarray([gene_idx_of[drivers[j]] for j in drv], dtype=np.int64)
+
+    pat = np.concatenate([pat_p, pat_d])
+    gene = np.concatenate([gene_p, gene_d])
+    is_drv = np.concatenate([np.zeros(len(pat_p), bool), np.ones(len(pat_d), bool)])
+    n = len(pat)
+
+    # Variant sınıfı
+    vt = VARIANT_TABLE
+    p_pass = np.asarray([r[5] for r in vt]); p_pass /= p_pass.sum()
+    p_drv = np.asarray([r[6] for r in vt]); p_drv /= p_drv.sum()
+    cls = np.where(is_drv, rng.choice(len(vt), size=n, p=p_drv), rng.choice(len(vt), size=n, p=p_pass))
+    col = lambda k: np.asarray([r[k] for r in vt], dtype=object)[cls]
+    vtype = col(1)
+
+    # Pozisyon (+ driver hotspot)
+    start = genes["start"].to_numpy()[gene] + (rng.random(n) * genes["length"].to_numpy()[gene]).astype(np.int64)
+    hotspot = np.where(is_drv, rng.random(n) < DRIVER_HOTSPOT_PROB, rng.random(n) < PASSENGER_HOTSPOT_PROB)
+    hs_list = genes["hotspots"].to_numpy()
+    for i in np.nonzero(hotspot & is_drv)[0]:
+        start[i] = hs_list[gene[i]][rng.integers(0, 3)]
+
+    # Allel + CONTEXT (11-mer, merkez = referans baz)
+    bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+    ref_i = rng.integers(0, 4, size=n)
+    alt_i = (ref_i + rng.integers(1, 4, size=n)) % 4
+    ctx = bases[rng.integers(0, 4, size=(n, 11))]
+    ctx[:, 5] = bases[ref_i]
+    context = ctx.view("S11").ravel().astype(str)
+    ref = np.asarray(list("ACGT"), dtype=object)[ref_i]
+    alt = np.asarray(list("ACGT"), dtype=object)[alt_i]
+    ref = np.where(vtype == "INS", "-", ref)
+    alt = np.where(vtype == "DEL", "-", alt)
+    end = np.where(vtype == "INS", start + 1, start)
+
+    t_depth = rng.poisson(80, size=n) + 10
+    t_alt = np.maximum(rng.binomial(t_depth, rng.beta(2, 5, size=n)), 3)
+    t_alt = np.minimum(t_alt, t_depth)
+    indel = vtype != "SNP"
+    callers = np.where(indel, rng.choice(INDEL_CALLERS, size=n, p=INDEL_CALLER_P),
+                       rng.choice(CALLERS, size=n, p=CALLER_P))
+    prot_pos = rng.integers(1, 1500, size=n)
+    aa = np.asarray(list("ACDEFGHIKLMNPQRSTVWY"), dtype=object)
+    hgvsp = ("p." + aa[rng.integers(0, 20, size=n)] + prot_pos.astype(str).astype(object)
+             + aa[rng.integers(0, 20, size=n)])
+
+    g = genes.iloc[gene]
+    muts = pd.DataFrame({
+        "pat": pat,
+        "chrom_idx": g["chrom_idx"].to_numpy(),
+        "Hugo_Symbol": g["Hugo_Symbol"].to_numpy(),
+        "Entrez_Gene_Id": g["Entrez_Gene_Id"].to_numpy(),
+        "Center": patients["center"].to_numpy()[pat],
+        "NCBI_Build": "GRCh38",
+        "Chromosome": g["Chromosome"].to_numpy(),
+        "Start_Position": start,
+        "End_Position": end,
+        "Strand": "+",
+        "Variant_Classification": col(0),
+        "Variant_Type": vtype,
+        "Reference_Allele": ref,
+        "Tumor_Seq_Allele1": ref,
+        "Tumor_Seq_Allele2": alt,
+        "Mutation_Status": "Somatic",
+        "HGVSp_Short": hgvsp,
+        "t_depth": t_depth,
+        "t_ref_count": t_depth - t_alt,
+        "t_alt_count": t_alt,
+        "n_depth": rng.poisson(50, size=n) + 8,
+        "Allele": alt,
+        "Gene": g["Gene"].to_numpy(),
+        "Feature_type": "Transcript",
+        "One_Consequence": col(2),
+        "Consequence": col(2),
+        "SYMBOL": g["Hugo_Symbol"].to_numpy(),
+        "SYMBOL_SOURCE": "HGNC",
+        "BIOTYPE": "protein_coding",
+        "CANONICAL": "YES",
+        "IMPACT": col(3),
+        "PICK": "1",
+        "VARIANT_CLASS": col(4),
+        "CONTEXT": context,
+        "case_id": patients["case_id"].to_numpy()[pat],
+        "hotspot": np.where(hotspot, "Y", "N"),
+        "RNA_Support": "Unknown",
+        "callers": callers,
+    })
+
+    # İkinci aliquot: mutasyonların ~%85'i paylaşılır
+    dup_pats = np.nonzero(patients["n_aliquots"].to_numpy() > 1)[0]
+    muts["aliquot"] = 0
+    second = muts[np.isin(muts["pat"], dup_pats) & (rng.random(n) < 0.85)].copy()
+    second["aliquot"] = 1
+    muts = pd.concat([muts, second], ignore_index=True)
+    return muts
+
+
+def _maf_frame(muts):
+    return pd.DataFrame({c: muts[c] if c in muts.columns else "" for c in MAF_COLUMNS}, index=muts.index)
+
+
+def _write_chunk(chunk_idx, patients, geno, drivers, genes, maf_dir, seed, gzip_level):
+    """Chunk'ı simüle et, aliquot başına bir .maf.gz yaz; (aliquot, satır) listesi döndür."""
+    rng = np.random.default_rng([seed, 3, chunk_idx])
+    muts = _simulate_chunk(chunk_idx, patients, geno, drivers, genes, seed)
+    muts = muts.sort_values(["pat", "aliquot", "chrom_idx", "Start_Position"], kind="stable")
+
+    written = []
+    for (p, a), grp in muts.groupby(["pat", "aliquot"], sort=True):
+        pid = patients["patient_id"].iat[p]
+        tumor_uuid, normal_uuid = _uuids(rng, 2)
+        grp = grp.assign(
+            Tumor_Sample_Barcode=f"{pid}-01A-{11 + a}D-A{p % 1000:03d}-10",
+            Matched_Norm_Sample_Barcode=f"{pid}-10A-01D-A{p % 1000:03d}-10",
+            Tumor_Sample_UUID=tumor_uuid,
+            Matched_Norm_Sample_UUID=normal_uuid,
+        )
+        header = [
+            "#version gdc-1.0.0",
+            "#annotation.spec gdc-2.0.0-aliquot-merged-masked",
+            "#contigs " + ",".join(CONTIGS + ["chrM"]),
+            "#sort.order BarcodesAndCoordinate",
+            "#filedate 20220516",
+            f"#normal.aliquot {normal_uuid}",
+            f"#tumor.aliquot {tumor_uuid}",
+        ]
+        path = os.path.join(maf_dir, f"{tumor_uuid}.wxs.aliquot_ensemble_masked.maf.gz")
+        with gzip.open(path, "wt", compresslevel=gzip_level, encoding="utf-8", newline="") as f:
+            f.write("\n".join(header) + "\n")
+            _maf_frame(grp).to_csv(f, sep="\t", index=False, lineterminator="\n")
+        written.append((pid, a, len(grp)))
+    return written
+
+
+# ------------------------------------------------------------
+# 4) clinical.tsv / follow_up.tsv
+# ------------------------------------------------------------
+def clinical_columns(template=CLINICAL_TEMPLATE):
+    if template and os.path.exists(template):
+        return pd.read_csv(template, sep="\t", nrows=0).columns.tolist()
+    return list(CLINICAL_COLUMNS)
+
+
+def build_clinical(patients, columns, seed=SEED):
+    """Vaka başına (1 + treatments) satır; bilinmeyen kolonlar '-- ile doldurulur."""
+    rng = np.random.default_rng([seed, 4])
+    n = len(patients)
+    reps = 1 + rng.poisson(CLINICAL_ROWS_MEAN, size=n)
+    demographic_id = np.asarray(_uuids(rng, n), dtype=object)
+    diagnosis_id = np.asarray(_uuids(rng, n), dtype=object)
+    rep_idx = np.repeat(np.arange(n), reps)
+    p = patients.iloc[rep_idx].reset_index(drop=True)
+    k = p.groupby("patient_id").cumcount() + 1
+    dead = p["OS_event"] == 1
+    tnm = p["stage"].map(STAGE_TNM)
+
+    vals = {
+        "project.project_id": PROJECT_ID,
+        "cases.case_id": p["case_id"],
+        "cases.consent_type": "Informed Consent",
+        "cases.disease_type": "Adenomas and Adenocarcinomas",
+        "cases.index_date": "Diagnosis",
+        "cases.lost_to_followup": "No",
+        "cases.primary_site": "Liver and intrahepatic bile ducts",
+        "cases.submitter_id": p["patient_id"],
+        "demographic.age_at_index": p["age_years"].astype(str),
+        "demographic.days_to_birth": p["days_to_birth"].astype(str),
+        "demographic.days_to_death": np.where(dead, p["OS_time"].astype(str), NA),
+        "demographic.demographic_id": demographic_id[rep_idx],
+        "demographic.ethnicity": "not hispanic or latino",
+        "demographic.gender": p["gender"],
+        "demographic.race": p["race"],
+        "demographic.submitter_id": p["patient_id"] + "_demographic",
+        "demographic.vital_status": np.where(dead, "Dead", "Alive"),
+        "diagnoses.age_at_diagnosis": (-p["days_to_birth"]).astype(str),
+        "diagnoses.ajcc_pathologic_t": tnm.str[0],
+        "diagnoses.ajcc_pathologic_n": tnm.str[1],
+        "diagnoses.ajcc_pathologic_m": tnm.str[2],
+        "diagnoses.ajcc_pathologic_stage": p["stage"],
+        "diagnoses.days_to_last_follow_up": np.where(dead, NA, p["OS_time"].astype(float).astype(str)),
+        "diagnoses.diagnosis_id": diagnosis_id[rep_idx],
+        "diagnoses.primary_diagnosis": "Hepatocellular carcinoma, NOS",
+        "diagnoses.site_of_resection_or_biopsy": "Liver",
+        "diagnoses.submitter_id": p["patient_id"] + "_diagnosis",
+        "diagnoses.tissue_or_organ_of_origin": "Liver",
+        "diagnoses.tumor_grade": rng.choice(["G1", "G2", "G3", "G4"], size=len(p), p=[0.15, 0.48, 0.33, 0.04]),
+        "treatments.submitter_id": p["patient_id"] + "_treatment" + np.where(k > 1, k.astype(str), ""),
+        "treatments.treatment_id": _uuids(rng, len(p)),
+        "treatments.treatment_or_therapy": rng.choice(["yes", "no", "not reported"], size=len(p), p=[0.3, 0.6, 0.1]),
+        "treatments.treatment_type": rng.choice(TREATMENT_TYPES, size=len(p)),
+    }
+    return pd.DataFrame({c: vals.get(c, NA) for c in columns}, index=p.index)
+
+
+def build_follow_up(patients, seed=SEED):
+    """Vaka başına 1-4 takip satırı; son takip = OS_time, nüks olan vakada bir satırda days_to_recurrence."""
+    rng = np.random.default_rng([seed, 5])
+    n = len(patients)
+    reps = rng.integers(1, 5, size=n)
+    p = patients.iloc[np.repeat(np.arange(n), reps)].reset_index(drop=True)
+    k = p.groupby("patient_id").cumcount()
+    last = k == np.repeat(reps, reps) - 1
+    frac = np.where(last, 1.0, rng.uniform(0.1, 0.95, size=len(p)))
+    days = (p["OS_time"] * frac).round().astype(int)
+    # nüks, vakanın ilk satırına yazılır
+    rec_row = (k == 0) & (p["DFS_event"] == 1)
+
+    return pd.DataFrame({
+        "project.project_id": PROJECT_ID,
+        "cases.case_id": p["case_id"],
+        "cases.submitter_id": p["patient_id"],
+        "follow_ups.follow_up_id": _uuids(rng, len(p)),
+        "follow_ups.submitter_id": p["patient_id"] + "_follow_up" + (k + 1).astype(str),
+        "follow_ups.timepoint_category": np.where(last, "Last Contact", "Follow-up"),
+        "follow_ups.days_to_follow_up": days.astype(str),
+        "follow_ups.days_to_progression": NA,
+        "follow_ups.days_to_recurrence": np.where(rec_row, p["DFS_time"].astype(str), NA),
+        "follow_ups.disease_response": np.where(rec_row, "WT-With Tumor", "TF-Tumor Free"),
+        "follow_ups.progression_or_recurrence": np.where(rec_row, "Yes", "No"),
+        "follow_ups.progression_or_recurrence_type": np.where(rec_row, "Locoregional", NA),
+        "follow_ups.ecog_performance_status": NA,
+    }, columns=FOLLOW_UP_COLUMNS)
+
+
+# ------------------------------------------------------------
+# 5) Hepsi
+# ------------------------------------------------------------
+def generate_cohort(out_dir, n_patients=N_PATIENTS, n_genes=N_GENES, mut_median=MUT_PER_SAMPLE_MEDIAN,
+                    mut_sigma=MUT_PER_SAMPLE_SIGMA, hypermutator_frac=HYPERMUTATOR_FRAC,
+                    dup_aliquot_frac=DUP_ALIQUOT_FRAC, driver_profile=None, survival_hr=None,
+                    seed=SEED, n_jobs=-1, clinical_template=CLINICAL_TEMPLATE,
+                    references_dir=REFERENCES_DIR, gzip_level=GZIP_LEVEL):
+    """out_dir altına maf_files/, clinical.tsv, follow_up.tsv, references/, cohort_manifest.json yaz."""
+    t0 = time.perf_counter()
+    maf_dir = os.path.join(out_dir, "maf_files")
+    if os.path.isdir(maf_dir):
+        shutil.rmtree(maf_dir)
+    os.makedirs(maf_dir)
+
+    genes = make_gene_table(n_genes, driver_profile, seed)
+    patients, geno, drivers = make_patients(genes, n_patients, mut_median, mut_sigma, hypermutator_frac,
+                                            dup_aliquot_frac, survival_hr, seed)
+
+    bounds = range(0, n_patients, CHUNK_PATIENTS)
+    jobs = [delayed(_write_chunk)(ci, patients.iloc[s:s + CHUNK_PATIENTS].reset_index(drop=True),
+                                  geno[s:s + CHUNK_PATIENTS], drivers, genes, maf_dir, seed, gzip_level)
+            for ci, s in enumerate(bounds)]
+    written = [w for chunk in Parallel(n_jobs=n_jobs, backend="loky")(jobs) for w in chunk]
+
+    build_clinical(patients, clinical_columns(clinical_template), seed).to_csv(
+        os.path.join(out_dir, "clinical.tsv"), sep="\t", index=False)
+    build_follow_up(patients, seed).to_csv(os.path.join(out_dir, "follow_up.tsv"), sep="\t", index=False)
+
+    if references_dir and os.path.isdir(references_dir):
+        ref_out = os.path.join(out_dir, "references")
+        os.makedirs(ref_out, exist_ok=True)
+        for fn in os.listdir(references_dir):
+            if fn.endswith(".txt"):
+                shutil.copy2(os.path.join(references_dir, fn), os.path.join(ref_out, fn))
+
+    manifest = {
+        "params": {
+            "n_patients": n_patients, "n_genes": n_genes, "mut_median": mut_median, "mut_sigma": mut_sigma,
+            "hypermutator_frac": hypermutator_frac, "dup_aliquot_frac": dup_aliquot_frac, "seed": seed,
+            "driver_profile": dict(zip(drivers, genes.loc[genes["driver_freq"] > 0, "driver_freq"].tolist())),
+            "survival_hr": DEFAULT_SURVIVAL_HR if survival_hr is None else survival_hr,
+        },
+        "n_maf_files": len(written),
+        "n_mutations": int(sum(w[2] for w in written)),
+        "n_hypermutators": int(patients["hypermutator"].sum()),
+        "n_deaths": int(patients["OS_event"].sum()),
+        "n_recurrences": int(patients["DFS_event"].sum()),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+    with open(os.path.join(out_dir, "cohort_manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sentetik MAF + clinical kohort üretici")
+    ap.add_argument("out_dir")
+    ap.add_argument("--scale", type=float, default=1.0, help=f"Hasta sayısı çarpanı ({N_PATIENTS} x scale)")
+    ap.add_argument("--patients", type=int, default=None, help="Hasta sayısı (--scale'i ezer)")
+    ap.add_argument("--genes", type=int, default=N_GENES)
+    ap.add_argument("--mut-median", type=float, default=MUT_PER_SAMPLE_MEDIAN, help="Örnek başına medyan mutasyon")
+    ap.add_argument("--mut-sigma", type=float, default=MUT_PER_SAMPLE_SIGMA)
+    ap.add_argument("--hypermutator-frac", type=float, default=HYPERMUTATOR_FRAC)
+    ap.add_argument("--dup-aliquot-frac", type=float, default=DUP_ALIQUOT_FRAC)
+    ap.add_argument("--driver-profile", default=None, help="gen<TAB>frekans dosyası (varsayılan: LIHC profili)")
+    ap.add_argument("--seed", type=int, default=SEED)
+    ap.add_argument("-j", "--jobs", type=int, default=-1)
+    args = ap.parse_args(argv)
+
+    n_patients = args.patients or max(int(round(N_PATIENTS * args.scale)), 1)
+    profile = read_driver_profile(args.driver_profile) if args.driver_profile else None
+    man = generate_cohort(args.out_dir, n_patients=n_patients, n_genes=args.genes, mut_median=args.mut_median,
+                          mut_sigma=args.mut_sigma, hypermutator_frac=args.hypermutator_frac,
+                          dup_aliquot_frac=args.dup_aliquot_frac, driver_profile=profile,
+                          seed=args.seed, n_jobs=args.jobs)
+    print(f"✅ Sentetik kohort: {args.out_dir}")
+    print(f"   hasta: {n_patients} | MAF dosyası: {man['n_maf_files']} | mutasyon: {man['n_mutations']}")
+    print(f"   ölüm: {man['n_deaths']} | nüks: {man['n_recurrences']} | süre: {man['seconds']} sn")
+
+
+if __name__ == "__main__":
+    main()
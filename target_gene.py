@@ -1,18 +1,33 @@
 import os
-import pandas as pd
+
+from instrumentation import StepProfiler
+from maf_index import open_index
+
+# Hedef genlerin mutasyon sayıları: merged MAF'ın tamamı okunmaz, maf_index.py'nin
+# gen -> satır aralığı indeksinden sayılır (MAF değişmişse indeks önce yeniden kurulur)
+
+MAF_PATH = "merged_LIHC_MAF.csv"
+INDEX_DIR = os.path.join("outputs", "maf_index")
 
 # outputs klasörü yoksa oluştur
 os.makedirs("outputs", exist_ok=True)
 
-maf = pd.read_csv("merged_LIHC_MAF.csv", low_memory=False)
+prof = StepProfiler("target_gene", log_dir=os.path.join("outputs", "run_logs"))
+
+prof.begin("open MAF index")
+idx = open_index(MAF_PATH, INDEX_DIR)
+prof.end(rows_out=idx.n_rows)
 
 target_genes = [
     "TP53", "TERT", "CTNNB1",
     "ARID1A", "RB1", "AXIN1", "PTEN"
 ]
 
-target_maf = maf[maf["Hugo_Symbol"].isin(target_genes)]
+prof.begin("count", rows_in=idx.n_rows)
+counts = idx.gene_counts(idx.gene_rows(target_genes))
 
-gene_counts = target_maf["Hugo_Symbol"].value_counts()
+gene_counts = counts.set_index("Hugo_Symbol")["n_mutations"].rename("count")
 
 gene_counts.to_csv("outputs/target_gene_mutation_counts.csv")
+prof.end(rows_out=len(gene_counts))
+prof.finish()
@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import socket
+import argparse
+import importlib
+import threading
+import subprocess
+
+from memo_cache import content_hash
+
+# ============================================================
+# Dosya tabanlı iş kuyruğu (shard'lı gen taramaları için; broker yok)
+# - Kuyruk = paylaşılan bir klasör (yerel disk ya da tüm node'ların gördüğü NFS/SMB):
+#     job.json                 iş tanımı (anahtar, task sayısı, fonksiyon)
+#     context.pkl              tüm task'ların ortak verisi (bir kez yazılır, worker başına bir kez okunur)
+#     pending/<id>.json        sırada bekleyen task'lar
+#     leased/<id>__<worker>.json   claim edilmiş (lease'li) task'lar
+#     done/<id>.json, results/<id>.pkl   biten task'lar + kısmi sonuçları
+#     failed/<id>.json         MAX_ATTEMPTS kez hata veren task'lar (hata metniyle)
+# - Claim = pending -> leased atomik rename (aynı anda iki worker aynı task'ı alamaz;
+#   SQLite yerine rename: ağ dosya sistemlerinde kilitlemeye güvenmek gerekmez)
+# - Lease: worker çalışırken leased dosyasının mtime'ını yeniler (heartbeat);
+#   lease_s boyunca yenilenmeyen task (node düştü / process öldü) tekrar pending'e alınır.
+#   Semantik "en az bir kez": nadiren bir task iki kez çalışabilir; sonuçlar aynı
+#   olduğu için results/<id>.pkl'nin son yazılanı geçerlidir.
+# - Reduce: tüm task'lar bitince results() sonuçları task sırasıyla döndürür.
+#
+# Kullanım:
+#   q = WorkQueue(queue_dir)
+#   q.publish("step4B_survival_by_gene:scan_shard", tasks, context=ctx)   # task: JSON payload
+#   python work_queue.py work <queue_dir>          # her node'da (istediğin kadar) worker
+#   python work_queue.py work <queue_dir> -n 4     # bu makinede 4 worker process
+#   python work_queue.py status <queue_dir>
+#   parts = q.results()                             # hepsi bitince (reduce)
+#
+# Task fonksiyonu: fn(payload, context) -> picklable sonuç; "modül:fonksiyon" adıyla
+# verilir ve worker'da bu repodan import edilir (worker'lar aynı kodu görmeli).
+# ============================================================
+
+LEASE_S = 120.0           # heartbeat gelmezse task bu kadar sn sonra başka worker'a geçer
+HEARTBEAT_S = 20.0
+POLL_S = 1.0
+MAX_ATTEMPTS = 3
+SUBDIRS = ["pending", "leased", "done", "failed", "results"]
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_CONTEXTS = {}            # (context yolu, mtime) -> context (worker process başına bir kez okunur)
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _write_json(path, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class WorkQueue:
+    def __init__(self, queue_dir, lease_s=LEASE_S, max_attempts=MAX_ATTEMPTS):
+        self.dir = queue_dir
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+
+    def _p(self, *parts):
+        return os.path.join(self.dir, *parts)
+
+    # --------------------------------------------------------
+    # Yayınlama
+    # --------------------------------------------------------
+    def job(self):
+        path = self._p("job.json")
+        return _read_json(path) if os.path.exists(path) else None
+
+    def publish(self, fn, tasks, context=None, reset=False):
+        """
+        Task'ları kuyruğa yaz. Aynı iş (fn + task'lar + context hash'i) zaten yayınlanmışsa
+        dokunulmaz (yarım kalan iş kaldığı yerden devam eder); farklıysa kuyruk sıfırlanır.
+        Dönüş: True -> yeni yayınlandı, False -> mevcut iş devam ediyor.
+        """
+        key = content_hash(fn, tasks, context)
+        job = self.job()
+        if job is not None and job["key"] == key and not reset:
+            return False
+        if os.path.isdir(self.dir):
+            shutil.rmtree(self.dir)
+        for d in SUBDIRS:
+            os.makedirs(self._p(d), exist_ok=True)
+
+        if context is not None:
+            tmp = self._p(f"context.pkl.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(context, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._p("context.pkl"))
+        for i, payload in enumerate(tasks):
+            tid = f"{i:05d}"
+            _write_json(self._p("pending", f"{tid}.json"),
+                        {"id": tid, "fn": fn, "payload": payload, "attempts": 0})
+        # job.json en son: worker'lar job.json görünce kuyruk tamdır
+        _write_json(self._p("job.json"), {"key": key, "fn": fn, "n_tasks": len(tasks),
+                                          "created": time.strftime("%Y-%m-%d %H:%M:%S")})
+        return True
+
+    # --------------------------------------------------------
+    # Claim / lease
+    # --------------------------------------------------------
+    def _listdir(self, sub):
+        try:
+            return sorted(f for f in os.listdir(self._p(sub)) if f.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def reclaim_expired(self):
+        """Lease'i dolmuş task'ları pending'e geri al; geri alınan sayısı."""
+        n = 0
+        now = time.time()
+        for name in self._listdir("leased"):
+            path = self._p("leased", name)
+            try:
+                if now - os.path.getmtime(path) <= self.lease_s:
+                    continue
+                os.rename(path, self._p("pending", name.split("__")[0] + ".json"))
+                n += 1
+            except (FileNotFoundError, FileExistsError, PermissionError):
+                continue          # başka bir worker bitirdi / geri aldı
+        return n
+
+    def claim(self, worker=None):
+        """Bir task'ı lease'le; {"id", "fn", "payload", "attempts", "_lease"} ya da None."""
+        worker = worker or worker_name()
+        self.reclaim_expired()
+        for name in self._listdir("pending"):
+            tid = name[:-len(".json")]
+            lease = self._p("leased", f"{tid}__{worker}.json")
+            try:
+                os.rename(self._p("pending", name), lease)
+                os.utime(lease)                  # lease süresi claim anından başlar
+                task = _read_json(lease)
+            except (FileNotFoundError, FileExistsError, PermissionError):
+                continue                         # başka bir worker kaptı
+            task["_lease"] = lease
+            return task
+        return None
+
+    def heartbeat(self, task):
+        """Lease'i uzat; lease kaybedildiyse False."""
+        try:
+            os.utime(task["_lease"])
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, task, result):
+        tmp = self._p("results", f"{task['id']}.pkl.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._p("results", f"{task['id']}.pkl"))
+        try:
+            os.replace(task["_lease"], self._p("done", f"{task['id']}.json"))
+        except FileNotFoundError:
+            # lease süresi dolup task başkasına geçmiş; sonuç yine de yazıldı
+            if not os.path.exists(self._p("done", f"{task['id']}.json")):
+                _write_json(self._p("done", f"{task['id']}.json"), {"id": task["id"]})
+
+    def fail(self, task, error):
+        """Hata: deneme hakkı varsa pending'e geri, yoksa failed/ (hata metniyle)."""
+        rec = {k: v for k, v in task.items() if k != "_lease"}
+        rec["attempts"] += 1
+        rec["error"] = error
+        dest = "failed" if rec["attempts"] >= self.max_attempts else "pending"
+        _write_json(self._p(dest, f"{rec['id']}.json"), rec)
+        try:
+            os.remove(task["_lease"])
+        except FileNotFoundError:
+            pass
+
+    # --------------------------------------------------------
+    # Durum / reduce
+    # --------------------------------------------------------
+    def status(self):
+        job = self.job() or {"n_tasks": 0}
+        st = {d: len(self._listdir(d)) for d in ["pending", "leased", "done", "failed"]}
+        st["total"] = job["n_tasks"]
+        return st
+
+    def finished(self):
+        st = self.status()
+        return st["total"] > 0 and st["done"] + st["failed"] >= st["total"]
+
+    def errors(self):
+        return {n[:-5]: _read_json(self._p("failed", n)).get("error", "") for n in self._listdir("failed")}
+
+    def context(self):
+        path = self._p("context.pkl")
+        if not os.path.exists(path):
+            return None
+        key = (os.path.abspath(path), os.path.getmtime(path))
+        if key not in _CONTEXTS:
+            with open(path, "rb") as f:
+                _CONTEXTS[key] = pickle.load(f)
+        return _CONTEXTS[key]
+
+    def results(self):
+        """Tüm kısmi sonuçlar, task sırasıyla (reduce için); eksik / hatalı task varsa RuntimeError."""
+        job = self.job()
+        errors = self.errors()
+        if errors:
+            msg = "\n".join(f"  {tid}: {err.strip().splitlines()[-1] if err else ''}" for tid, err in errors.items())
+            raise RuntimeError(f"{len(errors)} task başarısız oldu ({self.dir}):\n{msg}")
+        out = []
+        for i in range(job["n_tasks"]):
+            path = self._p("results", f"{i:05d}.pkl")
+            if not os.path.exists(path):
+                raise RuntimeError(f"Task {i:05d} sonucu yok; kuyruk henüz bitmedi ({self.status()})")
+            with open(path, "rb") as f:
+                out.append(pickle.load(f))
+        return out
+
+    def wait(self, procs=(), poll_s=POLL_S, verbose=True):
+        """Kuyruk bitene kadar bekle. Yerel worker'ların hepsi çıkıp iş bitmediyse RuntimeError."""
+        last = None
+        while not self.finished():
+            st = self.status()
+            if verbose and st != last:
+                print(f"   ⏳ kuyruk: {st['done']}/{st['total']} bitti, {st['leased']} çalışıyor, "
+                      f"{st['pending']} sırada" + (f", {st['failed']} hata" if st["failed"] else ""))
+                last = st
+            if procs and all(p.poll() is not None for p in procs):
+                if not self.finished():
+                    raise RuntimeError(f"Tüm yerel worker'lar çıktı ama kuyruk bitmedi: {self.status()}")
+            time.sleep(poll_s)
+        return self.status()
+
+
+# ------------------------------------------------------------
+# Worker
+# ------------------------------------------------------------
+def resolve(fn_name):
+    module, _, fn = fn_name.partition(":")
+    if SCRIPT_DIR not in sys.path:
+        sys.path.insert(0, SCRIPT_DIR)
+    return getattr(importlib.import_module(module), fn)
+
+
+def run_worker(queue_dir, worker=None, lease_s=LEASE_S, heartbeat_s=HEARTBEAT_S, poll_s=POLL_S,
+               max_tasks=None, wait_for_job=60.0):
+    """Kuyruk bitene kadar task claim et / çalıştır; bu worker'ın bitirdiği task sayısı."""
+    import traceback
+
+    q = WorkQueue(queue_dir, lease_s=lease_s)
+    worker = worker or worker_name()
+    t0 = time.time()
+    while q.job() is None:                 # iş henüz yayınlanmamış olabilir
+        if time.time() - t0 > wait_for_job:
+            raise RuntimeError(f"Kuyrukta iş yok: {queue_dir}")
+        time.sleep(poll_s)
+
+    n_done = 0
+    while not q.finished() and (max_tasks is None or n_done < max_tasks):
+        task = q.claim(worker)
+        if task is None:
+            time.sleep(poll_s)             # lease'li task'lar var: bitmelerini / süresinin dolmasını bekle
+            continue
+
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(heartbeat_s):
+                if not q.heartbeat(task):
+                    return
+        hb = threading.Thread(target=beat, daemon=True)
+        hb.start()
+        try:
+            t = time.perf_counter()
+            result = resolve(task["fn"])(task["payload"], q.context())
+            q.complete(task, result)
+            n_done += 1
+            print(f"[{worker}] task {task['id']} bitti ({time.perf_counter() - t:.1f} sn)", flush=True)
+        except Exception:
+            q.fail(task, traceback.format_exc())
+            print(f"[{worker}] task {task['id']} HATA (deneme {task['attempts'] + 1})", flush=True)
+        finally:
+            stop.set()
+            hb.join()
+    return n_done
+
+
+def spawn_local_workers(queue_dir, n, lease_s=LEASE_S, log_dir=None, env=None):
+    """Bu makinede n worker process başlat (node'ların yerel karşılığı); Popen listesi."""
+    procs = []
+    for i in range(n):
+        out = None
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+            out = open(os.path.join(log_dir, f"worker_{i}.log"), "w", encoding="utf-8")
+        cmd = [sys.executable, os.path.join(SCRIPT_DIR, "work_queue.py"), "work", queue_dir,
+               "--worker-id", f"{socket.gethostname()}-local{i}", "--lease", str(lease_s)]
+        procs.append(subprocess.Popen(cmd, cwd=SCRIPT_DIR, stdout=out, stderr=subprocess.STDOUT if out else None,
+                                      env={**os.environ, **(env or {})}))
+    return procs
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Dosya tabanlı iş kuyruğu: worker / durum")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_work = sub.add_parser("work", help="Kuyruk bitene kadar task çalıştır")
+    p_work.add_argument("queue_dir")
+    p_work.add_argument("-n", "--workers", type=int, default=1, help="Bu makinede kaç worker process")
+    p_work.add_argument("--worker-id", default=None)
+    p_work.add_argument("--lease", type=float, default=LEASE_S, help="Lease süresi (sn)")
+    p_work.add_argument("--max-tasks", type=int, default=None, help="Bu kadar task sonra çık")
+    p_status = sub.add_parser("status", help="Kuyruk durumu")
+    p_status.add_argument("queue_dir")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "status":
+        q = WorkQueue(args.queue_dir)
+        print(json.dumps({"job": q.job(), **q.status()}, indent=1, ensure_ascii=False))
+        for tid, err in q.errors().items():
+            print(f"\n❌ task {tid}:\n{err}")
+        return
+
+    if args.workers > 1:
+        procs = spawn_local_workers(args.queue_dir, args.workers, lease_s=args.lease)
+        rcs = [p.wait() for p in procs]
+        if any(rcs):
+            raise SystemExit(1)
+        return
+    n = run_worker(args.queue_dir, worker=args.worker_id, lease_s=args.lease, max_tasks=args.max_tasks)
+    print(f"✅ worker {args.worker_id or worker_name()}: {n} task")
+
+
+if __name__ == "__main__":
+    main()